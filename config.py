@@ -38,6 +38,115 @@ else:
 DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
+# Мониторинг event loop (см. utils/loop_monitor.py)
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '1.0'))
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.25'))
+LOOP_SLOW_CALLBACK_THRESHOLD = float(os.getenv('LOOP_SLOW_CALLBACK_THRESHOLD', '0.1'))
+LOOP_PENDING_UPDATES_THRESHOLD = int(os.getenv('LOOP_PENDING_UPDATES_THRESHOLD', '20'))
+# debug-режим asyncio замедляет каждый callback: включать только для диагностики
+LOOP_DEBUG = os.getenv('LOOP_DEBUG', 'false').lower() == 'true'
+
+
+def _parse_float_map(raw, what='значение'):
+    """'state_transition=0.1,search_operation=0.5' -> {'state_transition': 0.1, ...}"""
+    values = {}
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        key, value = item.split('=', 1)
+        try:
+            values[key.strip()] = float(value)
+        except ValueError:
+            print(f"⚠️  Некорректное {what}: {item}")
+    return values
+
+
+def _parse_sample_rates(raw):
+    rates = _parse_float_map(raw, 'значение частоты сэмплирования')
+    return {event: min(1.0, max(0.0, rate)) for event, rate in rates.items()}
+
+
+# Журнал действий пользователей (utils/user_logger.py)
+USER_LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv('USER_LOG_SAMPLE_RATES', ''))
+USER_LOG_QUEUE_SIZE = int(os.getenv('USER_LOG_QUEUE_SIZE', '10000'))
+
+# Профилировщик SQL (utils/sql_profiler.py), по умолчанию выключен
+SQL_PROFILE = os.getenv('SQL_PROFILE', 'false').lower() == 'true'
+SQL_PROFILE_EXPLAIN_THRESHOLD = float(os.getenv('SQL_PROFILE_EXPLAIN_THRESHOLD', '0.05'))
+SQL_PROFILE_DUMP = os.getenv('SQL_PROFILE_DUMP', 'logs/sql_profile.json')
+
+# SLO для дашборда задержек (scripts/dashboard.py): цель по задержке, сек
+SLO_LATENCY_TARGETS = _parse_float_map(
+    os.getenv('SLO_LATENCY_TARGETS', '/add=2.0,/search=1.0,/payment=1.5,/list=3.0'),
+    'значение цели SLO',
+)
+SLO_DEFAULT_LATENCY_TARGET = float(os.getenv('SLO_DEFAULT_LATENCY_TARGET', '2.0'))
+# Доля «хороших» запросов (быстрее цели и без ошибки)
+SLO_OBJECTIVE = float(os.getenv('SLO_OBJECTIVE', '0.95'))
+
+# Сколько апдейтов обрабатывается одновременно (utils/update_processor.py);
+# апдейты одного пользователя всегда идут по очереди. 1 — строго последовательно
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '8'))
+
+# Состояние диалогов и user_data между рестартами (utils/persistence.py)
+PERSISTENCE_ENABLED = os.getenv('PERSISTENCE_ENABLED', 'true').lower() == 'true'
+PERSISTENCE_PATH = os.getenv('PERSISTENCE_PATH', 'bot_state.db')
+# Как часто сбрасывать изменённые данные в базу, мс
+PERSISTENCE_FLUSH_MS = int(os.getenv('PERSISTENCE_FLUSH_MS', '500'))
+
+# Лимит исходящих запросов к Bot API на бота, запросов в секунду (utils/rate_limiter.py)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+# Планировщик исходящих запросов (utils/rate_limiter.py): лимиты на чат и повторы после RetryAfter
+RATE_LIMITER_ENABLED = os.getenv('RATE_LIMITER_ENABLED', 'true').lower() == 'true'
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+TELEGRAM_GROUP_RATE_PER_MIN = float(os.getenv('TELEGRAM_GROUP_RATE_PER_MIN', '20'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '2'))
+# Сколько ID сообщений на чат хранить для очистки (utils/message_cleanup.py)
+CLEANUP_MAX_TRACKED = int(os.getenv('CLEANUP_MAX_TRACKED', '200'))
+
+# Режим получения апдейтов: 'polling' или 'webhook' (utils/webhook_server.py, нужен aiohttp)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').strip().lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').strip()  # публичный https-адрес без пути
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '').strip()  # пусто — генерируется при запуске
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+# Порт /metrics и /healthz в режиме polling (0 — не поднимать сервер);
+# в режиме webhook эндпоинты доступны на WEBHOOK_PORT
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+# Бот обрабатывает только сообщения и нажатия кнопок
+ALLOWED_UPDATES = [
+    u.strip() for u in os.getenv('ALLOWED_UPDATES', 'message,callback_query').split(',') if u.strip()
+]
+
+# Файл ACL (utils/acl.py): роли, выданные командой /admin. Роли из
+# COORDINATOR_IDS/VIEWER_IDS действуют всегда; файл перечитывается при изменении
+ACL_PATH = os.getenv('ACL_PATH', 'acl.json')
+ACL_RELOAD_INTERVAL = float(os.getenv('ACL_RELOAD_INTERVAL', '1.0'))
+
+# Хуки middleware (utils/middleware.py), которые нужно выключить:
+# log_updates, access, debug_callbacks — через запятую
+MIDDLEWARE_DISABLED = [
+    m.strip() for m in os.getenv('MIDDLEWARE_DISABLED', '').split(',') if m.strip()
+]
+
+# Взнос за мероприятие в шекелях (utils/payment_ledger.py): баланс ниже взноса —
+# статус Partial, не ниже — Paid. 0 — любой взнос считается полной оплатой
+EVENT_FEE = int(os.getenv('EVENT_FEE', '0'))
+
+# Сверка выписки банка/Bit (/reconcile, utils/payment_reconciliation.py):
+# совпадения с уверенностью не ниже порога вносятся кнопкой «уверенные»
+RECONCILE_MIN_CONFIDENCE = float(os.getenv('RECONCILE_MIN_CONFIDENCE', '0.85'))
+
+# Кеш участников в сервисе: правки бота обновляют его вместе с версией записи,
+# поэтому TTL (сек) нужен только для правок мимо бота — в интерфейсе Airtable.
+# 0 — кеш не устаревает. Поле Airtable с временем изменения: AIRTABLE_MODIFIED_FIELD
+PARTICIPANTS_CACHE_TTL = float(
+    os.getenv('PARTICIPANTS_CACHE_TTL', '300' if DATABASE_TYPE == 'airtable' else '0')
+)
+
 # Проверка конфигурации
 if BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE' or len(BOT_TOKEN) < 40:
     print("⚠️  ВНИМАНИЕ: Установите корректный BOT_TOKEN в файле .env")
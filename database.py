@@ -2,8 +2,14 @@ import sqlite3
 import logging
 from typing import List, Dict, Optional
 
+from utils import sql_profiler
+from utils.duplicate_keys import contact_keys, name_key
+from utils.migrations import Migration, run_migrations
+from utils.payment_ledger import payment_status_for
+from utils.payment_summary import diff_breakdowns, summary_from_breakdown
 from utils.exceptions import (
     BotException,
+    ConcurrentModificationError,
     ParticipantNotFoundError,
     DuplicateParticipantError,
     ValidationError,
@@ -50,10 +56,9 @@ class DatabaseConnection:
         self.conn: Optional[sqlite3.Connection] = None
 
     def __enter__(self) -> sqlite3.Connection:
-        self.conn = sqlite3.connect(DB_PATH)
+        # Профилирование включается через SQL_PROFILE; иначе обычное соединение
+        self.conn = sql_profiler.connect(DB_PATH)
         self.conn.row_factory = sqlite3.Row
-        sql_logger = logging.getLogger('sql')
-        self.conn.set_trace_callback(sql_logger.info)
         return self.conn
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
@@ -81,92 +86,465 @@ def _truncate_fields(data: Dict) -> Dict:
     return result
 
 
-def init_database():
-    """Создание таблицы участников при первом запуске"""
+def init_database(dry_run: bool = False) -> List[Migration]:
+    """
+    Приводит схему к последней миграции из MIGRATIONS (utils/migrations.py).
+
+    Если схема актуальна, выполняется только чтение ``PRAGMA user_version``.
+    ``dry_run=True`` ничего не меняет и возвращает ожидающие миграции;
+    иначе возвращает применённые.
+    """
     try:
         with DatabaseConnection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS participants (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    FullNameRU TEXT NOT NULL,
-                    Gender TEXT CHECK (Gender IN ('M', 'F')) DEFAULT 'F',
-                    Size TEXT,
-                    CountryAndCity TEXT,
-                    Church TEXT,
-                    Role TEXT CHECK (Role IN ('CANDIDATE', 'TEAM')) DEFAULT 'CANDIDATE',
-                    Department TEXT,
-                    FullNameEN TEXT,
-                    SubmittedBy TEXT,
-                    ContactInformation TEXT,
-                    roomId INTEGER,
-                    tableId INTEGER,
-                    PaymentStatus TEXT DEFAULT 'Unpaid',
-                    PaymentAmount INTEGER DEFAULT 0,
-                    PaymentDate TEXT DEFAULT '',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            cursor.execute(
-                """
-                CREATE INDEX IF NOT EXISTS Candidates_index_0
-                ON participants (Size, Gender, FullNameRU, Department, Role)
-                """
-            )
-            cursor.execute(
-                """
-                CREATE INDEX IF NOT EXISTS FullNameRU_index
-                ON participants (FullNameRU)
-                """
-            )
-            cursor.execute(
-                """
-                CREATE TRIGGER IF NOT EXISTS check_team_department
-                BEFORE INSERT ON participants
-                WHEN NEW.Role = 'TEAM' AND (NEW.Department IS NULL OR NEW.Department = '')
-                BEGIN
-                    SELECT RAISE(ABORT, 'Department is required for TEAM role');
-                END;
-                """
-            )
-            
-            # Run migration to add payment fields to existing databases
-            _migrate_payment_fields(cursor)
-            
-            print("✅ База данных инициализирована")
+            migrations = run_migrations(conn, MIGRATIONS, dry_run=dry_run)
     except sqlite3.Error as e:
         logger.error("Error initializing database: %s", e)
+        return []
+    if not dry_run:
+        print("✅ База данных инициализирована")
+    return migrations
+
+
+def _create_participants(cursor: sqlite3.Cursor) -> None:
+    """Таблица участников, индексы и проверка отдела для TEAM."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS participants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            FullNameRU TEXT NOT NULL,
+            Gender TEXT CHECK (Gender IN ('M', 'F')) DEFAULT 'F',
+            Size TEXT,
+            CountryAndCity TEXT,
+            Church TEXT,
+            Role TEXT CHECK (Role IN ('CANDIDATE', 'TEAM')) DEFAULT 'CANDIDATE',
+            Department TEXT,
+            FullNameEN TEXT,
+            SubmittedBy TEXT,
+            ContactInformation TEXT,
+            roomId INTEGER,
+            tableId INTEGER,
+            PaymentStatus TEXT DEFAULT 'Unpaid',
+            PaymentAmount INTEGER DEFAULT 0,
+            PaymentDate TEXT DEFAULT '',
+            version INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS Candidates_index_0
+        ON participants (Size, Gender, FullNameRU, Department, Role)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS FullNameRU_index
+        ON participants (FullNameRU)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS check_team_department
+        BEFORE INSERT ON participants
+        WHEN NEW.Role = 'TEAM' AND (NEW.Department IS NULL OR NEW.Department = '')
+        BEGIN
+            SELECT RAISE(ABORT, 'Department is required for TEAM role');
+        END;
+        """
+    )
 
 
 def _migrate_payment_fields(cursor: sqlite3.Cursor) -> None:
     """Migration to add payment fields to existing databases."""
+    # Check if payment fields already exist
+    cursor.execute("PRAGMA table_info(participants)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    payment_fields_to_add = []
+    if 'PaymentStatus' not in columns:
+        payment_fields_to_add.append("PaymentStatus TEXT DEFAULT 'Unpaid'")
+    if 'PaymentAmount' not in columns:
+        payment_fields_to_add.append("PaymentAmount INTEGER DEFAULT 0")
+    if 'PaymentDate' not in columns:
+        payment_fields_to_add.append("PaymentDate TEXT DEFAULT ''")
+
+    # Add missing payment fields
+    for field_def in payment_fields_to_add:
+        cursor.execute(f"ALTER TABLE participants ADD COLUMN {field_def}")
+        logger.info(f"Added payment field: {field_def}")
+
+    if payment_fields_to_add:
+        print(f"✅ Миграция завершена: добавлено {len(payment_fields_to_add)} полей оплаты")
+
+
+def _migrate_version_column(cursor: sqlite3.Cursor) -> None:
+    """Добавляет счётчик версий для оптимистичной блокировки (см. _check_version)."""
+    cursor.execute("PRAGMA table_info(participants)")
+    if "version" not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE participants ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        logger.info("Added participants.version column")
+
+
+def _check_version(
+    cursor: sqlite3.Cursor, participant_id: int, expected_version: Optional[int]
+) -> int:
+    """
+    Разбирает результат ``UPDATE ... SET version = version + 1 WHERE id = ?
+    [AND version = ?]`` и возвращает новую версию записи.
+
+    Ни одной строки не изменено: участника нет (ParticipantNotFoundError) или
+    его уже сохранил кто-то другой (ConcurrentModificationError).
+    """
+    updated = cursor.rowcount > 0
+    if updated and expected_version is not None:
+        return expected_version + 1
+    cursor.execute("SELECT version FROM participants WHERE id = ?", (participant_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ParticipantNotFoundError(
+            f"Participant with id {participant_id} not found"
+        )
+    if not updated:
+        raise ConcurrentModificationError(
+            f"Participant {participant_id} was modified: version {row[0]}, expected {expected_version}"
+        )
+    return row[0]
+
+
+def _version_filter(participant_id: int, expected_version: Optional[int]):
+    """Условие WHERE для UPDATE участника: с проверкой версии, если она известна."""
+    if expected_version is None:
+        return "id = ?", (participant_id,)
+    return "id = ? AND version = ?", (participant_id, expected_version)
+
+
+# Сводка оплат по статусам; её поддерживают триггеры ниже в той же транзакции,
+# что и изменение участника. NULL-статус хранится как ''.
+_PAYMENT_SUMMARY_ADD = """
+    INSERT INTO payment_summary (PaymentStatus, count, total)
+    VALUES (IFNULL(NEW.PaymentStatus, ''), 1, IFNULL(NEW.PaymentAmount, 0))
+    ON CONFLICT(PaymentStatus) DO UPDATE SET
+        count = count + 1, total = total + excluded.total;
+"""
+_PAYMENT_SUMMARY_REMOVE = """
+    UPDATE payment_summary
+    SET count = count - 1, total = total - IFNULL(OLD.PaymentAmount, 0)
+    WHERE PaymentStatus = IFNULL(OLD.PaymentStatus, '');
+    DELETE FROM payment_summary
+    WHERE PaymentStatus = IFNULL(OLD.PaymentStatus, '') AND count <= 0;
+"""
+_PAYMENT_SUMMARY_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS payment_summary_insert
+    AFTER INSERT ON participants
+    BEGIN {_PAYMENT_SUMMARY_ADD} END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS payment_summary_delete
+    AFTER DELETE ON participants
+    BEGIN {_PAYMENT_SUMMARY_REMOVE} END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS payment_summary_update
+    AFTER UPDATE OF PaymentStatus, PaymentAmount ON participants
+    WHEN IFNULL(OLD.PaymentStatus, '') IS NOT IFNULL(NEW.PaymentStatus, '')
+      OR IFNULL(OLD.PaymentAmount, 0) IS NOT IFNULL(NEW.PaymentAmount, 0)
+    BEGIN {_PAYMENT_SUMMARY_REMOVE} {_PAYMENT_SUMMARY_ADD} END;
+    """,
+)
+
+
+def _create_payment_summary(cursor: sqlite3.Cursor) -> None:
+    """Создаёт сводку оплат и триггеры; новую сводку заполняет из participants."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'payment_summary'"
+    )
+    exists = cursor.fetchone() is not None
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payment_summary (
+            PaymentStatus TEXT PRIMARY KEY NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    for trigger in _PAYMENT_SUMMARY_TRIGGERS:
+        cursor.execute(trigger)
+    if not exists:
+        _rebuild_payment_summary(cursor)
+
+
+def _scan_payment_breakdown(cursor: sqlite3.Cursor) -> Dict:
+    """Разбивка по статусам полным проходом по participants (для проверки)."""
+    # GROUP BY по самой колонке идёт по порядку participants_payment_index без
+    # сортировки; NULL и '' сводятся в один статус уже здесь
+    cursor.execute(
+        """
+        SELECT PaymentStatus, COUNT(*), IFNULL(SUM(PaymentAmount), 0)
+        FROM participants
+        GROUP BY PaymentStatus
+        """
+    )
+    breakdown: Dict = {}
+    for status, count, total in cursor.fetchall():
+        item = breakdown.setdefault(status or "", {"count": 0, "total": 0})
+        item["count"] += count
+        item["total"] += total
+    return breakdown
+
+
+def _read_payment_breakdown(cursor: sqlite3.Cursor) -> Dict:
+    cursor.execute("SELECT PaymentStatus, count, total FROM payment_summary")
+    return {row[0]: {"count": row[1], "total": row[2]} for row in cursor.fetchall()}
+
+
+def _rebuild_payment_summary(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("DELETE FROM payment_summary")
+    cursor.execute(
+        """
+        INSERT INTO payment_summary (PaymentStatus, count, total)
+        SELECT IFNULL(PaymentStatus, ''), COUNT(*), IFNULL(SUM(PaymentAmount), 0)
+        FROM participants
+        GROUP BY 1
+        """
+    )
+
+
+# Журнал платежей (utils/payment_ledger.py): записи только добавляются,
+# баланс участника и итоги по дням обновляет триггер на вставку.
+_PAYMENTS_LEDGER_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        participant_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL CHECK (amount <> 0),
+        PaymentDate TEXT NOT NULL,
+        method TEXT,
+        recorded_by INTEGER,
+        reference TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS payments_participant_index
+    ON payments (participant_id, id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payment_balances (
+        participant_id INTEGER PRIMARY KEY,
+        balance INTEGER NOT NULL DEFAULT 0,
+        payments_count INTEGER NOT NULL DEFAULT 0,
+        last_payment_date TEXT NOT NULL DEFAULT ''
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payment_daily (
+        PaymentDate TEXT PRIMARY KEY NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payments_insert
+    AFTER INSERT ON payments
+    BEGIN
+        INSERT INTO payment_balances (participant_id, balance, payments_count, last_payment_date)
+        VALUES (NEW.participant_id, NEW.amount, 1, NEW.PaymentDate)
+        ON CONFLICT(participant_id) DO UPDATE SET
+            balance = balance + excluded.balance,
+            payments_count = payments_count + 1,
+            last_payment_date = MAX(last_payment_date, excluded.last_payment_date);
+        INSERT INTO payment_daily (PaymentDate, total, count)
+        VALUES (NEW.PaymentDate, NEW.amount, 1)
+        ON CONFLICT(PaymentDate) DO UPDATE SET
+            total = total + excluded.total, count = count + 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payments_no_update
+    BEFORE UPDATE ON payments
+    BEGIN
+        SELECT RAISE(ABORT, 'payments ledger is append-only');
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payments_no_delete
+    BEFORE DELETE ON payments
+    BEGIN
+        SELECT RAISE(ABORT, 'payments ledger is append-only');
+    END;
+    """,
+)
+
+
+def _create_payments_ledger(cursor: sqlite3.Cursor) -> None:
+    """Создаёт журнал платежей; в новый журнал переносит уже внесённые суммы."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'payments'"
+    )
+    exists = cursor.fetchone() is not None
+    for statement in _PAYMENTS_LEDGER_SCHEMA:
+        cursor.execute(statement)
+    cursor.execute("PRAGMA table_info(payments)")
+    if "reference" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE payments ADD COLUMN reference TEXT")
+    # ссылка на операцию банка: одну выписку нельзя внести дважды
+    cursor.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS payments_reference_index
+        ON payments (reference) WHERE reference IS NOT NULL
+        """
+    )
+    if not exists:
+        # прежние оплаты становятся начальными записями журнала
+        cursor.execute(
+            """
+            INSERT INTO payments (participant_id, amount, PaymentDate, method)
+            SELECT id, PaymentAmount,
+                   IFNULL(NULLIF(PaymentDate, ''), date(created_at)), 'opening_balance'
+            FROM participants
+            WHERE PaymentAmount > 0
+            ORDER BY id
+            """
+        )
+        if cursor.rowcount > 0:
+            logger.info("Moved %d existing payments into the ledger", cursor.rowcount)
+
+
+def _add_query_indexes(cursor: sqlite3.Cursor) -> None:
+    """
+    Индексы под реальные запросы (нагрузка и планы — scripts/query_plan.py).
+
+    Candidates_index_0 (Size, Gender, FullNameRU, Department, Role) не
+    подходил ни одному запросу и только замедлял запись.
+    """
+    cursor.execute("DROP INDEX IF EXISTS Candidates_index_0")
+    # get_all_participants: ORDER BY created_at без сортировки во временном B-tree
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS participants_created_index ON participants (created_at)"
+    )
+    # get_unpaid_participants (фильтр по статусу + порядок); покрывающий для
+    # проверки сводки оплат, которой нужны только статус и сумма
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS participants_payment_index
+        ON participants (PaymentStatus, created_at, PaymentAmount)
+        """
+    )
+    # список/экспорт команды по отделу, по алфавиту
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS participants_role_department_index
+        ON participants (Role, Department, FullNameRU)
+        """
+    )
+
+
+# Полнотекстовый индекс для поиска (FTS5, триграммы): хранит только индекс,
+# текст читается из participants (external content). Триггеры держат его в
+# синхроне в той же транзакции, что и изменение участника.
+SEARCH_COLUMNS = ("FullNameRU", "FullNameEN", "Church", "CountryAndCity", "ContactInformation")
+_SEARCH_NEW = ", ".join(f"NEW.{column}" for column in SEARCH_COLUMNS)
+_SEARCH_OLD = ", ".join(f"OLD.{column}" for column in SEARCH_COLUMNS)
+_SEARCH_INDEX_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS participants_fts USING fts5(
+        {", ".join(SEARCH_COLUMNS)},
+        content = 'participants', content_rowid = 'id', tokenize = 'trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS participants_fts_insert
+    AFTER INSERT ON participants
+    BEGIN
+        INSERT INTO participants_fts (rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES (NEW.id, {_SEARCH_NEW});
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS participants_fts_delete
+    AFTER DELETE ON participants
+    BEGIN
+        INSERT INTO participants_fts (participants_fts, rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', OLD.id, {_SEARCH_OLD});
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS participants_fts_update
+    AFTER UPDATE OF {", ".join(SEARCH_COLUMNS)} ON participants
+    BEGIN
+        INSERT INTO participants_fts (participants_fts, rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', OLD.id, {_SEARCH_OLD});
+        INSERT INTO participants_fts (rowid, {", ".join(SEARCH_COLUMNS)})
+        VALUES (NEW.id, {_SEARCH_NEW});
+    END;
+    """,
+    # частота триграмм (в скольких записях встречается) для нечёткого поиска
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS participants_fts_vocab
+    USING fts5vocab(participants_fts, 'row')
+    """,
+)
+# Вес колонок в bm25: совпадение в имени важнее, чем в церкви или контактах
+_SEARCH_WEIGHTS = "4.0, 4.0, 1.0, 1.0, 1.0"
+
+
+def _create_search_index(cursor: sqlite3.Cursor) -> None:
+    """Создаёт participants_fts и заполняет его из participants."""
     try:
-        # Check if payment fields already exist
-        cursor.execute("PRAGMA table_info(participants)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        payment_fields_to_add = []
-        if 'PaymentStatus' not in columns:
-            payment_fields_to_add.append("PaymentStatus TEXT DEFAULT 'Unpaid'")
-        if 'PaymentAmount' not in columns:
-            payment_fields_to_add.append("PaymentAmount INTEGER DEFAULT 0")
-        if 'PaymentDate' not in columns:
-            payment_fields_to_add.append("PaymentDate TEXT DEFAULT ''")
-        
-        # Add missing payment fields
-        for field_def in payment_fields_to_add:
-            cursor.execute(f"ALTER TABLE participants ADD COLUMN {field_def}")
-            logger.info(f"Added payment field: {field_def}")
-        
-        if payment_fields_to_add:
-            print(f"✅ Миграция завершена: добавлено {len(payment_fields_to_add)} полей оплаты")
-        
-    except sqlite3.Error as e:
-        logger.error("Error during payment fields migration: %s", e)
-        # Don't raise exception - let the app continue with existing schema
+        cursor.execute(_SEARCH_INDEX_SCHEMA[0])
+    except sqlite3.OperationalError as e:
+        # SQLite без FTS5 или старше 3.34 (нет trigram): поиск останется
+        # полным проходом в сервисе, как и для Airtable
+        logger.warning("Full-text search index is not available: %s", e)
+        return
+    for statement in _SEARCH_INDEX_SCHEMA[1:]:
+        cursor.execute(statement)
+    cursor.execute("INSERT INTO participants_fts (participants_fts) VALUES ('rebuild')")
+
+
+def _add_duplicate_keys(cursor: sqlite3.Cursor) -> None:
+    """
+    Нормализованные ключи имени и контактов (utils/duplicate_keys.py) для
+    поиска дублей по индексу; заполняются для уже внесённых участников.
+    """
+    cursor.execute("PRAGMA table_info(participants)")
+    columns = {column[1] for column in cursor.fetchall()}
+    for column in ("NameKey", "PhoneKey", "EmailKey"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE participants ADD COLUMN {column} TEXT")
+    cursor.execute("SELECT id, FullNameRU, ContactInformation FROM participants")
+    cursor.executemany(
+        "UPDATE participants SET NameKey = ?, PhoneKey = ?, EmailKey = ? WHERE id = ?",
+        [
+            (name_key(full_name), *contact_keys(contact), participant_id)
+            for participant_id, full_name, contact in cursor.fetchall()
+        ],
+    )
+    for column in ("NameKey", "PhoneKey", "EmailKey"):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS participants_{column.lower()}_index "
+            f"ON participants ({column})"
+        )
+
+
+# Миграции схемы по PRAGMA user_version; новые добавляются в конец со
+# следующим номером. 1–5 повторяют прежний init_database и идемпотентны:
+# база, созданная до user_version (версия 0), может уже содержать любую их часть.
+MIGRATIONS = (
+    Migration(1, "participants table", _create_participants),
+    Migration(2, "payment fields", _migrate_payment_fields),
+    Migration(3, "participants.version", _migrate_version_column),
+    Migration(4, "payment summary", _create_payment_summary),
+    Migration(5, "payments ledger", _create_payments_ledger),
+    Migration(6, "query indexes", _add_query_indexes),
+    Migration(7, "full-text search index", _create_search_index),
+    Migration(8, "duplicate keys", _add_duplicate_keys),
+)
+SCHEMA_VERSION = MIGRATIONS[-1].version
 
 
 def add_participant(participant_data: Dict) -> int:
@@ -178,8 +556,9 @@ def add_participant(participant_data: Dict) -> int:
                 """
                 INSERT INTO participants
                 (FullNameRU, Gender, Size, CountryAndCity, Church, Role, Department,
-                 FullNameEN, SubmittedBy, ContactInformation, PaymentStatus, PaymentAmount, PaymentDate)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 FullNameEN, SubmittedBy, ContactInformation, PaymentStatus, PaymentAmount, PaymentDate,
+                 NameKey, PhoneKey, EmailKey)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     participant_data.get('FullNameRU'),
@@ -195,9 +574,17 @@ def add_participant(participant_data: Dict) -> int:
                     participant_data.get('PaymentStatus', 'Unpaid'),
                     participant_data.get('PaymentAmount', 0),
                     participant_data.get('PaymentDate', ''),
+                    name_key(participant_data.get('FullNameRU')),
+                    *contact_keys(participant_data.get('ContactInformation')),
                 ),
             )
             participant_id = cursor.lastrowid
+            _sync_ledger(
+                cursor,
+                participant_id,
+                participant_data.get('PaymentAmount', 0),
+                participant_data.get('PaymentDate'),
+            )
             return participant_id
     except sqlite3.IntegrityError as e:
         logger.error("Validation error while adding participant: %s", e)
@@ -277,21 +664,30 @@ def get_participant_by_id_safe(participant_id: int, context: str = "") -> Option
     return participant
 
 
-def update_participant(participant_id: int, participant_data: Dict) -> bool:
-    """Update a participant or raise ParticipantNotFoundError if missing."""
+def update_participant(
+    participant_id: int, participant_data: Dict, expected_version: Optional[int] = None
+) -> int:
+    """
+    Update a participant or raise ParticipantNotFoundError if missing.
+
+    С ``expected_version`` запись меняется, только если её версия не изменилась
+    (иначе ConcurrentModificationError). Возвращает новую версию записи.
+    """
 
     participant_data = _truncate_fields(participant_data)
+    where, where_params = _version_filter(participant_id, expected_version)
     try:
         with DatabaseConnection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                """
+                f"""
                 UPDATE participants SET
                 FullNameRU = ?, Gender = ?, Size = ?, CountryAndCity = ?, Church = ?,
                 Role = ?, Department = ?, FullNameEN = ?, SubmittedBy = ?,
                 ContactInformation = ?, PaymentStatus = ?, PaymentAmount = ?, PaymentDate = ?, 
-                updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
+                NameKey = ?, PhoneKey = ?, EmailKey = ?,
+                version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE {where}
                 """,
                 (
                     participant_data.get('FullNameRU'),
@@ -307,14 +703,19 @@ def update_participant(participant_id: int, participant_data: Dict) -> bool:
                     participant_data.get('PaymentStatus', 'Unpaid'),
                     participant_data.get('PaymentAmount', 0),
                     participant_data.get('PaymentDate', ''),
-                    participant_id,
+                    name_key(participant_data.get('FullNameRU')),
+                    *contact_keys(participant_data.get('ContactInformation')),
+                    *where_params,
                 ),
             )
-            if cursor.rowcount == 0:
-                raise ParticipantNotFoundError(
-                    f"Participant with id {participant_id} not found"
-                )
-            return True
+            version = _check_version(cursor, participant_id, expected_version)
+            _sync_ledger(
+                cursor,
+                participant_id,
+                participant_data.get('PaymentAmount', 0),
+                participant_data.get('PaymentDate'),
+            )
+            return version
     except sqlite3.IntegrityError as e:
         logger.error("Validation error while updating participant %s: %s", participant_id, e)
         raise ValidationError(str(e)) from e
@@ -367,6 +768,16 @@ VALID_FIELDS = {
 }
 
 
+def _duplicate_key_updates(field_updates: Dict) -> Dict:
+    """Ключи дублей, которые меняются вместе с именем или контактами."""
+    keys: Dict = {}
+    if "FullNameRU" in field_updates:
+        keys["NameKey"] = name_key(field_updates["FullNameRU"])
+    if "ContactInformation" in field_updates:
+        keys["PhoneKey"], keys["EmailKey"] = contact_keys(field_updates["ContactInformation"])
+    return keys
+
+
 def _validate_participant_fields(field_updates: Dict) -> bool:
     """Check that provided fields are valid columns in the table."""
     if not field_updates:
@@ -374,28 +785,43 @@ def _validate_participant_fields(field_updates: Dict) -> bool:
     return all(field in VALID_FIELDS for field in field_updates.keys())
 
 
-def update_participant_field(participant_id: int, field_updates: Dict) -> bool:
-    """Update specific fields for a participant without touching other data."""
+def update_participant_field(
+    participant_id: int, field_updates: Dict, expected_version: Optional[int] = None
+) -> int:
+    """
+    Update specific fields for a participant without touching other data.
+
+    Версия проверяется и увеличивается как в update_participant; возвращает
+    новую версию записи.
+    """
 
     if not _validate_participant_fields(field_updates):
         logger.error("Invalid fields for update: %s", list(field_updates.keys()))
         raise ValidationError("Invalid fields for update")
 
     field_updates = _truncate_fields(field_updates)
+    field_updates.update(_duplicate_key_updates(field_updates))
     set_clause = ", ".join(f"{field} = ?" for field in field_updates.keys())
-    values = list(field_updates.values())
-    values.append(participant_id)
+    where, where_params = _version_filter(participant_id, expected_version)
+    values = [*field_updates.values(), *where_params]
 
     try:
         with DatabaseConnection() as conn:
             cursor = conn.cursor()
-            query = f"UPDATE participants SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+            query = (
+                f"UPDATE participants SET {set_clause}, version = version + 1, "
+                f"updated_at = CURRENT_TIMESTAMP WHERE {where}"
+            )
             cursor.execute(query, values)
-            if cursor.rowcount == 0:
-                raise ParticipantNotFoundError(
-                    f"Participant with id {participant_id} not found"
+            version = _check_version(cursor, participant_id, expected_version)
+            if "PaymentAmount" in field_updates:
+                _sync_ledger(
+                    cursor,
+                    participant_id,
+                    field_updates["PaymentAmount"],
+                    field_updates.get("PaymentDate"),
                 )
-            return True
+            return version
     except sqlite3.IntegrityError as e:
         logger.error(
             "Validation error while updating fields for participant %s: %s",
@@ -413,13 +839,20 @@ def update_participant_field(participant_id: int, field_updates: Dict) -> bool:
 
 
 def find_participant_by_name(full_name_ru: str) -> Optional[Dict]:
-    """Ищет участника по имени. Возвращает dict или None, если не найден."""
+    """
+    Ищет участника по имени без учёта регистра, «ё»/«е», дефисов и порядка
+    слов (индекс по NameKey); из нескольких — внесённый первым. Возвращает
+    dict или None, если не найден.
+    """
+    key = name_key(full_name_ru)
+    if key is None:
+        return None
     try:
         with DatabaseConnection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT * FROM participants WHERE FullNameRU = ?",
-                (full_name_ru,),
+                "SELECT * FROM participants WHERE NameKey = ? ORDER BY id LIMIT 1",
+                (key,),
             )
             row = cursor.fetchone()
             # Если строка не найдена, просто возвращаем None. Это не ошибка.
@@ -432,7 +865,116 @@ def find_participant_by_name(full_name_ru: str) -> Optional[Dict]:
         raise BotException("Database error while searching participant") from e
 
 
-def update_payment_status(participant_id: int, status: str, amount: int, date: str) -> bool:
+def find_participants_by_contact(contact: str) -> List[Dict]:
+    """Участники с тем же телефоном или email, что и в ``contact`` (по индексам)."""
+    phone, email = contact_keys(contact)
+    if phone is None and email is None:
+        return []
+    try:
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM participants WHERE PhoneKey = ? OR EmailKey = ?",
+                (phone, email),
+            )
+            # совпадений единицы: порядок по id дешевле задать здесь, чем
+            # сортировать в SQLite после объединения двух индексов
+            return sorted((dict(row) for row in cursor.fetchall()), key=lambda row: row["id"])
+    except sqlite3.Error as e:
+        logger.error("Database error while searching participants by contact: %s", e)
+        raise BotException("Database error while searching participants by contact") from e
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+# Сколько вхождений триграмм читает нечёткий поиск: самые частые триграммы
+# («ов », «ова») есть в каждой второй записи и ранжирование по ним стоило бы
+# как проход по всей таблице, а участника почти не выделяют
+_FUZZY_POSTINGS = 5000
+
+
+def _rare_trigrams(cursor: sqlite3.Cursor, text: str) -> List[str]:
+    """Самые редкие триграммы строки, пока их суммарная частота в пределах бюджета."""
+    trigrams = sorted({text[i : i + 3] for i in range(len(text) - 2)})
+    cursor.execute(
+        "SELECT term, doc FROM participants_fts_vocab "
+        f"WHERE term IN ({', '.join('?' * len(trigrams))}) ORDER BY doc, term",
+        trigrams,
+    )
+    selected: List[str] = []
+    postings = 0
+    for term, doc in cursor.fetchall():
+        if len(selected) >= 3 and postings + doc > _FUZZY_POSTINGS:
+            break
+        selected.append(term)
+        postings += doc
+    return selected
+
+
+def _match_participants(cursor: sqlite3.Cursor, match: str, limit: int) -> List[Dict]:
+    cursor.execute(
+        f"""
+        SELECT p.* FROM participants_fts
+        JOIN participants AS p ON p.id = participants_fts.rowid
+        WHERE participants_fts MATCH ?
+        ORDER BY bm25(participants_fts, {_SEARCH_WEIGHTS})
+        LIMIT ?
+        """,
+        (match, limit),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def search_participants(query: str, limit: int = 50) -> Optional[List[Dict]]:
+    """
+    Кандидаты для поиска из полнотекстового индекса, лучшие первыми.
+
+    Сначала ищутся записи, где каждое слово запроса (от трёх символов)
+    встречается как подстрока; если таких нет — записи с общими редкими
+    триграммами (опечатки). Стоимость зависит от числа совпадений, а не от
+    размера таблицы.
+
+    Возвращает None, если искать в SQLite нельзя (запрос короче трёх
+    символов или индекса нет) — тогда сервис ищет по полному списку.
+    """
+    text = " ".join(query.lower().split())
+    if len(text) < 3:
+        return None
+    words = [word for word in text.split() if len(word) >= 3]
+    try:
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            rows: List[Dict] = []
+            if words:
+                rows = _match_participants(
+                    cursor, " AND ".join(_fts_phrase(word) for word in words), limit
+                )
+            if not rows:
+                trigrams = _rare_trigrams(cursor, text)
+                if trigrams:
+                    rows = _match_participants(
+                        cursor, " OR ".join(_fts_phrase(t) for t in trigrams), limit
+                    )
+            return rows
+    except sqlite3.OperationalError as e:
+        if "participants_fts" in str(e):
+            return None
+        logger.error("Database error while searching participants: %s", e)
+        raise BotException("Database error while searching participants") from e
+    except sqlite3.Error as e:
+        logger.error("Database error while searching participants: %s", e)
+        raise BotException("Database error while searching participants") from e
+
+
+def update_payment_status(
+    participant_id: int,
+    status: str,
+    amount: int,
+    date: str,
+    expected_version: Optional[int] = None,
+) -> int:
     """
     Update payment status for a specific participant.
     
@@ -441,33 +983,34 @@ def update_payment_status(participant_id: int, status: str, amount: int, date: s
         status: Payment status (Unpaid, Paid, Partial, Refunded)
         amount: Payment amount in shekels (integer)
         date: Payment date in ISO format
+        expected_version: Версия, которую видел вызывающий (None — без проверки)
         
     Returns:
-        bool: True if update was successful
+        int: новая версия записи
         
     Raises:
         ParticipantNotFoundError: If participant not found
+        ConcurrentModificationError: If the version has changed
         ValidationError: If validation fails
         BotException: On database errors
     """
     try:
         with DatabaseConnection() as conn:
             cursor = conn.cursor()
+            where, where_params = _version_filter(participant_id, expected_version)
             cursor.execute(
-                """
+                f"""
                 UPDATE participants SET
                 PaymentStatus = ?, PaymentAmount = ?, PaymentDate = ?, 
-                updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
+                version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE {where}
                 """,
-                (status, amount, date, participant_id),
+                (status, amount, date, *where_params),
             )
-            if cursor.rowcount == 0:
-                raise ParticipantNotFoundError(
-                    f"Participant with id {participant_id} not found"
-                )
+            version = _check_version(cursor, participant_id, expected_version)
+            _sync_ledger(cursor, participant_id, amount, date)
             logger.info(f"Updated payment for participant {participant_id}: {status}, {amount}₪")
-            return True
+            return version
     except sqlite3.IntegrityError as e:
         logger.error("Validation error while updating payment for participant %s: %s", participant_id, e)
         raise ValidationError(str(e)) from e
@@ -506,49 +1049,330 @@ def get_unpaid_participants() -> List[Dict]:
 def get_payment_summary() -> Dict:
     """
     Get payment summary statistics.
-    
+
+    Читает сводку ``payment_summary``, которую поддерживают триггеры, —
+    без прохода по таблице участников.
+
     Returns:
         Dict: Payment summary with counts and totals
         
+    Raises:
+        BotException: On database errors
+    """
+    try:
+        with DatabaseConnection() as conn:
+            breakdown = _read_payment_breakdown(conn.cursor())
+            # NULL-статус хранится как '' (как и прежде, отдаём None)
+            if "" in breakdown:
+                breakdown[None] = breakdown.pop("")
+            return summary_from_breakdown(breakdown)
+    except sqlite3.Error as e:
+        logger.error("Database error while fetching payment summary: %s", e)
+        raise BotException("Database error while fetching payment summary") from e
+
+
+def verify_payment_summary(repair: bool = True) -> Dict:
+    """
+    Сверяет сводку оплат с пересчётом с нуля и при расхождении пересобирает её.
+
+    Returns:
+        Dict: ``consistent``, ``repaired`` и ``differences`` по статусам
+
+    Raises:
+        BotException: On database errors
+    """
+    try:
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            differences = diff_breakdowns(
+                _scan_payment_breakdown(cursor), _read_payment_breakdown(cursor)
+            )
+            repaired = bool(differences) and repair
+            if differences:
+                logger.warning("Payment summary is inconsistent: %s", differences)
+            if repaired:
+                _rebuild_payment_summary(cursor)
+            return {
+                "consistent": not differences,
+                "repaired": repaired,
+                "differences": differences,
+            }
+    except sqlite3.Error as e:
+        logger.error("Database error while verifying payment summary: %s", e)
+        raise BotException("Database error while verifying payment summary") from e
+
+
+def _sync_ledger(
+    cursor: sqlite3.Cursor, participant_id: int, amount: Optional[int], date: Optional[str]
+) -> None:
+    """
+    Сумма оплаты, записанная в участника напрямую (форма, правка поля,
+    update_payment_status), проходит через журнал: разница с балансом
+    вносится корректировкой, чтобы PaymentAmount совпадал с балансом.
+    """
+    cursor.execute(
+        "SELECT balance FROM payment_balances WHERE participant_id = ?", (participant_id,)
+    )
+    row = cursor.fetchone()
+    delta = int(amount or 0) - (row[0] if row else 0)
+    if delta == 0:
+        return
+    cursor.execute(
+        """
+        INSERT INTO payments (participant_id, amount, PaymentDate, method)
+        VALUES (?, ?, IFNULL(NULLIF(?, ''), date('now')), 'adjustment')
+        """,
+        (participant_id, delta, date),
+    )
+    logger.info(
+        f"Ledger adjustment for participant {participant_id}: {delta:+}₪ (balance {amount}₪)"
+    )
+
+
+def _record_payment(
+    cursor: sqlite3.Cursor,
+    participant_id: int,
+    amount: int,
+    date: str,
+    event_fee: int,
+    method: Optional[str],
+    recorded_by: Optional[int],
+    reference: Optional[str] = None,
+) -> Optional[Dict]:
+    """Запись платежа и пересчёт участника; None — ссылка уже есть в журнале."""
+    cursor.execute("SELECT version FROM participants WHERE id = ?", (participant_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ParticipantNotFoundError(
+            f"Participant with id {participant_id} not found"
+        )
+    cursor.execute(
+        """
+        INSERT INTO payments (participant_id, amount, PaymentDate, method, recorded_by, reference)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(reference) WHERE reference IS NOT NULL DO NOTHING
+        """,
+        (participant_id, amount, date, method, recorded_by, reference),
+    )
+    if cursor.rowcount == 0:
+        return None
+    payment_id = cursor.lastrowid
+    cursor.execute(
+        "SELECT balance, last_payment_date FROM payment_balances WHERE participant_id = ?",
+        (participant_id,),
+    )
+    balance, last_payment_date = cursor.fetchone()
+    status = payment_status_for(balance, event_fee)
+    cursor.execute(
+        """
+        UPDATE participants SET
+        PaymentStatus = ?, PaymentAmount = ?, PaymentDate = ?,
+        version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """,
+        (status, balance, last_payment_date, participant_id),
+    )
+    logger.info(
+        f"Recorded payment {payment_id} for participant {participant_id}: "
+        f"{amount}₪, balance {balance}₪, {status}"
+    )
+    return {
+        "payment_id": payment_id,
+        "participant_id": participant_id,
+        "amount": amount,
+        "balance": balance,
+        "status": status,
+        "payment_date": last_payment_date,
+        "version": row[0] + 1,
+    }
+
+
+def record_payment(
+    participant_id: int,
+    amount: int,
+    date: str,
+    event_fee: int = 0,
+    method: Optional[str] = None,
+    recorded_by: Optional[int] = None,
+) -> Dict:
+    """
+    Добавляет платёж в журнал и пересчитывает статус участника.
+
+    В одной транзакции: запись в ``payments`` (триггер обновляет баланс и
+    итог дня), чтение баланса по ключу и обновление ``PaymentStatus``,
+    ``PaymentAmount`` (= баланс) и ``PaymentDate`` участника.
+
+    Args:
+        participant_id: ID участника
+        amount: Сумма взноса в шекелях; отрицательная — корректировка/возврат
+        date: Дата платежа в ISO формате
+        event_fee: Взнос за мероприятие; 0 — любой взнос считается полной оплатой
+        method: Способ оплаты (наличные, перевод, ...)
+        recorded_by: Telegram ID пользователя, внёсшего платёж
+
+    Returns:
+        Dict: ``payment_id``, ``participant_id``, ``amount``, ``balance``,
+        ``status``, ``payment_date``, ``version`` (новая версия участника)
+
+    Raises:
+        ParticipantNotFoundError: If participant not found
+        ValidationError: If amount is zero
+        BotException: On database errors
+    """
+    try:
+        with DatabaseConnection() as conn:
+            return _record_payment(
+                conn.cursor(), participant_id, amount, date, event_fee, method, recorded_by
+            )
+    except sqlite3.IntegrityError as e:
+        logger.error("Validation error while recording payment for participant %s: %s", participant_id, e)
+        raise ValidationError(str(e)) from e
+    except sqlite3.Error as e:
+        logger.error("Database error while recording payment for participant %s: %s", participant_id, e)
+        raise BotException("Database error while recording payment") from e
+
+
+def record_payments(payments: List[Dict], event_fee: int = 0) -> Dict:
+    """
+    Вносит пачку платежей (сверка выписки) одной транзакцией.
+
+    Args:
+        payments: Словари ``participant_id``, ``amount``, ``date`` и
+            необязательные ``method``, ``recorded_by``, ``reference``
+        event_fee: Взнос за мероприятие
+
+    Returns:
+        Dict: ``recorded`` — результаты как у ``record_payment``;
+        ``duplicates`` — ссылки, которые уже есть в журнале;
+        ``missing`` — ID участников, которых больше нет
+
+    Raises:
+        ValidationError: If an amount is zero (nothing is written)
+        BotException: On database errors
+    """
+    result: Dict[str, List] = {"recorded": [], "duplicates": [], "missing": []}
+    try:
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            for payment in payments:
+                try:
+                    recorded = _record_payment(
+                        cursor,
+                        int(payment["participant_id"]),
+                        payment["amount"],
+                        payment["date"],
+                        event_fee,
+                        payment.get("method"),
+                        payment.get("recorded_by"),
+                        payment.get("reference"),
+                    )
+                except ParticipantNotFoundError:
+                    result["missing"].append(payment["participant_id"])
+                    continue
+                if recorded is None:
+                    result["duplicates"].append(payment.get("reference"))
+                else:
+                    recorded["reference"] = payment.get("reference")
+                    result["recorded"].append(recorded)
+            logger.info(
+                "Recorded %d payments in batch (%d duplicates, %d missing participants)",
+                len(result["recorded"]), len(result["duplicates"]), len(result["missing"]),
+            )
+            return result
+    except sqlite3.IntegrityError as e:
+        logger.error("Validation error while recording payment batch: %s", e)
+        raise ValidationError(str(e)) from e
+    except sqlite3.Error as e:
+        logger.error("Database error while recording payment batch: %s", e)
+        raise BotException("Database error while recording payments") from e
+
+
+def get_participant_balance(participant_id: int) -> Optional[Dict]:
+    """
+    Баланс участника из ``payment_balances`` (поиск по первичному ключу).
+
+    Returns:
+        Optional[Dict]: ``participant_id``, ``balance``, ``payments_count``,
+        ``last_payment_date`` или None, если платежей не было
+
     Raises:
         BotException: On database errors
     """
     try:
         with DatabaseConnection() as conn:
             cursor = conn.cursor()
-            
-            # Get counts by payment status
             cursor.execute(
                 """
-                SELECT PaymentStatus, COUNT(*) as count, SUM(PaymentAmount) as total
-                FROM participants 
-                GROUP BY PaymentStatus
-                """
+                SELECT participant_id, balance, payments_count, last_payment_date
+                FROM payment_balances WHERE participant_id = ?
+                """,
+                (participant_id,),
             )
-            status_summary = {row[0]: {"count": row[1], "total": row[2] or 0} for row in cursor.fetchall()}
-            
-            # Get overall totals
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    except sqlite3.Error as e:
+        logger.error("Database error while fetching balance for participant %s: %s", participant_id, e)
+        raise BotException("Database error while fetching balance") from e
+
+
+def get_payment_history(participant_id: int) -> List[Dict]:
+    """
+    Платежи участника в порядке внесения (по индексу ``participant_id, id``).
+
+    Raises:
+        BotException: On database errors
+    """
+    try:
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 """
-                SELECT 
-                    COUNT(*) as total_participants,
-                    SUM(PaymentAmount) as total_amount,
-                    COUNT(CASE WHEN PaymentStatus = 'Paid' THEN 1 END) as paid_count
-                FROM participants
-                """
+                SELECT id, participant_id, amount, PaymentDate, method, recorded_by, reference, created_at
+                FROM payments WHERE participant_id = ?
+                ORDER BY id
+                """,
+                (participant_id,),
             )
-            row = cursor.fetchone()
-            
-            return {
-                "status_breakdown": status_summary,
-                "total_participants": row[0],
-                "total_amount": row[1] or 0,
-                "paid_count": row[2],
-                "unpaid_count": row[0] - row[2]
-            }
+            return [dict(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
-        logger.error("Database error while fetching payment summary: %s", e)
-        raise BotException("Database error while fetching payment summary") from e
+        logger.error("Database error while fetching payments for participant %s: %s", participant_id, e)
+        raise BotException("Database error while fetching payment history") from e
+
+
+def get_cash_flow(start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+    """
+    Поступления по дням из ``payment_daily`` за период ``[start, end]``.
+
+    Args:
+        start: Первая дата (ISO), None — с начала журнала
+        end: Последняя дата (ISO), None — до конца журнала
+
+    Returns:
+        List[Dict]: ``date``, ``total``, ``count`` по возрастанию даты
+
+    Raises:
+        BotException: On database errors
+    """
+    conditions = []
+    params = []
+    if start:
+        conditions.append("PaymentDate >= ?")
+        params.append(start)
+    if end:
+        conditions.append("PaymentDate <= ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    try:
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT PaymentDate AS date, total, count FROM payment_daily {where} ORDER BY PaymentDate",
+                params,
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logger.error("Database error while fetching cash flow: %s", e)
+        raise BotException("Database error while fetching cash flow") from e
 
 
 if __name__ == "__main__":
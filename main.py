@@ -1,3 +1,4 @@
+import io
 import json
 import logging
 import re
@@ -5,15 +6,19 @@ import time
 import traceback
 from collections import defaultdict
 from datetime import datetime
-from functools import wraps
+from functools import lru_cache, wraps
 from logging.handlers import RotatingFileHandler
-from dataclasses import asdict
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import TelegramError
+from telegram.request import BaseRequest
 from telegram.ext import (
     Application,
     ApplicationHandlerStop,
+    BasePersistence,
+    BaseRateLimiter,
+    BaseUpdateProcessor,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
@@ -22,11 +27,27 @@ from telegram.ext import (
     filters,
 )
 import config
-from config import BOT_TOKEN, BOT_USERNAME, COORDINATOR_IDS, VIEWER_IDS
-from utils.decorators import require_role
+from config import BOT_TOKEN, BOT_USERNAME
+from utils.acl import COORDINATOR, VIEWER, acl
+from utils.decorators import (
+    COMMAND_DENIED_MESSAGE,
+    UNAUTHORIZED_MESSAGES,
+    reply_unauthorized,
+    require_role,
+)
 from utils.cache import load_reference_data
+from utils.card_renderer import renderer as card_renderer
 from utils.timeouts import set_edit_timeout, clear_expired_edit
 from utils.user_logger import UserActionLogger
+from utils.loop_monitor import LoopMonitor
+from utils.keyboards import BACK_KEYBOARD, CANCEL_KEYBOARD, CANCEL_ROW, keyboard, row
+from utils.middleware import MiddlewarePipeline, PipelineApplication
+from utils.message_cleanup import cleaner as message_cleaner, take_tracked, track_message
+from utils.panel import forget_panel, show_panel
+from utils.persistence import TransientRef, create_persistence
+from utils.rate_limiter import create_request_scheduler
+from utils.update_processor import create_update_processor
+from utils.webhook_server import AIOHTTP_AVAILABLE, BotHTTPServer, run_webhook
 from utils.session_recovery import detect_interrupted_session, handle_session_recovery
 from database import init_database
 from repositories.participant_repository import SqliteParticipantRepository
@@ -46,7 +67,7 @@ except ImportError:
 
 
 from services.participant_service import ParticipantService, SearchResult
-from models.participant import Participant
+from models.participant import DATA_FIELDS, PAYMENT_FIELDS, Participant
 from parsers.participant_parser import (
     parse_participant_data,
     is_template_format,
@@ -74,12 +95,13 @@ from services.participant_service import (
 from utils.validators import validate_participant_data
 from utils.exceptions import (
     BotException,
+    ConcurrentModificationError,
     ParticipantNotFoundError,
     ValidationError,
     DatabaseError,
 )
 from messages import MESSAGES
-from constants import GENDER_DISPLAY, ROLE_DISPLAY, DEPARTMENT_DISPLAY
+from constants import GENDER_DISPLAY, ROLE_DISPLAY, DEPARTMENT_DISPLAY, PAYMENT_STATUS_DISPLAY
 from states import (
     CONFIRMING_DATA,
     CONFIRMING_DUPLICATE,
@@ -96,6 +118,11 @@ from states import (
 
 BOT_VERSION = "0.1"
 
+# Сценарии, у каждого из которых своё сообщение-панель (utils/panel.py)
+PARTICIPANT_PANEL = "participant"
+SEARCH_PANEL = "search"
+PAYMENT_PANEL = "payment"
+
 
 def smart_cleanup_on_error(func):
     """
@@ -442,24 +469,29 @@ def cleanup_user_data_safe(context: ContextTypes.DEFAULT_TYPE, user_id: int = No
 # --- Вспомогательные функции для очистки ---
 
 
+def _cleanup_store(context: ContextTypes.DEFAULT_TYPE) -> Dict:
+    """Список очистки хранится по чату; без чата — в user_data."""
+    chat_data = getattr(context, "chat_data", None)
+    return chat_data if chat_data is not None else context.user_data
+
+
 def _add_message_to_cleanup(context: ContextTypes.DEFAULT_TYPE, message_id: int):
     """Добавляет ID сообщения в список для последующей очистки."""
-    if "messages_to_delete" not in context.user_data:
-        context.user_data["messages_to_delete"] = []
-    context.user_data["messages_to_delete"].append(message_id)
+    track_message(_cleanup_store(context), message_id)
 
 
 async def _cleanup_messages(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
-    """Удаляет все сообщения, сохраненные для очистки."""
-    messages_to_delete = context.user_data.get("messages_to_delete", [])
-    for message_id in messages_to_delete:
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-        except Exception as e:
-            logger.warning("Could not delete message %d: %s", message_id, e)
-
-    if "messages_to_delete" in context.user_data:
-        context.user_data["messages_to_delete"].clear()
+    """Передаёт сохранённые сообщения на фоновое пакетное удаление."""
+    message_ids = take_tracked(_cleanup_store(context))
+    # панель удаляется вместе с остальными сообщениями
+    forget_panel(context)
+    message_cleaner.schedule(
+        context.bot,
+        chat_id,
+        message_ids,
+        job_queue=getattr(context, "job_queue", None),
+        application=getattr(context, "application", None),
+    )
 
 
 async def clear_field_to_edit(context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -489,49 +521,32 @@ def safe_create_timeout_job(
     return None
 
 
+_RECOVER_EDIT_ROW = row(("🔄 Продолжить редактирование", "continue_editing"))
+_RECOVER_EDIT_KEYBOARD = keyboard(_RECOVER_EDIT_ROW)
+
+
 def _get_recover_edit_keyboard() -> InlineKeyboardMarkup:
     """Keyboard offering to resume editing after a technical issue."""
-    keyboard = [
-        [
-            InlineKeyboardButton(
-                "\ud83d\udd04 \u041f\u0440\u043e\u0434\u043e\u043b\u0436\u0438\u0442\u044c \u0440\u0435\u0434\u0430\u043a\u0442\u0438\u0440\u043e\u0432\u0430\u043d\u0438\u0435",
-                callback_data="continue_editing",
-            )
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return _RECOVER_EDIT_KEYBOARD
+
+
+@lru_cache(maxsize=None)
+def _recovery_keyboard(has_confirmation: bool, has_input: bool) -> InlineKeyboardMarkup:
+    rows = []
+    if has_confirmation:
+        rows.append(row(("📝 К подтверждению", "recover_confirmation")))
+    if has_input:
+        rows.append(row(("➕ Продолжить ввод", "recover_input")))
+    rows.append(row(("🔄 Начать заново", "main_add")))
+    return keyboard(*rows)
 
 
 def get_recovery_keyboard(context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardMarkup:
     """Keyboard for restoring the dialog after a technical issue."""
-    buttons = []
-    if context.user_data.get("parsed_participant"):
-        buttons.append(
-            [
-                InlineKeyboardButton(
-                    "\U0001f4dd \u041a \u043f\u043e\u0434\u0442\u0432\u0435\u0440\u0436\u0434\u0435\u043d\u0438\u044e",
-                    callback_data="recover_confirmation",
-                )
-            ]
-        )
-    if context.user_data.get("add_flow_data"):
-        buttons.append(
-            [
-                InlineKeyboardButton(
-                    "\u2795 \u041f\u0440\u043e\u0434\u043e\u043b\u0436\u0438\u0442\u044c \u0432\u0432\u043e\u0434",
-                    callback_data="recover_input",
-                )
-            ]
-        )
-    buttons.append(
-        [
-            InlineKeyboardButton(
-                "\ud83d\udd04 \u041d\u0430\u0447\u0430\u0442\u044c \u0437\u0430\u043d\u043e\u0432\u043e",
-                callback_data="main_add",
-            )
-        ]
+    return _recovery_keyboard(
+        bool(context.user_data.get("parsed_participant")),
+        bool(context.user_data.get("add_flow_data")),
     )
-    return InlineKeyboardMarkup(buttons)
 
 
 async def show_recovery_options(
@@ -635,6 +650,27 @@ user_logger = UserActionLogger()
 logger = logging.getLogger(__name__)
 ERROR_STATS: Dict[str, int] = defaultdict(int)
 
+loop_monitor: Optional[LoopMonitor] = (
+    LoopMonitor(
+        interval=config.LOOP_MONITOR_INTERVAL,
+        lag_threshold=config.LOOP_LAG_THRESHOLD,
+        slow_callback_threshold=config.LOOP_SLOW_CALLBACK_THRESHOLD,
+        pending_threshold=config.LOOP_PENDING_UPDATES_THRESHOLD,
+        debug=config.LOOP_DEBUG,
+        timing_logger=user_logger,
+    )
+    if config.LOOP_MONITOR_ENABLED
+    else None
+)
+
+# Роли: статические из config.py плюс выданные через /admin (файл ACL_PATH)
+acl.configure(
+    config.ACL_PATH,
+    coordinators=config.COORDINATOR_IDS,
+    viewers=config.VIEWER_IDS,
+    check_interval=config.ACL_RELOAD_INTERVAL,
+)
+
 
 # helper to keep last user actions
 def _record_action(context: ContextTypes.DEFAULT_TYPE, action: str) -> None:
@@ -651,32 +687,45 @@ def _log_session_end(context: ContextTypes.DEFAULT_TYPE, user_id: int) -> None:
         user_logger.log_user_action(user_id, "session_end", {"duration": duration})
 
 
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _is_json_safe(value) -> bool:
+    """Проверяет сериализуемость по типам, без построения JSON-строки."""
+    if isinstance(value, _JSON_SCALARS):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_json_safe(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(k, _JSON_SCALARS) and _is_json_safe(v)
+            for k, v in value.items()
+        )
+    return False
+
+
 def _safe_serialize_user_data(user_data: dict) -> dict:
     """Safely serialize user_data for logging, handling non-JSON-serializable objects."""
     safe_data = {}
     for key, value in user_data.items():
-        try:
-            # Try to serialize each value to check if it's JSON-safe
-            json.dumps(value, ensure_ascii=False)
+        if _is_json_safe(value):
             safe_data[key] = value
-        except (TypeError, ValueError):
-            # Handle special cases for non-serializable objects
-            if key == "search_results" and isinstance(value, list):
-                # Convert SearchResult objects to basic info
-                safe_data[key] = [
-                    {
-                        "participant_id": result.participant.id if hasattr(result, 'participant') else str(result),
-                        "confidence": getattr(result, 'confidence', 'unknown'),
-                        "match_field": getattr(result, 'match_field', 'unknown')
-                    } 
-                    for result in value
-                ]
-            elif hasattr(value, '__dict__'):
-                # For other objects with attributes, just store the type
-                safe_data[key] = f"<{type(value).__name__} object>"
-            else:
-                # For other non-serializable values, store their string representation
-                safe_data[key] = str(value)
+        elif key == "search_results" and isinstance(value, list):
+            # Convert SearchResult objects to basic info
+            safe_data[key] = [
+                {
+                    "participant_id": result.participant.id if hasattr(result, 'participant') else str(result),
+                    "confidence": getattr(result, 'confidence', 'unknown'),
+                    "match_field": getattr(result, 'match_field', 'unknown')
+                }
+                for result in value
+            ]
+        elif hasattr(value, '__dict__') or hasattr(type(value), '__slots__'):
+            # For other objects with attributes (incl. slotted Participant), just store the type
+            safe_data[key] = f"<{type(value).__name__} object>"
+        else:
+            # For other non-serializable values, store their string representation
+            safe_data[key] = str(value)
     return safe_data
 
 
@@ -705,7 +754,7 @@ def log_state_transitions(func):
                 user_id,
                 from_state,
                 str(next_state),
-                {"input": data, "duration": duration},
+                {"input": data, "duration": duration, "handler": func.__name__},
             )
             _record_action(context, f"state:{func.__name__}")
             return next_state
@@ -726,22 +775,56 @@ def log_state_transitions(func):
     return wrapper
 
 
-async def log_all_updates(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+# --- Middleware (utils/middleware.py): выполняется один раз до обработчиков ---
+
+
+def log_all_updates(update: object, application: Application) -> None:
     """Middleware to log every incoming update."""
-    logger.info("Incoming update: %s", update.to_dict())
+    if not isinstance(update, Update):
+        return
+    user = update.effective_user
+    logger.info(
+        "Incoming update %s from %s", update.update_id, user.id if user else None
+    )
+    # полная сериализация апдейта — только в отладочном логе
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Incoming update: %s", update.to_dict())
 
 
-async def debug_callback_middleware(
-    update: Update, context: ContextTypes.DEFAULT_TYPE
-) -> None:
+async def require_access(update: object, application: Application) -> bool:
+    """Отсекает пользователей без роли до сопоставления с обработчиками."""
+    user = getattr(update, "effective_user", None)
+    if user is None or acl.has_role(user.id, VIEWER):
+        return True
+    logger.info("Rejected update from unauthorized user %s", user.id)
+    try:
+        await reply_unauthorized(update, UNAUTHORIZED_MESSAGES[VIEWER])
+    except TelegramError as e:
+        logger.warning("Failed to notify unauthorized user %s: %s", user.id, e)
+    return False
+
+
+def debug_callback_middleware(update: object, application: Application) -> None:
     """Middleware для отладки callback'ов."""
-    if update.callback_query:
-        callback_data = update.callback_query.data
+    callback_query = getattr(update, "callback_query", None)
+    if callback_query:
         user_id = update.effective_user.id
-
-        logger.info(f"🔘 CALLBACK: User {user_id} pressed '{callback_data}'")
-        if context.user_data:
-            logger.debug(f"📊 user_data keys: {list(context.user_data.keys())}")
+        logger.info(f"🔘 CALLBACK: User {user_id} pressed '{callback_query.data}'")
+        if logger.isEnabledFor(logging.DEBUG):
+            # .get: не создаёт user_data для пользователя
+            user_data = application.user_data.get(user_id)
+            if user_data:
+                logger.debug(f"📊 user_data keys: {list(user_data.keys())}")
+
+
+def create_middleware(disabled: Sequence[str] = ()) -> MiddlewarePipeline:
+    """Порядок хуков: логирование, проверка доступа, отладка callback'ов."""
+    return (
+        MiddlewarePipeline(disabled)
+        .add("log_updates", log_all_updates)
+        .add("access", require_access)
+        .add("debug_callbacks", debug_callback_middleware)
+    )
 
 
 # Timeout in seconds to wait for user input when editing a specific field
@@ -772,12 +855,7 @@ FIELD_KEYBOARDS = {
 
 # Функция проверки прав пользователя
 def get_user_role(user_id):
-    if user_id in COORDINATOR_IDS:
-        return "coordinator"
-    elif user_id in VIEWER_IDS:
-        return "viewer"
-    else:
-        return "unauthorized"
+    return acl.role_of(user_id)
 
 
 async def show_confirmation(
@@ -803,72 +881,56 @@ async def show_confirmation(
                     f"Button [{i}][{j}]: text='{button.text}', callback_data='{button.callback_data}'"
                 )
 
-    message = update.effective_message
-    msg = await message.reply_text(
+    msg = await show_panel(
+        context,
+        update.effective_message,
         confirmation_text,
-        parse_mode="Markdown",
+        PARTICIPANT_PANEL,
         reply_markup=keyboard,
+        parse_mode="Markdown",
     )
-    _add_message_to_cleanup(context, msg.message_id)
+    if msg:
+        _add_message_to_cleanup(context, msg.message_id)
 
     # Сохраняем текущее состояние для декоратора
     context.user_data["current_state"] = CONFIRMING_DATA
     context.user_data["filling_missing_field"] = False
 
 
+_DUPLICATE_KEYBOARD = keyboard(
+    row(("✅ Добавить новый", "dup_add_new"), ("🔄 Заменить", "dup_replace")),
+    CANCEL_ROW,
+)
+_POST_ACTION_KEYBOARD = keyboard(
+    row(("➕ Добавить еще", "main_add"), ("📋 Список", "main_list")),
+    row(("🏠 Главное меню", "main_menu")),
+)
+_NO_CHANGES_KEYBOARD = keyboard(
+    _RECOVER_EDIT_ROW,
+    row(("✅ Сохранить как есть", "confirm_save")),
+    row(("❌ Отменить", "main_cancel")),
+)
+_RETURN_TO_MENU_KEYBOARD = keyboard(row(("🏠 В главное меню", "main_menu")))
+
+
 def get_duplicate_keyboard() -> InlineKeyboardMarkup:
     """Keyboard for handling duplicate participant decisions."""
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Добавить новый", callback_data="dup_add_new"),
-            InlineKeyboardButton("🔄 Заменить", callback_data="dup_replace"),
-        ],
-        [InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return _DUPLICATE_KEYBOARD
 
 
 def get_post_action_keyboard() -> InlineKeyboardMarkup:
     """Keyboard shown after successful add/update."""
-    keyboard = [
-        [
-            InlineKeyboardButton("➕ Добавить еще", callback_data="main_add"),
-            InlineKeyboardButton("📋 Список", callback_data="main_list"),
-        ],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return _POST_ACTION_KEYBOARD
 
 
 def get_no_changes_keyboard() -> InlineKeyboardMarkup:
     """Keyboard shown when no changes were detected during editing."""
-    keyboard = [
-        [
-            InlineKeyboardButton(
-                "\ud83d\udd04 \u041f\u0440\u043e\u0434\u043e\u043b\u0436\u0438\u0442\u044c \u0440\u0435\u0434\u0430\u043a\u0442\u0438\u0440\u043e\u0432\u0430\u043d\u0438\u0435",
-                callback_data="continue_editing",
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                "\u2705 \u0421\u043e\u0445\u0440\u0430\u043d\u0438\u0442\u044c \u043a\u0430\u043a \u0435\u0441\u0442\u044c",
-                callback_data="confirm_save",
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                "\u274c \u041e\u0442\u043c\u0435\u043d\u0438\u0442\u044c",
-                callback_data="main_cancel",
-            )
-        ],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return _NO_CHANGES_KEYBOARD
 
 
 def _get_return_to_menu_keyboard() -> InlineKeyboardMarkup:
     """Создает клавиатуру с кнопкой возврата в главное меню."""
-    keyboard = [[InlineKeyboardButton("🏠 В главное меню", callback_data="main_menu")]]
-    return InlineKeyboardMarkup(keyboard)
+    return _RETURN_TO_MENU_KEYBOARD
 
 
 async def _send_response_with_menu_button(
@@ -902,34 +964,22 @@ async def _send_response_with_menu_button(
 # --- HELPER FUNCTIONS (NEW) ---
 
 
-def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
-    """Создает клавиатуру главного меню в зависимости от роли пользователя."""
+_COORDINATOR_MENU_KEYBOARD = keyboard(
+    row(("➕ Добавить", "main_add"), ("🔍 Поиск", "main_search")),
+    row(("📋 Список", "main_list"), ("📤 Экспорт", "main_export")),
+    row(("ℹ️ Помощь", "main_help")),
+)
+_VIEWER_MENU_KEYBOARD = keyboard(
+    row(("🔍 Поиск", "main_search"), ("📋 Список", "main_list")),
+    row(("📤 Экспорт", "main_export"), ("ℹ️ Помощь", "main_help")),
+)
 
-    if user_id in COORDINATOR_IDS:
-        keyboard = [
-            [
-                InlineKeyboardButton("➕ Добавить", callback_data="main_add"),
-                InlineKeyboardButton("🔍 Поиск", callback_data="main_search"),
-            ],
-            [
-                InlineKeyboardButton("📋 Список", callback_data="main_list"),
-                InlineKeyboardButton("📤 Экспорт", callback_data="main_export"),
-            ],
-            [InlineKeyboardButton("ℹ️ Помощь", callback_data="main_help")],
-        ]
-    else:
-        keyboard = [
-            [
-                InlineKeyboardButton("🔍 Поиск", callback_data="main_search"),
-                InlineKeyboardButton("📋 Список", callback_data="main_list"),
-            ],
-            [
-                InlineKeyboardButton("📤 Экспорт", callback_data="main_export"),
-                InlineKeyboardButton("ℹ️ Помощь", callback_data="main_help"),
-            ],
-        ]
 
-    return InlineKeyboardMarkup(keyboard)
+def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    """Создает клавиатуру главного меню в зависимости от роли пользователя."""
+    if acl.has_role(user_id, COORDINATOR):
+        return _COORDINATOR_MENU_KEYBOARD
+    return _VIEWER_MENU_KEYBOARD
 
 
 def get_missing_fields(participant_data: Dict) -> List[str]:
@@ -992,43 +1042,38 @@ async def show_interactive_missing_field(
 
     context.user_data["waiting_for_field"] = field
 
-    cancel_markup = InlineKeyboardMarkup(
-        [[InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")]]
-    )
+    cancel_markup = CANCEL_KEYBOARD
 
-    message = update.effective_message
     keyboard_func = FIELD_KEYBOARDS.get(field)
     if keyboard_func:
-        kb = keyboard_func()
-        msg = await message.reply_text(
-            f"Выберите значение для поля **{FIELD_LABELS.get(field, field)}**",
-            parse_mode="Markdown",
-            reply_markup=kb,
-        )
+        text = f"Выберите значение для поля **{FIELD_LABELS.get(field, field)}**"
+        markup = keyboard_func()
     else:
-        msg = await message.reply_text(
-            f"Пришлите значение для поля **{FIELD_LABELS.get(field, field)}**",
-            parse_mode="Markdown",
-            reply_markup=cancel_markup,
-        )
-    _add_message_to_cleanup(context, msg.message_id)
+        text = f"Пришлите значение для поля **{FIELD_LABELS.get(field, field)}**"
+        markup = cancel_markup
+    msg = await show_panel(
+        context,
+        update.effective_message,
+        text,
+        PARTICIPANT_PANEL,
+        reply_markup=markup,
+        parse_mode="Markdown",
+    )
+    if msg:
+        _add_message_to_cleanup(context, msg.message_id)
 
 
 def format_status_message(participant_data: Dict) -> str:
     """Creates a status message with filled data and missing fields."""
-    message = "📝 **Процесс добавления:**\n\n"
-    message += format_participant_block(participant_data)
-    message += "\n\n"
-
+    parts = ["📝 **Процесс добавления:**", format_participant_block(participant_data)]
     missing = get_missing_fields(participant_data)
     if missing:
-        message += "🔴 **Осталось заполнить:**\n- " + "\n- ".join(missing)
-        message += "\n\nОтправьте данные для одного из этих полей или отправьте /cancel для отмены."
+        parts.append("🔴 **Осталось заполнить:**\n- " + "\n- ".join(missing))
+        parts.append("Отправьте данные для одного из этих полей или отправьте /cancel для отмены.")
     else:
-        message += "✅ **Все обязательные поля заполнены!**\n\n"
-        message += "Отправьте **ДА** для подтверждения или **НЕТ** для отмены."
-
-    return message
+        parts.append("✅ **Все обязательные поля заполнены!**")
+        parts.append("Отправьте **ДА** для подтверждения или **НЕТ** для отмены.")
+    return "\n\n".join(parts)
 
 
 async def _show_main_menu(
@@ -1087,7 +1132,7 @@ async def _show_main_menu(
 
 
 # Команда /start
-@require_role("viewer")
+@require_role("viewer", "start")
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Entry point that shows the main menu."""
     user_id = update.effective_user.id
@@ -1106,7 +1151,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_logger.log_user_action(user_id, "command_end", {"command": "/start"})
 
 
-@require_role("coordinator")
+@require_role("coordinator", "add")
 async def handle_add_callback(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -1128,11 +1173,11 @@ async def handle_add_callback(
         "ContactInformation": None,
     }
 
-    cancel_markup = InlineKeyboardMarkup(
-        [[InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")]]
-    )
+    cancel_markup = CANCEL_KEYBOARD
 
-    msg1 = await query.message.reply_text(
+    msg1 = await show_panel(
+        context,
+        query.message,
         "🚀 **Начинаем добавлять нового участника.**\n\n"
         "Отправьте данные любым удобным способом:\n"
         "1️⃣ **Вставьте заполненный шаблон** (пришлю его следующим сообщением).\n"
@@ -1140,8 +1185,10 @@ async def handle_add_callback(
         "3️⃣ **Отправляйте по одному полю** в сообщении (например, `Церковь Грейс`).\n\n"
         "*Для самой точной обработки используйте запятые или ввод с новой строки.*\n"
         "Для отмены введите /cancel.",
+        PARTICIPANT_PANEL,
         parse_mode="Markdown",
         reply_markup=cancel_markup,
+        new=True,
     )
     msg2 = await query.message.reply_text(MESSAGES["ADD_TEMPLATE"])
     _add_message_to_cleanup(context, msg1.message_id)
@@ -1195,15 +1242,7 @@ async def handle_main_menu_callback(update: Update, context: ContextTypes.DEFAUL
             )
             return
 
-        message = f"📋 **Список участников ({len(participants)} чел.):**\n\n"
-        for p in participants:
-            role_emoji = "👤" if p.Role == "CANDIDATE" else "👨‍💼"
-            department = (
-                f" ({p.Department})" if p.Role == "TEAM" and p.Department else ""
-            )
-            message += f"{role_emoji} **{p.FullNameRU}**\n"
-            message += f"   • Роль: {p.Role}{department}\n"
-            message += f"   • ID: {p.id}\n\n"
+        message = card_renderer.participant_list(participants)
 
         await _send_response_with_menu_button(update, message)
         return
@@ -1230,6 +1269,8 @@ async def handle_main_menu_callback(update: Update, context: ContextTypes.DEFAUL
 
 📊 **Просмотр данных:**
 /list - Показать список участников
+/stats - Статистика оплат
+/reconcile - Сверка оплат по выписке банка/Bit
 /export - Экспорт данных в CSV
 
 ❓ **Помощь:**
@@ -1254,9 +1295,7 @@ async def _show_search_prompt(
 ) -> int:
     """Общая логика для показа поискового промпта."""
 
-    cancel_markup = InlineKeyboardMarkup(
-        [[InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")]]
-    )
+    cancel_markup = CANCEL_KEYBOARD
 
     text = (
         "🔍 **Поиск участников**\n\n"
@@ -1270,22 +1309,27 @@ async def _show_search_prompt(
     if is_callback:
         await update.callback_query.answer()
         await update.callback_query.edit_message_reply_markup(reply_markup=None)
-        msg = await update.callback_query.message.reply_text(
-            text, parse_mode="Markdown", reply_markup=cancel_markup
-        )
-        _add_message_to_cleanup(context, update.callback_query.message.message_id)
+        message = update.callback_query.message
     else:
-        msg = await update.message.reply_text(
-            text, parse_mode="Markdown", reply_markup=cancel_markup
-        )
-        _add_message_to_cleanup(context, update.message.message_id)
+        message = update.message
+    _add_message_to_cleanup(context, message.message_id)
+    # промпт становится панелью поиска: результаты появятся на его месте
+    msg = await show_panel(
+        context,
+        message,
+        text,
+        SEARCH_PANEL,
+        reply_markup=cancel_markup,
+        parse_mode="Markdown",
+        new=True,
+    )
 
     _add_message_to_cleanup(context, msg.message_id)
     context.user_data["current_state"] = SEARCHING_PARTICIPANTS
     return SEARCHING_PARTICIPANTS
 
 
-@require_role("viewer")
+@require_role("viewer", "search")
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Инициация поиска участников через команду /search."""
     user_id = update.effective_user.id
@@ -1298,7 +1342,7 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     return await _show_search_prompt(update, context, is_callback=False)
 
 
-@require_role("viewer")
+@require_role("viewer", "search")
 async def handle_search_callback(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -1396,14 +1440,18 @@ async def handle_search_input(
             ]
         )
 
-        msg = await update.message.reply_text(
+        msg = await show_panel(
+            context,
+            update.message,
             f"❌ **Участники не найдены**\n\n"
             f"Поиск по запросу: *{query_text}*\n"
             f"Попробуйте изменить запрос или проверить правильность написания.",
-            parse_mode="Markdown",
+            SEARCH_PANEL,
             reply_markup=no_results_keyboard,
+            parse_mode="Markdown",
         )
-        _add_message_to_cleanup(context, msg.message_id)
+        if msg:
+            _add_message_to_cleanup(context, msg.message_id)
         return SEARCHING_PARTICIPANTS
 
     results_text = f"🔍 **Результаты поиска** (найдено: {len(search_results)})\n\n"
@@ -1412,10 +1460,16 @@ async def handle_search_input(
     results_text += "👆 Выберите участника для действий:"
 
     keyboard = get_search_results_keyboard(search_results)
-    msg = await update.message.reply_text(
-        results_text, parse_mode="Markdown", reply_markup=keyboard
+    msg = await show_panel(
+        context,
+        update.message,
+        results_text,
+        SEARCH_PANEL,
+        reply_markup=keyboard,
+        parse_mode="Markdown",
     )
-    _add_message_to_cleanup(context, msg.message_id)
+    if msg:
+        _add_message_to_cleanup(context, msg.message_id)
 
     context.user_data["search_results"] = search_results
     context.user_data["current_state"] = SELECTING_PARTICIPANT
@@ -1504,7 +1558,7 @@ async def show_participant_details_and_actions(
     """Показывает подробную информацию об участнике и доступные действия."""
 
     user_id = update.effective_user.id
-    is_coordinator = user_id in COORDINATOR_IDS
+    is_coordinator = acl.has_role(user_id, COORDINATOR)
 
     details_text = f"👤 **{participant.FullNameRU}** (ID: {participant.id})\n\n"
     if participant.FullNameEN:
@@ -1583,14 +1637,16 @@ async def handle_action_selection(
     participant_name = selected_participant.FullNameRU
 
     if action == "action_edit":
-        if user_id not in COORDINATOR_IDS:
+        if not acl.can(user_id, "edit"):
             await query.message.reply_text(
                 "❌ Только координаторы могут редактировать участников."
             )
             return CHOOSING_ACTION
 
         context.user_data["participant_id"] = participant_id
-        context.user_data["parsed_participant"] = asdict(selected_participant)
+        context.user_data["parsed_participant"] = selected_participant.to_dict()
+        # версия, от которой начата правка (см. show_edit_conflict)
+        context.user_data["edit_base"] = selected_participant.to_dict()
 
         user_logger.log_user_action(
             user_id,
@@ -1598,11 +1654,11 @@ async def handle_action_selection(
             {"participant_id": participant_id},
         )
 
-        await show_confirmation(update, context, asdict(selected_participant))
+        await show_confirmation(update, context, selected_participant.to_dict())
         return CONFIRMING_DATA
 
     if action == "action_delete":
-        if user_id not in COORDINATOR_IDS:
+        if not acl.can(user_id, "delete"):
             await query.message.reply_text(
                 "❌ Только координаторы могут удалять участников."
             )
@@ -1631,6 +1687,11 @@ async def handle_action_selection(
         return EXECUTING_ACTION
 
     if action.startswith("confirm_delete_"):
+        if not acl.can(user_id, "delete"):
+            await query.message.reply_text(
+                "❌ Только координаторы могут удалять участников."
+            )
+            return CHOOSING_ACTION
         try:
             participant_id = int(action.split("_")[-1])
         except ValueError:
@@ -1675,14 +1736,22 @@ async def handle_action_selection(
         return ConversationHandler.END
 
     if action == "action_payment":
+        if not acl.can(user_id, "payment"):
+            await query.message.reply_text(COMMAND_DENIED_MESSAGE)
+            return CHOOSING_ACTION
+
         # Сохраняем участника для обработки оплаты
         context.user_data["payment_participant"] = selected_participant
         
-        await query.message.reply_text(
+        await show_panel(
+            context,
+            query.message,
             f"💰 **Внесение оплаты**\n\n"
             f"👤 Участник: **{participant_name}**\n\n"
             f"Введите сумму оплаты в шейкелях (только целое число):",
-            parse_mode="Markdown"
+            PAYMENT_PANEL,
+            parse_mode="Markdown",
+            new=True,
         )
         
         user_logger.log_user_action(
@@ -1702,10 +1771,13 @@ async def handle_action_selection(
     return CHOOSING_ACTION
 
 
+_SEARCH_RESULTS_TAIL_ROW = row(("🔍 Новый поиск", "main_search"), ("❌ Отмена", "main_cancel"))
+
+
 def get_search_results_keyboard(results: List[SearchResult]) -> InlineKeyboardMarkup:
     """Создает клавиатуру с результатами поиска (максимум 5 кнопок)."""
 
-    buttons: List[List[InlineKeyboardButton]] = []
+    buttons: List[Sequence[InlineKeyboardButton]] = []
     for result in results[:5]:
         participant = result.participant
         confidence_emoji = "🎯" if result.confidence == 1.0 else "🔍"
@@ -1723,63 +1795,34 @@ def get_search_results_keyboard(results: List[SearchResult]) -> InlineKeyboardMa
             ]
         )
 
-    buttons.append(
-        [
-            InlineKeyboardButton("🔍 Новый поиск", callback_data="main_search"),
-            InlineKeyboardButton("❌ Отмена", callback_data="main_cancel"),
-        ]
-    )
+    buttons.append(_SEARCH_RESULTS_TAIL_ROW)
 
     return InlineKeyboardMarkup(buttons)
 
 
+_ACTIONS_TAIL_ROWS = (
+    row(("💰 Внести оплату", "action_payment")),
+    row(("🔍 Найти еще", "main_search"), ("🏠 Главное меню", "main_menu")),
+)
+_COORDINATOR_ACTIONS_KEYBOARD = keyboard(
+    row(("✏️ Редактировать", "action_edit"), ("🗑️ Удалить", "action_delete")),
+    *_ACTIONS_TAIL_ROWS,
+)
+_VIEWER_ACTIONS_KEYBOARD = keyboard(*_ACTIONS_TAIL_ROWS)
+
+
 def get_participant_actions_keyboard(
     participant: Participant, is_coordinator: bool
 ) -> InlineKeyboardMarkup:
     """Создает клавиатуру с доступными действиями."""
-
-    buttons: List[List[InlineKeyboardButton]] = []
     if is_coordinator:
-        buttons.extend(
-            [
-                [
-                    InlineKeyboardButton(
-                        "✏️ Редактировать", callback_data="action_edit"
-                    ),
-                    InlineKeyboardButton("🗑️ Удалить", callback_data="action_delete"),
-                ],
-                [
-                    InlineKeyboardButton(
-                        "💰 Внести оплату", callback_data="action_payment"
-                    ),
-                ],
-                [
-                    InlineKeyboardButton("🔍 Найти еще", callback_data="main_search"),
-                    InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu"),
-                ],
-            ]
-        )
-    else:
-        buttons.extend(
-            [
-                [
-                    InlineKeyboardButton(
-                        "💰 Внести оплату", callback_data="action_payment"
-                    ),
-                ],
-                [
-                    InlineKeyboardButton("🔍 Найти еще", callback_data="main_search"),
-                    InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu"),
-                ],
-            ]
-        )
-
-    return InlineKeyboardMarkup(buttons)
+        return _COORDINATOR_ACTIONS_KEYBOARD
+    return _VIEWER_ACTIONS_KEYBOARD
 
 
 # Equivalent to the main_help callback handler
 # Команда /help
-@require_role("viewer")
+@require_role("viewer", "help")
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if detect_interrupted_session(update, context):
@@ -1801,6 +1844,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 📊 **Просмотр данных:**
 /list - Показать список участников
+/stats - Статистика оплат
+/reconcile - Сверка оплат по выписке банка/Bit
 /export - Экспорт данных в CSV
 
 ❓ **Помощь:**
@@ -1818,7 +1863,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # Команда /add
-@require_role("coordinator")
+@require_role("coordinator", "add")
 @cleanup_on_error
 async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Starts the /add flow and initializes the session."""
@@ -1843,11 +1888,11 @@ async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         "ContactInformation": None,
     }
 
-    cancel_markup = InlineKeyboardMarkup(
-        [[InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")]]
-    )
+    cancel_markup = CANCEL_KEYBOARD
 
-    msg1 = await update.message.reply_text(
+    msg1 = await show_panel(
+        context,
+        update.message,
         "🚀 **Начинаем добавлять нового участника.**\n\n"
         "Отправьте данные любым удобным способом:\n"
         "1️⃣ **Вставьте заполненный шаблон** (пришлю его следующим сообщением).\n"
@@ -1855,8 +1900,10 @@ async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         "3️⃣ **Отправляйте по одному полю** в сообщении (например, `Церковь Грейс`).\n\n"
         "*Для самой точной обработки используйте запятые или ввод с новой строки.*\n"
         "Для отмены введите /cancel.",
+        PARTICIPANT_PANEL,
         parse_mode="Markdown",
         reply_markup=cancel_markup,
+        new=True,
     )
     msg2 = await update.message.reply_text(MESSAGES["ADD_TEMPLATE"])
     _add_message_to_cleanup(context, msg1.message_id)
@@ -1867,7 +1914,7 @@ async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     return COLLECTING_DATA
 
 
-@require_role("coordinator")
+@require_role("coordinator", "add")
 @smart_cleanup_on_error
 @log_state_transitions
 async def handle_partial_data(
@@ -1932,9 +1979,10 @@ async def handle_partial_data(
         )
         if existing_participant:
             context.user_data["participant_id"] = existing_participant.id
-            existing_dict = asdict(existing_participant)
+            existing_dict = existing_participant.to_dict()
             context.user_data["add_flow_data"] = existing_dict
             context.user_data["parsed_participant"] = existing_dict
+            context.user_data["edit_base"] = existing_participant.to_dict()
             await update.message.reply_text(
                 f"ℹ️ Участник с именем '{newly_identified_name}' уже существует. Переключаюсь в режим редактирования."
             )
@@ -1966,7 +2014,7 @@ async def handle_partial_data(
         raise ApplicationHandlerStop(FILLING_MISSING_FIELDS)
 
 
-@require_role("coordinator")
+@require_role("coordinator", "add")
 @smart_cleanup_on_error
 @log_state_transitions
 async def handle_missing_field_input(
@@ -1999,7 +2047,7 @@ async def handle_missing_field_input(
 
 
 # Команда /edit
-@require_role("coordinator")
+@require_role("coordinator", "edit")
 async def edit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if detect_interrupted_session(update, context):
@@ -2023,7 +2071,7 @@ async def edit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # Команда /delete
-@require_role("coordinator")
+@require_role("coordinator", "delete")
 async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if detect_interrupted_session(update, context):
@@ -2046,7 +2094,7 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-@require_role("coordinator")
+@require_role("coordinator", "payment")
 async def payment_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Команда /payment для координаторов - быстрый доступ к внесению оплаты.
@@ -2107,12 +2155,16 @@ async def payment_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             participant = search_results[0].participant
             context.user_data["payment_participant"] = participant
             
-            await update.message.reply_text(
+            await show_panel(
+                context,
+                update.message,
                 f"💰 **Внесение оплаты**\n\n"
                 f"👤 Участник: **{participant.FullNameRU}**\n"
                 f"🆔 ID: {participant.id}\n\n"
                 f"Введите сумму оплаты в шейкелях (только целое число):",
-                parse_mode="Markdown"
+                PAYMENT_PANEL,
+                parse_mode="Markdown",
+                new=True,
             )
             
             user_logger.log_user_action(
@@ -2143,10 +2195,15 @@ async def payment_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return SELECTING_PARTICIPANT
     else:
         # Нет аргументов - показываем инструкции и начинаем поиск
-        await update.message.reply_text(
+        # дальше идёт обычный поиск — его результаты заменят этот промпт
+        await show_panel(
+            context,
+            update.message,
             "💰 **Внесение оплаты участника**\n\n"
             "Введите имя участника для поиска:",
-            parse_mode="Markdown"
+            SEARCH_PANEL,
+            parse_mode="Markdown",
+            new=True,
         )
         
         user_logger.log_user_action(user_id, "payment_search_started", {})
@@ -2155,7 +2212,7 @@ async def payment_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_logger.log_user_action(user_id, "command_end", {"command": "/payment"})
 
 
-@require_role("coordinator")
+@require_role("coordinator", "edit_field")
 async def edit_field_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     ✅ НОВАЯ КОМАНДА: Демонстрация частичного обновления полей.
@@ -2183,7 +2240,8 @@ async def edit_field_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         except ValueError:
             participant_id = participant_id_str
 
-        if not participant_service.participant_exists(participant_id):
+        current = participant_service.get_participant(participant_id)
+        if current is None:
             await update.message.reply_text(
                 f"❌ Участник с ID {participant_id} не найден"
             )
@@ -2191,7 +2249,7 @@ async def edit_field_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         kwargs = {field_name: new_value}
         success = participant_service.update_participant_fields(
-            participant_id, user_id=user_id, **kwargs
+            participant_id, user_id=user_id, current=current, **kwargs
         )
 
         if success:
@@ -2219,7 +2277,7 @@ async def edit_field_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 # Команда /list
 # Equivalent to the main_list callback handler
-@require_role("viewer")
+@require_role("viewer", "list")
 async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if detect_interrupted_session(update, context):
@@ -2255,37 +2313,72 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Формируем список участников
-    message = f"📋 **Список участников ({len(participants)} чел.):**\n\n"
+    # Карточки рендерятся один раз на версию записи (utils/card_renderer.py)
+    message = card_renderer.participant_list(participants)
     user_logger.log_user_action(
         user_id, "command_end", {"command": "/list", "count": len(participants)}
     )
 
-    for p in participants:
-        role_emoji = "👤" if p.Role == "CANDIDATE" else "👨‍💼"
-        department = f" ({p.Department})" if p.Role == "TEAM" and p.Department else ""
-
-        # Определяем статус оплаты
-        payment_info = "❌ Не оплачено"
-        if hasattr(p, 'PaymentStatus') and p.PaymentStatus:
-            if p.PaymentStatus == "Paid" and hasattr(p, 'PaymentAmount') and p.PaymentAmount:
-                payment_info = f"💰 {p.PaymentAmount} ₪"
-            elif p.PaymentStatus == "Partial" and hasattr(p, 'PaymentAmount') and p.PaymentAmount:
-                payment_info = f"🔄 {p.PaymentAmount} ₪"
-            elif p.PaymentStatus == "Refunded":
-                payment_info = "🔙 Возврат"
-
-        message += f"{role_emoji} **{p.FullNameRU}**\n"
-        message += f"   • Роль: {p.Role}{department}\n"
-        message += f"   • Оплата: {payment_info}\n"
-        message += f"   • ID: {p.id}\n\n"
-
     await _send_response_with_menu_button(update, message)
 
 
+# Команда /stats: статистика оплат из поддерживаемой сводки (O(1) на чтение)
+def format_payment_statistics(stats: Dict) -> str:
+    lines = [
+        "📊 **Статистика оплат:**\n",
+        f"👥 Участников: {stats['total_participants']}",
+        f"✅ Оплатили: {stats['paid_count']}",
+        f"❌ Не оплатили: {stats['unpaid_count']}",
+        f"💰 Собрано: {stats['total_amount']} ₪",
+    ]
+    breakdown = stats.get("status_breakdown") or {}
+    if breakdown:
+        lines.append("\n**По статусам:**")
+        for status, item in sorted(breakdown.items(), key=lambda kv: str(kv[0])):
+            label = PAYMENT_STATUS_DISPLAY.get(status, status or "Не указано")
+            lines.append(f"• {label}: {item['count']} чел., {item['total']} ₪")
+    return "\n".join(lines)
+
+
+@require_role("viewer", "stats")
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    args = [a.lower() for a in (context.args or [])]
+    user_logger.log_user_action(
+        user_id, "command_start", {"command": "/stats", "params": args}
+    )
+    _record_action(context, "/stats:start")
+
+    check = args[:1] == ["check"]
+    if check and not acl.has_role(user_id, COORDINATOR):
+        await update.message.reply_text(UNAUTHORIZED_MESSAGES[COORDINATOR])
+        return
+
+    try:
+        if check:
+            result = participant_service.verify_payment_statistics()
+        stats = participant_service.get_payment_statistics()
+    except BotException as e:
+        logger.error("Failed to get payment statistics: %s", e)
+        await update.message.reply_text("❌ Не удалось получить статистику оплат.")
+        return
+
+    text = format_payment_statistics(stats)
+    if check:
+        if result["consistent"]:
+            text += "\n\n✅ Сводка совпадает с пересчётом."
+        else:
+            text += (
+                f"\n\n⚠️ Сводка расходилась по статусам: {len(result['differences'])}, "
+                "пересобрана."
+            )
+    await _send_response_with_menu_button(update, text)
+    user_logger.log_user_action(user_id, "command_end", {"command": "/stats"})
+
+
 # Команда /export
 # Equivalent to the main_export callback handler
-@require_role("viewer")
+@require_role("viewer", "export")
 async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if detect_interrupted_session(update, context):
@@ -2308,8 +2401,251 @@ async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_logger.log_user_action(user_id, "command_end", {"command": "/export"})
 
 
+# Команда /admin: управление ролями без перезапуска (utils/acl.py)
+ADMIN_USAGE = (
+    "🔐 **Управление доступом:**\n"
+    "`/admin` - список пользователей и ролей\n"
+    "`/admin grant <user_id> coordinator|viewer` - выдать роль\n"
+    "`/admin revoke <user_id>` - отозвать роль"
+)
+_ROLE_LABELS = {COORDINATOR: "координатор", VIEWER: "наблюдатель"}
+
+
+@require_role("coordinator", "admin")
+async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    args = list(context.args or [])
+    user_logger.log_user_action(
+        user_id, "command_start", {"command": "/admin", "params": args}
+    )
+    _record_action(context, "/admin:start")
+
+    action = args[0].lower() if args else "list"
+    if action == "list":
+        lines = [
+            f"• `{uid}` — {_ROLE_LABELS.get(role, role)}"
+            + (" (config)" if acl.is_static(uid) else "")
+            for uid, role in sorted(acl.users().items())
+        ]
+        text = "👥 **Пользователи с доступом:**\n" + ("\n".join(lines) or "—")
+        await update.message.reply_text(f"{text}\n\n{ADMIN_USAGE}", parse_mode="Markdown")
+    elif action == "grant" and len(args) == 3 and args[1].isdigit() and args[2] in _ROLE_LABELS:
+        target, role = int(args[1]), args[2]
+        if acl.is_static(target):
+            await update.message.reply_text("⚠️ Роль этого пользователя задана в config.py.")
+            return
+        acl.grant(target, role)
+        logger.info("User %s granted role %s to %s", user_id, role, target)
+        await update.message.reply_text(
+            f"✅ Пользователю {target} выдана роль: {_ROLE_LABELS[role]}"
+        )
+    elif action == "revoke" and len(args) == 2 and args[1].isdigit():
+        target = int(args[1])
+        if acl.is_static(target):
+            await update.message.reply_text("⚠️ Роль этого пользователя задана в config.py.")
+            return
+        if acl.revoke(target):
+            logger.info("User %s revoked role of %s", user_id, target)
+            await update.message.reply_text(f"✅ Доступ пользователя {target} отозван.")
+        else:
+            await update.message.reply_text(f"ℹ️ У пользователя {target} нет выданной роли.")
+    else:
+        await update.message.reply_text(ADMIN_USAGE, parse_mode="Markdown")
+
+    user_logger.log_user_action(user_id, "command_end", {"command": "/admin"})
+
+
+# Команда /reconcile: сверка выписки банка/Bit (utils/payment_reconciliation.py)
+RECONCILE_USAGE = (
+    "📄 **Сверка оплат по выписке**\n\n"
+    "Отправьте CSV-файл выписки банка или Bit. Нужны колонки с именем "
+    "плательщика и суммой; дата, телефон и номер операции — если есть.\n"
+    "Совпадения ищутся по телефону из контактов и по имени."
+)
+RECONCILE_MAX_FILE_SIZE = 5 * 1024 * 1024
+RECONCILE_PREVIEW_ROWS = 15
+RECONCILE_CANCEL_ROW = row(("❌ Отмена", "reconcile_cancel"))
+
+
+def _decode_statement(data: bytes) -> io.StringIO:
+    # Выписки израильских банков часто в windows-1255
+    for encoding in ("utf-8-sig", "cp1255"):
+        try:
+            return io.StringIO(data.decode(encoding), newline="")
+        except UnicodeDecodeError:
+            continue
+    return io.StringIO(data.decode("utf-8", errors="replace"), newline="")
+
+
+def _format_reconcile_match(match) -> str:
+    transfer = match.transfer
+    target = match.participant.FullNameRU if match.participant else "—"
+    return (
+        f"• {transfer.payer}: {transfer.amount} ₪ → {target} "
+        f"({match.confidence:.0%}, {match.reason})"
+    )
+
+
+def format_reconciliation_report(report) -> str:
+    lines = [
+        "📄 Сверка выписки",
+        f"Строк с поступлениями: {len(report.matches)} на сумму {report.total_amount} ₪",
+        f"✅ Уверенные совпадения: {len(report.confident)}",
+        f"🔶 Требуют проверки: {len(report.to_review)}",
+        f"❌ Не найдены: {len(report.unmatched)}",
+    ]
+    if report.skipped:
+        lines.append(f"⏭ Пропущено строк (расход или нет суммы): {report.skipped}")
+    for title, matches in (
+        ("Уверенные", report.confident),
+        ("На проверку", report.to_review),
+        ("Не найдены", report.unmatched),
+    ):
+        if not matches:
+            continue
+        lines.append(f"\n{title}:")
+        lines.extend(_format_reconcile_match(m) for m in matches[:RECONCILE_PREVIEW_ROWS])
+        if len(matches) > RECONCILE_PREVIEW_ROWS:
+            lines.append(f"… и ещё {len(matches) - RECONCILE_PREVIEW_ROWS}")
+    return "\n".join(lines)
+
+
+def _reconcile_keyboard(report) -> InlineKeyboardMarkup:
+    # в тексте кнопок счётчики, поэтому без кеша utils/keyboards
+    rows = []
+    if report.confident:
+        rows.append([InlineKeyboardButton(
+            f"✅ Внести уверенные ({len(report.confident)})", callback_data="reconcile_apply_confident"
+        )])
+    if report.to_review:
+        proposed = len(report.confident) + len(report.to_review)
+        rows.append([InlineKeyboardButton(
+            f"☑️ Внести все предложенные ({proposed})", callback_data="reconcile_apply_all"
+        )])
+    rows.append(list(RECONCILE_CANCEL_ROW))
+    return InlineKeyboardMarkup(rows)
+
+
+@require_role("coordinator", "reconcile")
+async def reconcile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    user_logger.log_user_action(user_id, "command_start", {"command": "/reconcile"})
+    _record_action(context, "/reconcile:start")
+    context.user_data["awaiting_reconcile_file"] = True
+    await update.message.reply_text(RECONCILE_USAGE, parse_mode="Markdown")
+
+
+async def handle_reconcile_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """CSV-выписка после /reconcile (или с подписью /reconcile).
+
+    Остальные файлы пропускаются до проверки роли: наблюдатель, приславший
+    документ, не должен получать отказ в /reconcile, которую не вызывал.
+    """
+    message = update.message
+    caption = (message.caption or "").strip().lower()
+    if not context.user_data.pop("awaiting_reconcile_file", False) and not caption.startswith("/reconcile"):
+        return
+    await _reconcile_statement(update, context)
+
+
+@require_role("coordinator", "reconcile")
+async def _reconcile_statement(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.message
+    user_id = update.effective_user.id
+    document = message.document
+    if document.file_size and document.file_size > RECONCILE_MAX_FILE_SIZE:
+        await message.reply_text("❌ Файл слишком большой (максимум 5 МБ).")
+        return
+
+    try:
+        telegram_file = await document.get_file()
+        data = await telegram_file.download_as_bytearray()
+        report = participant_service.reconcile_payments(
+            _decode_statement(bytes(data)), config.RECONCILE_MIN_CONFIDENCE
+        )
+    except ValueError as e:
+        await message.reply_text(f"❌ Не удалось разобрать выписку: {e}\n\n{RECONCILE_USAGE}")
+        return
+    except (TelegramError, BotException) as e:
+        logger.error("Failed to reconcile statement: %s", e)
+        await message.reply_text("❌ Не удалось обработать файл. Попробуйте ещё раз.")
+        return
+
+    # отчёт с объектами участников не нужен после рестарта — не сохраняем его
+    context.user_data["reconcile_report"] = TransientRef(report)
+    user_logger.log_user_action(
+        user_id,
+        "reconcile_preview",
+        {
+            "file": document.file_name,
+            "rows": len(report.matches),
+            "confident": len(report.confident),
+            "to_review": len(report.to_review),
+            "unmatched": len(report.unmatched),
+        },
+    )
+    await message.reply_text(
+        format_reconciliation_report(report), reply_markup=_reconcile_keyboard(report)
+    )
+
+
+@require_role("coordinator", "reconcile")
+async def handle_reconcile_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    user_id = update.effective_user.id
+    ref = context.user_data.pop("reconcile_report", None)
+
+    if query.data == "reconcile_cancel":
+        await query.edit_message_reply_markup(reply_markup=None)
+        await _send_response_with_menu_button(update, "❌ Сверка отменена, платежи не внесены.")
+        return
+    if not ref:
+        await query.message.reply_text("⚠️ Сверка устарела. Отправьте /reconcile и файл ещё раз.")
+        return
+
+    report = ref.obj
+    matches = report.confident
+    if query.data == "reconcile_apply_all":
+        matches = matches + report.to_review
+    try:
+        result = participant_service.apply_reconciliation(matches, user_id=user_id)
+    except BotException as e:
+        logger.error("Failed to apply reconciliation: %s", e)
+        context.user_data["reconcile_report"] = ref
+        await query.message.reply_text("❌ Не удалось внести платежи. Попробуйте ещё раз.")
+        return
+
+    recorded = result["recorded"]
+    lines = [
+        "✅ Сверка завершена",
+        f"Внесено платежей: {len(recorded)} на сумму {sum(r['amount'] for r in recorded)} ₪",
+    ]
+    paid = sum(1 for r in recorded if r["status"] == "Paid")
+    if paid:
+        lines.append(f"Полностью оплатили: {paid}")
+    if result["duplicates"]:
+        lines.append(f"⏭ Уже были внесены ранее: {len(result['duplicates'])}")
+    if result["missing"]:
+        lines.append(f"⚠️ Участники не найдены: {len(result['missing'])}")
+    left = len(report.matches) - len(matches)
+    if left:
+        lines.append(f"Не внесено строк: {left} — их можно внести через /payment")
+    await query.edit_message_reply_markup(reply_markup=None)
+    await _send_response_with_menu_button(update, "\n".join(lines), parse_mode=None)
+    user_logger.log_user_action(
+        user_id,
+        "reconcile_applied",
+        {
+            "recorded": len(recorded),
+            "duplicates": len(result["duplicates"]),
+            "missing": len(result["missing"]),
+        },
+    )
+
+
 # Команда /cancel
-@require_role("viewer")
+@require_role("viewer", "cancel")
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
     if detect_interrupted_session(update, context):
@@ -2344,11 +2680,13 @@ async def cancel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     _log_session_end(context, user_id)
 
+    # Забираем список очистки до сброса chat_data
+    await _cleanup_messages(context, update.effective_chat.id)
+
     context.user_data.clear()
     if hasattr(context, "chat_data") and context.chat_data:
         context.chat_data.clear()
 
-    await _cleanup_messages(context, update.effective_chat.id)
     await _show_main_menu(update, context, is_return=True)
 
     user_logger.log_user_action(user_id, "command_end", {"command": "cancel_callback"})
@@ -2390,7 +2728,9 @@ async def process_participant_confirmation(
     existing_participant = None
     if not is_update:
         existing_participant = participant_service.check_duplicate(
-            participant_data["FullNameRU"], user_id=user_id
+            participant_data["FullNameRU"],
+            user_id=user_id,
+            contact=participant_data.get("ContactInformation"),
         )
 
     if existing_participant:
@@ -2407,12 +2747,14 @@ async def process_participant_confirmation(
 ⚥ Пол: {existing_participant.Gender}
 👥 Роль: {existing_participant.Role}
 ⛪ Церковь: {existing_participant.Church}
+📞 Контакты: {existing_participant.ContactInformation or '—'}
 
 🔄 **Новые данные:**
 👤 Имя: {participant_data['FullNameRU']}
 ⚥ Пол: {participant_data['Gender']}
 👥 Роль: {participant_data['Role']}
 ⛪ Церковь: {participant_data['Church']}
+📞 Контакты: {participant_data.get('ContactInformation') or '—'}
 
 ❓ **Что делать?**
 - **ДА** - добавить как нового участника (возможен дубль)
@@ -2495,14 +2837,20 @@ async def handle_save_confirmation(
         return ConversationHandler.END
 
     is_update = "participant_id" in context.user_data
+    # общий шаг /add и правки: право проверяется по тому, что сохраняем
+    if not acl.can(user_id, "edit" if is_update else "add"):
+        await query.message.reply_text(COMMAND_DENIED_MESSAGE)
+        return CONFIRMING_DATA
 
     # Проверка на дубликат (только при создании нового)
     if not is_update:
         existing = participant_service.check_duplicate(
-            participant_data.get("FullNameRU"), user_id=user_id
+            participant_data.get("FullNameRU"),
+            user_id=user_id,
+            contact=participant_data.get("ContactInformation"),
         )
         if existing:
-            context.user_data["existing_participant_id"] = existing.get("id")
+            context.user_data["existing_participant_id"] = existing.id
             message = "⚠️ **Найден дубликат!**\n\n"
             message += format_participant_block(existing)
             message += "\n\nЧто делаем?"
@@ -2534,7 +2882,7 @@ async def handle_save_confirmation(
             )
             updated_participant = participant_service.get_participant(participant_id)
             if updated_participant:
-                full_info = format_participant_full_info(asdict(updated_participant))
+                full_info = format_participant_full_info(updated_participant.to_dict())
                 success_message = f"✅ **Участник обновлен!**\n\n{full_info}"
             else:
                 success_message = (
@@ -2557,7 +2905,7 @@ async def handle_save_confirmation(
                     "result": "added",
                 },
             )
-            full_info = format_participant_full_info(asdict(new_participant))
+            full_info = format_participant_full_info(new_participant.to_dict())
             success_message = f"✅ **Участник добавлен!**\n\n{full_info}"
 
         keyboard = InlineKeyboardMarkup(
@@ -2584,6 +2932,8 @@ async def handle_save_confirmation(
         )
         cleanup_user_data_safe(context, update.effective_user.id)
         return ConversationHandler.END
+    except ConcurrentModificationError as e:
+        return await show_edit_conflict(update, context, participant_data, e.current)
     except ValidationError as e:
         # Не завершаем диалог и не очищаем состояние при валидационных ошибках
         err_text = str(e)
@@ -2620,40 +2970,11 @@ async def handle_save_confirmation(
 # ✅ ДОБАВИТЬ: Новая функция форматирования
 def format_participant_full_info(data: Dict) -> str:
     """Форматирует полную информацию об участнике для финального отображения."""
-    from constants import (
-        GENDER_DISPLAY,
-        ROLE_DISPLAY,
-        SIZE_DISPLAY,
-        DEPARTMENT_DISPLAY,
-    )
-
-    participant_id = data.get("id")
-    id_display = str(participant_id) if participant_id else "N/A"
-    info = f"👤 **{data.get('FullNameRU', 'Не указано')}** (ID: {id_display})\n"
-
-    if data.get("FullNameEN"):
-        info += f"🌍 English: {data['FullNameEN']}\n"
-
-    info += f"⚥ Пол: {GENDER_DISPLAY.get(data.get('Gender', ''), 'Не указано')}\n"
-    info += f"👕 Размер: {SIZE_DISPLAY.get(data.get('Size', ''), 'Не указано')}\n"
-    info += f"⛪ Церковь: {data.get('Church', 'Не указано')}\n"
-    info += f"👥 Роль: {ROLE_DISPLAY.get(data.get('Role', ''), 'Не указано')}\n"
-
-    if data.get("Role") == "TEAM" and data.get("Department"):
-        info += f"🏢 Департамент: {DEPARTMENT_DISPLAY.get(data['Department'], data['Department'])}\n"
-
-    if data.get("CountryAndCity"):
-        info += f"🏙️ Город: {data['CountryAndCity']}\n"
-    if data.get("SubmittedBy"):
-        info += f"👨‍💼 Кто подал: {data['SubmittedBy']}\n"
-    if data.get("ContactInformation"):
-        info += f"📞 Контакты: {data['ContactInformation']}\n"
-
-    return info
+    return card_renderer.full_info(data)
 
 
 # ✅ ДОБАВИТЬ: Обработчик кнопки редактирования
-@require_role("coordinator")
+@require_role("coordinator", "edit")
 @log_state_transitions
 async def handle_edit_participant_callback(
     update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -2686,9 +3007,10 @@ async def handle_edit_participant_callback(
     cleanup_user_data_safe(context, user_id)
 
     context.user_data["participant_id"] = participant_id
-    context.user_data["parsed_participant"] = asdict(participant)
+    context.user_data["parsed_participant"] = participant.to_dict()
+    context.user_data["edit_base"] = participant.to_dict()
 
-    await show_confirmation(update, context, asdict(participant))
+    await show_confirmation(update, context, participant.to_dict())
     return CONFIRMING_DATA
 
 
@@ -2746,7 +3068,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # Обработка подтверждения пользователя
-@require_role("coordinator")
+@require_role("coordinator", "add")
 @smart_cleanup_on_error
 @log_state_transitions
 async def handle_participant_confirmation(
@@ -2843,7 +3165,8 @@ async def edit_field_callback(
         context, clear_field_to_edit, FIELD_EDIT_TIMEOUT, user_id
     )
     if timeout_job:
-        context.user_data["clear_edit_job"] = timeout_job
+        # Job не сохраняется в persistence и не должен копироваться
+        context.user_data["clear_edit_job"] = TransientRef(timeout_job)
 
     keyboard_map = {
         "Gender": get_gender_selection_keyboard_simple,
@@ -2852,9 +3175,7 @@ async def edit_field_callback(
         "Department": get_department_selection_keyboard,
     }
 
-    cancel_markup = InlineKeyboardMarkup(
-        [[InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")]]
-    )
+    cancel_markup = BACK_KEYBOARD
 
     if field_to_edit in keyboard_map:
         kb = keyboard_map[field_to_edit]()
@@ -2980,6 +3301,106 @@ async def handle_continue_editing_callback(
     return CONFIRMING_DATA
 
 
+def rebase_edit(
+    base: Optional[Dict], mine: Dict, stored: Dict
+) -> Tuple[Dict, List[str]]:
+    """Переносит правки пользователя на сохранённую другим версию участника.
+
+    Правка — поля, в которых ``mine`` отличается от ``base`` (версии, с
+    которой её начали); остальное берётся из ``stored``. Поля оплаты ведёт
+    журнал, они всегда из ``stored``. Возвращает объединённые данные и поля,
+    которые оба изменили по-разному. Без ``base`` правкой считается любое
+    отличие от ``stored``, и каждое из них — конфликт.
+    """
+    merged = dict(stored)
+    conflicts = []
+    for name in DATA_FIELDS:
+        if name in PAYMENT_FIELDS:
+            continue
+        old = (base if base is not None else stored).get(name) or ""
+        new = mine.get(name) or ""
+        if new in (old, stored.get(name) or ""):
+            continue
+        merged[name] = mine.get(name)
+        if base is None or (stored.get(name) or "") != old:
+            conflicts.append(name)
+    return merged, conflicts
+
+
+async def show_edit_conflict(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    participant_data: Dict,
+    current: Optional[Participant],
+) -> int:
+    """Участника сохранили, пока шло редактирование: переносит правку на его версию.
+
+    Поля, которые пользователь не менял, берутся из сохранённой записи
+    (``rebase_edit``), в сообщении перечислены только настоящие конфликты.
+    «Сохранить мои» отправляет ``confirm_save`` с объединёнными данными и
+    версией сохранённой записи, «Взять сохранённые» загружает её для правки.
+    """
+    query = update.callback_query
+    if current is None:
+        await query.message.reply_text("❌ Участник не найден — возможно, его удалили.")
+        cleanup_user_data_safe(context, update.effective_user.id)
+        return ConversationHandler.END
+
+    stored = current.to_dict()
+    merged, conflicts = rebase_edit(context.user_data.get("edit_base"), participant_data, stored)
+    differences = [
+        f"• {FIELD_LABELS.get(name, name)}: сохранено «{stored.get(name) or '—'}», "
+        f"у вас «{merged.get(name) or '—'}»"
+        for name in conflicts
+    ]
+    merged["version"] = current.version
+    context.user_data["parsed_participant"] = merged
+    # следующий конфликт считается уже от этой версии
+    context.user_data["edit_base"] = current.to_dict()
+
+    text = "⚠️ Пока вы редактировали, участника сохранил другой координатор.\n\n"
+    if differences:
+        text += "Конфликты:\n" + "\n".join(differences)
+        text += "\n\nСохранить ваши значения поверх или взять сохранённые?"
+    else:
+        text += (
+            "Ваши правки не пересекаются с его изменениями. "
+            "«Сохранить мои» применит их к сохранённой версии."
+        )
+    keyboard = InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton("💾 Сохранить мои", callback_data="confirm_save"),
+                InlineKeyboardButton("🔄 Взять сохранённые", callback_data="conflict_reload"),
+            ],
+            [InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")],
+        ]
+    )
+    await query.message.reply_text(text, reply_markup=keyboard)
+    return CONFIRMING_DATA
+
+
+@smart_cleanup_on_error
+async def handle_conflict_reload(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> int:
+    """Отбрасывает свою правку и открывает сохранённую версию участника."""
+    query = update.callback_query
+    await query.answer()
+
+    participant = participant_service.get_participant(context.user_data.get("participant_id"))
+    if participant is None:
+        await query.message.reply_text("❌ Участник не найден — возможно, его удалили.")
+        cleanup_user_data_safe(context, update.effective_user.id)
+        return ConversationHandler.END
+
+    participant_data = participant.to_dict()
+    context.user_data["parsed_participant"] = participant_data
+    context.user_data["edit_base"] = participant.to_dict()
+    await show_confirmation(update, context, participant_data)
+    return CONFIRMING_DATA
+
+
 @smart_cleanup_on_error
 async def handle_field_edit_cancel(
     update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -3096,12 +3517,14 @@ async def handle_duplicate_callback(
 
     elif action == "dup_replace":
         existing = participant_service.check_duplicate(
-            participant_data["FullNameRU"], user_id=user_id
+            participant_data["FullNameRU"],
+            user_id=user_id,
+            contact=participant_data.get("ContactInformation"),
         )
         if existing:
             try:
                 updated = participant_service.update_participant(
-                    existing.id, participant_data, user_id=user_id
+                    existing.id, participant_data, user_id=user_id, current=existing
                 )
                 user_logger.log_participant_operation(
                     user_id, "update", participant_data, existing.id
@@ -3187,6 +3610,7 @@ def validate_payment_amount(text: str) -> tuple[bool, int, str]:
         return False, 0, "⚠️ Пожалуйста, введите целое число"
 
 
+@require_role("coordinator", "payment")
 async def handle_payment_amount_input(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -3198,9 +3622,12 @@ async def handle_payment_amount_input(
     is_valid, amount, error_message = validate_payment_amount(text)
     
     if not is_valid:
-        await update.message.reply_text(
+        await show_panel(
+            context,
+            update.message,
             f"{error_message}\n\n"
-            f"Попробуйте еще раз. Введите целое число больше нуля:"
+            f"Попробуйте еще раз. Введите целое число больше нуля:",
+            PAYMENT_PANEL,
         )
         return ENTERING_PAYMENT_AMOUNT
     
@@ -3220,13 +3647,16 @@ async def handle_payment_amount_input(
         ]
     ])
     
-    await update.message.reply_text(
+    await show_panel(
+        context,
+        update.message,
         f"💰 **Подтверждение оплаты**\n\n"
         f"👤 Участник: **{participant.FullNameRU}**\n"
         f"💵 Сумма: **{amount} ₪** (шейкелей)\n\n"
         f"Подтвердить внесение оплаты?",
+        PAYMENT_PANEL,
+        reply_markup=confirm_keyboard,
         parse_mode="Markdown",
-        reply_markup=confirm_keyboard
     )
     
     user_logger.log_user_action(
@@ -3239,6 +3669,7 @@ async def handle_payment_amount_input(
     raise ApplicationHandlerStop(CONFIRMING_PAYMENT)
 
 
+@require_role("coordinator", "payment")
 async def handle_payment_confirmation(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -3262,14 +3693,14 @@ async def handle_payment_confirmation(
             
             # Обрабатываем платеж через сервис (передаем ISO дату)
             payment_date = date.today().isoformat()
-            success = participant_service.process_payment(
+            payment = participant_service.process_payment(
                 participant_id=participant.id,
                 amount=amount,
                 payment_date=payment_date,
                 user_id=user_id
             )
             
-            if success:
+            if payment:
                 # Создаем клавиатуру для дальнейших действий
                 success_keyboard = InlineKeyboardMarkup([
                     [
@@ -3280,13 +3711,19 @@ async def handle_payment_confirmation(
                 
                 current_date = datetime.now().strftime("%d.%m.%Y")
                 
-                await query.message.reply_text(
+                await show_panel(
+                    context,
+                    query.message,
                     f"✅ **Оплата внесена!**\n\n"
                     f"💰 Сумма: **{amount} ₪**\n"
+                    f"💳 Всего внесено: **{payment['balance']} ₪**"
+                    f"{f' из {config.EVENT_FEE} ₪' if config.EVENT_FEE > 0 else ''}\n"
+                    f"📊 Статус: {PAYMENT_STATUS_DISPLAY.get(payment['status'], payment['status'])}\n"
                     f"📅 Дата: **{current_date}**\n"
                     f"👤 Участник: **{participant.FullNameRU}**",
+                    PAYMENT_PANEL,
+                    reply_markup=success_keyboard,
                     parse_mode="Markdown",
-                    reply_markup=success_keyboard
                 )
                 
                 user_logger.log_user_action(
@@ -3295,6 +3732,8 @@ async def handle_payment_confirmation(
                     {
                         "participant_id": participant.id,
                         "amount": amount,
+                        "balance": payment["balance"],
+                        "status": payment["status"],
                         "participant_name": participant.FullNameRU
                     }
                 )
@@ -3346,14 +3785,36 @@ def create_participant_repository():
         return SqliteParticipantRepository()
 
 
-# Основная функция
-def main():
+# Сервер /metrics в режиме polling (в режиме webhook эндпоинты на webhook-сервере)
+metrics_server: Optional[BotHTTPServer] = None
+
+
+async def _on_post_init(application: Application) -> None:
+    """Запускает фоновые задачи мониторинга после инициализации приложения."""
+    if loop_monitor is not None:
+        loop_monitor.start(application)
+    if metrics_server is not None:
+        await metrics_server.start()
+
+
+async def _on_post_shutdown(application: Application) -> None:
+    if metrics_server is not None:
+        await metrics_server.stop()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+
+
+def init_services() -> bool:
+    """Проверяет конфигурацию и готовит базу, справочники и сервисы.
+
+    Возвращает False, если запуск бота невозможен.
+    """
     # Проверка конфигурации при старте
     if config.DATABASE_TYPE == "airtable":
         if not config.AIRTABLE_TOKEN or not config.AIRTABLE_BASE_ID:
             print("❌ ERROR: Airtable configuration incomplete!")
             print("   Set AIRTABLE_TOKEN and AIRTABLE_BASE_ID in .env file")
-            return
+            return False
 
         # Test Airtable connection
         try:
@@ -3362,11 +3823,11 @@ def main():
             client = AirtableClient()
             if not client.test_connection():
                 print("❌ ERROR: Cannot connect to Airtable!")
-                return
+                return False
             print("✅ Airtable connection successful")
         except Exception as e:
             print(f"❌ ERROR: Airtable connection failed: {e}")
-            return
+            return False
 
     # Инициализируем базу данных только для SQLite
     if config.DATABASE_TYPE != "airtable":
@@ -3378,7 +3839,11 @@ def main():
     # Initialize repository and service instances
     global participant_repository, participant_service
     participant_repository = create_participant_repository()
-    participant_service = ParticipantService(repository=participant_repository)
+    participant_service = ParticipantService(
+        repository=participant_repository,
+        event_fee=config.EVENT_FEE,
+        cache_ttl=config.PARTICIPANTS_CACHE_TTL,
+    )
 
     # Runtime check: verify python-telegram-bot version is in 22.x range
     try:
@@ -3392,14 +3857,52 @@ def main():
     except Exception as e:
         logger.warning("Failed to verify python-telegram-bot version: %s", e)
 
-    # Создаем приложение
-    application = Application.builder().token(BOT_TOKEN).build()
-
-    # Middleware to log all incoming updates
-    application.add_handler(
-        MessageHandler(filters.ALL, debug_callback_middleware), group=-2
+    return True
+
+
+def build_application(
+    token: str = BOT_TOKEN,
+    request: Optional[BaseRequest] = None,
+    get_updates_request: Optional[BaseRequest] = None,
+    update_processor: Optional[BaseUpdateProcessor] = None,
+    persistence: Optional[BasePersistence] = None,
+    rate_limiter: Optional[BaseRateLimiter] = None,
+    middleware: Optional[MiddlewarePipeline] = None,
+) -> Application:
+    """Создаёт приложение и регистрирует обработчики.
+
+    ``request``/``get_updates_request``/``update_processor`` позволяют
+    нагрузочному стенду (scripts/load_test.py) подменить сетевой слой.
+    По умолчанию апдейты разных пользователей обрабатываются параллельно
+    (``config.CONCURRENT_UPDATES``), апдейты одного пользователя — по очереди.
+    С ``persistence`` диалоги и user_data переживают рестарт, с
+    ``rate_limiter`` исходящие запросы идут через планировщик лимитов.
+    Каждый апдейт сначала проходит ``middleware`` (по умолчанию
+    ``create_middleware`` с ``config.MIDDLEWARE_DISABLED``).
+    """
+    if update_processor is None:
+        update_processor = create_update_processor(config.CONCURRENT_UPDATES)
+    if middleware is None:
+        middleware = create_middleware(config.MIDDLEWARE_DISABLED)
+    builder = (
+        Application.builder()
+        .token(token)
+        .application_class(PipelineApplication, kwargs={"middleware": middleware})
+        .post_init(_on_post_init)
+        .post_shutdown(_on_post_shutdown)
     )
-    application.add_handler(MessageHandler(filters.ALL, log_all_updates), group=-1)
+    if request is not None:
+        builder = builder.request(request)
+    if get_updates_request is not None:
+        builder = builder.get_updates_request(get_updates_request)
+    if update_processor is not None:
+        builder = builder.concurrent_updates(update_processor)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    if rate_limiter is not None:
+        builder = builder.rate_limiter(rate_limiter)
+    application = builder.build()
+    persistent = persistence is not None
 
     search_conv = ConversationHandler(
         entry_points=[
@@ -3450,6 +3953,8 @@ def main():
         ],
         per_chat=True,
         per_message=False,
+        name="search_conv",
+        persistent=persistent,
     )
 
     add_conv = ConversationHandler(
@@ -3483,6 +3988,9 @@ def main():
                 CallbackQueryHandler(
                     handle_field_edit_cancel, pattern="^field_edit_cancel$"
                 ),
+                CallbackQueryHandler(
+                    handle_conflict_reload, pattern="^conflict_reload$"
+                ),
                 MessageHandler(
                     filters.TEXT & ~filters.COMMAND, handle_participant_confirmation
                 ),
@@ -3508,6 +4016,8 @@ def main():
         ],
         per_chat=True,
         per_message=False,
+        name="add_conv",
+        persistent=persistent,
     )
     # ConversationHandler должен быть зарегистрирован первым
     application.add_handler(search_conv)
@@ -3547,6 +4057,18 @@ def main():
     application.add_handler(CommandHandler("payment", payment_command))
     application.add_handler(CommandHandler("list", list_command))
     application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("admin", admin_command))
+    application.add_handler(CommandHandler("reconcile", reconcile_command))
+    application.add_handler(
+        MessageHandler(
+            filters.Document.FileExtension("csv") | filters.Document.MimeType("text/csv"),
+            handle_reconcile_file,
+        )
+    )
+    application.add_handler(
+        CallbackQueryHandler(handle_reconcile_callback, pattern="^reconcile_")
+    )
     application.add_handler(CommandHandler("cancel", cancel_command))
     application.add_handler(
         CallbackQueryHandler(
@@ -3564,13 +4086,59 @@ def main():
     # Обработчик ошибок
     application.add_error_handler(error_handler)
 
+    if loop_monitor is not None:
+        loop_monitor.instrument(application)
+
+    return application
+
+
+# Основная функция
+def main():
+    if not init_services():
+        return
+
+    webhook_mode = config.BOT_MODE == "webhook"
+    if webhook_mode or config.METRICS_PORT:
+        if not AIOHTTP_AVAILABLE:
+            print("❌ ERROR: webhook mode and /metrics require aiohttp (pip install aiohttp)")
+            return
+    if webhook_mode and not config.WEBHOOK_URL:
+        print("❌ ERROR: BOT_MODE=webhook requires WEBHOOK_URL in .env file")
+        return
+
+    application = build_application(
+        persistence=create_persistence(
+            config.PERSISTENCE_ENABLED,
+            config.PERSISTENCE_PATH,
+            config.PERSISTENCE_FLUSH_MS,
+        ),
+        rate_limiter=create_request_scheduler(config.RATE_LIMITER_ENABLED),
+    )
+
     database_type = config.DATABASE_TYPE.upper()
     print(f"🤖 Бот @{BOT_USERNAME} запущен!")
     print(f"🗄️ Database: {database_type}")
-    print("🔄 Polling started...")
 
     # Запускаем бота
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if webhook_mode:
+        print(f"🌐 Webhook started on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}...")
+        run_webhook(
+            application,
+            host=config.WEBHOOK_HOST,
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=config.ALLOWED_UPDATES,
+        )
+    else:
+        if config.METRICS_PORT:
+            global metrics_server
+            metrics_server = BotHTTPServer(
+                application, host=config.WEBHOOK_HOST, port=config.METRICS_PORT
+            )
+        print("🔄 Polling started...")
+        application.run_polling(allowed_updates=config.ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
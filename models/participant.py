@@ -1,8 +1,9 @@
-from dataclasses import dataclass, field
-from typing import Optional, Union
+from dataclasses import MISSING, dataclass, field, fields
+from operator import attrgetter
+from typing import Any, ClassVar, Dict, Mapping, Optional, Tuple, Union
 
 
-@dataclass
+@dataclass(slots=True)
 class Participant:
     # Required field without a default
     FullNameRU: str
@@ -17,10 +18,89 @@ class Participant:
     SubmittedBy: str = ""
     ContactInformation: str = ""
     CountryAndCity: str = ""
-    
+
     # Payment fields - added for TDB-1
     PaymentStatus: str = "Unpaid"
     PaymentAmount: int = 0  # Amount in shekels (integers only)
     PaymentDate: str = ""   # ISO format date string
-    
+
+    # Версия записи для оптимистичной блокировки: счётчик в SQLite, время
+    # изменения записи в Airtable; None — неизвестна (запись без проверки)
+    version: Optional[Union[int, str]] = field(default=None, compare=False)
+
     id: Optional[Union[int, str]] = field(default=None, compare=False)
+
+    # Значения полей на момент чтения/записи (см. dirty_fields). Снимок берут
+    # только для участника, которого собираются менять, — списки из get_all
+    # его не хранят и остаются компактными.
+    _saved: Optional[Tuple[Any, ...]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    # Имена полей в порядке объявления; заполняются после создания класса.
+    # __slots__ без __dict__: экземпляр меньше, доступ к полям быстрее.
+    FIELD_NAMES: ClassVar[Tuple[str, ...]] = ()
+    FIELD_SET: ClassVar[frozenset] = frozenset()
+    DEFAULTS: ClassVar[Dict[str, Any]] = {}
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "Participant":
+        """Из строки БД (dict или sqlite3.Row); лишние колонки отбрасываются."""
+        if not isinstance(row, dict):
+            row = dict(row)
+        get = row.get
+        return cls(row["FullNameRU"], *[get(name, default) for name, default in _ROW_DEFAULTS])
+
+    @classmethod
+    def from_airtable(
+        cls, record: Mapping[str, Any], version_field: Optional[str] = None
+    ) -> "Participant":
+        """Из записи Airtable: отсутствующие поля получают значения по умолчанию.
+
+        ``version_field`` — поле типа «Last modified time», его значение
+        становится версией участника.
+        """
+        data = record.get("fields", {})
+        return cls(
+            *[data.get(name, default) for name, default in _AIRTABLE_DEFAULTS],
+            version=data.get(version_field) if version_field else None,
+            id=record["id"],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Поверхностная копия полей (вместо рекурсивного ``dataclasses.asdict``)."""
+        return dict(zip(self.FIELD_NAMES, _get_fields(self)))
+
+    def mark_clean(self, saved: Optional["Participant"] = None) -> None:
+        """Запоминает сохранённое состояние: текущее или версии ``saved`` из хранилища."""
+        self._saved = _get_data(saved if saved is not None else self)
+
+    def dirty_fields(self) -> Tuple[str, ...]:
+        """Поля, изменённые после mark_clean; без снимка — все поля (полная запись)."""
+        if self._saved is None:
+            return DATA_FIELDS
+        return tuple(
+            name
+            for name, old, new in zip(DATA_FIELDS, self._saved, _get_data(self))
+            if old != new
+        )
+
+
+Participant.FIELD_NAMES = tuple(f.name for f in fields(Participant) if f.init)
+Participant.FIELD_SET = frozenset(Participant.FIELD_NAMES)
+Participant.DEFAULTS = {
+    f.name: f.default
+    for f in fields(Participant)
+    if f.init and f.default is not MISSING
+}
+
+# Поля с данными участника (без version и id) — то, что пишется в хранилище
+DATA_FIELDS = Participant.FIELD_NAMES[:-2]
+# Итог журнала платежей: меняется только через process_payment/record_payment(s)
+PAYMENT_FIELDS = ("PaymentStatus", "PaymentAmount", "PaymentDate")
+
+_get_fields = attrgetter(*Participant.FIELD_NAMES)
+_get_data = attrgetter(*DATA_FIELDS)
+# (имя, значение по умолчанию) в порядке позиционных аргументов конструктора
+_ROW_DEFAULTS = tuple((name, Participant.DEFAULTS[name]) for name in Participant.FIELD_NAMES[1:])
+_AIRTABLE_DEFAULTS = (("FullNameRU", ""),) + _ROW_DEFAULTS[:-2]  # version и id — отдельно
@@ -17,6 +17,11 @@ class AirtableClient:
 
         self.api = Api(self.token)
         self.participants_table = self.api.table(self.base_id, "Participants")
+        # Журнал платежей: ParticipantId, Amount, PaymentDate, Method, RecordedBy
+        self.payments_table = self.api.table(self.base_id, "Payments")
+        # Поле типа «Last modified time» — версия записи для проверки перед
+        # обновлением; если его нет в таблице, обновления идут без проверки
+        self.modified_field = os.getenv("AIRTABLE_MODIFIED_FIELD", "LastModified")
 
     def test_connection(self):
         """Test connection to Airtable"""
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Union
 import time
 from datetime import datetime
 
@@ -7,9 +7,12 @@ from pyairtable.api.types import RecordDict
 from pyairtable.formulas import match
 
 from repositories.participant_repository import BaseParticipantRepository
-from models.participant import Participant
+from models.participant import DATA_FIELDS, Participant
 from repositories.airtable_client import AirtableClient
+from utils.payment_ledger import PaymentLedger, payment_status_for
+from utils.payment_summary import PaymentAggregate, diff_breakdowns
 from utils.exceptions import (
+    ConcurrentModificationError,
     ParticipantNotFoundError,
     ValidationError,
     BotException,
@@ -36,9 +39,89 @@ def _normalize_date_to_iso(value: str) -> str:
 class AirtableParticipantRepository(BaseParticipantRepository):
     """Airtable implementation of participant repository."""
 
+    # Сводка оплат в памяти пересобирается целиком не чаще раза в N секунд:
+    # записи могут меняться и в интерфейсе Airtable, мимо бота
+    payment_summary_ttl = 600.0
+
     def __init__(self):
         self.client = AirtableClient()
         self.table = self.client.participants_table
+        self.payments_table = self.client.payments_table
+        self.version_field = self.client.modified_field
+        self._payments: Optional[PaymentAggregate] = None
+        self._payments_built_at = 0.0
+        self._ledger: Optional[PaymentLedger] = None
+        self._ledger_built_at = 0.0
+
+    # --- Сводка оплат (utils/payment_summary.py) ---
+
+    def _build_payment_aggregate(self) -> PaymentAggregate:
+        return PaymentAggregate.from_records(
+            (p.id, p.PaymentStatus, p.PaymentAmount) for p in self.get_all()
+        )
+
+    def _track_payment(self, record_id: str, status: Optional[str] = None, amount: Optional[int] = None) -> None:
+        """Применяет изменение записи к сводке; неизвестная запись сбрасывает сводку."""
+        if self._payments is None:
+            return
+        previous = self._payments.get(record_id)
+        if previous is None and (status is None or amount is None):
+            self._payments = None
+            return
+        if status is None:
+            status = previous[0]
+        if amount is None:
+            amount = previous[1]
+        self._payments.set(record_id, status, amount)
+
+    # --- Журнал платежей (utils/payment_ledger.py) ---
+
+    def _get_ledger(self) -> PaymentLedger:
+        """Балансы из таблицы Payments; перечитывается с тем же TTL, что и сводка."""
+        expired = time.monotonic() - self._ledger_built_at > self.payment_summary_ttl
+        if self._ledger is None or expired:
+            ledger = PaymentLedger()
+            for record in self.payments_table.all():
+                fields = record.get("fields", {})
+                if fields.get("ParticipantId") and fields.get("Amount"):
+                    ledger.add(
+                        fields["ParticipantId"],
+                        int(fields["Amount"]),
+                        fields.get("PaymentDate") or "",
+                        fields.get("Reference"),
+                    )
+            self._ledger = ledger
+            self._ledger_built_at = time.monotonic()
+        return self._ledger
+
+    @staticmethod
+    def _opening_entry(participant_id: str, fields: Dict) -> Optional[Dict]:
+        """
+        Запись ``opening_balance`` для участника без записей в Payments: сумма,
+        внесённая до журнала или напрямую в таблицу, становится началом баланса.
+        """
+        amount = int(fields.get('PaymentAmount') or 0)
+        if not amount:
+            return None
+        return {
+            'ParticipantId': participant_id,
+            'Amount': amount,
+            'PaymentDate': _normalize_date_to_iso(fields.get('PaymentDate'))
+            or datetime.now().date().isoformat(),
+            'Method': 'opening_balance',
+        }
+
+    def _fetch_fields(self, participant_ids: Iterable[str], chunk_size: int = 50) -> Dict[str, Dict]:
+        """Поля участников по id: несколько запросов с OR(RECORD_ID()=...)."""
+        ids = sorted(participant_ids)
+        found: Dict[str, Dict] = {}
+        for start in range(0, len(ids), chunk_size):
+            formula = "OR({})".format(
+                ",".join(f"RECORD_ID()='{pid}'" for pid in ids[start:start + chunk_size])
+            )
+            for record in self.table.all(formula=formula):
+                found[record["id"]] = record.get("fields", {})
+        return found
 
     def _participant_to_airtable_fields(self, participant: Participant) -> dict:
         """Convert Participant dataclass to Airtable fields.
@@ -73,23 +156,27 @@ class AirtableParticipantRepository(BaseParticipantRepository):
 
     def _airtable_record_to_participant(self, record: RecordDict) -> Participant:
         """Convert Airtable record to Participant dataclass."""
-        fields = record.get('fields', {})
-        return Participant(
-            id=record['id'],  # Airtable record ID
-            FullNameRU=fields.get('FullNameRU', ''),
-            FullNameEN=fields.get('FullNameEN', ''),
-            Gender=fields.get('Gender', 'F'),
-            Size=fields.get('Size', ''),
-            Church=fields.get('Church', ''),
-            Role=fields.get('Role', ''),
-            Department=fields.get('Department', ''),
-            CountryAndCity=fields.get('CountryAndCity', ''),
-            SubmittedBy=fields.get('SubmittedBy', ''),
-            ContactInformation=fields.get('ContactInformation', ''),
-            PaymentStatus=fields.get('PaymentStatus', 'Unpaid'),
-            PaymentAmount=fields.get('PaymentAmount', 0),
-            PaymentDate=fields.get('PaymentDate', ''),
-        )
+        return Participant.from_airtable(record, self.version_field)
+
+    def _record_version(self, record) -> Optional[str]:
+        if not isinstance(record, dict):
+            return None
+        return record.get('fields', {}).get(self.version_field)
+
+    def _check_version(self, participant_id: str, expected_version: Optional[str]) -> None:
+        """Сверяет время изменения записи перед обновлением.
+
+        У Airtable нет условных обновлений, поэтому это проверка-затем-запись:
+        окно гонки сужается до одного запроса, но не исчезает.
+        """
+        if expected_version is None:
+            return
+        record = self.table.get(participant_id)
+        if self._record_version(record) != expected_version:
+            raise ConcurrentModificationError(
+                f"Participant {participant_id} was modified in Airtable",
+                current=self._airtable_record_to_participant(record),
+            )
 
     def add(self, participant: Participant) -> int:
         """Add participant to Airtable."""
@@ -101,6 +188,7 @@ class AirtableParticipantRepository(BaseParticipantRepository):
 
             # Возвращаем Airtable record ID как строку
             record_id = record['id']
+            self._track_payment(record_id, fields['PaymentStatus'], fields['PaymentAmount'])
             logger.info(f"Successfully added participant with ID: {record_id}")
             return record_id
 
@@ -115,7 +203,9 @@ class AirtableParticipantRepository(BaseParticipantRepository):
 
         try:
             record = self.table.get(participant_id)
-            return self._airtable_record_to_participant(record)
+            participant = self._airtable_record_to_participant(record)
+            participant.mark_clean()  # снимок: update отправит только изменения
+            return participant
 
         except Exception as e:
             if "NOT_FOUND" in str(e) or "Record not found" in str(e):
@@ -137,7 +227,9 @@ class AirtableParticipantRepository(BaseParticipantRepository):
                 return None
 
             # Return first match
-            return self._airtable_record_to_participant(records[0])
+            participant = self._airtable_record_to_participant(records[0])
+            participant.mark_clean()
+            return participant
 
         except Exception as e:
             logger.error(f"Error searching participant by name: {e}")
@@ -176,11 +268,22 @@ class AirtableParticipantRepository(BaseParticipantRepository):
             # If role is CANDIDATE ensure Department is cleared in Airtable
             if fields.get('Role') == 'CANDIDATE':
                 fields['Department'] = None
-            self.table.update(participant.id, fields)
+            dirty = participant.dirty_fields()
+            if len(dirty) < len(DATA_FIELDS):
+                fields = self._dirty_airtable_fields(participant, fields, dirty)
+                if not fields:
+                    return True
+            self._check_version(participant.id, participant.version)
+            record = self.table.update(participant.id, fields)
+            self._track_payment(participant.id, fields.get('PaymentStatus'), fields.get('PaymentAmount'))
+            participant.version = self._record_version(record)
+            participant.mark_clean()
 
             logger.info(f"Successfully updated participant {participant.id}")
             return True
 
+        except ConcurrentModificationError:
+            raise
         except Exception as e:
             if "NOT_FOUND" in str(e):
                 raise ParticipantNotFoundError(
@@ -189,7 +292,19 @@ class AirtableParticipantRepository(BaseParticipantRepository):
             logger.error(f"Error updating participant: {e}")
             raise DatabaseError(f"Airtable error on update: {e}") from e
 
-    def update_fields(self, participant_id: Union[int, str], **fields) -> bool:
+    @staticmethod
+    def _dirty_airtable_fields(participant: Participant, fields: dict, dirty) -> dict:
+        """PATCH только изменённых полей; очищенные поля отправляются как null."""
+        patch = {name: fields[name] for name in dirty if name in fields}
+        if 'Department' in dirty or 'Role' in dirty:
+            patch['Department'] = fields.get('Department')
+        if 'PaymentDate' in dirty and 'PaymentDate' not in patch:
+            patch['PaymentDate'] = None
+        return patch
+
+    def update_fields(
+        self, participant_id: Union[int, str], expected_version=None, **fields
+    ) -> bool:
         """Update specific fields for a participant."""
         participant_id = str(participant_id)
         self._validate_fields(**fields)
@@ -222,11 +337,18 @@ class AirtableParticipantRepository(BaseParticipantRepository):
             for key, value in fields.items():
                 airtable_fields[key] = value if value is not None else None
 
+            self._check_version(participant_id, expected_version)
             self.table.update(participant_id, airtable_fields)
+            if 'PaymentStatus' in fields or 'PaymentAmount' in fields:
+                self._track_payment(
+                    participant_id, fields.get('PaymentStatus'), fields.get('PaymentAmount')
+                )
 
             logger.info(f"Successfully updated fields for participant {participant_id}")
             return True
 
+        except ConcurrentModificationError:
+            raise
         except Exception as e:
             if "NOT_FOUND" in str(e):
                 raise ParticipantNotFoundError(
@@ -242,6 +364,8 @@ class AirtableParticipantRepository(BaseParticipantRepository):
 
         try:
             self.table.delete(participant_id)
+            if self._payments is not None:
+                self._payments.discard(participant_id)
 
             logger.info(f"Successfully deleted participant {participant_id}")
             return True
@@ -258,7 +382,14 @@ class AirtableParticipantRepository(BaseParticipantRepository):
         """Check if participant exists in Airtable."""
         return self.get_by_id(participant_id) is not None
 
-    def update_payment(self, participant_id: Union[int, str], status: str, amount: int, date: str) -> bool:
+    def update_payment(
+        self,
+        participant_id: Union[int, str],
+        status: str,
+        amount: int,
+        date: str,
+        expected_version=None,
+    ) -> bool:
         """Update payment status for a participant in Airtable."""
         participant_id = str(participant_id)
         logger.info(f"Updating payment for participant {participant_id}: {status}, {amount}₪")
@@ -274,11 +405,15 @@ class AirtableParticipantRepository(BaseParticipantRepository):
                 'PaymentAmount': amount,
                 'PaymentDate': normalized_date,
             }
+            self._check_version(participant_id, expected_version)
             self.table.update(participant_id, payment_fields)
+            self._track_payment(participant_id, status, amount)
 
             logger.info(f"Successfully updated payment for participant {participant_id}")
             return True
 
+        except ConcurrentModificationError:
+            raise
         except Exception as e:
             if "NOT_FOUND" in str(e):
                 raise ParticipantNotFoundError(
@@ -287,6 +422,206 @@ class AirtableParticipantRepository(BaseParticipantRepository):
             logger.error(f"Error updating payment in Airtable: {e}")
             raise DatabaseError(f"Airtable error on update_payment: {e}") from e
 
+    def record_payment(
+        self,
+        participant_id: Union[int, str],
+        amount: int,
+        date: str,
+        event_fee: int = 0,
+        method: Optional[str] = None,
+        recorded_by: Optional[int] = None,
+    ) -> Dict:
+        """Append a payment to the Payments table and update participant status."""
+        participant_id = str(participant_id)
+        logger.info(f"Recording payment for participant {participant_id}: {amount}₪")
+
+        try:
+            ledger = self._get_ledger()
+            payment_date = _normalize_date_to_iso(date)
+            previous = ledger.balance(participant_id)
+            opening = None
+            if previous is None:
+                opening = self._opening_entry(
+                    participant_id, self.table.get(participant_id).get("fields", {})
+                )
+                previous = {
+                    "balance": opening['Amount'] if opening else 0,
+                    "last_payment_date": opening['PaymentDate'] if opening else "",
+                }
+            balance = previous["balance"] + amount
+            last_payment_date = max(previous["last_payment_date"], payment_date)
+            status = payment_status_for(balance, event_fee)
+
+            # Сначала участник: несуществующий id не должен попасть в журнал
+            updated = self.table.update(participant_id, {
+                'PaymentStatus': status,
+                'PaymentAmount': balance,
+                'PaymentDate': last_payment_date or None,
+            })
+            payment_fields = {
+                'ParticipantId': participant_id,
+                'Amount': amount,
+                'PaymentDate': payment_date,
+            }
+            if method:
+                payment_fields['Method'] = method
+            if recorded_by is not None:
+                payment_fields['RecordedBy'] = recorded_by
+            try:
+                if opening:
+                    self.payments_table.create(opening)
+                record = self.payments_table.create(payment_fields)
+            except Exception:
+                # участник уже обновлён — журнал перечитаем при следующем обращении
+                self._ledger = None
+                raise
+            if opening:
+                ledger.add(participant_id, opening['Amount'], opening['PaymentDate'])
+            ledger.add(participant_id, amount, payment_date)
+            self._track_payment(participant_id, status, balance)
+
+            logger.info(f"Recorded payment {record['id']} for participant {participant_id}")
+            return {
+                "payment_id": record["id"],
+                "participant_id": participant_id,
+                "amount": amount,
+                "balance": balance,
+                "status": status,
+                "payment_date": last_payment_date,
+                "version": self._record_version(updated),
+            }
+
+        except Exception as e:
+            if "NOT_FOUND" in str(e):
+                raise ParticipantNotFoundError(
+                    f"Participant with id {participant_id} not found"
+                )
+            logger.error(f"Error recording payment in Airtable: {e}")
+            raise DatabaseError(f"Airtable error on record_payment: {e}") from e
+
+    def record_payments(self, payments: List[Dict], event_fee: int = 0) -> Dict:
+        """Append a batch of payments with batch_create/batch_update requests."""
+        logger.info(f"Recording {len(payments)} payments in Airtable")
+        result: Dict[str, List] = {"recorded": [], "duplicates": [], "missing": []}
+
+        try:
+            ledger = self._get_ledger()
+            pending = {
+                str(payment["participant_id"]) for payment in payments
+                if ledger.balance(str(payment["participant_id"])) is None
+            }
+            found = self._fetch_fields(pending) if pending else {}
+            openings = {}
+            for pid, fields in found.items():
+                opening = self._opening_entry(pid, fields) if pid in pending else None
+                if opening:
+                    openings[pid] = opening
+            balances: Dict[str, Dict] = {}
+            new_records: List[Dict] = []
+            batch_references = set()
+            for payment in payments:
+                participant_id = str(payment["participant_id"])
+                if participant_id in pending and participant_id not in found:
+                    result["missing"].append(payment["participant_id"])
+                    continue
+                reference = payment.get("reference")
+                if reference and (ledger.has_reference(reference) or reference in batch_references):
+                    result["duplicates"].append(reference)
+                    continue
+                if reference:
+                    batch_references.add(reference)
+                payment_date = _normalize_date_to_iso(payment["date"])
+                opening = openings.get(participant_id)
+                state = balances.get(participant_id) or ledger.balance(participant_id) or {
+                    "balance": opening['Amount'] if opening else 0,
+                    "last_payment_date": opening['PaymentDate'] if opening else "",
+                }
+                state = {
+                    "balance": state["balance"] + payment["amount"],
+                    "last_payment_date": max(state["last_payment_date"], payment_date),
+                }
+                balances[participant_id] = state
+                fields = {
+                    'ParticipantId': participant_id,
+                    'Amount': payment["amount"],
+                    'PaymentDate': payment_date,
+                }
+                if payment.get("method"):
+                    fields['Method'] = payment["method"]
+                if payment.get("recorded_by") is not None:
+                    fields['RecordedBy'] = payment["recorded_by"]
+                if reference:
+                    fields['Reference'] = reference
+                new_records.append(fields)
+            if not new_records:
+                return result
+
+            # Участники одним batch_update (по 10 записей на запрос), затем журнал
+            statuses = {
+                pid: payment_status_for(state["balance"], event_fee) for pid, state in balances.items()
+            }
+            self.table.batch_update([
+                {
+                    "id": pid,
+                    "fields": {
+                        'PaymentStatus': statuses[pid],
+                        'PaymentAmount': state["balance"],
+                        'PaymentDate': state["last_payment_date"] or None,
+                    },
+                }
+                for pid, state in balances.items()
+            ])
+            # начальные остатки — в том же batch_create, перед платежами
+            opening_records = [openings[pid] for pid in balances if pid in openings]
+            try:
+                created = self.payments_table.batch_create(opening_records + new_records)
+            except Exception:
+                self._ledger = None
+                raise
+
+            for fields in opening_records:
+                ledger.add(fields['ParticipantId'], fields['Amount'], fields['PaymentDate'])
+            for record, fields in zip(created[len(opening_records):], new_records):
+                pid = fields['ParticipantId']
+                balance = ledger.add(pid, fields['Amount'], fields['PaymentDate'], fields.get('Reference'))
+                result["recorded"].append({
+                    "payment_id": record["id"],
+                    "participant_id": pid,
+                    "amount": fields['Amount'],
+                    "balance": balance["balance"],
+                    "status": payment_status_for(balance["balance"], event_fee),
+                    "payment_date": balance["last_payment_date"],
+                    "reference": fields.get('Reference'),
+                })
+            for pid, state in balances.items():
+                self._track_payment(pid, statuses[pid], state["balance"])
+
+            logger.info(
+                "Recorded %d payments in Airtable batch (%d duplicates)",
+                len(result["recorded"]), len(result["duplicates"]),
+            )
+            return result
+
+        except Exception as e:
+            logger.error(f"Error recording payment batch in Airtable: {e}")
+            raise DatabaseError(f"Airtable error on record_payments: {e}") from e
+
+    def get_balance(self, participant_id: Union[int, str]) -> Optional[Dict]:
+        """Get participant balance from the in-memory ledger."""
+        try:
+            return self._get_ledger().balance(str(participant_id))
+        except Exception as e:
+            logger.error(f"Error getting balance from Airtable: {e}")
+            raise DatabaseError(f"Airtable error on get_balance: {e}") from e
+
+    def get_cash_flow(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Get daily payment totals from the in-memory ledger."""
+        try:
+            return self._get_ledger().cash_flow(start, end)
+        except Exception as e:
+            logger.error(f"Error getting cash flow from Airtable: {e}")
+            raise DatabaseError(f"Airtable error on get_cash_flow: {e}") from e
+
     def get_unpaid_participants(self) -> List[Participant]:
         """Get all unpaid participants from Airtable."""
         logger.info("Getting unpaid participants from Airtable")
@@ -309,42 +644,43 @@ class AirtableParticipantRepository(BaseParticipantRepository):
             raise DatabaseError(f"Airtable error on get_unpaid_participants: {e}") from e
 
     def get_payment_summary(self) -> Dict:
-        """Get payment summary from Airtable."""
+        """Get payment summary from the in-memory aggregate."""
         logger.info("Getting payment summary from Airtable")
 
         try:
-            # Get all participants to calculate summary
-            all_participants = self.get_all()
-            
-            status_breakdown = {}
-            total_amount = 0
-            paid_count = 0
-            
-            for participant in all_participants:
-                status = participant.PaymentStatus
-                amount = participant.PaymentAmount
-                
-                if status not in status_breakdown:
-                    status_breakdown[status] = {"count": 0, "total": 0}
-                
-                status_breakdown[status]["count"] += 1
-                status_breakdown[status]["total"] += amount
-                total_amount += amount
-                
-                if status == "Paid":
-                    paid_count += 1
+            expired = time.monotonic() - self._payments_built_at > self.payment_summary_ttl
+            if self._payments is None or expired:
+                self._payments = self._build_payment_aggregate()
+                self._payments_built_at = time.monotonic()
+            return self._payments.as_summary()
+
+        except Exception as e:
+            logger.error(f"Error getting payment summary from Airtable: {e}")
+            raise DatabaseError(f"Airtable error on get_payment_summary: {e}") from e
+
+    def verify_payment_summary(self) -> Dict:
+        """Rebuild the aggregate from all records and report differences."""
+        logger.info("Verifying payment summary for Airtable")
 
+        try:
+            rebuilt = self._build_payment_aggregate()
+            actual = self._payments.breakdown() if self._payments is not None else {}
+            differences = diff_breakdowns(rebuilt.breakdown(), actual)
+            # без построенной сводки сверять нечего — просто строим её
+            consistent = self._payments is None or not differences
+            if not consistent:
+                logger.warning("Airtable payment summary is inconsistent: %s", differences)
+            self._payments = rebuilt
+            self._payments_built_at = time.monotonic()
             return {
-                "status_breakdown": status_breakdown,
-                "total_participants": len(all_participants),
-                "total_amount": total_amount,
-                "paid_count": paid_count,
-                "unpaid_count": len(all_participants) - paid_count
+                "consistent": consistent,
+                "repaired": not consistent,
+                "differences": differences if not consistent else {},
             }
 
         except Exception as e:
-            logger.error(f"Error getting payment summary from Airtable: {e}")
-            raise DatabaseError(f"Airtable error on get_payment_summary: {e}") from e
+            logger.error(f"Error verifying payment summary in Airtable: {e}")
+            raise DatabaseError(f"Airtable error on verify_payment_summary: {e}") from e
 
     def _handle_rate_limit(self, retry_count: int = 0):
         """Handle Airtable rate limiting with exponential backoff."""
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Optional, Set, Union
 
 # Используем dataclass из models, чтобы работать с объектами, а не словарями
-from models.participant import Participant
+from models.participant import DATA_FIELDS, Participant
 
 
 class AbstractParticipantRepository(ABC):
@@ -69,7 +69,13 @@ class AbstractParticipantRepository(ABC):
         """
         ✅ ИСПРАВЛЕНО: принимает объект Participant, а не Dict.
 
-        Обновляет участника полностью. participant.id должен быть установлен.
+        Сохраняет участника. participant.id должен быть установлен.
+        Если объект получен из get_by_id (есть снимок, см. dirty_fields),
+        записываются только изменённые поля, иначе — все.
+
+        Если известна participant.version, запись сохраняется только при
+        совпадении версии в хранилище (compare-and-swap); после записи
+        participant.version — новая версия.
 
         Args:
             participant: Объект участника с установленным ID
@@ -79,18 +85,22 @@ class AbstractParticipantRepository(ABC):
 
         Raises:
             ParticipantNotFoundError: Если участник не найден
+            ConcurrentModificationError: Если участника уже изменили
             ValidationError: При неверных данных
             ValueError: Если participant.id не установлен
         """
         pass
 
     @abstractmethod
-    def update_fields(self, participant_id: Union[int, str], **fields) -> bool:
+    def update_fields(
+        self, participant_id: Union[int, str], expected_version=None, **fields
+    ) -> bool:
         """
         ✅ НОВЫЙ МЕТОД: частичное обновление конкретных полей.
 
         Args:
             participant_id: ID участника
+            expected_version: Версия, которую видел вызывающий (None — без проверки)
             **fields: Поля для обновления (FullNameRU="Новое имя", Gender="M", etc.)
 
         Returns:
@@ -98,6 +108,7 @@ class AbstractParticipantRepository(ABC):
 
         Raises:
             ParticipantNotFoundError: Если участник не найден
+            ConcurrentModificationError: Если версия не совпала
             ValidationError: При неверных данных
             ValueError: Если переданы неизвестные поля
 
@@ -136,7 +147,14 @@ class AbstractParticipantRepository(ABC):
         pass
 
     @abstractmethod
-    def update_payment(self, participant_id: Union[int, str], status: str, amount: int, date: str) -> bool:
+    def update_payment(
+        self,
+        participant_id: Union[int, str],
+        status: str,
+        amount: int,
+        date: str,
+        expected_version=None,
+    ) -> bool:
         """
         ✅ НОВЫЙ МЕТОД: обновление статуса оплаты.
 
@@ -145,12 +163,14 @@ class AbstractParticipantRepository(ABC):
             status: Статус оплаты (Unpaid, Paid, Partial, Refunded)
             amount: Сумма в шейкелях (целое число)
             date: Дата оплаты в ISO формате
+            expected_version: Версия, которую видел вызывающий (None — без проверки)
 
         Returns:
             bool: True если обновление успешно
 
         Raises:
             ParticipantNotFoundError: Если участник не найден
+            ConcurrentModificationError: Если версия не совпала
             ValidationError: При неверных данных
         """
         pass
@@ -175,19 +195,118 @@ class AbstractParticipantRepository(ABC):
         """
         pass
 
+    @abstractmethod
+    def verify_payment_summary(self) -> Dict:
+        """
+        Сверяет поддерживаемую сводку оплат с пересчётом с нуля и пересобирает
+        её при расхождении.
+
+        Returns:
+            Dict: ``consistent``, ``repaired`` и ``differences`` по статусам
+        """
+        pass
+
+
+    @abstractmethod
+    def record_payment(
+        self,
+        participant_id: Union[int, str],
+        amount: int,
+        date: str,
+        event_fee: int = 0,
+        method: Optional[str] = None,
+        recorded_by: Optional[int] = None,
+    ) -> Dict:
+        """
+        Добавляет платёж в журнал и пересчитывает статус участника по балансу.
+
+        Args:
+            participant_id: ID участника
+            amount: Сумма взноса в шейкелях (целое число)
+            date: Дата платежа в ISO формате
+            event_fee: Взнос за мероприятие (0 — любой взнос считается полной оплатой)
+            method: Способ оплаты
+            recorded_by: Telegram ID пользователя, внёсшего платёж
+
+        Returns:
+            Dict: ``payment_id``, ``participant_id``, ``amount``, ``balance``,
+            ``status``, ``payment_date``
+
+        Raises:
+            ParticipantNotFoundError: Если участник не найден
+            ValidationError: При неверных данных
+        """
+        pass
+
+    @abstractmethod
+    def record_payments(self, payments: List[Dict], event_fee: int = 0) -> Dict:
+        """
+        Вносит пачку платежей (сверка выписки) одной записью.
+
+        Args:
+            payments: Словари ``participant_id``, ``amount``, ``date`` и
+                необязательные ``method``, ``recorded_by``, ``reference``
+            event_fee: Взнос за мероприятие
+
+        Returns:
+            Dict: ``recorded`` (результаты по платежам), ``duplicates`` (ссылки,
+            которые уже есть в журнале), ``missing`` (ID несуществующих участников)
+        """
+        pass
+
+    @abstractmethod
+    def get_balance(self, participant_id: Union[int, str]) -> Optional[Dict]:
+        """
+        Баланс участника по журналу платежей.
+
+        Returns:
+            Optional[Dict]: ``participant_id``, ``balance``, ``payments_count``,
+            ``last_payment_date`` или None, если платежей не было
+        """
+        pass
+
+    @abstractmethod
+    def get_cash_flow(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """
+        Поступления по дням за период ``[start, end]`` (даты ISO, включительно).
+
+        Returns:
+            List[Dict]: ``date``, ``total``, ``count`` по возрастанию даты
+        """
+        pass
 
 class BaseParticipantRepository(AbstractParticipantRepository):
     """Base repository with shared validation helpers."""
 
+    def search(self, query: str, limit: int = 50) -> Optional[List[Participant]]:
+        """
+        Кандидаты для поиска из хранилища, лучшие первыми (не больше ``limit``).
+
+        None — хранилище так искать не умеет, сервис ищет по полному списку
+        участников (так работает Airtable).
+        """
+        return None
+
+    def find_duplicates(
+        self, full_name_ru: str, contact: Optional[str] = None
+    ) -> Optional[List[Participant]]:
+        """
+        Возможные дубли: участники с тем же ключом имени, затем — с тем же
+        телефоном или email из ``contact`` (utils/duplicate_keys.py).
+
+        None — хранилище ключей не хранит, сервис сверяет ключи по кешу
+        участников (так работает Airtable).
+        """
+        return None
+
     def _validate_fields(self, **fields) -> None:
-        valid_field_names = set(Participant.__annotations__.keys()) - {"id"}
+        valid_field_names = set(DATA_FIELDS)
         invalid_fields = set(fields.keys()) - valid_field_names
         if invalid_fields:
             raise ValueError(f"Invalid fields for Participant: {invalid_fields}")
 
 
 import logging
-from dataclasses import asdict
 
 # Импортируем существующие низкоуровневые функции
 from database import (
@@ -196,10 +315,18 @@ from database import (
     find_participant_by_name,
     get_all_participants,
     update_participant,
+    update_participant_field,
     delete_participant,
     update_payment_status,
     get_unpaid_participants,
     get_payment_summary,
+    verify_payment_summary,
+    record_payment,
+    record_payments,
+    get_participant_balance,
+    get_cash_flow,
+    search_participants,
+    find_participants_by_contact,
 )
 from utils.exceptions import (
     ParticipantNotFoundError,
@@ -217,7 +344,7 @@ class SqliteParticipantRepository(BaseParticipantRepository):
 
     def add(self, participant: Participant) -> int:
         logger.info(f"Adding participant to SQLite: {participant.FullNameRU}")
-        participant_data = asdict(participant)
+        participant_data = participant.to_dict()
         participant_data.pop("id", None)  # Убираем ID перед добавлением
         try:
             return add_participant(participant_data)
@@ -236,13 +363,10 @@ class SqliteParticipantRepository(BaseParticipantRepository):
             logger.debug(f"Participant {participant_id} not found in database")
             return None
 
-        # Фильтруем только валидные поля для Participant dataclass
-        valid_fields = {
-            k: v
-            for k, v in participant_dict.items()
-            if k in Participant.__annotations__
-        }
-        return Participant(**valid_fields)
+        # Лишние колонки строки отбрасываются в from_row; снимок для update
+        participant = Participant.from_row(participant_dict)
+        participant.mark_clean()
+        return participant
 
     def get_by_name(self, full_name_ru: str) -> Optional[Participant]:
         logger.info(f"Getting participant by name from SQLite: {full_name_ru}")
@@ -251,12 +375,9 @@ class SqliteParticipantRepository(BaseParticipantRepository):
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on get_by_name: {e}") from e
         if participant_dict:
-            valid_fields = {
-                k: v
-                for k, v in participant_dict.items()
-                if k in Participant.__annotations__
-            }
-            return Participant(**valid_fields)
+            participant = Participant.from_row(participant_dict)
+            participant.mark_clean()
+            return participant
         return None
 
     def get_all(self) -> List[Participant]:
@@ -265,12 +386,39 @@ class SqliteParticipantRepository(BaseParticipantRepository):
             participants_list_of_dicts = get_all_participants()
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on get_all: {e}") from e
-        return [
-            Participant(
-                **{k: v for k, v in p.items() if k in Participant.__annotations__}
-            )
-            for p in participants_list_of_dicts
-        ]
+        return [Participant.from_row(p) for p in participants_list_of_dicts]
+
+    def search(self, query: str, limit: int = 50) -> Optional[List[Participant]]:
+        """Кандидаты из полнотекстового индекса participants_fts (триграммы, bm25)."""
+        try:
+            rows = search_participants(query, limit)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on search: {e}") from e
+        if rows is None:
+            return None
+        return [Participant.from_row(row) for row in rows]
+
+    def find_duplicates(
+        self, full_name_ru: str, contact: Optional[str] = None
+    ) -> Optional[List[Participant]]:
+        """Дубли по индексам NameKey, PhoneKey и EmailKey."""
+        try:
+            rows = []
+            by_name = find_participant_by_name(full_name_ru)
+            if by_name:
+                rows.append(by_name)
+            if contact:
+                rows.extend(
+                    row
+                    for row in find_participants_by_contact(contact)
+                    if not by_name or row["id"] != by_name["id"]
+                )
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on find_duplicates: {e}") from e
+        duplicates = [Participant.from_row(row) for row in rows]
+        for participant in duplicates:
+            participant.mark_clean()
+        return duplicates
 
     def update(self, participant: Participant) -> bool:
         """
@@ -283,16 +431,32 @@ class SqliteParticipantRepository(BaseParticipantRepository):
             f"Updating participant in SQLite: {participant.FullNameRU} (ID: {participant.id})"
         )
 
-        # Конвертируем в Dict для database слоя
-        participant_data = asdict(participant)
-        participant_data.pop("id", None)  # Убираем ID из данных
-
+        # Пишем только изменённые колонки; без снимка (объект создан не из
+        # get_by_id) — все колонки, как раньше
+        dirty = participant.dirty_fields()
         try:
-            return update_participant(participant.id, participant_data)
+            if len(dirty) < len(DATA_FIELDS):
+                if dirty:
+                    participant.version = update_participant_field(
+                        participant.id,
+                        {name: getattr(participant, name) for name in dirty},
+                        expected_version=participant.version,
+                    )
+            else:
+                participant_data = participant.to_dict()
+                participant_data.pop("id", None)  # Убираем ID из данных
+                participant_data.pop("version", None)
+                participant.version = update_participant(
+                    participant.id, participant_data, expected_version=participant.version
+                )
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on update: {e}") from e
+        participant.mark_clean()
+        return True
 
-    def update_fields(self, participant_id: Union[int, str], **fields) -> bool:
+    def update_fields(
+        self, participant_id: Union[int, str], expected_version=None, **fields
+    ) -> bool:
         """
         ✅ НОВЫЙ МЕТОД: частичное обновление полей.
         """
@@ -302,21 +466,13 @@ class SqliteParticipantRepository(BaseParticipantRepository):
             f"Updating fields for participant {participant_id}: {list(fields.keys())}"
         )
 
-        # Получаем текущего участника
-        current = self.get_by_id(participant_id)
-        if current is None:
-            raise ParticipantNotFoundError(
-                f"Participant with id {participant_id} not found"
-            )
-
-        # Создаем обновленную копию
-        current_dict = asdict(current)
-        current_dict.update(fields)
-
-        # Создаем новый объект и обновляем
-        updated_participant = Participant(**current_dict)
+        if not fields:
+            return True
+        # UPDATE только переданных колонок, без чтения участника перед записью;
+        # отсутствие строки даёт ParticipantNotFoundError
         try:
-            return self.update(updated_participant)
+            update_participant_field(int(participant_id), fields, expected_version)
+            return True
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on update_fields: {e}") from e
 
@@ -337,14 +493,22 @@ class SqliteParticipantRepository(BaseParticipantRepository):
         """
         return self.get_by_id(participant_id) is not None
 
-    def update_payment(self, participant_id: Union[int, str], status: str, amount: int, date: str) -> bool:
+    def update_payment(
+        self,
+        participant_id: Union[int, str],
+        status: str,
+        amount: int,
+        date: str,
+        expected_version=None,
+    ) -> bool:
         """
         ✅ НОВЫЙ МЕТОД: обновление статуса оплаты.
         """
         participant_id = int(participant_id)
         logger.info(f"Updating payment for participant {participant_id}: {status}, {amount}₪")
         try:
-            return update_payment_status(participant_id, status, amount, date)
+            update_payment_status(participant_id, status, amount, date, expected_version)
+            return True
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on update_payment: {e}") from e
 
@@ -355,12 +519,7 @@ class SqliteParticipantRepository(BaseParticipantRepository):
         logger.info("Getting unpaid participants from SQLite")
         try:
             unpaid_dicts = get_unpaid_participants()
-            return [
-                Participant(
-                    **{k: v for k, v in p.items() if k in Participant.__annotations__}
-                )
-                for p in unpaid_dicts
-            ]
+            return [Participant.from_row(p) for p in unpaid_dicts]
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on get_unpaid_participants: {e}") from e
 
@@ -374,6 +533,48 @@ class SqliteParticipantRepository(BaseParticipantRepository):
         except sqlite3.Error as e:
             raise DatabaseError(f"SQLite error on get_payment_summary: {e}") from e
 
+    def verify_payment_summary(self) -> Dict:
+        logger.info("Verifying payment summary in SQLite")
+        try:
+            return verify_payment_summary()
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on verify_payment_summary: {e}") from e
+
+    def record_payment(
+        self,
+        participant_id: Union[int, str],
+        amount: int,
+        date: str,
+        event_fee: int = 0,
+        method: Optional[str] = None,
+        recorded_by: Optional[int] = None,
+    ) -> Dict:
+        participant_id = int(participant_id)
+        logger.info(f"Recording payment for participant {participant_id}: {amount}₪")
+        try:
+            return record_payment(participant_id, amount, date, event_fee, method, recorded_by)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on record_payment: {e}") from e
+
+    def record_payments(self, payments: List[Dict], event_fee: int = 0) -> Dict:
+        logger.info(f"Recording {len(payments)} payments in SQLite")
+        try:
+            return record_payments(payments, event_fee)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on record_payments: {e}") from e
+
+    def get_balance(self, participant_id: Union[int, str]) -> Optional[Dict]:
+        try:
+            return get_participant_balance(int(participant_id))
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on get_balance: {e}") from e
+
+    def get_cash_flow(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        try:
+            return get_cash_flow(start, end)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"SQLite error on get_cash_flow: {e}") from e
+
     # ✅ АЛИАСЫ ДЛЯ ОБРАТНОЙ СОВМЕСТИМОСТИ С ТЕСТАМИ
     
     def add_participant(self, participant: Participant) -> int:
@@ -387,19 +588,7 @@ class SqliteParticipantRepository(BaseParticipantRepository):
     def update_participant(self, participant_id: Union[int, str], data: Dict) -> bool:
         """
         Алиас для обратной совместимости с тестами.
-        Принимает participant_id и Dict, преобразует в Participant для update.
-        """
-        from utils.exceptions import ParticipantNotFoundError
-        
-        # Получаем текущего участника
-        current = self.get_by_id(participant_id)
-        if current is None:
-            raise ParticipantNotFoundError(f"Participant with id {participant_id} not found")
-        
-        # Создаем обновленные данные, объединив текущие с новыми
-        updated_dict = asdict(current)
-        updated_dict.update({k: v for k, v in data.items() if k in Participant.__annotations__})
-        
-        # Создаем новый объект Participant и обновляем
-        updated_participant = Participant(**updated_dict)
-        return self.update(updated_participant)
+        Принимает participant_id и Dict; пишет только переданные поля.
+        """
+        fields = {k: v for k, v in data.items() if k in DATA_FIELDS}
+        return self.update_fields(participant_id, data.get("version"), **fields)
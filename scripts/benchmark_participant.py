@@ -0,0 +1,132 @@
+"""Benchmark Participant memory footprint and conversion throughput.
+
+Compares the previous model (plain ``@dataclass`` with ``__dict__``,
+``dataclasses.asdict`` and filtering rows through ``__annotations__``)
+with the slotted model and its ``from_row`` / ``from_airtable`` /
+``to_dict`` paths. Memory is measured with tracemalloc over a list of
+instances; throughput is conversions per second.
+
+    python scripts/benchmark_participant.py --count 10000 --rounds 3
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.participant import Participant  # noqa: E402
+
+
+@dataclass
+class LegacyParticipant:
+    FullNameRU: str
+    Gender: str = "F"
+    Size: str = ""
+    Church: str = ""
+    Role: str = ""
+    Department: str = ""
+    FullNameEN: str = ""
+    SubmittedBy: str = ""
+    ContactInformation: str = ""
+    CountryAndCity: str = ""
+    PaymentStatus: str = "Unpaid"
+    PaymentAmount: int = 0
+    PaymentDate: str = ""
+    id: Optional[Union[int, str]] = field(default=None, compare=False)
+
+
+def _legacy_from_airtable(record) -> LegacyParticipant:
+    fields = record.get("fields", {})
+    return LegacyParticipant(
+        id=record["id"],
+        FullNameRU=fields.get("FullNameRU", ""),
+        FullNameEN=fields.get("FullNameEN", ""),
+        Gender=fields.get("Gender", "F"),
+        Size=fields.get("Size", ""),
+        Church=fields.get("Church", ""),
+        Role=fields.get("Role", ""),
+        Department=fields.get("Department", ""),
+        CountryAndCity=fields.get("CountryAndCity", ""),
+        SubmittedBy=fields.get("SubmittedBy", ""),
+        ContactInformation=fields.get("ContactInformation", ""),
+        PaymentStatus=fields.get("PaymentStatus", "Unpaid"),
+        PaymentAmount=fields.get("PaymentAmount", 0),
+        PaymentDate=fields.get("PaymentDate", ""),
+    )
+
+
+def _rows(count: int):
+    return [
+        {
+            "id": i,
+            "FullNameRU": f"Участник {i}",
+            "Gender": "M" if i % 2 else "F",
+            "Size": "L",
+            "Church": "Церковь",
+            "Role": "CANDIDATE",
+            "FullNameEN": f"Participant {i}",
+            "ContactInformation": f"+97250{i:07d}",
+            "PaymentAmount": i % 3 * 500,
+            "created_at": "2025-01-01 00:00:00",  # колонка не из модели
+        }
+        for i in range(count)
+    ]
+
+
+def _rate(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def _bytes_per_instance(factory, rows) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [factory(row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # строки значений общие с rows, поэтому считается сам объект (+ __dict__)
+    return (after - before) / len(instances)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = _rows(args.count)
+    records = [{"id": f"rec{r['id']}", "fields": r} for r in rows]
+    legacy_names = LegacyParticipant.__annotations__
+
+    def legacy_from_row(row):
+        return LegacyParticipant(**{k: v for k, v in row.items() if k in legacy_names})
+
+    legacy = [legacy_from_row(row) for row in rows]
+    slotted = [Participant.from_row(row) for row in rows]
+
+    print(
+        f"memory: legacy {_bytes_per_instance(legacy_from_row, rows):.0f} B/instance | "
+        f"slotted {_bytes_per_instance(Participant.from_row, rows):.0f} B/instance"
+    )
+    for r in range(1, args.rounds + 1):
+        print(
+            f"round {r}: "
+            f"from_row {_rate(legacy_from_row, rows) / 1e3:.0f}k -> {_rate(Participant.from_row, rows) / 1e3:.0f}k/s | "
+            f"from_airtable {_rate(_legacy_from_airtable, records) / 1e3:.0f}k -> "
+            f"{_rate(Participant.from_airtable, records) / 1e3:.0f}k/s | "
+            f"to_dict {_rate(asdict, legacy) / 1e3:.0f}k -> {_rate(Participant.to_dict, slotted) / 1e3:.0f}k/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
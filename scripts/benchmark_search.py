@@ -0,0 +1,87 @@
+"""Benchmark participant search: full scan in Python vs the FTS5 index.
+
+For each table size the same queries run through ``ParticipantService``
+twice:
+
+* ``scan`` — the previous path: every participant from the (warm) cache is
+  scored in Python;
+* ``fts`` — ``repository.search`` takes the top candidates from
+  ``participants_fts`` (trigram, bm25) and only those are rescored.
+
+Both paths must return results with the same confidences (ties may come
+in a different order); a difference is marked ``(!)``. Reported numbers are
+milliseconds per search.
+
+    python scripts/benchmark_search.py --sizes 1000,10000,100000 --rounds 20
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories.participant_repository import SqliteParticipantRepository  # noqa: E402
+from scripts.query_plan import CHURCHES, build_database, person  # noqa: E402
+from services.participant_service import ParticipantService  # noqa: E402
+
+QUERIES = (
+    ("exact", person(777)[0]),
+    ("typo", person(4242)[0].replace("е", "и", 1)),
+    ("english", person(4242)[1]),
+    ("surname", person(777)[0].split()[1][:6]),
+    ("church", CHURCHES[1]),
+)
+
+
+class ScanRepository(SqliteParticipantRepository):
+    """Репозиторий без поиска в хранилище: сервис сканирует весь список."""
+
+    def search(self, query, limit=50):
+        return None
+
+
+def _best(results):
+    # при равной уверенности порядок у путей разный: сравниваем уверенность
+    return [round(result.confidence, 3) for result in results]
+
+
+def _ms_per_search(service: ParticipantService, query: str, rounds: int):
+    best = service.search_participants(query)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        service.search_participants(query)
+    return (time.perf_counter() - start) / rounds * 1000, best
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in (int(value) for value in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            build_database(os.path.join(tmp, "participants.db"), size)
+            scan = ParticipantService(ScanRepository(), cache_ttl=0)
+            scan._get_cached_participants()  # прогрев кеша, как у работающего бота
+            fts = ParticipantService(SqliteParticipantRepository(), cache_ttl=0)
+            cells = []
+            for label, query in QUERIES:
+                scan_ms, scan_best = _ms_per_search(scan, query, args.rounds)
+                fts_ms, fts_best = _ms_per_search(fts, query, args.rounds)
+                same = _best(scan_best) == _best(fts_best)
+                cells.append(f"{label} {scan_ms:.2f} -> {fts_ms:.2f}{'' if same else ' (!)'}")
+            print(f"{size:>7} participants: " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    import logging
+
+    logging.disable(logging.INFO)
+    main()
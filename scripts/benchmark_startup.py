@@ -0,0 +1,97 @@
+"""Benchmark database startup: per-start DDL vs user_version migrations.
+
+Builds a temporary database with ``--participants`` rows (each with a
+ledger payment) and times, per start (open connection, init, close):
+
+* ``legacy`` — the previous ``init_database``: every CREATE ... IF NOT
+  EXISTS, the ``PRAGMA table_info`` column checks and the summary/ledger
+  existence checks on every start;
+* ``current`` — ``init_database`` on an up-to-date schema: one
+  ``PRAGMA user_version`` read;
+* ``upgrade`` — the first start after this change on a pre-migration
+  database (``user_version = 0``): migrations 1..N run once, idempotently.
+
+    python scripts/benchmark_startup.py --participants 50000 --rounds 3
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+def _populate(count: int) -> None:
+    with patch("builtins.print"):
+        database.init_database()
+    with database.DatabaseConnection() as conn:
+        conn.executemany(
+            "INSERT INTO participants (FullNameRU, Gender, Size, Church, Role, PaymentStatus, PaymentAmount)"
+            " VALUES (?, ?, 'L', 'Церковь', 'CANDIDATE', ?, ?)",
+            (
+                (f"Участник {i}", "M" if i % 2 else "F", "Paid" if i % 3 else "Unpaid", 500 if i % 3 else 0)
+                for i in range(count)
+            ),
+        )
+        conn.execute(
+            "INSERT INTO payments (participant_id, amount, PaymentDate, method)"
+            " SELECT id, PaymentAmount, '2025-01-01', 'cash' FROM participants WHERE PaymentAmount > 0"
+        )
+
+
+def _legacy_init() -> None:
+    with database.DatabaseConnection() as conn:
+        cursor = conn.cursor()
+        for migration in database.MIGRATIONS:
+            migration.apply(cursor)
+
+
+def _current_init() -> None:
+    with patch("builtins.print"):
+        database.init_database()
+
+
+def _time(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _upgrade_ms() -> float:
+    with sqlite3.connect(database.DB_PATH) as conn:
+        conn.execute("PRAGMA user_version = 0")
+    return _time(_current_init, 1)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--participants", type=int, default=50_000)
+    parser.add_argument("--starts", type=int, default=50, help="starts per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "participants.db")
+        _populate(args.participants)
+        size_mb = os.path.getsize(database.DB_PATH) / 1e6
+        print(f"{args.participants} participants, {size_mb:.1f} MB")
+        for r in range(1, args.rounds + 1):
+            print(
+                f"round {r}: legacy {_time(_legacy_init, args.starts):.2f} ms/start | "
+                f"current {_time(_current_init, args.starts):.2f} ms/start | "
+                f"upgrade (once) {_upgrade_ms():.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark UserActionLogger throughput per 10k events.
+
+Compares the previous synchronous path (json.dumps + file write in the
+calling thread) with the queued logger, where the caller only builds the
+event and serialisation happens on the writer thread.
+
+    python scripts/benchmark_user_logger.py --events 10000 --rounds 5
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _event(i: int):
+    return (
+        i % 50,
+        "CONFIRMING_DATA",
+        "CONFIRMING_DATA",
+        {"input": "Иван Иванов M L церковь", "duration": 0.0123, "handler": "handle_message"},
+    )
+
+
+def bench_sync(path: str, events: int) -> float:
+    logger = logging.getLogger("bench_sync")
+    logger.propagate = False
+    handler = RotatingFileHandler(path, maxBytes=50 * 1024 * 1024)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    start = time.perf_counter()
+    for i in range(events):
+        user_id, from_state, to_state, context = _event(i)
+        data = {
+            "event": "state_transition",
+            "user_id": user_id,
+            "from_state": from_state,
+            "to_state": to_state,
+            "context": context,
+        }
+        logger.log(logging.INFO + 7, json.dumps(data, ensure_ascii=False))
+    elapsed = time.perf_counter() - start
+    logger.removeHandler(handler)
+    handler.close()
+    return elapsed
+
+
+def bench_queued(events: int, sample_rate: float) -> tuple[float, float]:
+    from utils import user_logger as module
+
+    user_logger = module.UserActionLogger(
+        sample_rates={"state_transition": sample_rate}
+    )
+    start = time.perf_counter()
+    for i in range(events):
+        user_logger.log_state_transition(*_event(i))
+    caller = time.perf_counter() - start
+    # ждём, пока поток записи опустошит очередь
+    handler = user_logger.logger.handlers[0]
+    while not handler.queue.empty():
+        time.sleep(0.001)
+    total = time.perf_counter() - start
+    return caller, total
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="user_logger_bench_")
+    os.chdir(workdir)
+    from utils import user_logger as module
+
+    scale = 10_000 / args.events
+    print(f"orjson: {'yes' if module.ORJSON_AVAILABLE else 'no'}; logs in {workdir}")
+    for r in range(1, args.rounds + 1):
+        sync = bench_sync(os.path.join(workdir, "sync.log"), args.events)
+        caller, total = bench_queued(args.events, args.sample_rate)
+        print(
+            f"round {r}: sync {sync * scale * 1000:.1f} ms/10k | "
+            f"queued caller {caller * scale * 1000:.1f} ms/10k, "
+            f"end-to-end {total * scale * 1000:.1f} ms/10k"
+        )
+    print("counters:", module.UserActionLogger.stats())
+
+
+if __name__ == "__main__":
+    main()
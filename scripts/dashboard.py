@@ -0,0 +1,582 @@
+"""Static latency/SLO dashboard generated from the bot logs.
+
+``LoopMonitor`` writes a ``handler_timing`` event to ``user_actions.log``
+for every handler call. This script keeps an incremental index in
+``logs/dashboard.db``: per rotated/live file it remembers how far it has
+read (keyed by inode, so rotation does not cause re-reading) and folds new
+events into latency histograms per hour, command and user. Regenerating the
+HTML therefore only parses lines written since the previous run, and the
+aggregates outlive log rotation.
+
+The HTML page contains per-command percentile charts over time with error
+rate overlays, per-coordinator and hour-of-day tables and SLO burn rates
+against ``config.SLO_LATENCY_TARGETS`` / ``config.SLO_OBJECTIVE``.
+
+    python3 scripts/dashboard.py --days 7 --output logs/dashboard.html
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import os
+import sqlite3
+import sys
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+DEFAULT_LOG_DIR = "logs"
+DEFAULT_DB = os.path.join("logs", "dashboard.db")
+DEFAULT_OUTPUT = os.path.join("logs", "dashboard.html")
+SOURCE = "user_actions"
+
+# Верхние границы корзин гистограммы, мс; последняя корзина — всё, что выше
+BUCKETS_MS: Tuple[int, ...] = (
+    10, 25, 50, 100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000, 30000
+)
+HIST_SIZE = len(BUCKETS_MS) + 1
+
+HANDLER_COMMANDS: Dict[str, str] = {
+    # /add и редактирование карточки
+    "add_command": "/add",
+    "handle_add_callback": "/add",
+    "handle_partial_data": "/add",
+    "handle_missing_field_input": "/add",
+    "handle_enum_selection": "/add",
+    "handle_participant_confirmation": "/add",
+    "handle_save_confirmation": "/add",
+    "handle_duplicate_callback": "/add",
+    "handle_edit_participant_callback": "/add",
+    "edit_field_callback": "/add",
+    "handle_field_edit_cancel": "/add",
+    "handle_continue_editing_callback": "/add",
+    "handle_recover_confirmation": "/add",
+    "handle_recover_input": "/add",
+    "handle_message": "/add",
+    # /search
+    "search_command": "/search",
+    "handle_search_callback": "/search",
+    "handle_search_input": "/search",
+    "handle_participant_selection": "/search",
+    "handle_action_selection": "/search",
+    # /payment
+    "payment_command": "/payment",
+    "handle_payment_amount_input": "/payment",
+    "handle_payment_confirmation": "/payment",
+    # прочие команды
+    "list_command": "/list",
+    "export_command": "/export",
+    "start_command": "/start",
+    "help_command": "/help",
+    "edit_command": "/edit",
+    "edit_field_command": "/edit",
+    "delete_command": "/delete",
+    "cancel_command": "/cancel",
+    "cancel_callback": "/cancel",
+    "handle_main_menu_callback": "menu",
+    "handle_session_recovery_callback": "menu",
+}
+PRIMARY_COMMANDS = ("/add", "/search", "/payment", "/list")
+IGNORED_HANDLERS = frozenset({"log_all_updates", "debug_callback_middleware"})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_offsets (
+    inode INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latency_buckets (
+    hour TEXT NOT NULL,
+    command TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    PRIMARY KEY (hour, command, user_id, bucket)
+) WITHOUT ROWID;
+"""
+
+
+# ---------------------------------------------------------------------------
+# Histogram helpers
+# ---------------------------------------------------------------------------
+
+
+def bucket_index(seconds: float) -> int:
+    return bisect_left(BUCKETS_MS, seconds * 1000)
+
+
+def _bucket_bounds(i: int) -> Tuple[float, float]:
+    lower = BUCKETS_MS[i - 1] if i > 0 else 0
+    upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else BUCKETS_MS[-1] * 2
+    return lower / 1000, upper / 1000
+
+
+def percentile(hist: Sequence[int], q: float) -> Optional[float]:
+    """Approximate percentile (seconds) by interpolating inside the bucket."""
+    total = sum(hist)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(hist):
+        if count and seen + count >= rank:
+            lower, upper = _bucket_bounds(i)
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return _bucket_bounds(HIST_SIZE - 1)[1]
+
+
+def _over_share(i: int, target: float) -> float:
+    """Share of bucket ``i`` that lies above ``target`` seconds."""
+    lower, upper = _bucket_bounds(i)
+    if lower >= target:
+        return 1.0
+    if upper > target:
+        return (upper - target) / (upper - lower)
+    return 0.0
+
+
+def fraction_over(hist: Sequence[int], target: float) -> float:
+    """Approximate share of calls slower than ``target`` seconds."""
+    total = sum(hist)
+    if not total:
+        return 0.0
+    return sum(count * _over_share(i, target) for i, count in enumerate(hist)) / total
+
+
+class _Agg:
+    __slots__ = ("hist", "error_hist")
+
+    def __init__(self) -> None:
+        self.hist = [0] * HIST_SIZE
+        self.error_hist = [0] * HIST_SIZE
+
+    def add(self, bucket: int, count: int, errors: int) -> None:
+        self.hist[bucket] += count
+        self.error_hist[bucket] += errors
+
+    @property
+    def errors(self) -> int:
+        return sum(self.error_hist)
+
+    @property
+    def count(self) -> int:
+        return sum(self.hist)
+
+    @property
+    def error_rate(self) -> float:
+        count = self.count
+        return self.errors / count if count else 0.0
+
+
+# ---------------------------------------------------------------------------
+# Incremental index
+# ---------------------------------------------------------------------------
+
+
+class LatencyIndex:
+    """SQLite store of latency histograms with per-file ingest offsets."""
+
+    def __init__(self, path: str = DEFAULT_DB) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def ingest(self, log_dir: str = DEFAULT_LOG_DIR, source: str = SOURCE) -> int:
+        """Read new lines from rotated and live logs, oldest first."""
+        directory = Path(log_dir)
+        rotated = sorted(
+            directory.glob(f"{source}.log.[0-9]*"),
+            key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0,
+            reverse=True,
+        )
+        files = [p for p in rotated if p.suffix[1:].isdigit()]
+        live = directory / f"{source}.log"
+        if live.exists():
+            files.append(live)
+        return sum(self._ingest_file(path) for path in files)
+
+    def _ingest_file(self, path: Path) -> int:
+        stat = path.stat()
+        row = self.conn.execute(
+            "SELECT offset FROM ingest_offsets WHERE inode = ?", (stat.st_ino,)
+        ).fetchone()
+        offset = row[0] if row else 0
+        if offset > stat.st_size:  # inode переиспользован новым файлом
+            offset = 0
+        if offset == stat.st_size:
+            return 0
+
+        with path.open("rb") as f:
+            f.seek(offset)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # незаконченную строку дочитаем позже
+        counts: Dict[Tuple[str, str, int, int], List[int]] = defaultdict(lambda: [0, 0])
+        events = 0
+        for line in data[:complete].splitlines():
+            event = _parse_timing(line)
+            if event is None:
+                continue
+            hour, command, user_id, duration, error = event
+            key = (hour, command, user_id, bucket_index(duration))
+            counts[key][0] += 1
+            counts[key][1] += 1 if error else 0
+            events += 1
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO latency_buckets (hour, command, user_id, bucket, count, errors)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (hour, command, user_id, bucket) DO UPDATE SET
+                    count = count + excluded.count,
+                    errors = errors + excluded.errors
+                """,
+                [(*key, c, e) for key, (c, e) in counts.items()],
+            )
+            self.conn.execute(
+                """
+                INSERT INTO ingest_offsets (inode, path, offset, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (inode) DO UPDATE SET
+                    path = excluded.path, offset = excluded.offset,
+                    updated_at = excluded.updated_at
+                """,
+                (stat.st_ino, str(path), offset + complete, datetime.utcnow().isoformat()),
+            )
+        return events
+
+    def rows(self, since_hour: str) -> Iterable[Tuple[str, str, int, int, int, int]]:
+        return self.conn.execute(
+            """
+            SELECT hour, command, user_id, bucket, count, errors
+            FROM latency_buckets WHERE hour >= ?
+            """,
+            (since_hour,),
+        )
+
+
+def _parse_timing(line: bytes) -> Optional[Tuple[str, str, int, float, Optional[str]]]:
+    if b'handler_timing' not in line:
+        return None
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    if entry.get("event") != "handler_timing":
+        return None
+    handler = entry.get("handler") or "unknown"
+    timestamp = entry.get("timestamp")
+    if handler in IGNORED_HANDLERS or not timestamp:
+        return None
+    return (
+        timestamp[:13],
+        HANDLER_COMMANDS.get(handler, handler),
+        entry.get("user_id") or 0,
+        float(entry.get("duration") or 0.0),
+        entry.get("error"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Report model
+# ---------------------------------------------------------------------------
+
+
+def _hour_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H")
+
+
+def build_report(index: LatencyIndex, days: int = 7, now: Optional[datetime] = None) -> Dict:
+    now = now or datetime.utcnow()
+    hours = [_hour_key(now - timedelta(hours=h)) for h in range(days * 24 - 1, -1, -1)]
+    last_hour, last_day = hours[-1], _hour_key(now - timedelta(hours=23))
+
+    by_command: Dict[str, _Agg] = defaultdict(_Agg)
+    by_command_hour: Dict[str, Dict[str, _Agg]] = defaultdict(lambda: defaultdict(_Agg))
+    by_user: Dict[int, _Agg] = defaultdict(_Agg)
+    by_hour_of_day: Dict[int, _Agg] = defaultdict(_Agg)
+    windows: Dict[str, Dict[str, _Agg]] = {"1h": defaultdict(_Agg), "24h": defaultdict(_Agg)}
+
+    for hour, command, user_id, bucket, count, errors in index.rows(hours[0]):
+        by_command[command].add(bucket, count, errors)
+        by_command_hour[command][hour].add(bucket, count, errors)
+        by_user[user_id].add(bucket, count, errors)
+        by_hour_of_day[int(hour[11:13])].add(bucket, count, errors)
+        if hour >= last_day:
+            windows["24h"][command].add(bucket, count, errors)
+        if hour == last_hour:
+            windows["1h"][command].add(bucket, count, errors)
+    windows[f"{days}d"] = by_command
+
+    return {
+        "generated_at": now,
+        "days": days,
+        "hours": hours,
+        "by_command": by_command,
+        "by_command_hour": by_command_hour,
+        "by_user": by_user,
+        "by_hour_of_day": by_hour_of_day,
+        "windows": windows,
+    }
+
+
+def slo_target(command: str) -> float:
+    return config.SLO_LATENCY_TARGETS.get(command, config.SLO_DEFAULT_LATENCY_TARGET)
+
+
+def burn_rate(agg: _Agg, target: float, objective: float) -> Optional[float]:
+    """Share of bad calls (slow or failed) relative to the error budget."""
+    count = agg.count
+    if not count:
+        return None
+    # медленный вызов плохой в любом случае; ошибка — если он не был медленным
+    bad = sum(
+        (agg.hist[i] - agg.error_hist[i]) * _over_share(i, target) + agg.error_hist[i]
+        for i in range(HIST_SIZE)
+    ) / count
+    budget = 1.0 - objective
+    return bad / budget if budget > 0 else None
+
+
+# ---------------------------------------------------------------------------
+# HTML rendering
+# ---------------------------------------------------------------------------
+
+_STYLE = """
+body { font-family: -apple-system, Segoe UI, sans-serif; margin: 24px; color: #222; }
+table { border-collapse: collapse; margin-bottom: 24px; }
+th, td { border: 1px solid #ddd; padding: 4px 10px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+.ok { background: #e7f6e7; } .warn { background: #fff4d6; } .bad { background: #fde2e1; }
+.charts { display: flex; flex-wrap: wrap; gap: 16px; }
+.chart { border: 1px solid #eee; padding: 8px; }
+small { color: #777; }
+"""
+
+
+def _fmt_s(value: Optional[float]) -> str:
+    return "—" if value is None else f"{value * 1000:.0f} ms"
+
+
+def _fmt_pct(value: float) -> str:
+    return f"{value * 100:.1f}%"
+
+
+def _burn_cell(value: Optional[float]) -> str:
+    if value is None:
+        return "<td>—</td>"
+    css = "ok" if value < 1 else "warn" if value < 2 else "bad"
+    return f'<td class="{css}">{value:.2f}×</td>'
+
+
+def svg_chart(
+    title: str,
+    labels: Sequence[str],
+    series: Dict[str, Sequence[Optional[float]]],
+    error_rates: Sequence[float],
+    target: Optional[float] = None,
+    width: int = 560,
+    height: int = 220,
+) -> str:
+    """Line chart of latency series (seconds) with error-rate bars underneath."""
+    pad_l, pad_r, pad_t, pad_b = 48, 40, 24, 28
+    plot_w, plot_h = width - pad_l - pad_r, height - pad_t - pad_b
+    values = [v for s in series.values() for v in s if v is not None]
+    y_max = max(values + ([target] if target else []) + [0.001]) * 1.1
+    n = max(len(labels), 1)
+
+    def x(i: int) -> float:
+        return pad_l + plot_w * (i + 0.5) / n
+
+    def y(v: float) -> float:
+        return pad_t + plot_h * (1 - v / y_max)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">',
+        f'<text x="{pad_l}" y="16" font-size="13" font-weight="bold">{html.escape(title)}</text>',
+        f'<line x1="{pad_l}" y1="{pad_t + plot_h}" x2="{pad_l + plot_w}" '
+        f'y2="{pad_t + plot_h}" stroke="#999"/>',
+        f'<text x="4" y="{pad_t + 10}" font-size="10">{y_max * 1000:.0f} ms</text>',
+    ]
+    # ошибки — полупрозрачные столбцы, шкала справа (0..100%)
+    bar_w = max(plot_w / n - 1, 1)
+    for i, rate in enumerate(error_rates):
+        if rate > 0:
+            bar_h = plot_h * rate
+            parts.append(
+                f'<rect x="{x(i) - bar_w / 2:.1f}" y="{pad_t + plot_h - bar_h:.1f}" '
+                f'width="{bar_w:.1f}" height="{bar_h:.1f}" fill="#e5484d" opacity="0.25">'
+                f"<title>{html.escape(labels[i])}: errors {_fmt_pct(rate)}</title></rect>"
+            )
+    if target:
+        parts.append(
+            f'<line x1="{pad_l}" y1="{y(target):.1f}" x2="{pad_l + plot_w}" y2="{y(target):.1f}" '
+            f'stroke="#e5484d" stroke-dasharray="4 3"/>'
+            f'<text x="{pad_l + plot_w + 2}" y="{y(target) + 3:.1f}" font-size="10" '
+            f'fill="#e5484d">SLO</text>'
+        )
+    colors = ["#3b82f6", "#f59e0b", "#8b5cf6"]
+    for (name, points), color in zip(series.items(), colors):
+        path = []
+        for i, v in enumerate(points):
+            if v is None:
+                continue
+            path.append(f"{'M' if not path else 'L'}{x(i):.1f},{y(v):.1f}")
+        if path:
+            parts.append(f'<path d="{" ".join(path)}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+    legend_x = pad_l
+    for (name, _), color in zip(series.items(), colors):
+        parts.append(
+            f'<text x="{legend_x}" y="{height - 8}" font-size="10" fill="{color}">■ {html.escape(name)}</text>'
+        )
+        legend_x += 60
+    parts.append(
+        f'<text x="{legend_x}" y="{height - 8}" font-size="10" fill="#e5484d">■ errors %</text>'
+    )
+    if labels:
+        parts.append(
+            f'<text x="{pad_l + plot_w}" y="{height - 8}" font-size="10" text-anchor="end">'
+            f"{html.escape(labels[0])} … {html.escape(labels[-1])}</text>"
+        )
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def render_html(report: Dict) -> str:
+    objective = config.SLO_OBJECTIVE
+    days = report["days"]
+    window_names = ["1h", "24h", f"{days}d"]
+    commands = sorted(
+        report["by_command"],
+        key=lambda c: (c not in PRIMARY_COMMANDS, -report["by_command"][c].count),
+    )
+
+    out = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        "<title>Bot latency SLO dashboard</title>",
+        f"<style>{_STYLE}</style></head><body>",
+        "<h1>Latency & SLO dashboard</h1>",
+        f"<p><small>Generated {report['generated_at']:%Y-%m-%d %H:%M} UTC · window {days}d · "
+        f"objective {_fmt_pct(objective)} of calls faster than target and without error</small></p>",
+        "<h2>SLO burn by command</h2>",
+        "<table><tr><th>Command</th><th>Target</th><th>Calls</th><th>p50</th><th>p95</th>"
+        "<th>p99</th><th>Errors</th>"
+        + "".join(f"<th>Burn {w}</th>" for w in window_names)
+        + "</tr>",
+    ]
+    for command in commands:
+        agg = report["by_command"][command]
+        target = slo_target(command)
+        out.append(
+            f"<tr><td>{html.escape(command)}</td><td>{_fmt_s(target)}</td><td>{agg.count}</td>"
+            f"<td>{_fmt_s(percentile(agg.hist, 0.5))}</td>"
+            f"<td>{_fmt_s(percentile(agg.hist, 0.95))}</td>"
+            f"<td>{_fmt_s(percentile(agg.hist, 0.99))}</td>"
+            f"<td>{_fmt_pct(agg.error_rate)}</td>"
+            + "".join(
+                _burn_cell(burn_rate(report["windows"][w].get(command, _Agg()), target, objective))
+                for w in window_names
+            )
+            + "</tr>"
+        )
+    out.append("</table>")
+
+    out.append("<h2>Latency per command (hourly)</h2><div class='charts'>")
+    hours = report["hours"]
+    for command in commands:
+        if command not in PRIMARY_COMMANDS and report["by_command"][command].count < 10:
+            continue
+        per_hour = report["by_command_hour"][command]
+        aggs = [per_hour.get(h) for h in hours]
+        out.append("<div class='chart'>")
+        out.append(
+            svg_chart(
+                command,
+                [h.replace("T", " ") + "h" for h in hours],
+                {
+                    "p50": [percentile(a.hist, 0.5) if a else None for a in aggs],
+                    "p95": [percentile(a.hist, 0.95) if a else None for a in aggs],
+                },
+                [a.error_rate if a else 0.0 for a in aggs],
+                target=slo_target(command),
+            )
+        )
+        out.append("</div>")
+    out.append("</div>")
+
+    out.append("<h2>By hour of day (UTC)</h2><div class='chart'>")
+    hod = [report["by_hour_of_day"].get(h) for h in range(24)]
+    out.append(
+        svg_chart(
+            "All commands",
+            [f"{h:02d}h" for h in range(24)],
+            {
+                "p50": [percentile(a.hist, 0.5) if a else None for a in hod],
+                "p95": [percentile(a.hist, 0.95) if a else None for a in hod],
+            },
+            [a.error_rate if a else 0.0 for a in hod],
+        )
+    )
+    out.append("</div>")
+
+    out.append(
+        "<h2>By coordinator</h2><table><tr><th>User</th><th>Calls</th><th>p50</th>"
+        "<th>p95</th><th>p99</th><th>Errors</th></tr>"
+    )
+    for user_id, agg in sorted(report["by_user"].items(), key=lambda kv: -kv[1].count):
+        out.append(
+            f"<tr><td>{user_id or 'unknown'}</td><td>{agg.count}</td>"
+            f"<td>{_fmt_s(percentile(agg.hist, 0.5))}</td>"
+            f"<td>{_fmt_s(percentile(agg.hist, 0.95))}</td>"
+            f"<td>{_fmt_s(percentile(agg.hist, 0.99))}</td>"
+            f"<td>{_fmt_pct(agg.error_rate)}</td></tr>"
+        )
+    out.append("</table></body></html>")
+    return "\n".join(out)
+
+
+def generate(
+    log_dir: str = DEFAULT_LOG_DIR,
+    db_path: str = DEFAULT_DB,
+    output: str = DEFAULT_OUTPUT,
+    days: int = 7,
+) -> Tuple[int, str]:
+    index = LatencyIndex(db_path)
+    try:
+        ingested = index.ingest(log_dir)
+        report = build_report(index, days)
+    finally:
+        index.close()
+    Path(output).write_text(render_html(report), encoding="utf-8")
+    return ingested, output
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate latency SLO dashboard")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR)
+    parser.add_argument("--db", default=DEFAULT_DB, help="Incremental index (SQLite)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    ingested, path = generate(args.log_dir, args.db, args.output, args.days)
+    print(f"✅ {path}: {ingested} new events, {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,403 @@
+"""Offline load test: polling vs webhook throughput and latency.
+
+The bot is built with ``main.build_application`` but its network layer is
+replaced by ``OfflineRequest``, an in-memory fake of the Bot API: outgoing
+calls (sendMessage, editMessageText, ...) are answered immediately and
+``getUpdates`` is served from a local queue. In webhook mode synthetic
+updates are POSTed to a local ``BotHTTPServer`` instead, so both modes go
+through the same handlers, database and JSON parsing.
+
+Each virtual coordinator sends a short scenario (/start, /search, a name,
+/cancel, /list) and waits until the previous update is fully processed
+before sending the next one. Latency is measured from injection to the end
+of processing; throughput is processed updates per second of wall time.
+
+``--api-latency`` adds a simulated Bot API round trip to every outgoing
+call, and ``--concurrency`` runs the same load for several
+``CONCURRENT_UPDATES`` values (1 = sequential processing):
+
+    python scripts/load_test.py --mode both --users 20 --rounds 5
+    python scripts/load_test.py --mode polling --api-latency 50 --concurrency 1,8,32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import BaseUpdateProcessor  # noqa: E402
+from telegram.request import BaseRequest, RequestData  # noqa: E402
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "load_test_bot"}
+FIRST_USER_ID = 900_000_000
+SCENARIO = ["/start", "/search", "{name}", "/cancel", "/list"]
+NAMES = ["Иван Петров", "Мария Сидорова", "Анна Иванова", "Пётр Смирнов", "Ольга Кузнецова"]
+
+
+class FakeTelegram:
+    """In-memory Bot API: queue for getUpdates and canned replies for the rest."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.updates: Optional[asyncio.Queue] = None
+        self.calls: Counter = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._message_ids = itertools.count(1000)
+
+    def _queue(self) -> asyncio.Queue:
+        if self.updates is None:
+            self.updates = asyncio.Queue()
+        return self.updates
+
+    def push(self, update: Dict[str, Any]) -> None:
+        self._queue().put_nowait(update)
+
+    async def call(self, method: str, params: Dict[str, Any]) -> Any:
+        self.calls[method] += 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if self.latency:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.latency)
+            finally:
+                self.in_flight -= 1
+        if method in ("sendMessage", "editMessageText", "sendDocument", "editMessageReplyMarkup"):
+            chat_id = params.get("chat_id") or FIRST_USER_ID
+            return {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        return True
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        queue = self._queue()
+        timeout = float(params.get("timeout") or 0) or 0.1
+        try:
+            first = await asyncio.wait_for(queue.get(), timeout=min(timeout, 1.0))
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        limit = int(params.get("limit") or 100)
+        while len(batch) < limit and not queue.empty():
+            batch.append(queue.get_nowait())
+        return batch
+
+
+class OfflineRequest(BaseRequest):
+    """``BaseRequest`` that answers from ``FakeTelegram`` without network I/O."""
+
+    def __init__(self, api: FakeTelegram) -> None:
+        self.api = api
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout: Any = None,
+        write_timeout: Any = None,
+        connect_timeout: Any = None,
+        pool_timeout: Any = None,
+    ):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        result = await self.api.call(api_method, params)
+        return 200, json.dumps({"ok": True, "result": result}, default=str).encode()
+
+
+class TimingUpdateProcessor(BaseUpdateProcessor):
+    """Wraps the bot's update processor and resolves a future per processed update.
+
+    ``inner=None`` means PTB's default sequential processing.
+    """
+
+    def __init__(self, inner: Optional[BaseUpdateProcessor] = None) -> None:
+        self.inner = inner
+        super().__init__(inner.max_concurrent_updates if inner is not None else 1)
+        self.pending: Dict[int, asyncio.Future] = {}
+
+    def expect(self, update_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = future
+        return future
+
+    async def process_update(self, update: object, coroutine) -> None:
+        try:
+            if self.inner is not None:
+                # per-user ordering and the concurrency limit live in the inner processor
+                await self.inner.process_update(update, coroutine)
+            else:
+                await super().process_update(update, coroutine)
+        finally:
+            future = self.pending.pop(getattr(update, "update_id", None), None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        if self.inner is not None:
+            await self.inner.initialize()
+
+    async def shutdown(self) -> None:
+        if self.inner is not None:
+            await self.inner.shutdown()
+
+
+def make_message_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    message: Dict[str, Any] = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoadTest:
+    def __init__(
+        self,
+        users: int,
+        rounds: int,
+        think: float = 0.0,
+        api_latency: float = 0.0,
+        concurrency: Optional[int] = None,
+    ) -> None:
+        self.users = users
+        self.rounds = rounds
+        self.think = think
+        self.api_latency = api_latency
+        self.concurrency = concurrency
+        self._update_ids = itertools.count(1)
+
+    def _processor(self) -> TimingUpdateProcessor:
+        import config
+        from utils.update_processor import create_update_processor
+
+        concurrency = self.concurrency or config.CONCURRENT_UPDATES
+        return TimingUpdateProcessor(create_update_processor(concurrency))
+
+    async def _drive_users(self, processor: TimingUpdateProcessor, inject) -> List[float]:
+        latencies: List[float] = []
+
+        async def user(index: int) -> None:
+            user_id = FIRST_USER_ID + index
+            name = NAMES[index % len(NAMES)]
+            for _ in range(self.rounds):
+                for step in SCENARIO:
+                    update_id = next(self._update_ids)
+                    done = processor.expect(update_id)
+                    start = time.perf_counter()
+                    await inject(make_message_update(update_id, user_id, step.format(name=name)))
+                    latencies.append(await asyncio.wait_for(done, timeout=30) - start)
+                    if self.think:
+                        await asyncio.sleep(self.think)
+
+        await asyncio.gather(*(user(i) for i in range(self.users)))
+        return latencies
+
+    async def run_polling(self, build) -> Dict[str, Any]:
+        import config
+
+        api = FakeTelegram(self.api_latency)
+        processor = self._processor()
+        application = build(api, processor)
+        await application.initialize()
+        await application.post_init(application)
+        await application.updater.start_polling(
+            poll_interval=0.0, timeout=1, allowed_updates=config.ALLOWED_UPDATES
+        )
+        await application.start()
+
+        async def inject(update: Dict[str, Any]) -> None:
+            api.push(update)
+
+        try:
+            started = time.perf_counter()
+            latencies = await self._drive_users(processor, inject)
+            elapsed = time.perf_counter() - started
+        finally:
+            await application.updater.stop()
+            await application.stop()
+            await application.shutdown()
+            await application.post_shutdown(application)
+        return self._summary("polling", latencies, elapsed, api)
+
+    async def run_webhook(self, build) -> Dict[str, Any]:
+        import aiohttp
+
+        from utils.webhook_server import SECRET_HEADER, BotHTTPServer, generate_secret_token, serve_webhook
+
+        api = FakeTelegram(self.api_latency)
+        processor = self._processor()
+        application = build(api, processor)
+        secret = generate_secret_token()
+        server = BotHTTPServer(
+            application, host="127.0.0.1", port=0, webhook_path="/telegram", secret_token=secret
+        )
+        stop = asyncio.Event()
+        serving = asyncio.create_task(serve_webhook(application, server, stop_event=stop))
+        while not application.running:
+            if serving.done():
+                serving.result()
+            await asyncio.sleep(0.01)
+
+        url = f"http://127.0.0.1:{server.port}/telegram"
+        try:
+            async with aiohttp.ClientSession(headers={SECRET_HEADER: secret}) as session:
+
+                async def inject(update: Dict[str, Any]) -> None:
+                    async with session.post(url, json=update) as response:
+                        response.raise_for_status()
+
+                started = time.perf_counter()
+                latencies = await self._drive_users(processor, inject)
+                elapsed = time.perf_counter() - started
+        finally:
+            stop.set()
+            await serving
+        return self._summary("webhook", latencies, elapsed, api)
+
+    def _summary(self, mode: str, latencies: List[float], elapsed: float, api: FakeTelegram) -> Dict[str, Any]:
+        return {
+            "mode": mode,
+            "concurrency": processor_concurrency(self.concurrency),
+            "updates": len(latencies),
+            "seconds": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "max_ms": max(latencies, default=0.0) * 1000,
+            "api_calls": sum(api.calls.values()) - api.calls["getUpdates"],
+        }
+
+
+def processor_concurrency(concurrency: Optional[int]) -> int:
+    import config
+
+    return max(1, concurrency or config.CONCURRENT_UPDATES)
+
+
+def prepare_bot(participants: int):
+    """Imports the bot against a temporary SQLite database with test data."""
+    import config
+
+    config.DATABASE_TYPE = "local"
+
+    import database
+    import main as bot
+
+    database.DB_PATH = os.path.join(os.getcwd(), "load_test.db")
+    if not bot.init_services():
+        raise SystemExit("bot services failed to initialise")
+    for i in range(participants):
+        database.add_participant(
+            {
+                "FullNameRU": f"{NAMES[i % len(NAMES)]} {i}",
+                "Gender": "M" if i % 2 else "F",
+                "Size": "L",
+                "Church": "Грейс",
+                "Role": "CANDIDATE",
+            }
+        )
+
+    def build(api: FakeTelegram, processor: BaseUpdateProcessor):
+        return bot.build_application(
+            "123456:LOAD-TEST",
+            request=OfflineRequest(api),
+            get_updates_request=OfflineRequest(api),
+            update_processor=processor,
+        )
+
+    return build
+
+
+def add_virtual_coordinators(users: int) -> None:
+    from utils.acl import COORDINATOR, acl
+
+    # только в памяти: файл ACL не меняется
+    for i in range(users):
+        acl.grant(FIRST_USER_ID + i, COORDINATOR, persist=False)
+
+
+def print_summary(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['mode']:8} x{result['concurrency']:<3d} {result['updates']:6d} updates in {result['seconds']:.2f}s | "
+        f"{result['throughput']:.1f} upd/s | p50 {result['p50_ms']:.1f} ms, "
+        f"p95 {result['p95_ms']:.1f} ms, max {result['max_ms']:.1f} ms | "
+        f"{result['api_calls']} API calls"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["polling", "webhook", "both"], default="both")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--participants", type=int, default=200)
+    parser.add_argument("--think", type=float, default=0.0, help="pause between steps, seconds")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API RTT, ms")
+    parser.add_argument(
+        "--concurrency",
+        default="",
+        help="comma-separated CONCURRENT_UPDATES values to compare (default: config)",
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bot_load_test_")
+    os.chdir(workdir)
+    build = prepare_bot(args.participants)
+    add_virtual_coordinators(args.users)
+    print(f"logs and database in {workdir}")
+
+    levels = [int(v) for v in args.concurrency.split(",") if v.strip()] or [None]
+    modes = ["polling", "webhook"] if args.mode == "both" else [args.mode]
+    for level in levels:
+        test = LoadTest(args.users, args.rounds, args.think, args.api_latency / 1000, level)
+        for mode in modes:
+            runner = test.run_polling if mode == "polling" else test.run_webhook
+            print_summary(asyncio.run(runner(build)))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@
 Provides simple statistics such as user activity by day, command usage,
 average operation times and common errors. Outputs can be rendered to a
 basic HTML report or exported as CSV.
+
+With ``--archive-dir`` the archives produced by ``log_archiver.py`` are
+scanned as well, so statistics cover history beyond the rotated files.
 """
 
 from __future__ import annotations
@@ -12,9 +15,14 @@ import json
 from collections import Counter, defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 import os
 
+try:
+    from log_archiver import iter_archived_records, parse_log_line
+except ImportError:  # imported as scripts.log_analyzer
+    from scripts.log_archiver import iter_archived_records, parse_log_line
+
 
 def get_log_path(filename: str) -> str:
     """Get full path to log file in logs directory."""
@@ -24,31 +32,46 @@ def get_log_path(filename: str) -> str:
 def _read_lines(path: Path) -> Iterable[Dict]:
     with path.open("r", encoding="utf-8") as f:
         for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
+            entry = parse_log_line(line)
+            if entry is not None:
+                yield entry
+
+
+def _iter_entries(
+    log_file: str, archive_dir: Optional[str] = None, since: Optional[str] = None
+) -> Iterable[Dict]:
+    """Archived records of the same log (if requested) followed by the live file."""
+    path = Path(log_file)
+    if archive_dir:
+        source = path.name.split(".log")[0]
+        yield from iter_archived_records(source, archive_dir, since=since)
+    if path.exists():
+        for entry in _read_lines(path):
+            if since and entry.get("_ts") and entry["_ts"] < since:
                 continue
+            yield entry
 
 
-def user_activity_by_day(log_file: str = None) -> Dict[str, int]:
+def user_activity_by_day(
+    log_file: str = None, archive_dir: str = None, since: str = None
+) -> Dict[str, int]:
     if log_file is None:
         log_file = get_log_path("user_actions.log")
     counts: Dict[str, int] = defaultdict(int)
-    for entry in _read_lines(Path(log_file)):
-        ts = entry.get("timestamp") or entry.get("time") or ""
+    for entry in _iter_entries(log_file, archive_dir, since):
+        ts = entry.get("timestamp") or entry.get("time") or entry.get("_ts") or ""
         day = ts.split("T")[0] if "T" in ts else ts[:10]
         counts[day] += 1
     return dict(counts)
 
 
-def command_stats(log_file: str = None) -> Dict[str, int]:
+def command_stats(
+    log_file: str = None, archive_dir: str = None, since: str = None
+) -> Dict[str, int]:
     if log_file is None:
         log_file = get_log_path("user_actions.log")
     counter: Counter[str] = Counter()
-    for entry in _read_lines(Path(log_file)):
+    for entry in _iter_entries(log_file, archive_dir, since):
         if entry.get("event") == "user_action":
             cmd = entry.get("details", {}).get("command")
             if cmd:
@@ -56,18 +79,22 @@ def command_stats(log_file: str = None) -> Dict[str, int]:
     return dict(counter)
 
 
-def operation_times(log_file: str) -> Tuple[float, int]:
+def operation_times(
+    log_file: str, archive_dir: str = None, since: str = None
+) -> Tuple[float, int]:
     total, count = 0.0, 0
-    for entry in _read_lines(Path(log_file)):
+    for entry in _iter_entries(log_file, archive_dir, since):
         total += float(entry.get("duration", 0))
         count += 1
     avg = total / count if count else 0.0
     return avg, count
 
 
-def frequent_errors(log_file: str) -> Dict[str, int]:
+def frequent_errors(
+    log_file: str, archive_dir: str = None, since: str = None
+) -> Dict[str, int]:
     counter: Counter[str] = Counter()
-    for entry in _read_lines(Path(log_file)):
+    for entry in _iter_entries(log_file, archive_dir, since):
         if entry.get("event") == "error":
             counter[entry.get("error", "unknown")] += 1
     return dict(counter)
@@ -96,11 +123,15 @@ if __name__ == "__main__":
     parser.add_argument("log", help="Path to log file")
     parser.add_argument("--html", help="Path to output HTML report")
     parser.add_argument("--csv", help="Path to output CSV file")
+    parser.add_argument(
+        "--archive-dir", help="Also scan archives created by log_archiver.py"
+    )
+    parser.add_argument("--since", help="Only entries at or after this ISO date")
     args = parser.parse_args()
 
     stats = {
-        "user_activity": user_activity_by_day(args.log),
-        "command_stats": command_stats(args.log),
+        "user_activity": user_activity_by_day(args.log, args.archive_dir, args.since),
+        "command_stats": command_stats(args.log, args.archive_dir, args.since),
     }
 
     if args.html:
@@ -0,0 +1,441 @@
+"""Archive rotated JSON logs into a compact columnar format.
+
+Rotated ``user_actions.log.N`` and ``performance.log.N`` files are parsed,
+converted to columns (one list per key instead of repeating keys on every
+line) and written to ``logs/archive``:
+
+* Parquet with zstd compression when ``pyarrow`` is installed;
+* otherwise a zstd-compressed msgpack block when ``zstandard`` and
+  ``msgpack`` are installed;
+* otherwise gzip-compressed columnar JSON (stdlib only).
+
+``logs/archive/manifest.json`` records every archive with its row count,
+time range and a fingerprint of the source file, so re-running the archiver
+after the next rotation (``.1`` -> ``.2``) does not archive the same file
+twice and readers can skip archives outside the requested time range.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import msgpack
+    import zstandard
+
+    MSGPACK_ZSTD_AVAILABLE = True
+except ImportError:
+    MSGPACK_ZSTD_AVAILABLE = False
+
+
+DEFAULT_LOG_DIR = "logs"
+DEFAULT_ARCHIVE_DIR = os.path.join("logs", "archive")
+DEFAULT_SOURCES = ("user_actions", "performance")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+BLOCK_MAGIC = b"TDLA\x01"
+TIMESTAMP_COLUMN = "_ts"
+
+FORMAT_EXTENSIONS = {
+    "parquet": ".parquet",
+    "msgpack": ".msgpack.zst",
+    "json": ".json.gz",
+}
+
+# "2025-08-13 10:00:00,123 - performance - INFO - {...}"
+_PREFIXED_LINE_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:,\d+)?) - [^ ]+ - [A-Z_]+ - (\{.*\})$"
+)
+
+
+def default_format() -> str:
+    if PYARROW_AVAILABLE:
+        return "parquet"
+    if MSGPACK_ZSTD_AVAILABLE:
+        return "msgpack"
+    return "json"
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+
+def parse_log_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse a pure JSON line or a ``LOG_FORMAT`` line with a JSON message.
+
+    Adds a ``_ts`` ISO timestamp taken from the record's ``timestamp`` field
+    or from the logging prefix.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    prefix_ts = None
+    if not line.startswith("{"):
+        match = _PREFIXED_LINE_RE.match(line)
+        if not match:
+            return None
+        prefix_ts, line = match.groups()
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(entry, dict):
+        return None
+
+    ts = entry.get("timestamp") or entry.get("time")
+    if not ts and prefix_ts:
+        ts = datetime.strptime(prefix_ts.split(",")[0], "%Y-%m-%d %H:%M:%S").isoformat()
+    entry[TIMESTAMP_COLUMN] = ts if isinstance(ts, str) else None
+    return entry
+
+
+def read_log_file(path: Path) -> Iterator[Dict[str, Any]]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = parse_log_line(line)
+            if entry is not None:
+                yield entry
+
+
+# ---------------------------------------------------------------------------
+# Columnar conversion
+# ---------------------------------------------------------------------------
+
+
+def _column_type(values: Sequence[Any]) -> str:
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return "str"
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int}:
+        return "int"
+    if kinds <= {int, float}:
+        return "float"
+    if kinds <= {dict, list}:
+        return "json"
+    return "str"
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == "float":
+        return float(value)
+    if kind == "json":
+        return json.dumps(value, ensure_ascii=False)
+    if kind == "str" and not isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def records_to_columns(records: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert row dicts to ``{"columns": {...}, "types": {...}, "rows": N}``."""
+    keys: List[str] = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+
+    columns: Dict[str, List[Any]] = {}
+    types: Dict[str, str] = {}
+    for key in keys:
+        raw = [record.get(key) for record in records]
+        kind = _column_type(raw)
+        types[key] = kind
+        columns[key] = [_coerce(v, kind) for v in raw]
+    return {"columns": columns, "types": types, "rows": len(records)}
+
+
+def columns_to_records(block: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    columns = block["columns"]
+    json_columns = {k for k, kind in block.get("types", {}).items() if kind == "json"}
+    names = list(columns)
+    for i in range(block["rows"]):
+        record = {}
+        for name in names:
+            value = columns[name][i]
+            if value is None:
+                continue
+            if name in json_columns:
+                value = json.loads(value)
+            record[name] = value
+        yield record
+
+
+# ---------------------------------------------------------------------------
+# Archive writers / readers
+# ---------------------------------------------------------------------------
+
+
+def write_archive(block: Dict[str, Any], path: Path, fmt: str) -> None:
+    if fmt == "parquet":
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("pyarrow is not installed")
+        table = pa.table(block["columns"])
+        table = table.replace_schema_metadata(
+            {"types": json.dumps(block["types"])}
+        )
+        pq.write_table(table, path, compression="zstd")
+    elif fmt == "msgpack":
+        if not MSGPACK_ZSTD_AVAILABLE:
+            raise RuntimeError("msgpack/zstandard are not installed")
+        payload = msgpack.packb(block, use_bin_type=True)
+        compressed = zstandard.ZstdCompressor(level=10).compress(payload)
+        path.write_bytes(BLOCK_MAGIC + compressed)
+    elif fmt == "json":
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=9) as f:
+            json.dump(block, f, ensure_ascii=False, separators=(",", ":"))
+    else:
+        raise ValueError(f"Unknown archive format: {fmt}")
+
+
+def read_archive(path: Path, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Read an archive back into a column block, optionally projecting columns."""
+    name = path.name
+    if name.endswith(FORMAT_EXTENSIONS["parquet"]):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError(f"pyarrow is required to read {name}")
+        available = pq.read_schema(path).names
+        wanted = [c for c in columns if c in available] if columns else None
+        table = pq.read_table(path, columns=wanted)
+        metadata = table.schema.metadata or {}
+        types = json.loads(metadata.get(b"types", b"{}"))
+        block = {"columns": table.to_pydict(), "types": types, "rows": table.num_rows}
+    elif name.endswith(FORMAT_EXTENSIONS["msgpack"]):
+        if not MSGPACK_ZSTD_AVAILABLE:
+            raise RuntimeError(f"msgpack and zstandard are required to read {name}")
+        data = path.read_bytes()
+        if not data.startswith(BLOCK_MAGIC):
+            raise ValueError(f"{name} is not a log archive block")
+        payload = zstandard.ZstdDecompressor().decompress(data[len(BLOCK_MAGIC):])
+        block = msgpack.unpackb(payload, raw=False)
+    elif name.endswith(FORMAT_EXTENSIONS["json"]):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            block = json.load(f)
+    else:
+        raise ValueError(f"Unknown archive format: {name}")
+
+    if columns and not name.endswith(FORMAT_EXTENSIONS["parquet"]):
+        block["columns"] = {k: v for k, v in block["columns"].items() if k in columns}
+    block["types"] = {k: v for k, v in block.get("types", {}).items() if k in block["columns"]}
+    return block
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+
+
+def load_manifest(archive_dir: str = DEFAULT_ARCHIVE_DIR) -> Dict[str, Any]:
+    path = Path(archive_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "archives": []}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict[str, Any], archive_dir: str = DEFAULT_ARCHIVE_DIR) -> None:
+    path = Path(archive_dir) / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _fingerprint(path: Path) -> str:
+    digest = hashlib.sha1()
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_name(path: Path) -> Optional[str]:
+    """``performance.log.3`` / ``performance.log.3.gz`` -> ``performance``."""
+    match = re.match(r"^(.+?)\.log\.\d+(?:\.gz)?$", path.name)
+    return match.group(1) if match else None
+
+
+def find_rotated_logs(
+    log_dirs: Iterable[str], sources: Sequence[str] = DEFAULT_SOURCES
+) -> List[Path]:
+    found = []
+    for log_dir in log_dirs:
+        directory = Path(log_dir)
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.iterdir()):
+            if path.is_file() and _source_name(path) in sources:
+                found.append(path)
+    return found
+
+
+def archive_file(
+    path: Path,
+    archive_dir: str = DEFAULT_ARCHIVE_DIR,
+    fmt: Optional[str] = None,
+    manifest: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Archive a single rotated log. Returns the manifest entry or ``None``
+    when the file was already archived or contains no records."""
+    fmt = fmt or default_format()
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = load_manifest(archive_dir)
+
+    fingerprint = _fingerprint(path)
+    if any(a["fingerprint"] == fingerprint for a in manifest["archives"]):
+        return None
+
+    records = list(read_log_file(path))
+    if not records:
+        return None
+
+    timestamps = [r[TIMESTAMP_COLUMN] for r in records if r.get(TIMESTAMP_COLUMN)]
+    source = _source_name(path) or path.stem
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    stamp = min(timestamps).replace(":", "").replace("-", "")[:15] if timestamps else "nots"
+    target = Path(archive_dir) / f"{source}-{stamp}-{fingerprint[:12]}{FORMAT_EXTENSIONS[fmt]}"
+
+    block = records_to_columns(records)
+    write_archive(block, target, fmt)
+
+    entry = {
+        "file": target.name,
+        "source": source,
+        "format": fmt,
+        "rows": block["rows"],
+        "columns": sorted(block["columns"]),
+        "min_ts": min(timestamps) if timestamps else None,
+        "max_ts": max(timestamps) if timestamps else None,
+        "fingerprint": fingerprint,
+        "original": path.name,
+        "original_bytes": path.stat().st_size,
+        "archive_bytes": target.stat().st_size,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    manifest["archives"].append(entry)
+    if own_manifest:
+        save_manifest(manifest, archive_dir)
+    return entry
+
+
+def archive_logs(
+    log_dir: str = DEFAULT_LOG_DIR,
+    archive_dir: str = DEFAULT_ARCHIVE_DIR,
+    sources: Sequence[str] = DEFAULT_SOURCES,
+    fmt: Optional[str] = None,
+    delete_source: bool = False,
+) -> List[Dict[str, Any]]:
+    """Archive all rotated logs found in ``log_dir`` and ``archive_dir``."""
+    manifest = load_manifest(archive_dir)
+    created = []
+    for path in find_rotated_logs([log_dir, archive_dir], sources):
+        entry = archive_file(path, archive_dir, fmt, manifest)
+        if entry is not None:
+            created.append(entry)
+        if delete_source and (entry is not None or _is_archived(path, manifest)):
+            path.unlink()
+    if created:
+        save_manifest(manifest, archive_dir)
+    return created
+
+
+def _is_archived(path: Path, manifest: Dict[str, Any]) -> bool:
+    fingerprint = _fingerprint(path)
+    return any(a["fingerprint"] == fingerprint for a in manifest["archives"])
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+
+def iter_archived_records(
+    source: str,
+    archive_dir: str = DEFAULT_ARCHIVE_DIR,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield archived records of ``source`` in chronological archive order.
+
+    ``since``/``until`` are ISO strings compared against the manifest time
+    range first, so archives outside the window are not opened at all.
+    ``columns`` limits which columns are decoded (``_ts`` is always kept).
+    """
+    manifest = load_manifest(archive_dir)
+    archives = [a for a in manifest["archives"] if a["source"] == source]
+    archives.sort(key=lambda a: a.get("min_ts") or "")
+    wanted = list(columns) + [TIMESTAMP_COLUMN] if columns else None
+
+    for entry in archives:
+        if since and entry.get("max_ts") and entry["max_ts"] < since:
+            continue
+        if until and entry.get("min_ts") and entry["min_ts"] > until:
+            continue
+        block = read_archive(Path(archive_dir) / entry["file"], wanted)
+        for record in columns_to_records(block):
+            ts = record.get(TIMESTAMP_COLUMN)
+            if ts and ((since and ts < since) or (until and ts > until)):
+                continue
+            yield record
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive rotated bot logs")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR)
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR)
+    parser.add_argument(
+        "--format", choices=sorted(FORMAT_EXTENSIONS), default=None,
+        help="Archive format (default: best available)",
+    )
+    parser.add_argument(
+        "--source", action="append", dest="sources",
+        help="Log name to archive (repeatable, default: user_actions, performance)",
+    )
+    parser.add_argument(
+        "--delete-source", action="store_true",
+        help="Remove rotated files once they are archived",
+    )
+    args = parser.parse_args()
+
+    entries = archive_logs(
+        args.log_dir,
+        args.archive_dir,
+        sources=args.sources or DEFAULT_SOURCES,
+        fmt=args.format,
+        delete_source=args.delete_source,
+    )
+    for entry in entries:
+        ratio = entry["original_bytes"] / entry["archive_bytes"] if entry["archive_bytes"] else 0
+        print(
+            f"{entry['original']} -> {entry['file']} "
+            f"({entry['rows']} rows, {entry['format']}, x{ratio:.1f})"
+        )
+    if not entries:
+        print("Nothing to archive")
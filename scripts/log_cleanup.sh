@@ -10,6 +10,11 @@ echo "🗂️ Архивирование логов старше $DAYS_TO_KEEP 
 # Создаем папку архива
 mkdir -p "$ARCHIVE_DIR"
 
+# Конвертируем ротированные user_actions/performance в колоночный архив
+# (logs/archive/manifest.json). Повторный запуск не дублирует архивы.
+echo "🧱 Колоночный архив user_actions/performance..."
+python3 scripts/log_archiver.py --log-dir "$LOG_DIR" --archive-dir "$ARCHIVE_DIR"
+
 # Находим и архивируем старые логи
 find "$LOG_DIR" -name "*.log.*" -mtime +$DAYS_TO_KEEP -type f | while read file; do
     echo "📦 Архивируем: $file"
@@ -0,0 +1,45 @@
+"""Apply or preview SQLite schema migrations.
+
+Reads ``PRAGMA user_version`` of the database and runs the numbered
+migrations from ``database.MIGRATIONS`` that are newer. ``--dry-run`` only
+lists them. The bot runs the same migrations on start, so this script is
+for checking what an upgrade will do before restarting it.
+
+    python scripts/migrate.py --db participants.db --dry-run
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from utils.migrations import get_user_version  # noqa: E402
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="list pending migrations only")
+    args = parser.parse_args()
+
+    database.DB_PATH = args.db
+    with sqlite3.connect(args.db) as conn:
+        current = get_user_version(conn)
+    print(f"{args.db}: schema version {current}, latest {database.SCHEMA_VERSION}")
+
+    migrations = database.init_database(dry_run=args.dry_run)
+    verb = "pending" if args.dry_run else "applied"
+    if not migrations:
+        print(f"nothing {verb}")
+    for migration in migrations:
+        print(f"{verb}: {migration.version:>3}  {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
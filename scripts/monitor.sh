@@ -16,13 +16,14 @@ show_help() {
     echo "  errors         - Показать последние ошибки"
     echo "  user [ID]      - Показать действия конкретного пользователя"
     echo "  performance    - Показать медленные операции"
-    echo "  report         - Создать HTML отчет"
+    echo "  report [дни]   - Обновить HTML дашборд задержек и SLO (по умолчанию 7 дней)"
+    echo "  sql [sort]     - Отчет профилировщика SQL (SQL_PROFILE=true)"
 }
 
 live_users() {
     echo "📱 Следим за действиями пользователей (Ctrl+C для выхода)..."
     tail -f "$LOG_DIR/user_actions.log" | jq --unbuffered -r '
-        "\(.timestamp // now | strftime(\"%H:%M:%S\")) | 👤\(.user_id) | \(.action) | \(.details.command // .details | tostring)"
+        "\((.timestamp // (now | todate))[11:19]) | 👤\(.user_id) | \(.action // .event) | \(.details.command // .details // .to_state | tostring)"
     ' 2>/dev/null || tail -f "$LOG_DIR/user_actions.log"
 }
 
@@ -77,9 +78,10 @@ show_user() {
     
     echo "👤 Действия пользователя $1:"
     if [[ -f "$LOG_DIR/user_actions.log" ]]; then
-        grep "\"user_id\": $1" "$LOG_DIR/user_actions.log" | jq -r '
-            "\(.timestamp // \"unknown\") | \(.action) | \(.details | tostring)"
-        ' 2>/dev/null || grep "\"user_id\": $1" "$LOG_DIR/user_actions.log"
+        # JSON пишется без пробелов (orjson) или с пробелами (json) — учитываем оба
+        grep -E "\"user_id\": ?$1[,}]" "$LOG_DIR/user_actions.log" | jq -r '
+            "\(.timestamp // \"unknown\") | \(.action // .event) | \(.details // .context | tostring)"
+        ' 2>/dev/null || grep -E "\"user_id\": ?$1[,}]" "$LOG_DIR/user_actions.log"
     else
         echo "Файл действий пользователей не найден"
     fi
@@ -97,15 +99,20 @@ show_performance() {
 }
 
 create_report() {
-    echo "📈 Создаем HTML отчет..."
+    echo "📈 Обновляем дашборд задержек и SLO..."
     if [[ -f "$LOG_DIR/user_actions.log" ]]; then
-        python3 scripts/log_analyzer.py "$LOG_DIR/user_actions.log" --html "logs/report_$(date +%Y%m%d_%H%M%S).html"
-        echo "✅ Отчет создан в logs/"
+        # Индекс logs/dashboard.db обновляется инкрементально — читаются только новые строки
+        python3 scripts/dashboard.py --log-dir "$LOG_DIR" --days "${1:-7}" --output "$LOG_DIR/dashboard.html"
     else
         echo "❌ Файл логов не найден"
     fi
 }
 
+show_sql_profile() {
+    echo "🗄️ Профиль SQL запросов:"
+    python3 -m utils.sql_profiler report --sort "${1:-total}"
+}
+
 # Основная логика
 case "$1" in
     "live-users") live_users ;;
@@ -115,7 +122,8 @@ case "$1" in
     "errors") show_errors ;;
     "user") show_user "$2" ;;
     "performance") show_performance ;;
-    "report") create_report ;;
+    "report") create_report "$2" ;;
+    "sql") show_sql_profile "$2" ;;
     *) show_help ;;
 esac
 
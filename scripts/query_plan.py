@@ -0,0 +1,284 @@
+"""Run the participants query workload and compare plans and timings.
+
+``WORKLOAD`` calls every public query function of ``database`` plus the
+filter shapes used for /list, /search and /export. It runs against a
+generated database. The SQL profiler (``utils/sql_profiler.py``) times each
+statement and captures its ``EXPLAIN QUERY PLAN``.
+
+The report compares two runs:
+
+* ``before`` — the schema before the query-index migration
+  (``--before-version``, default 5);
+* ``after`` — the same data after ``init_database`` applies the remaining
+  migrations.
+
+Workload entries that need a later schema (e.g. the duplicate-key columns
+of migration 8) fail in the ``before`` run; they are skipped there and
+listed in the report.
+
+    python scripts/query_plan.py --participants 100000 --rounds 5
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from utils.exceptions import BotException  # noqa: E402
+from utils.migrations import run_migrations  # noqa: E402
+from utils.sql_profiler import profiler  # noqa: E402
+
+DEPARTMENTS = ("Worship", "Kitchen", "Media", "Setup", "Prayer")
+STATUSES = ("Unpaid", "Unpaid", "Paid", "Paid", "Paid", "Partial")
+FIRST_NAMES = (
+    "Александр", "Алексей", "Анна", "Андрей", "Борис", "Вера", "Виктор", "Галина",
+    "Дмитрий", "Евгений", "Елена", "Игорь", "Ирина", "Кирилл", "Ксения", "Леонид",
+    "Мария", "Михаил", "Наталья", "Николай", "Ольга", "Павел", "Роман", "Светлана",
+    "Сергей", "Татьяна", "Юлия", "Яков",
+)
+SYLLABLES = (
+    "бар", "вол", "гор", "дан", "жук", "зай", "кар", "лев", "мал", "нов", "пет", "род",
+    "сок", "тих", "фил", "хар", "цвет", "чер", "шир", "щег", "бел", "гус", "мор", "сид",
+)
+SUFFIXES = ("ов", "ев", "ин", "ский", "енко", "ович")
+CHURCHES = ("Благодать", "Новая жизнь", "Слово жизни", "Эммануил", "Голгофа", "Вефиль")
+CITIES = ("Хайфа", "Тель-Авив", "Иерусалим", "Ашдод", "Нетания", "Беэр-Шева", "Кармиэль")
+_LATIN = dict(zip("абвгдеёжзийклмнопрстуфхцчшщъыьэюя", (
+    "a b v g d e e zh z i y k l m n o p r s t u f kh ts ch sh shch  y  e yu ya".split(" ")
+)))
+
+
+def person(i: int) -> Tuple[str, str]:
+    """Имя участника ``i`` (русское и латиницей): детерминированно, с повторами."""
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    stem = SYLLABLES[i // 7 % len(SYLLABLES)] + SYLLABLES[i // 131 % len(SYLLABLES)]
+    surname = (stem + SUFFIXES[i // 3 % len(SUFFIXES)]).capitalize()
+    if first.endswith(("а", "я")) and surname.endswith(("ов", "ев", "ин")):
+        surname += "а"
+    name_ru = f"{first} {surname}"
+    name_en = "".join(_LATIN.get(c, c) for c in name_ru.lower()).title()
+    return name_ru, name_en
+
+
+def phone(i: int) -> str:
+    return f"+97250{i * 7919 % 10_000_000:07d}"
+
+
+class WorkloadState:
+    """Ключи, которыми запросы нагрузки обращаются к данным."""
+
+    def __init__(self, count: int) -> None:
+        self.participant_id = count // 2 or 1
+        self.name = person(self.participant_id - 1)[0]
+        self.phone = phone(self.participant_id - 1)
+        self.new_id: Optional[int] = None
+        self.round = 0
+
+
+def _select(sql: str, params: Tuple = ()) -> List[Dict]:
+    with database.DatabaseConnection() as conn:
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+def _add(state: WorkloadState) -> None:
+    state.round += 1
+    state.new_id = database.add_participant(
+        {"FullNameRU": f"Нагрузка {state.round}", "Gender": "M", "Role": "CANDIDATE"}
+    )
+
+
+def _record_batch(state: WorkloadState) -> None:
+    database.record_payments(
+        [
+            {
+                "participant_id": state.participant_id,
+                "amount": 10,
+                "date": "2025-02-01",
+                "reference": f"workload-{state.round}-{i}",
+            }
+            for i in range(3)
+        ]
+    )
+
+
+# (имя, вызов): все публичные запросы database.py и фильтры списка/поиска/экспорта
+WORKLOAD: Tuple[Tuple[str, Callable[[WorkloadState], Any]], ...] = (
+    ("get_all_participants", lambda s: database.get_all_participants()),
+    ("get_participant_by_id", lambda s: database.get_participant_by_id(s.participant_id)),
+    ("find_participant_by_name", lambda s: database.find_participant_by_name(s.name)),
+    ("find_participants_by_contact", lambda s: database.find_participants_by_contact(s.phone)),
+    ("get_unpaid_participants", lambda s: database.get_unpaid_participants()),
+    ("get_payment_summary", lambda s: database.get_payment_summary()),
+    ("verify_payment_summary", lambda s: database.verify_payment_summary(repair=False)),
+    ("get_participant_balance", lambda s: database.get_participant_balance(s.participant_id)),
+    ("get_payment_history", lambda s: database.get_payment_history(s.participant_id)),
+    ("get_cash_flow", lambda s: database.get_cash_flow("2025-01-01", "2025-01-31")),
+    ("search_participants", lambda s: database.search_participants(s.name.replace("е", "и", 1), 50)),
+    ("add_participant", _add),
+    ("update_participant", lambda s: database.update_participant(
+        s.new_id, {"FullNameRU": f"Нагрузка {s.round}", "Size": "L"})),
+    ("update_participant_field", lambda s: database.update_participant_field(s.new_id, {"Church": "Благодать"})),
+    ("update_payment_status", lambda s: database.update_payment_status(s.new_id, "Paid", 500, "2025-01-15")),
+    ("record_payment", lambda s: database.record_payment(s.participant_id, 10, "2025-01-20")),
+    ("record_payments", _record_batch),
+    ("delete_participant", lambda s: database.delete_participant(s.new_id)),
+    # страница /list: первые записи без сортировки всей таблицы
+    ("filter: list page", lambda s: _select(
+        "SELECT * FROM participants ORDER BY created_at DESC LIMIT ? OFFSET ?", (20, 40))),
+    ("filter: unpaid page", lambda s: _select(
+        "SELECT * FROM participants WHERE PaymentStatus = 'Unpaid' ORDER BY created_at DESC LIMIT ?", (20,))),
+    # /list и /export по роли и отделу («/export worship team»)
+    ("filter: team by department", lambda s: _select(
+        "SELECT * FROM participants WHERE Role = ? AND Department = ? ORDER BY FullNameRU",
+        ("TEAM", "Worship"))),
+    # /search: префикс имени по индексу FullNameRU
+    ("filter: name prefix", lambda s: _select(
+        "SELECT * FROM participants WHERE FullNameRU >= ? AND FullNameRU < ? ORDER BY FullNameRU",
+        (s.name[:6], s.name[:5] + chr(ord(s.name[5]) + 1)))),
+)
+
+
+def build_database(path: str, count: int, schema_version: Optional[int] = None) -> WorkloadState:
+    """Создаёт БД по миграциям до ``schema_version`` и заполняет ``count`` участниками."""
+    database.DB_PATH = path
+    with database.DatabaseConnection() as conn:
+        run_migrations(conn, database.MIGRATIONS[:schema_version])
+        conn.execute("BEGIN")
+        conn.executemany(
+            """
+            INSERT INTO participants (FullNameRU, FullNameEN, Gender, Size, Church,
+                CountryAndCity, ContactInformation, Role, Department, PaymentStatus,
+                PaymentAmount, created_at)
+            VALUES (?, ?, ?, 'L', ?, ?, ?, ?, ?, ?, ?, datetime('2025-01-01', ? || ' minutes'))
+            """,
+            (
+                (
+                    *person(i),
+                    "M" if i % 2 else "F",
+                    CHURCHES[i % len(CHURCHES)],
+                    CITIES[i % len(CITIES)],
+                    phone(i),
+                    "TEAM" if i % 5 == 0 else "CANDIDATE",
+                    DEPARTMENTS[i // 5 % len(DEPARTMENTS)] if i % 5 == 0 else "",
+                    STATUSES[i % len(STATUSES)],
+                    0 if STATUSES[i % len(STATUSES)] == "Unpaid" else 500,
+                    f"+{i}",
+                )
+                for i in range(count)
+            ),
+        )
+        conn.execute(
+            """
+            INSERT INTO payments (participant_id, amount, PaymentDate, method)
+            SELECT id, PaymentAmount, date(created_at), 'cash'
+            FROM participants WHERE PaymentAmount > 0
+            """
+        )
+    return WorkloadState(count)
+
+
+# вызовы, которые работают с участником из add_participant
+NEEDS_NEW_PARTICIPANT = {
+    "update_participant", "update_participant_field", "update_payment_status", "delete_participant",
+}
+
+
+def _missing_schema(error: Exception) -> bool:
+    cause = error.__cause__ if isinstance(error, BotException) else error
+    return isinstance(cause, sqlite3.OperationalError) and str(cause).startswith(
+        ("no such column", "no such table", "table participants has no column")
+    )
+
+
+def run_workload(
+    state: WorkloadState, rounds: int = 1, skipped: Optional[Set[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Прогоняет нагрузку ``rounds`` раз; статистика и план по каждому оператору.
+
+    Если передан ``skipped``, вызовы, которым не хватает таблиц или колонок
+    более поздней схемы (и изменения участника, которого не удалось
+    добавить), пропускаются и их имена попадают в это множество; иначе
+    ошибка пробрасывается.
+    """
+    saved = profiler.enabled, profiler.explain_threshold, profiler.dump_path
+    profiler.enabled, profiler.explain_threshold, profiler.dump_path = True, 0.0, None
+    profiler.reset()
+    try:
+        with patch("builtins.print"):
+            for _ in range(rounds):
+                for name, call in WORKLOAD:
+                    if skipped is not None and name in skipped:
+                        continue
+                    if skipped is not None and name in NEEDS_NEW_PARTICIPANT and state.new_id is None:
+                        skipped.add(name)
+                        continue
+                    try:
+                        call(state)
+                    except (BotException, sqlite3.Error) as e:
+                        if skipped is None or not _missing_schema(e):
+                            raise
+                        skipped.add(name)
+        return {
+            sql: stats
+            for sql, stats in profiler.snapshot().items()
+            if sql.split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT")
+            # оператор пропущенного вызова упал и плана не получил
+            and not any(step.startswith("(no plan:") for step in stats.get("plan") or ())
+        }
+    finally:
+        profiler.enabled, profiler.explain_threshold, profiler.dump_path = saved
+        profiler.reset()
+
+
+def format_comparison(
+    before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]], width: int = 110
+) -> str:
+    lines = [f"{'before,ms':>10} {'after,ms':>9}  statement"]
+    for sql in sorted(after, key=lambda key: before.get(key, after[key])["mean"], reverse=True):
+        old = before.get(sql)
+        old_mean = f"{old['mean'] * 1000:>10.2f}" if old else f"{'-':>10}"
+        lines.append(f"{old_mean} {after[sql]['mean'] * 1000:>9.2f}  {sql[:width]}")
+        old_plan = (old or {}).get("plan") or []
+        new_plan = after[sql].get("plan") or []
+        for step in old_plan if old_plan != new_plan else []:
+            lines.append(f"{'':>21}  - {step}")
+        for step in new_plan:
+            lines.append(f"{'':>21}  {'+' if old_plan != new_plan else ' '} {step}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--participants", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--before-version", type=int, default=5)
+    args = parser.parse_args()
+    # генератор данных заполняет журнал платежей (миграция 5)
+    if not 5 <= args.before_version <= database.SCHEMA_VERSION:
+        parser.error(f"--before-version must be between 5 and {database.SCHEMA_VERSION}")
+
+    skipped: Set[str] = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        state = build_database(os.path.join(tmp, "participants.db"), args.participants, args.before_version)
+        before = run_workload(state, args.rounds, skipped)
+        with patch("builtins.print"):
+            database.init_database()
+        after = run_workload(state, args.rounds)
+    print(f"{args.participants} participants, {args.rounds} rounds, schema {args.before_version} -> "
+          f"{database.SCHEMA_VERSION}")
+    if skipped:
+        print(f"skipped before: {', '.join(name for name, _ in WORKLOAD if name in skipped)}")
+    print(format_comparison(before, after))
+
+
+if __name__ == "__main__":
+    main()
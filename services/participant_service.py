@@ -1,28 +1,32 @@
 import json
 import logging
 import time
-from dataclasses import asdict, dataclass
-from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import InlineKeyboardMarkup
 
 from repositories.participant_repository import AbstractParticipantRepository
-from models.participant import Participant
+from models.participant import DATA_FIELDS, PAYMENT_FIELDS, Participant
 from database import find_participant_by_name
+from utils.card_renderer import renderer as card_renderer
+from utils.payment_reconciliation import (
+    ParticipantMatcher,
+    ReconciliationMatch,
+    ReconciliationReport,
+    reconcile,
+)
+from utils.keyboards import BACK_ROW, CANCEL_ROW, keyboard, row
 from utils.validators import validate_participant_data
 from utils.exceptions import (
+    ConcurrentModificationError,
     DuplicateParticipantError,
     ParticipantNotFoundError,
     ValidationError,
 )
 from parsers.participant_parser import normalize_field_value
-from constants import (
-    GENDER_DISPLAY,
-    ROLE_DISPLAY,
-    SIZE_DISPLAY,
-    DEPARTMENT_DISPLAY,
-    PAYMENT_STATUS_DISPLAY,
-)
+from utils.duplicate_keys import contact_keys, name_key
+from constants import DEPARTMENT_DISPLAY
 
 logger = logging.getLogger(__name__)
 
@@ -58,12 +62,20 @@ FIELD_EMOJIS = {
     "PaymentDate": "📅",
 }
 
+# Поля поиска кроме имён: (атрибут Participant, match_field)
+_EXTRA_SEARCH_FIELDS = (
+    ("ContactInformation", "contact"),
+    ("Church", "church"),
+    ("CountryAndCity", "city"),
+)
+_EXTRA_FIELD_CONFIDENCE = 0.7
+
 
 @dataclass
 class SearchResult:
     participant: Participant
     confidence: float
-    match_field: str  # "name_ru", "name_en", "id"
+    match_field: str  # "name_ru", "name_en", "id", "church", "city", "contact"
     match_type: str  # "exact", "fuzzy", "partial"
 
 
@@ -79,7 +91,7 @@ def merge_participant_data(
     """
 
     if isinstance(existing_data, Participant):
-        merged = asdict(existing_data)
+        merged = existing_data.to_dict()
     else:
         merged = existing_data.copy()
 
@@ -105,219 +117,109 @@ def merge_participant_data(
 
 
 def format_participant_block(data: Union[Participant, Dict]) -> str:
-    # Конвертируем Participant в Dict для единообразной работы
-    if isinstance(data, Participant):
-        data_dict = asdict(data)
-    else:
-        data_dict = data
-
-    gender_key = data_dict.get("Gender") or ""
-    size_key = data_dict.get("Size") or ""
-    role_key = data_dict.get("Role") or ""
-    dept_key = data_dict.get("Department") or ""
-    payment_status_key = data_dict.get("PaymentStatus") or "Unpaid"
-
-    gender = GENDER_DISPLAY.get(gender_key, "Не указано")
-    size = SIZE_DISPLAY.get(size_key, "Не указано")
-    role = ROLE_DISPLAY.get(role_key, role_key)
-    department = DEPARTMENT_DISPLAY.get(dept_key, dept_key or "Не указано")
-
-    text = (
-        f"Имя (рус): {data_dict.get('FullNameRU') or 'Не указано'}\n"
-        f"Имя (англ): {data_dict.get('FullNameEN') or 'Не указано'}\n"
-        f"Пол: {gender}\n"
-        f"Размер: {size}\n"
-        f"Церковь: {data_dict.get('Church') or 'Не указано'}\n"
-        f"Роль: {role}"
-    )
+    # Шаблон и кеш по версии записи — в utils/card_renderer.py
+    return card_renderer.block(data)
 
-    if role_key == "TEAM":
-        text += f"\nДепартамент: {department}"
 
-    text += (
-        f"\nГород: {data_dict.get('CountryAndCity') or 'Не указано'}\n"
-        f"Кто подал: {data_dict.get('SubmittedBy') or 'Не указано'}\n"
-        f"Контакты: {data_dict.get('ContactInformation') or 'Не указано'}"
-    )
+# Клавиатуры собираются один раз при импорте (utils/keyboards.py);
+# функции ниже отдают готовые неизменяемые объекты.
+_GENDER_KEYBOARD = keyboard(
+    row(("\U0001f468 Мужской", "gender_M")),
+    row(("\U0001f469 Женский", "gender_F")),
+    BACK_ROW,
+)
 
-    # Add payment information в ожидаемом тестами формате
-    payment_amount = data_dict.get('PaymentAmount', 0)
-    payment_date = data_dict.get('PaymentDate', "")
-    
-    # Статус оплаты (всегда показываем)
-    payment_status_display = PAYMENT_STATUS_DISPLAY.get(payment_status_key, payment_status_key)
-    text += f"\n💰 Статус оплаты: {payment_status_display}"
-    
-    # Сумма оплаты (если больше 0)
-    if payment_amount and payment_amount > 0:
-        text += f"\n💳 Сумма оплаты: {payment_amount} ₪"
-    
-    # Дата оплаты (если есть)
-    if payment_date:
-        text += f"\n📅 Дата оплаты: {payment_date}"
-
-    return text
+_ROLE_KEYBOARD = keyboard(
+    row(("\U0001f464 Кандидат", "role_CANDIDATE")),
+    row(("\U0001f465 Команда", "role_TEAM")),
+    BACK_ROW,
+)
+
+_SIZE_KEYBOARD = keyboard(
+    row(("XS", "size_XS"), ("S", "size_S"), ("M", "size_M")),
+    row(("L", "size_L"), ("XL", "size_XL"), ("XXL", "size_XXL")),
+    row(("3XL", "size_3XL")),
+    BACK_ROW,
+)
+
+# Департаменты по два в строке; кнопка ручного ввода удалена
+_dept_items = [(name, f"dept_{key}") for key, name in DEPARTMENT_DISPLAY.items()]
+_DEPARTMENT_KEYBOARD = keyboard(
+    *(row(*_dept_items[i : i + 2]) for i in range(0, len(_dept_items), 2)),
+    BACK_ROW,
+)
+
+_EDIT_HEAD_ROWS = (
+    row(("✅ Сохранить", "confirm_save")),
+    row(("👤 Имя (рус)", "edit_FullNameRU"), ("🌍 Имя (англ)", "edit_FullNameEN")),
+    row(("⚥ Пол", "edit_Gender"), ("👕 Размер", "edit_Size")),
+    row(("⛪ Церковь", "edit_Church"), ("🏙️ Город", "edit_CountryAndCity")),
+)
+_EDIT_TAIL_ROWS = (
+    row(("👨‍💼 Кто подал", "edit_SubmittedBy"), ("📞 Контакты", "edit_ContactInformation")),
+    CANCEL_ROW,
+)
+# У кандидата нет департамента — кнопка редактирования департамента скрыта
+_EDIT_KEYBOARD_CANDIDATE = keyboard(
+    *_EDIT_HEAD_ROWS, row(("👥 Роль", "edit_Role")), *_EDIT_TAIL_ROWS
+)
+_EDIT_KEYBOARD_TEAM = keyboard(
+    *_EDIT_HEAD_ROWS,
+    row(("👥 Роль", "edit_Role"), ("🏢 Департамент", "edit_Department")),
+    *_EDIT_TAIL_ROWS,
+)
 
 
 def get_gender_selection_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора пола."""
-    buttons = [
-        [InlineKeyboardButton("\U0001f468 Мужской", callback_data="gender_M")],
-        [InlineKeyboardButton("\U0001f469 Женский", callback_data="gender_F")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _GENDER_KEYBOARD
 
 
 def get_role_selection_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора роли."""
-    buttons = [
-        [InlineKeyboardButton("\U0001f464 Кандидат", callback_data="role_CANDIDATE")],
-        [InlineKeyboardButton("\U0001f465 Команда", callback_data="role_TEAM")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _ROLE_KEYBOARD
 
 
 def get_gender_selection_keyboard_required() -> InlineKeyboardMarkup:
     """Keyboard for gender selection without manual input."""
-    buttons = [
-        [InlineKeyboardButton("\U0001f468 Мужской", callback_data="gender_M")],
-        [InlineKeyboardButton("\U0001f469 Женский", callback_data="gender_F")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _GENDER_KEYBOARD
 
 
 def get_role_selection_keyboard_required() -> InlineKeyboardMarkup:
     """Keyboard for role selection without manual input."""
-    buttons = [
-        [InlineKeyboardButton("\U0001f464 Кандидат", callback_data="role_CANDIDATE")],
-        [InlineKeyboardButton("\U0001f465 Команда", callback_data="role_TEAM")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _ROLE_KEYBOARD
 
 
 def get_size_selection_keyboard_required() -> InlineKeyboardMarkup:
     """Keyboard for size selection without manual input."""
-    buttons = [
-        [
-            InlineKeyboardButton("XS", callback_data="size_XS"),
-            InlineKeyboardButton("S", callback_data="size_S"),
-            InlineKeyboardButton("M", callback_data="size_M"),
-        ],
-        [
-            InlineKeyboardButton("L", callback_data="size_L"),
-            InlineKeyboardButton("XL", callback_data="size_XL"),
-            InlineKeyboardButton("XXL", callback_data="size_XXL"),
-        ],
-        [InlineKeyboardButton("3XL", callback_data="size_3XL")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _SIZE_KEYBOARD
 
 
 def get_department_selection_keyboard_required() -> InlineKeyboardMarkup:
     """Keyboard for department selection without manual input."""
-    buttons = []
-    dept_items = list(DEPARTMENT_DISPLAY.items())
-    for i in range(0, len(dept_items), 2):
-        row = []
-        for j in range(i, min(i + 2, len(dept_items))):
-            key, display_name = dept_items[j]
-            row.append(InlineKeyboardButton(display_name, callback_data=f"dept_{key}"))
-        buttons.append(row)
-
-    buttons.append([InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")])
-    return InlineKeyboardMarkup(buttons)
+    return _DEPARTMENT_KEYBOARD
 
 
 def get_size_selection_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора размера без ручного ввода."""
-    buttons = [
-        [
-            InlineKeyboardButton("XS", callback_data="size_XS"),
-            InlineKeyboardButton("S", callback_data="size_S"),
-            InlineKeyboardButton("M", callback_data="size_M"),
-        ],
-        [
-            InlineKeyboardButton("L", callback_data="size_L"),
-            InlineKeyboardButton("XL", callback_data="size_XL"),
-            InlineKeyboardButton("XXL", callback_data="size_XXL"),
-        ],
-        [InlineKeyboardButton("3XL", callback_data="size_3XL")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _SIZE_KEYBOARD
 
 
 def get_gender_selection_keyboard_simple() -> InlineKeyboardMarkup:
     """Keyboard for gender selection without manual input."""
-    buttons = [
-        [InlineKeyboardButton("\U0001f468 Мужской", callback_data="gender_M")],
-        [InlineKeyboardButton("\U0001f469 Женский", callback_data="gender_F")],
-        [InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")],
-    ]
-    return InlineKeyboardMarkup(buttons)
+    return _GENDER_KEYBOARD
 
 
 def get_department_selection_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора департамента."""
-    buttons = []
-    dept_items = list(DEPARTMENT_DISPLAY.items())
-    for i in range(0, len(dept_items), 2):
-        row = []
-        for j in range(i, min(i + 2, len(dept_items))):
-            key, display_name = dept_items[j]
-            row.append(InlineKeyboardButton(display_name, callback_data=f"dept_{key}"))
-        buttons.append(row)
-
-    # Кнопка ручного ввода удалена
-    buttons.append([InlineKeyboardButton("↩️ Назад", callback_data="field_edit_cancel")])
-    return InlineKeyboardMarkup(buttons)
+    return _DEPARTMENT_KEYBOARD
 
 
 def get_edit_keyboard(participant_data: Dict) -> InlineKeyboardMarkup:
     """Создает клавиатуру с кнопками для редактирования полей."""
-    buttons = [
-        [InlineKeyboardButton("✅ Сохранить", callback_data="confirm_save")],
-        [
-            InlineKeyboardButton("👤 Имя (рус)", callback_data="edit_FullNameRU"),
-            InlineKeyboardButton("🌍 Имя (англ)", callback_data="edit_FullNameEN"),
-        ],
-        [
-            InlineKeyboardButton("⚥ Пол", callback_data="edit_Gender"),
-            InlineKeyboardButton("👕 Размер", callback_data="edit_Size"),
-        ],
-        [
-            InlineKeyboardButton("⛪ Церковь", callback_data="edit_Church"),
-            InlineKeyboardButton("🏙️ Город", callback_data="edit_CountryAndCity"),
-        ],
-    ]
-
-    role = participant_data.get("Role")
-    if role == "CANDIDATE":
-        buttons.append([InlineKeyboardButton("👥 Роль", callback_data="edit_Role")])
-    else:
-        buttons.append(
-            [
-                InlineKeyboardButton("👥 Роль", callback_data="edit_Role"),
-                InlineKeyboardButton("🏢 Департамент", callback_data="edit_Department"),
-            ]
-        )
-
-    buttons.append(
-        [
-            InlineKeyboardButton("👨‍💼 Кто подал", callback_data="edit_SubmittedBy"),
-            InlineKeyboardButton(
-                "📞 Контакты", callback_data="edit_ContactInformation"
-            ),
-        ]
-    )
-
-    buttons.append([InlineKeyboardButton("❌ Отмена", callback_data="main_cancel")])
-    return InlineKeyboardMarkup(buttons)
+    if participant_data.get("Role") == "CANDIDATE":
+        return _EDIT_KEYBOARD_CANDIDATE
+    return _EDIT_KEYBOARD_TEAM
 
 
 def detect_changes(old: Dict, new: Dict) -> List[str]:
@@ -407,19 +309,34 @@ class ParticipantService:
     4. Поддержка как полного, так и частичного обновления
     """
 
-    def __init__(self, repository: AbstractParticipantRepository):
+    def __init__(
+        self,
+        repository: AbstractParticipantRepository,
+        event_fee: int = 0,
+        cache_ttl: float = 300,
+    ):
         self.repository = repository
+        # Взнос за мероприятие: от него считается статус Partial/Paid
+        self.event_fee = event_fee
         self.logger = logging.getLogger("participant_changes")
         self.performance_logger = logging.getLogger("performance")
         self._participants_cache = None
         self._cache_timestamp = 0
-        self._cache_ttl = 300  # 5 минут
+        # Записи бота обновляют кеш вместе с версией, конфликт версий
+        # перечитывает участника, поэтому TTL нужен только для правок мимо
+        # бота (интерфейс Airtable); 0 — кеш не устаревает
+        self._cache_ttl = cache_ttl
+        # Сколько лучших кандидатов из индекса хранилища пересчитывает поиск
+        self.search_candidates = 50
+        # (список кеша, ключ имени -> участники, телефон/email -> участники)
+        # для проверки дублей без хранилища; строится заново, только если
+        # заменён сам список кеша
+        self._duplicate_index = None
 
     def _get_cached_participants(self):
         now = time.time()
-        if (
-            self._participants_cache is None
-            or now - self._cache_timestamp > self._cache_ttl
+        if self._participants_cache is None or (
+            self._cache_ttl and now - self._cache_timestamp > self._cache_ttl
         ):
             logger.debug("Refreshing participants cache")
             self._participants_cache = self.get_all_participants()
@@ -428,6 +345,33 @@ class ParticipantService:
             logger.debug("Using cached participants")
         return self._participants_cache
 
+    def _cache_put(self, participant: Participant) -> None:
+        """Кладёт сохранённую версию участника в кеш (замена или добавление)."""
+        try:
+            if self._participants_cache is None:
+                return
+            for idx, cached in enumerate(self._participants_cache):
+                if str(cached.id) == str(participant.id):
+                    self._participants_cache[idx] = participant
+                    self._index_duplicate(cached, add=False)
+                    break
+            else:
+                self._participants_cache.append(participant)
+            self._index_duplicate(participant)
+            self._cache_timestamp = time.time()
+        except Exception:
+            self._participants_cache = None
+
+    def _handle_conflict(
+        self, error: ConcurrentModificationError, participant_id: Union[int, str]
+    ) -> None:
+        """Дополняет ошибку актуальной версией участника и обновляет по ней кеш."""
+        if error.current is None:
+            error.current = self.repository.get_by_id(participant_id)
+        if error.current is not None:
+            self._cache_put(error.current)
+        logger.warning("Concurrent modification of participant %s", participant_id)
+
     def _log_participant_change(
         self,
         user_id: Optional[int],
@@ -447,12 +391,60 @@ class ParticipantService:
             entry["old_data"] = old_data
         self.logger.info(json.dumps(entry, ensure_ascii=False))
 
+    def _index_duplicate(self, participant: Participant, add: bool = True) -> None:
+        """Добавляет участника в индекс дублей по кешу или убирает из него."""
+        if self._duplicate_index is None:
+            return
+        _, by_name, by_contact = self._duplicate_index
+        keys = [(by_name, name_key(participant.FullNameRU))]
+        keys += [(by_contact, key) for key in contact_keys(participant.ContactInformation)]
+        for index, key in keys:
+            if not key:
+                continue
+            bucket = [p for p in index.get(key, ()) if p is not participant]
+            if add:
+                bucket.append(participant)
+            index[key] = bucket
+
+    def _cached_duplicates(
+        self, full_name_ru: str, contact: Optional[str]
+    ) -> List[Participant]:
+        """find_duplicates по кешу: ключи участников считаются один раз."""
+        participants = self._get_cached_participants()
+        if self._duplicate_index is None or self._duplicate_index[0] is not participants:
+            self._duplicate_index = (participants, {}, {})
+            for p in participants:
+                self._index_duplicate(p)
+        _, by_name, by_contact = self._duplicate_index
+
+        # участник мог измениться на месте после индексации: ключи сверяются
+        # заново, это дёшево — кандидатов единицы
+        key = name_key(full_name_ru)
+        duplicates = [p for p in by_name.get(key, ()) if key and name_key(p.FullNameRU) == key]
+        for key in contact_keys(contact):
+            for p in by_contact.get(key, ()) if key else ():
+                if key in contact_keys(p.ContactInformation) and all(p is not d for d in duplicates):
+                    duplicates.append(p)
+        return duplicates
+
     def check_duplicate(
-        self, full_name_ru: str, user_id: Optional[int] = None
+        self,
+        full_name_ru: str,
+        user_id: Optional[int] = None,
+        contact: Optional[str] = None,
     ) -> Optional[Participant]:
-        """Return participant if exists, otherwise None."""
+        """
+        Return participant if exists, otherwise None.
+
+        Имя сравнивается по нормализованному ключу (регистр, «ё», дефисы,
+        порядок слов); с ``contact`` дублем считается и участник с тем же
+        телефоном или email.
+        """
         start = time.time()
-        participant = self.repository.get_by_name(full_name_ru)
+        duplicates = self.repository.find_duplicates(full_name_ru, contact)
+        if duplicates is None:
+            duplicates = self._cached_duplicates(full_name_ru, contact)
+        participant = duplicates[0] if duplicates else None
         duration = time.time() - start
         self.performance_logger.info(
             json.dumps(
@@ -506,25 +498,36 @@ class ParticipantService:
         try:
             if self._participants_cache is not None:
                 self._participants_cache.append(new_participant)
+                self._index_duplicate(new_participant)
                 self._cache_timestamp = time.time()
         except Exception:
             self._participants_cache = None
         return new_participant
 
     def update_participant(
-        self, participant_id: Union[int, str], data: Dict, user_id: Optional[int] = None
+        self,
+        participant_id: Union[int, str],
+        data: Dict,
+        user_id: Optional[int] = None,
+        current: Optional[Participant] = None,
     ) -> bool:
         """
         ✅ ОБНОВЛЕНО: полное обновление через объект Participant.
 
-        Validate and update participant completely.
+        Validate and update participant completely. ``current`` — актуальная
+        версия участника, если она уже есть у вызывающего (без повторного
+        чтения); в хранилище уходят только поля, отличающиеся от неё.
+
+        Поля оплаты (PAYMENT_FIELDS) берутся из хранилища: их ведёт журнал
+        платежей, а копия из карточки правки или разобранного текста может
+        быть устаревшей или пустой.
         """
         valid, error = validate_participant_data(data)
         if not valid:
             raise ValidationError(error)
 
         # Получаем существующего участника
-        existing = self.repository.get_by_id(participant_id)
+        existing = current if current is not None else self.repository.get_by_id(participant_id)
         if existing is None:
             raise ParticipantNotFoundError(
                 f"Participant with id {participant_id} not found"
@@ -532,18 +535,28 @@ class ParticipantService:
 
         # ✅ ИСПРАВЛЕНИЕ: создаем новый объект с обновленными данными
         updated_data = data.copy()
-        updated_data["id"] = participant_id
+        updated_data["id"] = existing.id
+        for name in PAYMENT_FIELDS:
+            updated_data[name] = getattr(existing, name)
+        if updated_data.get("version") is None:
+            # данные без версии проверяются по только что прочитанной записи
+            updated_data["version"] = existing.version
 
         start = time.time()
         updated_participant = Participant(**updated_data)
-        result = self.repository.update(updated_participant)
+        updated_participant.mark_clean(existing)
+        try:
+            result = self.repository.update(updated_participant)
+        except ConcurrentModificationError as e:
+            self._handle_conflict(e, participant_id)
+            raise
         duration = time.time() - start
         self._log_participant_change(
             user_id,
             "update",
             data,
             participant_id=participant_id,
-            old_data=asdict(existing),
+            old_data=existing.to_dict(),
         )
         self.performance_logger.info(
             json.dumps(
@@ -556,30 +569,25 @@ class ParticipantService:
                 ensure_ascii=False,
             )
         )
-        # Update cache immediately
-        try:
-            if result and self._participants_cache is not None:
-                pid_int = int(participant_id) if isinstance(participant_id, str) else participant_id
-                for idx, cached in enumerate(self._participants_cache):
-                    if cached.id == pid_int:
-                        self._participants_cache[idx] = updated_participant
-                        break
-                else:
-                    # Not found in cache, append to keep cache consistent
-                    self._participants_cache.append(updated_participant)
-                self._cache_timestamp = time.time()
-        except Exception:
-            self._participants_cache = None
+        # Update cache immediately (вместе с новой версией)
+        if result:
+            self._cache_put(updated_participant)
         return result
 
     def update_participant_fields(
-        self, participant_id: Union[int, str], user_id: Optional[int] = None, **fields
+        self,
+        participant_id: Union[int, str],
+        user_id: Optional[int] = None,
+        current: Optional[Participant] = None,
+        **fields,
     ) -> bool:
         """
         ✅ НОВЫЙ МЕТОД: частичное обновление конкретных полей.
 
         Args:
             participant_id: ID участника
+            current: Версия участника, от которой делалась правка; если её
+                успели изменить — ConcurrentModificationError
             **fields: Поля для обновления
 
         Example:
@@ -587,19 +595,30 @@ class ParticipantService:
         """
 
         # Validate against merged current data to avoid false negatives on missing fields
-        current = self.repository.get_by_id(participant_id)
+        if current is None:
+            current = self.repository.get_by_id(participant_id)
         if current is None:
             raise ParticipantNotFoundError(
                 f"Participant with id {participant_id} not found"
             )
-        merged_dict = asdict(current)
+        invalid_fields = set(fields) - set(DATA_FIELDS)
+        if invalid_fields:
+            raise ValueError(f"Invalid fields for Participant: {invalid_fields}")
+        merged_dict = current.to_dict()
         merged_dict.update(fields)
         valid, error = validate_participant_data(merged_dict)
         if not valid:
             raise ValidationError(error)
 
+        # Пишутся только изменённые поля (dirty_fields) с проверкой версии current
+        updated = Participant(**merged_dict)
+        updated.mark_clean(current)
         start = time.time()
-        result = self.repository.update_fields(participant_id, **fields)
+        try:
+            result = self.repository.update(updated)
+        except ConcurrentModificationError as e:
+            self._handle_conflict(e, participant_id)
+            raise
         duration = time.time() - start
         self._log_participant_change(
             user_id, "update_fields", fields, participant_id=participant_id
@@ -616,17 +635,8 @@ class ParticipantService:
             )
         )
         # Update cache immediately
-        try:
-            if result and self._participants_cache is not None:
-                pid_int = int(participant_id) if isinstance(participant_id, str) else participant_id
-                for cached in self._participants_cache:
-                    if cached.id == pid_int:
-                        for key, value in fields.items():
-                            setattr(cached, key, value)
-                        break
-                self._cache_timestamp = time.time()
-        except Exception:
-            self._participants_cache = None
+        if result:
+            self._cache_put(updated)
         return result
 
     def get_participant(self, participant_id: Union[int, str]) -> Optional[Participant]:
@@ -715,10 +725,14 @@ class ParticipantService:
                 )
                 return results
 
-        all_participants = self._get_cached_participants()
+        # Кандидаты — лучшие совпадения из полнотекстового индекса (SQLite);
+        # если хранилище так искать не умеет, — все участники из кеша
+        candidates = self.repository.search(query_cleaned, limit=self.search_candidates)
+        if candidates is None:
+            candidates = self._get_cached_participants()
 
         # 2. Точные совпадения по именам
-        for p in all_participants:
+        for p in candidates:
             if p.FullNameRU and p.FullNameRU.lower() == query_cleaned.lower():
                 results.append(
                     SearchResult(
@@ -745,7 +759,7 @@ class ParticipantService:
 
         # 3. Fuzzy поиск
         results.extend(
-            self._fuzzy_search(query_cleaned, all_participants, min_confidence)
+            self._fuzzy_search(query_cleaned, candidates, min_confidence)
         )
 
         results.sort(key=lambda x: x.confidence, reverse=True)
@@ -797,6 +811,24 @@ class ParticipantService:
                             else "partial",
                         )
                     )
+                    continue
+
+            # Церковь, город и контакты тоже есть в индексе поиска: по ним
+            # только вхождение подстроки и уверенность ниже, чем по имени
+            if _EXTRA_FIELD_CONFIDENCE >= min_confidence:
+                query_lower = query.lower()
+                for field_name, match_field in _EXTRA_SEARCH_FIELDS:
+                    value = getattr(p, field_name)
+                    if value and query_lower in value.lower():
+                        results.append(
+                            SearchResult(
+                                participant=p,
+                                confidence=_EXTRA_FIELD_CONFIDENCE,
+                                match_field=match_field,
+                                match_type="partial",
+                            )
+                        )
+                        break
 
         return results
 
@@ -831,49 +863,32 @@ class ParticipantService:
     def format_search_result(self, result: SearchResult) -> str:
         """Форматирует результат поиска для отображения."""
 
-        p = result.participant
-        confidence_emoji = "🎯" if result.confidence == 1.0 else "🔍"
-        role_emoji = "👤" if p.Role == "CANDIDATE" else "👨‍💼"
-
-        text = f"{confidence_emoji} {role_emoji} **{p.FullNameRU}** (ID: {p.id})\n"
-        text += f"   • Церковь: {p.Church}\n"
-        text += f"   • Роль: {p.Role}"
-        if p.Role == "TEAM" and p.Department:
-            text += f" ({p.Department})"
-
-        # Добавляем информацию об оплате
-        if hasattr(p, 'PaymentStatus') and p.PaymentStatus:
-            if p.PaymentStatus == "Paid" and hasattr(p, 'PaymentAmount') and p.PaymentAmount:
-                text += f"\n   • 💰 Оплачено: {p.PaymentAmount} ₪"
-            elif p.PaymentStatus == "Partial" and hasattr(p, 'PaymentAmount') and p.PaymentAmount:
-                text += f"\n   • 🔄 Частично: {p.PaymentAmount} ₪"
-            elif p.PaymentStatus == "Refunded":
-                text += f"\n   • 🔙 Возврат оплаты"
-            else:
-                text += f"\n   • ❌ Не оплачено"
-        else:
-            text += f"\n   • ❌ Не оплачено"
-
-        if result.match_field == "name_en" and p.FullNameEN:
-            text += f"\n   • English: {p.FullNameEN}"
-
-        if result.confidence < 1.0:
-            text += f"\n   • Совпадение: {int(result.confidence * 100)}%"
+        return card_renderer.search_result(result)
 
-        return text
-
-    def process_payment(self, participant_id: Union[int, str], amount: int, payment_date: Optional[str] = None, user_id: Optional[int] = None) -> bool:
+    def process_payment(
+        self,
+        participant_id: Union[int, str],
+        amount: int,
+        payment_date: Optional[str] = None,
+        user_id: Optional[int] = None,
+        method: Optional[str] = None,
+    ) -> Dict:
         """
-        ✅ НОВЫЙ МЕТОД: обработка платежа участника.
+        Вносит платёж участника в журнал платежей.
+
+        Каждый взнос сохраняется отдельной записью; сумма оплаты участника
+        становится его балансом, а статус — Partial или Paid относительно
+        ``event_fee``.
 
         Args:
             participant_id: ID участника
             amount: Сумма в шейкелях (целое число)
             payment_date: Дата оплаты в ISO формате (опционально)
             user_id: ID пользователя для логирования
+            method: Способ оплаты (опционально)
 
         Returns:
-            bool: True если операция успешна
+            Dict: ``payment_id``, ``amount``, ``balance``, ``status``, ``payment_date``
 
         Raises:
             ParticipantNotFoundError: Если участник не найден
@@ -891,10 +906,11 @@ class ParticipantService:
         if payment_date is None:
             payment_date = date.today().isoformat()
 
-        # Определяем статус на основе суммы
-        status = "Paid"  # По умолчанию считаем полной оплатой
-        
-        success = self.repository.update_payment(participant_id, status, amount, payment_date)
+        result = self.repository.record_payment(
+            participant_id, amount, payment_date, self.event_fee, method, user_id
+        )
+        status = result["status"]
+        balance = result["balance"]
         
         duration = time.time() - start
         self.performance_logger.info(
@@ -904,6 +920,7 @@ class ParticipantService:
                 "user_id": user_id,
                 "participant_id": participant_id,
                 "amount": amount,
+                "balance": balance,
                 "status": status
             }, ensure_ascii=False)
         )
@@ -912,25 +929,124 @@ class ParticipantService:
         self._log_participant_change(
             user_id, 
             "payment_update", 
-            {"PaymentStatus": status, "PaymentAmount": amount, "PaymentDate": payment_date},
+            {
+                "PaymentStatus": status,
+                "PaymentAmount": balance,
+                "PaymentDate": result["payment_date"],
+                "payment": amount,
+            },
             participant_id=participant_id
         )
         
         # Update cache immediately
         try:
-            if success and self._participants_cache is not None:
+            if self._participants_cache is not None:
                 pid_int = int(participant_id) if isinstance(participant_id, str) else participant_id
                 for cached in self._participants_cache:
                     if cached.id == pid_int:
                         cached.PaymentStatus = status
-                        cached.PaymentAmount = amount
-                        cached.PaymentDate = payment_date
+                        cached.PaymentAmount = balance
+                        cached.PaymentDate = result["payment_date"]
+                        cached.version = result.get("version")
                         break
                 self._cache_timestamp = time.time()
         except Exception:
             self._participants_cache = None
         
-        return success
+        return result
+
+    def get_participant_balance(self, participant_id: Union[int, str]) -> Optional[Dict]:
+        """Баланс участника по журналу платежей (None — платежей не было)."""
+        return self.repository.get_balance(participant_id)
+
+    def get_cash_flow(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Поступления по дням за период (даты ISO, включительно)."""
+        return self.repository.get_cash_flow(start, end)
+
+    def reconcile_payments(
+        self, lines: Iterable[str], min_confidence: float = 0.85
+    ) -> ReconciliationReport:
+        """
+        Сопоставляет строки выписки банка/Bit с участниками.
+
+        Индексы по телефону и имени строятся один раз из кеша участников;
+        строки без точного совпадения ищутся обычным поиском.
+
+        Args:
+            lines: Строки CSV-файла (читаются потоком)
+            min_confidence: Порог, выше которого совпадение считается уверенным
+
+        Returns:
+            ReconciliationReport: совпадения с оценкой уверенности
+        """
+        start = time.time()
+        matcher = ParticipantMatcher(
+            self._get_cached_participants(),
+            search=lambda payer: self.search_participants(payer, max_results=2, min_confidence=0.7),
+        )
+        report = reconcile(lines, matcher, min_confidence)
+        self.performance_logger.info(
+            json.dumps({
+                "operation": "reconcile_payments",
+                "duration": time.time() - start,
+                "rows": len(report.matches),
+                "confident": len(report.confident),
+                "unmatched": len(report.unmatched),
+            }, ensure_ascii=False)
+        )
+        return report
+
+    def apply_reconciliation(
+        self, matches: List[ReconciliationMatch], user_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Вносит подтверждённые строки сверки одной пачкой через репозиторий.
+
+        Returns:
+            Dict: ``recorded``, ``duplicates``, ``missing`` (см. ``record_payments``)
+        """
+        start = time.time()
+        payments = [
+            {
+                "participant_id": match.participant.id,
+                "amount": match.transfer.amount,
+                "date": match.transfer.date,
+                "method": "bank_import",
+                "recorded_by": user_id,
+                "reference": match.transfer.reference,
+            }
+            for match in matches
+            if match.participant is not None
+        ]
+        result = self.repository.record_payments(payments, self.event_fee) if payments else {
+            "recorded": [], "duplicates": [], "missing": []
+        }
+        self.performance_logger.info(
+            json.dumps({
+                "operation": "apply_reconciliation",
+                "duration": time.time() - start,
+                "user_id": user_id,
+                "recorded": len(result["recorded"]),
+                "duplicates": len(result["duplicates"]),
+            }, ensure_ascii=False)
+        )
+        for recorded in result["recorded"]:
+            self._log_participant_change(
+                user_id,
+                "payment_update",
+                {
+                    "PaymentStatus": recorded["status"],
+                    "PaymentAmount": recorded["balance"],
+                    "PaymentDate": recorded["payment_date"],
+                    "payment": recorded["amount"],
+                    "reference": recorded.get("reference"),
+                },
+                participant_id=recorded["participant_id"],
+            )
+        if result["recorded"]:
+            # после пачки проще перечитать участников, чем править кеш по одному
+            self._participants_cache = None
+        return result
 
     def get_payment_statistics(self) -> Dict:
         """
@@ -952,6 +1068,24 @@ class ParticipantService:
         
         return stats
 
+    def verify_payment_statistics(self) -> Dict:
+        """
+        Проверка сводки оплат: пересчёт с нуля и пересборка при расхождении.
+
+        Returns:
+            Dict: ``consistent``, ``repaired`` и ``differences``
+        """
+        start = time.time()
+        result = self.repository.verify_payment_summary()
+        self.performance_logger.info(
+            json.dumps({
+                "operation": "verify_payment_statistics",
+                "duration": time.time() - start,
+                "consistent": result.get("consistent"),
+            }, ensure_ascii=False)
+        )
+        return result
+
     def validate_payment_data(self, payment_info: Dict) -> Tuple[bool, str]:
         """
         ✅ НОВЫЙ МЕТОД: валидация данных платежа.
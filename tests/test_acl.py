@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from main import CHOOSING_ACTION, admin_command, handle_action_selection, stats_command
+from models.participant import Participant
+from utils.acl import COORDINATOR, UNAUTHORIZED, VIEWER, AccessControl, acl
+
+
+class AccessControlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "acl.json")
+        self.acl = AccessControl(self.path, coordinators=[1], viewers=[2], check_interval=0)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        # гарантируем другую отметку файла даже на грубых часах ФС
+        os.utime(self.path, ns=(1, os.stat(self.path).st_mtime_ns + 1_000_000))
+
+    def test_static_roles_and_hierarchy(self):
+        self.assertEqual(self.acl.role_of(1), COORDINATOR)
+        self.assertEqual(self.acl.role_of(2), VIEWER)
+        self.assertEqual(self.acl.role_of(3), UNAUTHORIZED)
+        self.assertTrue(self.acl.has_role(1, VIEWER))
+        self.assertFalse(self.acl.has_role(2, COORDINATOR))
+        self.assertTrue(self.acl.can(1, "admin"))
+        self.assertFalse(self.acl.can(2, "add"))
+        self.assertFalse(self.acl.can(None, "search"))
+
+    def test_grant_revoke_persist_to_file(self):
+        self.acl.grant(3, COORDINATOR)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["users"], {"3": COORDINATOR})
+
+        other = AccessControl(self.path, check_interval=0)
+        self.assertEqual(other.role_of(3), COORDINATOR)
+
+        self.assertTrue(self.acl.revoke(3))
+        self.assertFalse(self.acl.revoke(1))  # роль из config.py
+        self.assertEqual(self.acl.role_of(3), UNAUTHORIZED)
+        self.assertEqual(self.acl.role_of(1), COORDINATOR)
+
+    def test_hot_reload_on_file_change(self):
+        self.assertFalse(self.acl.has_role(5, VIEWER))
+        self._write({"users": {"5": "viewer"}, "permissions": {"viewer": ["search"]}})
+        self.assertEqual(self.acl.role_of(5), VIEWER)
+        self.assertTrue(self.acl.can(5, "search"))
+        self.assertFalse(self.acl.can(5, "list"))
+
+        # битый файл не отбирает выданные роли
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{broken")
+        with self.assertLogs("utils.acl", level="ERROR"):
+            self.assertEqual(self.acl.role_of(5), VIEWER)
+
+    def test_reload_is_throttled(self):
+        lazy = AccessControl(self.path, check_interval=3600)
+        self.assertEqual(lazy.role_of(5), UNAUTHORIZED)
+        self._write({"users": {"5": "viewer"}})
+        self.assertEqual(lazy.role_of(5), UNAUTHORIZED)
+        lazy.reload()
+        self.assertEqual(lazy.role_of(5), VIEWER)
+
+    def test_override_replaces_role_members(self):
+        with self.acl.override(COORDINATOR, [7]), self.acl.override(VIEWER, [1]):
+            self.assertEqual(self.acl.role_of(7), COORDINATOR)
+            self.assertEqual(self.acl.role_of(1), VIEWER)
+            self.assertEqual(self.acl.role_of(2), UNAUTHORIZED)
+        self.assertEqual(self.acl.role_of(1), COORDINATOR)
+        self.assertEqual(self.acl.role_of(7), UNAUTHORIZED)
+
+
+class AdminCommandTestCase(unittest.IsolatedAsyncioTestCase):
+    async def _admin(self, user_id, *args):
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=user_id), message=MagicMock(), callback_query=None
+        )
+        update.message.reply_text = AsyncMock()
+        context = SimpleNamespace(args=list(args), user_data={}, chat_data={})
+        with patch("main.user_logger"):
+            await admin_command(update, context)
+        return update.message.reply_text.await_args.args[0]
+
+    async def test_grant_and_revoke_via_command(self):
+        with tempfile.TemporaryDirectory() as tmpdir, patch.object(
+            acl, "path", os.path.join(tmpdir, "acl.json")
+        ), acl.override(COORDINATOR, [10]):
+            self.assertIn("выдана роль", await self._admin(10, "grant", "20", "viewer"))
+            self.assertTrue(acl.has_role(20, VIEWER))
+            self.assertIn("20", await self._admin(10))
+            self.assertIn("отозван", await self._admin(10, "revoke", "20"))
+            self.assertFalse(acl.has_role(20, VIEWER))
+            self.assertIn("/admin grant", await self._admin(10, "grant", "x"))
+
+            self.assertIn("Только координаторы", await self._admin(20, "grant", "21", "coordinator"))
+            self.assertFalse(acl.has_role(21, VIEWER))
+
+    async def test_file_permissions_restrict_commands(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "acl.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"permissions": {"viewer": ["search", "list"]}}, f)
+            restricted = AccessControl(path, viewers=[30], check_interval=0)
+            update = SimpleNamespace(
+                effective_user=SimpleNamespace(id=30), message=MagicMock(), callback_query=None
+            )
+            update.message.reply_text = AsyncMock()
+            context = SimpleNamespace(args=[], user_data={}, chat_data={})
+            with patch("utils.decorators.acl", restricted), patch("main.user_logger"), \
+                 patch("main.participant_service") as service:
+                await stats_command(update, context)
+            service.get_payment_statistics.assert_not_called()
+            self.assertIn("Недостаточно прав", update.message.reply_text.await_args.args[0])
+
+    async def test_file_permissions_restrict_search_actions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "acl.json")
+            commands = ["start", "help", "search", "list", "cancel", "edit", "delete"]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"permissions": {"coordinator": commands}}, f)
+            restricted = AccessControl(path, coordinators=[40], check_interval=0)
+            query = MagicMock(data="action_payment")
+            query.answer = AsyncMock()
+            query.message.reply_text = AsyncMock()
+            update = SimpleNamespace(effective_user=SimpleNamespace(id=40), callback_query=query)
+            participant = Participant(FullNameRU="Иван Петров", id=1)
+            context = SimpleNamespace(user_data={"selected_participant": participant}, chat_data={})
+            with patch("main.acl", restricted), patch("main.show_panel", new=AsyncMock()) as panel:
+                state = await handle_action_selection(update, context)
+            self.assertEqual(state, CHOOSING_ACTION)
+            panel.assert_not_awaited()
+            self.assertNotIn("payment_participant", context.user_data)
+            self.assertIn("Недостаточно прав", query.message.reply_text.await_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from dataclasses import asdict, replace
+
+from models.participant import Participant
+from services.participant_service import SearchResult
+from utils.card_renderer import CardRenderer, escape_value
+from utils.metrics import MetricsRegistry
+
+
+class CardRendererTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.renderer = CardRenderer(max_entries=3, registry=self.registry)
+        self.participant = Participant(
+            id=7,
+            FullNameRU="Иван Петров",
+            Gender="M",
+            Size="L",
+            Church="Грейс",
+            Role="TEAM",
+            Department="Worship",
+            PaymentStatus="Paid",
+            PaymentAmount=500,
+        )
+
+    def test_block_matches_previous_format(self):
+        text = self.renderer.block(self.participant)
+        self.assertEqual(
+            text,
+            "Имя (рус): Иван Петров\n"
+            "Имя (англ): Не указано\n"
+            "Пол: Мужской\n"
+            "Размер: L\n"
+            "Церковь: Грейс\n"
+            "Роль: Команда\n"
+            "Департамент: Прославление\n"
+            "Город: Не указано\n"
+            "Кто подал: Не указано\n"
+            "Контакты: Не указано\n"
+            "💰 Статус оплаты: ✅ Оплачено\n"
+            "💳 Сумма оплаты: 500 ₪",
+        )
+        # dict и Participant с одинаковыми полями дают одну карточку из кеша
+        self.assertEqual(self.renderer.block(asdict(self.participant)), text)
+
+    def test_list_and_search_cards(self):
+        message = self.renderer.participant_list([self.participant])
+        self.assertEqual(
+            message,
+            "📋 **Список участников (1 чел.):**\n\n"
+            "👨‍💼 **Иван Петров**\n"
+            "   • Роль: TEAM (Worship)\n"
+            "   • Оплата: 💰 500 ₪\n"
+            "   • ID: 7\n\n",
+        )
+        result = SearchResult(
+            participant=self.participant, confidence=0.8, match_field="name_ru", match_type="fuzzy"
+        )
+        self.assertEqual(
+            self.renderer.search_result(result),
+            "🔍 👨‍💼 **Иван Петров** (ID: 7)\n"
+            "   • Церковь: Грейс\n"
+            "   • Роль: TEAM (Worship)\n"
+            "   • 💰 Оплачено: 500 ₪\n"
+            "   • Совпадение: 80%",
+        )
+
+    def test_markdown_is_escaped_in_values(self):
+        participant = replace(self.participant, FullNameRU="Иван_Петров*", Church="[Грейс]")
+        text = self.renderer.full_info(asdict(participant))
+        self.assertIn("👤 **Иван\\_Петров\\*** (ID: 7)", text)
+        self.assertIn("⛪ Церковь: \\[Грейс]", text)
+        self.assertEqual(escape_value(500), "500")
+
+    def test_cards_rendered_once_per_version(self):
+        self.renderer.list_item(self.participant)
+        self.renderer.list_item(self.participant)
+        self.assertEqual(self.registry.get_counter("cards.rendered"), 1)
+        self.assertEqual(self.registry.get_counter("cards.cache_hits"), 1)
+
+        paid_more = replace(self.participant, PaymentAmount=700)
+        self.assertIn("💰 700 ₪", self.renderer.list_item(paid_more))
+        self.assertEqual(self.registry.get_counter("cards.rendered"), 2)
+
+        # кеш ограничен: самые старые карточки вытесняются
+        for amount in (1, 2, 3):
+            self.renderer.list_item(replace(self.participant, PaymentAmount=amount))
+        self.assertEqual(len(self.renderer), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from scripts import dashboard
+
+
+def _timing(handler, duration, user_id=1, error=None, ts="2025-08-13T10:15:00"):
+    return json.dumps(
+        {
+            "timestamp": ts,
+            "event": "handler_timing",
+            "user_id": user_id,
+            "handler": handler,
+            "duration": duration,
+            "error": error,
+        }
+    ) + "\n"
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_percentile_and_fraction_over(self):
+        hist = [0] * dashboard.HIST_SIZE
+        hist[dashboard.bucket_index(0.08)] = 90  # 50..100 ms
+        hist[dashboard.bucket_index(2.5)] = 10  # 2..3 s
+        self.assertLessEqual(dashboard.percentile(hist, 0.5), 0.1)
+        self.assertGreater(dashboard.percentile(hist, 0.95), 2.0)
+        self.assertAlmostEqual(dashboard.fraction_over(hist, 2.0), 0.1)
+        self.assertIsNone(dashboard.percentile([0] * dashboard.HIST_SIZE, 0.5))
+
+
+class LatencyIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_dir = self.tmp.name
+        self.live = os.path.join(self.log_dir, "user_actions.log")
+        self.index = dashboard.LatencyIndex(os.path.join(self.log_dir, "dashboard.db"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def _append(self, *lines, path=None):
+        with open(path or self.live, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def _count(self):
+        return self.index.conn.execute("SELECT SUM(count) FROM latency_buckets").fetchone()[0]
+
+    def test_incremental_ingest_survives_rotation(self):
+        self._append(
+            _timing("handle_search_input", 0.2),
+            _timing("log_all_updates", 0.001),
+            json.dumps({"event": "user_action", "action": "x"}) + "\n",
+        )
+        self.assertEqual(self.index.ingest(self.log_dir), 1)
+        self.assertEqual(self.index.ingest(self.log_dir), 0)
+
+        # незавершённая строка не читается до появления перевода строки
+        self._append(_timing("add_command", 1.0), _timing("list_command", 0.5).rstrip("\n"))
+        self.assertEqual(self.index.ingest(self.log_dir), 1)
+
+        self._append("\n")
+        os.rename(self.live, self.live + ".1")
+        self._append(_timing("handle_payment_confirmation", 0.3, error="DatabaseError"))
+        self.assertEqual(self.index.ingest(self.log_dir), 2)
+        self.assertEqual(self._count(), 4)
+
+        commands = {
+            row[0]
+            for row in self.index.conn.execute("SELECT DISTINCT command FROM latency_buckets")
+        }
+        self.assertEqual(commands, {"/search", "/add", "/list", "/payment"})
+
+    def test_report_and_html(self):
+        self._append(
+            *[_timing("handle_search_input", 0.05, user_id=7) for _ in range(19)],
+            _timing("handle_search_input", 4.0, user_id=7, error="BotException"),
+        )
+        self.index.ingest(self.log_dir)
+        report = dashboard.build_report(self.index, days=1, now=datetime(2025, 8, 13, 10, 30))
+
+        search = report["by_command"]["/search"]
+        self.assertEqual(search.count, 20)
+        self.assertAlmostEqual(search.error_rate, 0.05)
+        # один медленный и ошибочный вызов из 20 при бюджете 5% — ровно 1×
+        burn = dashboard.burn_rate(search, 1.0, 0.95)
+        self.assertAlmostEqual(burn, 1.0)
+
+        page = dashboard.render_html(report)
+        self.assertIn("/search", page)
+        self.assertIn("<svg", page)
+        self.assertIn("<td>7</td>", page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import sqlite3
+import unittest
+from unittest.mock import MagicMock, patch
+
+import database
+from models.participant import DATA_FIELDS, Participant
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from repositories.participant_repository import SqliteParticipantRepository
+from services.participant_service import ParticipantService
+
+
+class DirtyFieldsTestCase(unittest.TestCase):
+    def test_without_snapshot_everything_is_dirty(self):
+        self.assertEqual(Participant(FullNameRU="Иван").dirty_fields(), DATA_FIELDS)
+
+    def test_changes_after_mark_clean(self):
+        participant = Participant(FullNameRU="Иван", Size="M", id=1)
+        participant.mark_clean()
+        self.assertEqual(participant.dirty_fields(), ())
+
+        participant.Size = "L"
+        participant.Church = "Грейс"
+        participant.id = 2  # id не является полем данных
+        self.assertEqual(participant.dirty_fields(), ("Size", "Church"))
+
+        participant.Size = "M"
+        self.assertEqual(participant.dirty_fields(), ("Church",))
+
+    def test_mark_clean_against_saved_version(self):
+        saved = Participant(FullNameRU="Иван", Size="M")
+        edited = Participant(FullNameRU="Иван", Size="L")
+        edited.mark_clean(saved)
+        self.assertEqual(edited.dirty_fields(), ("Size",))
+
+
+class SqliteDirtyUpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+        self.repository = SqliteParticipantRepository()
+        self.participant_id = self.repository.add(
+            Participant(FullNameRU="Иван Петров", Role="CANDIDATE", Size="M", Church="Благодать")
+        )
+        self.statements = []
+        self.conn.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def _updates(self):
+        # триггеры сводки оплат повторяют текст оператора в трассировке
+        return list(dict.fromkeys(s for s in self.statements if s.lstrip().startswith("UPDATE participants")))
+
+    def test_update_writes_only_changed_columns(self):
+        participant = self.repository.get_by_id(self.participant_id)
+        participant.Size = "L"
+        participant.Church = "Грейс"
+        self.statements.clear()
+
+        self.assertTrue(self.repository.update(participant))
+        (statement,) = self._updates()
+        self.assertIn("Size = 'L'", statement)
+        self.assertIn("Church = 'Грейс'", statement)
+        self.assertNotIn("FullNameRU", statement)
+        self.assertEqual(participant.dirty_fields(), ())
+
+        self.statements.clear()
+        self.repository.update(participant)  # нечего писать
+        self.assertEqual(self._updates(), [])
+        self.assertEqual(self.repository.get_by_id(self.participant_id).Size, "L")
+
+    def test_update_without_snapshot_writes_all_columns(self):
+        self.repository.update(Participant(FullNameRU="Иван Петров", Role="CANDIDATE", id=self.participant_id))
+        (statement,) = self._updates()
+        self.assertIn("FullNameRU = ", statement)
+        self.assertIn("PaymentDate = ", statement)
+
+    def test_update_fields_skips_read(self):
+        self.assertTrue(self.repository.update_fields(self.participant_id, Gender="M"))
+        self.assertFalse([s for s in self.statements if s.lstrip().startswith("SELECT *")])
+        self.assertEqual(len(self._updates()), 1)
+        self.assertEqual(self.repository.get_by_id(self.participant_id).Gender, "M")
+
+        with self.assertRaises(database.ParticipantNotFoundError):
+            self.repository.update_fields(999, Gender="M")
+
+    def test_service_uses_callers_version(self):
+        service = ParticipantService(self.repository)
+        current = self.repository.get_by_id(self.participant_id)
+        data = current.to_dict()
+        data["Size"] = "XL"
+        self.statements.clear()
+
+        with patch.object(self.repository, "get_by_id", wraps=self.repository.get_by_id) as get_by_id:
+            service.update_participant(self.participant_id, data, current=current)
+            get_by_id.assert_not_called()
+        (statement,) = self._updates()
+        self.assertIn("Size = 'XL'", statement)
+        self.assertNotIn("FullNameRU", statement)
+
+
+class AirtableDirtyUpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            self.repo = AirtableParticipantRepository()
+        self.repo.table = MagicMock()
+        self.repo.table.get.return_value = {
+            "id": "rec1",
+            "fields": {"FullNameRU": "Иван", "Role": "TEAM", "Department": "Worship", "PaymentDate": "2025-01-10"},
+        }
+
+    def test_patch_contains_only_changed_fields(self):
+        participant = self.repo.get_by_id("rec1")
+        participant.Size = "L"
+        self.repo.update(participant)
+        self.repo.table.update.assert_called_once_with("rec1", {"Size": "L"})
+
+    def test_cleared_fields_are_sent_as_null(self):
+        participant = self.repo.get_by_id("rec1")
+        participant.Role = "CANDIDATE"
+        participant.PaymentDate = ""
+        self.repo.update(participant)
+        self.repo.table.update.assert_called_once_with(
+            "rec1", {"Role": "CANDIDATE", "Department": None, "PaymentDate": None}
+        )
+
+    def test_unchanged_participant_is_not_sent(self):
+        self.assertTrue(self.repo.update(self.repo.get_by_id("rec1")))
+        self.repo.table.update.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import database
+from models.participant import Participant
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from repositories.participant_repository import SqliteParticipantRepository
+from services.participant_service import ParticipantService
+from utils.duplicate_keys import contact_keys, name_key, normalize_phone, phone_keys
+from utils.exceptions import DuplicateParticipantError
+
+ANNA = {
+    "FullNameRU": "Анна Козлова",
+    "Gender": "F",
+    "Size": "M",
+    "Church": "Благодать",
+    "Role": "CANDIDATE",
+    "ContactInformation": "+972 50-123-4567, Anna.K@Mail.ru",
+}
+
+
+class DuplicateKeysTestCase(unittest.TestCase):
+    def test_name_key(self):
+        key = name_key("Анна Козлова")
+        for variant in ("анна козлова", "  АННА   Козлова ", "Козлова Анна", "Козлова-Анна"):
+            self.assertEqual(name_key(variant), key, variant)
+        self.assertEqual(name_key("Алёна Фёдорова"), name_key("Алена Федорова"))
+        self.assertNotEqual(name_key("Анна Козлова"), name_key("Анна Козлов"))
+        self.assertIsNone(name_key(""))
+        self.assertIsNone(name_key(" - "))
+        self.assertEqual(name_key("Козлова, Анна."), key)
+        self.assertNotEqual(name_key("Анна Козлова 2"), key)
+
+    def test_contact_keys(self):
+        self.assertEqual(contact_keys("050 123 4567"), ("501234567", None))
+        self.assertEqual(contact_keys(ANNA["ContactInformation"]), ("501234567", "anna.k@mail.ru"))
+        self.assertEqual(contact_keys("1234567890@mail.ru"), (None, "1234567890@mail.ru"))
+        # дата — не телефон
+        self.assertEqual(contact_keys("род. 12.03.1990"), (None, None))
+        self.assertEqual(contact_keys(None), (None, None))
+
+    def test_phone_keys(self):
+        self.assertEqual(normalize_phone("+972-50-123-4567"), normalize_phone("050 1234567"))
+        self.assertIsNone(normalize_phone("12.03.1990"))
+        self.assertEqual(
+            phone_keys("050-123-4567 или 052 765 4321, 1234567890@mail.ru"),
+            ["501234567", "527654321"],
+        )
+
+
+class SqliteDuplicateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+        self.service = ParticipantService(SqliteParticipantRepository(), cache_ttl=0)
+        self.anna_id = self.service.add_participant(dict(ANNA)).id
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def test_name_variants_are_duplicates(self):
+        for variant in ("анна козлова", "Козлова  Анна", "АННА-КОЗЛОВА"):
+            self.assertEqual(self.service.check_duplicate(variant).id, self.anna_id, variant)
+        self.assertIsNone(self.service.check_duplicate("Анна Петрова"))
+        with self.assertRaises(DuplicateParticipantError):
+            self.service.add_participant({**ANNA, "FullNameRU": "козлова анна"})
+
+    def test_contact_match_is_opt_in(self):
+        self.assertIsNone(self.service.check_duplicate("Анна Ковалёва", contact="050-765-43-21"))
+        self.assertIsNone(self.service.check_duplicate("Анна Ковалёва"))
+        self.assertEqual(
+            self.service.check_duplicate("Анна Ковалёва", contact="050 123 4567").id, self.anna_id
+        )
+        self.assertEqual(
+            self.service.check_duplicate("Анна Ковалёва", contact="anna.k@mail.ru").id, self.anna_id
+        )
+
+    def test_keys_follow_updates(self):
+        self.service.update_participant_fields(
+            self.anna_id, FullNameRU="Анна Смирнова", ContactInformation="anna@example.com"
+        )
+        self.assertIsNone(self.service.check_duplicate("Анна Козлова", contact="0501234567"))
+        self.assertEqual(self.service.check_duplicate("смирнова анна").id, self.anna_id)
+
+        participant = self.service.get_participant(self.anna_id)
+        participant_data = participant.to_dict()
+        participant_data["FullNameRU"] = "Анна Орлова"
+        database.update_participant(self.anna_id, participant_data)
+        self.assertEqual(self.service.check_duplicate("анна орлова").id, self.anna_id)
+
+    def test_migration_fills_keys_of_existing_participants(self):
+        self.conn.execute("UPDATE participants SET NameKey = NULL, PhoneKey = NULL, EmailKey = NULL")
+        self.conn.execute("PRAGMA user_version = 7")  # база до миграции 8
+        with patch("builtins.print"):
+            database.init_database()
+        self.assertEqual(database.find_participant_by_name("КОЗЛОВА АННА")["id"], self.anna_id)
+        self.assertEqual(
+            [row["id"] for row in database.find_participants_by_contact("0501234567")], [self.anna_id]
+        )
+
+
+class CachedDuplicateTestCase(unittest.TestCase):
+    def setUp(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            self.repository = AirtableParticipantRepository()
+        self.service = ParticipantService(self.repository)
+
+    def test_airtable_checks_keys_against_cache(self):
+        anna = Participant(**ANNA, id="rec1")
+        with patch.object(self.repository, "get_all", return_value=[anna]) as get_all, \
+             patch.object(self.repository, "get_by_name") as get_by_name, \
+             patch.object(self.repository, "add", return_value="rec2"):
+            self.assertIs(self.service.check_duplicate("анна козлова"), anna)
+            self.assertIs(self.service.check_duplicate("Ольга Орлова", contact="0501234567"), anna)
+
+            olga = self.service.add_participant(
+                {**ANNA, "FullNameRU": "Ольга Орлова", "ContactInformation": "olga@example.com"}
+            )
+            self.assertIs(self.service.check_duplicate("орлова ольга"), olga)
+            get_all.assert_called_once()
+            get_by_name.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ import re
 import unittest
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
+from utils.acl import acl
 
 
 class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
@@ -47,7 +48,7 @@ class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
         with patch("main.participant_service", new=SimpleNamespace(get_participant=lambda _id: participant)), \
              patch("main.user_logger"), \
              patch("main.show_confirmation", new=AsyncMock()), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]):
+             acl.override("coordinator", [user_id]):
             state = await handle_edit_participant_callback(update, context)
 
         self.assertEqual(state, CONFIRMING_DATA)
@@ -80,7 +81,7 @@ class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
         with patch("main.participant_service", new=SimpleNamespace(get_participant=lambda _id: participant)), \
              patch("main.user_logger"), \
              patch("main.show_confirmation", new=AsyncMock()), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]):
+             acl.override("coordinator", [user_id]):
             state = await handle_edit_participant_callback(entry_update, context)
         self.assertEqual(state, CONFIRMING_DATA)
 
@@ -138,7 +139,7 @@ class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
         with patch("main.participant_service", new=SimpleNamespace(get_participant=lambda _id: participant)), \
              patch("main.user_logger"), \
              patch("main.show_confirmation", new=AsyncMock()), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]):
+             acl.override("coordinator", [user_id]):
             state = await handle_edit_participant_callback(entry_update, context)
         self.assertEqual(state, CONFIRMING_DATA)
 
@@ -197,7 +198,7 @@ class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
         with patch("main.participant_service", new=SimpleNamespace(get_participant=lambda _id: participant)), \
              patch("main.user_logger"), \
              patch("main.show_confirmation", new=AsyncMock()), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]):
+             acl.override("coordinator", [user_id]):
             state = await handle_edit_participant_callback(entry_update, context)
         self.assertEqual(state, CONFIRMING_DATA)
 
@@ -254,7 +255,7 @@ class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
         with patch("main.participant_service", new=SimpleNamespace(get_participant=lambda _id: participant)), \
              patch("main.user_logger"), \
              patch("main.show_confirmation", new=AsyncMock()), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]):
+             acl.override("coordinator", [user_id]):
             _ = await handle_edit_participant_callback(entry_update, context)
 
         # Now simulate pressing Save
@@ -280,12 +281,45 @@ class EditAfterAddFlowTests(unittest.IsolatedAsyncioTestCase):
         )), \
              patch("main._cleanup_messages", new=AsyncMock()), \
              patch("main.user_logger"), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]):
+             acl.override("coordinator", [user_id]):
             state = await handle_save_confirmation(save_update, context)
 
         self.assertEqual(state, ConversationHandler.END)
         save_query.message.reply_text.assert_awaited()
 
+    async def test_confirm_save_reports_duplicate(self):
+        from main import CONFIRMING_DUPLICATE, handle_save_confirmation
+        from models.participant import Participant
+
+        user_id = 1
+        existing = Participant(FullNameRU="Иван Петров", Gender="M", Role="CANDIDATE", id=77)
+        save_query = MagicMock()
+        save_query.answer = AsyncMock()
+        save_query.message = MagicMock()
+        save_query.message.reply_text = AsyncMock()
+        save_update = SimpleNamespace(
+            callback_query=save_query,
+            effective_user=SimpleNamespace(id=user_id),
+            effective_chat=SimpleNamespace(id=100),
+        )
+        save_query.data = "confirm_save"
+        context = SimpleNamespace(
+            user_data={"parsed_participant": {"FullNameRU": "иван петров", "Gender": "M"}},
+            chat_data={},
+        )
+
+        with patch("main.participant_service", new=SimpleNamespace(
+            check_duplicate=lambda *args, **kwargs: existing,
+        )), \
+             patch("main._cleanup_messages", new=AsyncMock()), \
+             patch("main.user_logger"), \
+             acl.override("coordinator", [user_id]):
+            state = await handle_save_confirmation(save_update, context)
+
+        self.assertEqual(state, CONFIRMING_DUPLICATE)
+        self.assertEqual(context.user_data["existing_participant_id"], 77)
+        self.assertIn("дубликат", save_query.message.reply_text.await_args.args[0])
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+import copy
+import pickle
+import unittest
+from types import SimpleNamespace
+
+from telegram import InlineKeyboardMarkup
+from telegram.request._requestparameter import RequestParameter
+
+from services.participant_service import (
+    get_department_selection_keyboard,
+    get_department_selection_keyboard_required,
+    get_edit_keyboard,
+    get_gender_selection_keyboard,
+    get_gender_selection_keyboard_simple,
+)
+from utils.keyboards import FrozenInlineKeyboardMarkup, button, keyboard, row
+
+
+class KeyboardRegistryTestCase(unittest.TestCase):
+    def test_static_keyboards_are_built_once(self):
+        self.assertIs(get_gender_selection_keyboard(), get_gender_selection_keyboard_simple())
+        self.assertIs(get_department_selection_keyboard(), get_department_selection_keyboard_required())
+        self.assertIsInstance(get_gender_selection_keyboard(), FrozenInlineKeyboardMarkup)
+        self.assertIs(button("↩️ Назад", "field_edit_cancel"), button("↩️ Назад", "field_edit_cancel"))
+
+    def test_edit_keyboard_variants(self):
+        candidate = get_edit_keyboard({"Role": "CANDIDATE"})
+        team = get_edit_keyboard({"Role": "TEAM"})
+        self.assertIs(candidate, get_edit_keyboard({"Role": "CANDIDATE", "FullNameRU": "Иван"}))
+        self.assertIs(team, get_edit_keyboard({}))
+        data = [b.callback_data for r in team.inline_keyboard for b in r]
+        self.assertIn("edit_Department", data)
+        self.assertNotIn(
+            "edit_Department", [b.callback_data for r in candidate.inline_keyboard for b in r]
+        )
+        # общие строки переиспользуются, а не создаются заново
+        self.assertIs(candidate.inline_keyboard[0], team.inline_keyboard[0])
+
+    def test_serialisation_is_precomputed_and_matches_ptb(self):
+        markup = keyboard(row(("A", "a"), ("B", "b")), row(("C", "c")))
+        plain = InlineKeyboardMarkup(markup.inline_keyboard)
+        self.assertIs(markup.to_dict(), markup.to_dict())
+        self.assertEqual(markup.to_json(), plain.to_json())
+        self.assertEqual(
+            RequestParameter.from_input("reply_markup", markup).json_value,
+            RequestParameter.from_input("reply_markup", plain).json_value,
+        )
+        self.assertEqual(markup, plain)
+
+    def test_keyboard_is_immutable_and_copyable(self):
+        markup = get_gender_selection_keyboard()
+        with self.assertRaises(AttributeError):
+            markup.inline_keyboard = ()
+        self.assertEqual(copy.deepcopy(markup).to_json(), markup.to_json())
+        self.assertEqual(pickle.loads(pickle.dumps(markup)).to_json(), markup.to_json())
+
+    def test_recovery_keyboard_is_cached_per_combination(self):
+        import main
+
+        context = SimpleNamespace(user_data={"parsed_participant": {"FullNameRU": "Иван"}})
+        first = main.get_recovery_keyboard(context)
+        self.assertIs(first, main.get_recovery_keyboard(context))
+        self.assertEqual(
+            [b.callback_data for r in first.inline_keyboard for b in r],
+            ["recover_confirmation", "main_add"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts import log_analyzer, log_archiver
+
+
+class LogArchiverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_dir = Path(self.tmp.name)
+        self.archive_dir = self.log_dir / "archive"
+
+        actions = [
+            {"event": "user_action", "user_id": 1, "action": "command",
+             "details": {"command": "/add"}, "timestamp": "2025-07-01T10:00:00"},
+            {"event": "user_action", "user_id": 2, "action": "command",
+             "details": {"command": "/search"}, "timestamp": "2025-07-02T11:00:00"},
+        ]
+        (self.log_dir / "user_actions.log.1").write_text(
+            "\n".join(json.dumps(a) for a in actions) + "\n", encoding="utf-8"
+        )
+        (self.log_dir / "performance.log.1").write_text(
+            '2025-07-01 10:00:01,123 - performance - INFO - '
+            '{"operation": "search_participants", "duration": 0.5, "user_id": 1}\n'
+            'garbage line\n',
+            encoding="utf-8",
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_prefixed_line(self):
+        entry = log_archiver.parse_log_line(
+            '2025-07-01 10:00:01,123 - performance - INFO - {"duration": 1.5}'
+        )
+        self.assertEqual(entry["duration"], 1.5)
+        self.assertEqual(entry["_ts"], "2025-07-01T10:00:01")
+
+    def test_columns_roundtrip(self):
+        records = [{"a": 1, "b": {"x": 1}}, {"a": 2.5, "c": "s"}]
+        block = log_archiver.records_to_columns(records)
+        self.assertEqual(block["types"], {"a": "float", "b": "json", "c": "str"})
+        self.assertEqual(
+            list(log_archiver.columns_to_records(block)),
+            [{"a": 1.0, "b": {"x": 1}}, {"a": 2.5, "c": "s"}],
+        )
+
+    def test_archive_is_idempotent_and_queryable(self):
+        created = log_archiver.archive_logs(
+            str(self.log_dir), str(self.archive_dir), fmt="json"
+        )
+        self.assertEqual({e["source"] for e in created}, {"user_actions", "performance"})
+
+        # после ротации тот же файл получает новое имя — повторно не архивируем
+        (self.log_dir / "user_actions.log.1").rename(self.log_dir / "user_actions.log.2")
+        self.assertEqual(
+            log_archiver.archive_logs(str(self.log_dir), str(self.archive_dir), fmt="json"),
+            [],
+        )
+
+        records = list(
+            log_archiver.iter_archived_records(
+                "user_actions", str(self.archive_dir), since="2025-07-02"
+            )
+        )
+        self.assertEqual([r["user_id"] for r in records], [2])
+        self.assertEqual(records[0]["details"], {"command": "/search"})
+
+    def test_analyzer_reads_archives(self):
+        log_archiver.archive_logs(str(self.log_dir), str(self.archive_dir), fmt="json")
+        live = self.log_dir / "user_actions.log"
+        live.write_text(
+            json.dumps({"event": "user_action", "details": {"command": "/add"}}) + "\n",
+            encoding="utf-8",
+        )
+        stats = log_analyzer.command_stats(str(live), archive_dir=str(self.archive_dir))
+        self.assertEqual(stats, {"/add": 2, "/search": 1})
+
+        avg, count = log_analyzer.operation_times(
+            str(self.log_dir / "performance.log"), archive_dir=str(self.archive_dir)
+        )
+        self.assertEqual((avg, count), (0.5, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
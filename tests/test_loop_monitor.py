@@ -0,0 +1,107 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from telegram.ext import (
+    Application,
+    CommandHandler,
+    ConversationHandler,
+)
+
+from utils.loop_monitor import LoopMonitor
+from utils.metrics import MetricsRegistry
+
+
+async def _noop(update, context):
+    return None
+
+
+class LoopMonitorTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    async def test_heartbeat_detects_blocking_call(self):
+        monitor = LoopMonitor(
+            interval=0.02, lag_threshold=0.1, debug=False, registry=self.registry
+        )
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # имитируем синхронный I/O в обработчике
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        self.assertGreaterEqual(self.registry.get_counter("loop.lag.exceeded"), 1)
+        summary = self.registry.snapshot()["summaries"]["loop.lag.seconds"]
+        self.assertGreaterEqual(summary["max"], 0.1)
+
+    async def test_slow_callback_attributed_to_handler(self):
+        monitor = LoopMonitor(
+            slow_callback_threshold=0.05, debug=True, registry=self.registry
+        )
+
+        async def blocking_handler(update, context):
+            time.sleep(0.1)
+
+        wrapped = monitor.wrap_callback(blocking_handler)
+        monitor.start()
+        await asyncio.create_task(wrapped(None, None), name="update-task")
+        await asyncio.sleep(0)
+        await monitor.stop()
+
+        self.assertGreaterEqual(
+            self.registry.get_counter("loop.slow_callbacks.blocking_handler"), 1
+        )
+        self.assertIn(
+            "handler.blocking_handler.seconds", self.registry.snapshot()["summaries"]
+        )
+
+    async def test_handler_timing_logged(self):
+        timing_logger = MagicMock()
+        monitor = LoopMonitor(
+            debug=False, registry=self.registry, timing_logger=timing_logger
+        )
+
+        async def failing_handler(update, context):
+            raise ValueError("boom")
+
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=42))
+        with self.assertRaises(ValueError):
+            await monitor.wrap_callback(failing_handler)(update, None)
+
+        args = timing_logger.log_handler_timing.call_args.args
+        self.assertEqual((args[0], args[1], args[3]), (42, "failing_handler", "ValueError"))
+
+    async def test_pending_updates_gauge(self):
+        monitor = LoopMonitor(pending_threshold=2, debug=False, registry=self.registry)
+        monitor._update_queue = asyncio.Queue()
+        for i in range(3):
+            monitor._update_queue.put_nowait(i)
+
+        self.assertEqual(monitor.sample_pending_updates(), 3)
+        self.assertEqual(self.registry.get_gauge("updates.pending"), 3)
+        self.assertEqual(self.registry.get_counter("updates.pending.exceeded"), 1)
+
+
+class LoopMonitorInstrumentTestCase(unittest.TestCase):
+    def test_instrument_wraps_conversation_handlers(self):
+        app = Application.builder().token("DUMMY").build()
+        conv = ConversationHandler(
+            entry_points=[CommandHandler("add", _noop)],
+            states={1: [CommandHandler("next", _noop)]},
+            fallbacks=[CommandHandler("cancel", _noop)],
+        )
+        app.add_handler(conv)
+        app.add_handler(CommandHandler("start", _noop))
+
+        monitor = LoopMonitor(registry=MetricsRegistry())
+        self.assertEqual(monitor.instrument(app), 4)
+        # повторный вызов не оборачивает callback'и дважды
+        monitor.instrument(app)
+        self.assertTrue(conv.entry_points[0].callback.__loop_monitored__)
+        self.assertIs(conv.entry_points[0].callback.__wrapped__, _noop)
+
+
+if __name__ == "__main__":
+    unittest.main()
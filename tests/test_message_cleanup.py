@@ -0,0 +1,112 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from telegram.error import BadRequest, RetryAfter
+
+from utils.message_cleanup import MessageCleaner, take_tracked, track_message
+from utils.metrics import MetricsRegistry
+from utils.rate_limiter import TokenBucket
+
+
+class TrackingTestCase(unittest.TestCase):
+    def test_tracked_list_is_bounded(self):
+        registry = MetricsRegistry()
+        store = {}
+        for message_id in range(1, 8):
+            track_message(store, message_id, max_tracked=5, registry=registry)
+        self.assertEqual(store["messages_to_delete"], [3, 4, 5, 6, 7])
+        self.assertEqual(registry.get_counter("cleanup.dropped"), 2)
+
+        self.assertEqual(take_tracked(store), [3, 4, 5, 6, 7])
+        self.assertEqual(store["messages_to_delete"], [])
+        self.assertEqual(take_tracked(None), [])
+
+
+class MessageCleanerTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.cleaner = MessageCleaner(
+            limiter=TokenBucket(1000, registry=self.registry), registry=self.registry
+        )
+        self.bot = MagicMock()
+        self.bot.delete_messages = AsyncMock(return_value=True)
+
+    async def _drain(self):
+        for _ in range(20):
+            await asyncio.sleep(0)
+            if not self.cleaner.pending:
+                break
+
+    async def test_batches_of_100_and_coalescing(self):
+        self.assertTrue(self.cleaner.schedule(self.bot, 42, list(range(1, 151))))
+        # второй вызов до начала прохода присоединяется к нему
+        self.assertFalse(self.cleaner.schedule(self.bot, 42, list(range(151, 251))))
+        await self._drain()
+
+        sizes = [len(call.kwargs["message_ids"]) for call in self.bot.delete_messages.await_args_list]
+        self.assertEqual(sizes, [100, 100, 50])
+        self.assertEqual(self.registry.get_counter("cleanup.deleted"), 250)
+        self.assertEqual(self.cleaner.pending, 0)
+
+    async def test_retry_after_and_errors(self):
+        self.bot.delete_messages = AsyncMock(
+            side_effect=[RetryAfter(0), True, BadRequest("Message can't be deleted")]
+        )
+        self.cleaner.schedule(self.bot, 1, [1, 2])
+        await self._drain()
+        self.cleaner.schedule(self.bot, 1, [3])
+        await self._drain()
+
+        self.assertEqual(self.bot.delete_messages.await_count, 3)
+        self.assertEqual(self.registry.get_counter("cleanup.retry_after"), 1)
+        self.assertEqual(self.registry.get_counter("cleanup.deleted"), 2)
+        self.assertEqual(self.registry.get_counter("cleanup.errors"), 1)
+
+    async def test_runs_through_job_queue(self):
+        job_queue = MagicMock()
+        self.cleaner.schedule(self.bot, 7, [10, 11], job_queue=job_queue)
+        self.bot.delete_messages.assert_not_awaited()
+
+        callback, when = job_queue.run_once.call_args.args
+        self.assertEqual(when, 0)
+        context = SimpleNamespace(bot=self.bot, job=SimpleNamespace(data=7))
+        await callback(context)
+        self.bot.delete_messages.assert_awaited_once_with(chat_id=7, message_ids=[10, 11])
+
+
+class CleanupMessagesHandlerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_handler_does_not_wait_for_deletion(self):
+        import main
+
+        bot = MagicMock()
+        bot.delete_messages = AsyncMock(return_value=True)
+        context = SimpleNamespace(user_data={}, chat_data={}, bot=bot)
+        for message_id in (5, 6, 7):
+            main._add_message_to_cleanup(context, message_id)
+        self.assertEqual(context.chat_data["messages_to_delete"], [5, 6, 7])
+
+        cleaner = MessageCleaner(limiter=TokenBucket(1000))
+        with patch("main.message_cleaner", cleaner):
+            await main._cleanup_messages(context, 99)
+            bot.delete_messages.assert_not_awaited()
+            self.assertEqual(context.chat_data["messages_to_delete"], [])
+            await asyncio.sleep(0.01)
+        bot.delete_messages.assert_awaited_once_with(chat_id=99, message_ids=[5, 6, 7])
+
+
+class TokenBucketTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_acquire_waits_for_refill(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        # первый токен есть сразу, ещё два — по 20 мс
+        self.assertGreaterEqual(time.monotonic() - start, 0.035)
+        self.assertFalse(bucket.try_acquire())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from telegram import Update
+
+from utils.acl import acl
+from utils.metrics import MetricsRegistry
+from utils.middleware import MiddlewarePipeline
+
+
+class MiddlewarePipelineTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.calls = []
+
+    def _hook(self, name, result=None):
+        def hook(update, application):
+            self.calls.append(name)
+            return result
+
+        return hook
+
+    async def test_runs_in_order_and_short_circuits(self):
+        async def gate(update, application):
+            self.calls.append("gate")
+            return False
+
+        pipeline = (
+            MiddlewarePipeline(registry=self.registry)
+            .add("first", self._hook("first"))
+            .add("gate", gate)
+            .add("last", self._hook("last"))
+        )
+        self.assertFalse(await pipeline.run(object(), None))
+        self.assertEqual(self.calls, ["first", "gate"])
+        self.assertEqual(self.registry.get_counter("middleware.gate.stopped"), 1)
+        self.assertEqual(self.registry.snapshot()["summaries"]["middleware.first.seconds"]["count"], 1)
+
+        pipeline.set_enabled("gate", False)
+        self.assertTrue(await pipeline.run(object(), None))
+        self.assertEqual(self.calls[2:], ["first", "last"])
+        with self.assertRaises(ValueError):
+            pipeline.add("first", self._hook("again"))
+
+    async def test_disabled_hooks_and_errors(self):
+        def broken(update, application):
+            raise RuntimeError("boom")
+
+        pipeline = (
+            MiddlewarePipeline(disabled=["skipped"], registry=self.registry)
+            .add("broken", broken)
+            .add("skipped", self._hook("skipped", result=False))
+            .add("last", self._hook("last"))
+        )
+        self.assertEqual(pipeline.names, ["broken", "last"])
+        with self.assertLogs("utils.middleware", level="ERROR"):
+            self.assertTrue(await pipeline.run(object(), None))
+        self.assertEqual(self.calls, ["last"])
+        self.assertEqual(self.registry.get_counter("middleware.errors"), 1)
+
+
+class ApplicationMiddlewareTestCase(unittest.IsolatedAsyncioTestCase):
+    async def _send(self, user_id, texts):
+        import main
+        from scripts.load_test import FakeTelegram, OfflineRequest, make_message_update
+
+        api = FakeTelegram()
+        with patch("main.participant_service", MagicMock()), patch("main.user_logger"), patch(
+            "main.loop_monitor", None
+        ):
+            application = main.build_application(
+                "123456:TEST", request=OfflineRequest(api), get_updates_request=OfflineRequest(api)
+            )
+            await application.initialize()
+            try:
+                for update_id, text in enumerate(texts, start=1):
+                    update = Update.de_json(make_message_update(update_id, user_id, text), application.bot)
+                    await application.process_update(update)
+            finally:
+                await application.shutdown()
+        return application, api
+
+    async def test_unauthorized_user_stopped_before_handlers(self):
+        with patch("main.start_command") as start, acl.override("viewer", []):
+            application, api = await self._send(905, ["/start", "Иван"])
+        start.assert_not_called()
+        self.assertEqual(api.calls["sendMessage"], 2)
+        self.assertNotIn(905, application.user_data)
+        self.assertEqual(application.middleware.names, ["log_updates", "access", "debug_callbacks"])
+        self.assertTrue(all(group >= 0 for group in application.handlers))
+
+    async def test_authorized_user_reaches_handlers(self):
+        with patch("main.start_command", new=AsyncMock()) as start, acl.override("coordinator", [906]):
+            _, api = await self._send(906, ["/start"])
+        start.assert_awaited_once()
+        self.assertEqual(api.calls["sendMessage"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import database
+from utils.migrations import Migration, get_user_version, rebuild_table, run_migrations
+
+
+def _create_items(cursor):
+    cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, qty INTEGER)")
+
+
+def _add_note(cursor):
+    cursor.execute("ALTER TABLE items ADD COLUMN note TEXT")
+
+
+def _broken(cursor):
+    cursor.execute("ALTER TABLE items ADD COLUMN extra TEXT")
+    cursor.execute("SELECT * FROM missing_table")
+
+
+class MigrationRunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def _columns(self):
+        return [row[1] for row in self.conn.execute("PRAGMA table_info(items)")]
+
+    def test_applies_pending_in_order_once(self):
+        migrations = (Migration(1, "items", _create_items), Migration(2, "note", _add_note))
+        self.assertEqual([m.version for m in run_migrations(self.conn, migrations[:1])], [1])
+        self.assertEqual([m.version for m in run_migrations(self.conn, migrations)], [2])
+        self.assertEqual(run_migrations(self.conn, migrations), [])
+        self.assertEqual(get_user_version(self.conn), 2)
+        self.assertEqual(self._columns(), ["id", "qty", "note"])
+
+    def test_dry_run_changes_nothing(self):
+        migrations = (Migration(1, "items", _create_items),)
+        pending = run_migrations(self.conn, migrations, dry_run=True)
+        self.assertEqual([m.description for m in pending], ["items"])
+        self.assertEqual(get_user_version(self.conn), 0)
+        self.assertEqual(self._columns(), [])
+
+    def test_failed_migration_is_rolled_back(self):
+        migrations = (Migration(1, "items", _create_items), Migration(2, "broken", _broken))
+        with self.assertLogs("utils.migrations", level="ERROR"), self.assertRaises(sqlite3.OperationalError):
+            run_migrations(self.conn, migrations)
+        self.assertEqual(get_user_version(self.conn), 1)
+        self.assertEqual(self._columns(), ["id", "qty"])
+
+    def test_version_gaps_are_rejected(self):
+        with self.assertRaises(ValueError):
+            run_migrations(self.conn, (Migration(1, "a", _create_items), Migration(3, "b", _add_note)))
+
+    def test_rebuild_table_adds_check_and_keeps_dependents(self):
+        run_migrations(self.conn, (Migration(1, "items", _create_items),))
+        self.conn.execute("CREATE INDEX items_qty ON items (qty)")
+        self.conn.execute(
+            "CREATE TRIGGER items_positive BEFORE UPDATE ON items "
+            "BEGIN SELECT RAISE(ABORT, 'frozen') WHERE OLD.qty = 0; END"
+        )
+        self.conn.executemany("INSERT INTO items (qty) VALUES (?)", [(1,), (0,), (3,)])
+        self.conn.execute("DELETE FROM items WHERE id = 3")
+        self.conn.commit()
+
+        def add_check(cursor):
+            rebuild_table(
+                cursor,
+                "items",
+                "CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, qty INTEGER CHECK (qty >= 0))",
+            )
+
+        run_migrations(self.conn, (Migration(1, "items", _create_items), Migration(2, "check", add_check)))
+        self.assertEqual(self.conn.execute("SELECT id, qty FROM items").fetchall(), [(1, 1), (2, 0)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("INSERT INTO items (qty) VALUES (-1)")
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("UPDATE items SET qty = 5 WHERE id = 2")
+        names = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master")}
+        self.assertIn("items_qty", names)
+        self.assertNotIn("_items_old", names)
+        # id удалённой записи не выдаётся повторно
+        self.assertEqual(self.conn.execute("INSERT INTO items (qty) VALUES (2)").lastrowid, 4)
+
+
+class DatabaseMigrationsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def _init(self, **kwargs):
+        with patch("builtins.print"):
+            return database.init_database(**kwargs)
+
+    def test_current_schema_skips_ddl(self):
+        self._init()
+        self.assertEqual(get_user_version(self.conn), database.SCHEMA_VERSION)
+
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        self.assertEqual(self._init(), [])
+        self.assertEqual(statements, ["PRAGMA user_version"])
+
+    def test_dry_run_lists_all_migrations_on_new_database(self):
+        pending = self._init(dry_run=True)
+        self.assertEqual([m.version for m in pending], list(range(1, database.SCHEMA_VERSION + 1)))
+        self.assertIsNone(
+            self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'participants'").fetchone()
+        )
+
+    def test_database_created_before_user_version_is_upgraded(self):
+        # база прежнего init_database: схема на месте, user_version = 0
+        cursor = self.conn.cursor()
+        for migration in database.MIGRATIONS:
+            migration.apply(cursor)
+        participant_id = database.add_participant(
+            {"FullNameRU": "Иван", "Role": "CANDIDATE", "PaymentStatus": "Paid", "PaymentAmount": 500}
+        )
+        self.assertEqual(get_user_version(self.conn), 0)
+
+        self.assertEqual(len(self._init()), database.SCHEMA_VERSION)
+        self.assertEqual(get_user_version(self.conn), database.SCHEMA_VERSION)
+        self.assertEqual(database.get_participant_by_id(participant_id)["FullNameRU"], "Иван")
+        self.assertEqual(database.get_payment_summary()["total_amount"], 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
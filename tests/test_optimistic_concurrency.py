@@ -0,0 +1,250 @@
+import sqlite3
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import database
+from models.participant import Participant
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from repositories.participant_repository import SqliteParticipantRepository
+from services.participant_service import ParticipantService
+from utils.acl import acl
+from utils.exceptions import ConcurrentModificationError, ParticipantNotFoundError
+
+PARTICIPANT = {
+    "FullNameRU": "Иван Петров",
+    "Gender": "M",
+    "Size": "L",
+    "Church": "Благодать",
+    "Role": "CANDIDATE",
+}
+
+
+class SqliteVersioningTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+        self.repository = SqliteParticipantRepository()
+        self.service = ParticipantService(self.repository, cache_ttl=0)
+        self.participant_id = self.service.add_participant(dict(PARTICIPANT)).id
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def test_second_writer_gets_conflict(self):
+        first = self.repository.get_by_id(self.participant_id)
+        second = self.repository.get_by_id(self.participant_id)
+        self.assertEqual(first.version, 1)
+
+        first.Size = "XL"
+        self.repository.update(first)
+        self.assertEqual(first.version, 2)
+
+        second.Church = "Грейс"
+        with self.assertRaises(ConcurrentModificationError):
+            self.repository.update(second)
+        stored = self.repository.get_by_id(self.participant_id)
+        self.assertEqual((stored.Size, stored.Church, stored.version), ("XL", "Благодать", 2))
+
+    def test_every_write_bumps_version(self):
+        self.repository.update_fields(self.participant_id, Gender="F")
+        self.repository.update_payment(self.participant_id, "Paid", 100, "2025-01-10")
+        result = self.repository.record_payment(self.participant_id, 50, "2025-01-11")
+        self.assertEqual(result["version"], 4)
+        self.assertEqual(self.repository.get_by_id(self.participant_id).version, 4)
+
+        with self.assertRaises(ConcurrentModificationError):
+            self.repository.update_fields(self.participant_id, expected_version=3, Gender="M")
+        with self.assertRaises(ConcurrentModificationError):
+            self.repository.update_payment(self.participant_id, "Paid", 1, "2025-01-12", expected_version=1)
+        with self.assertRaises(ParticipantNotFoundError):
+            self.repository.update_fields(999, expected_version=1, Gender="M")
+
+    def test_service_conflict_refreshes_cache(self):
+        cached = {p.id: p for p in self.service._get_cached_participants()}
+        stale = cached[self.participant_id].to_dict()  # копия в user_data координатора A
+
+        # координатор B сохраняет раньше
+        self.service.update_participant_fields(self.participant_id, Size="XL")
+        self.assertEqual(self.service._get_cached_participants()[0].version, 2)
+
+        stale["Church"] = "Грейс"
+        with self.assertRaises(ConcurrentModificationError) as ctx:
+            self.service.update_participant(self.participant_id, stale)
+        self.assertEqual(ctx.exception.current.Size, "XL")
+        self.assertEqual(ctx.exception.current.version, 2)
+
+        # «Сохранить мои»: та же правка с версией сохранённой записи
+        stale["version"] = ctx.exception.current.version
+        self.service.update_participant(self.participant_id, stale)
+        cached = self.service._get_cached_participants()[0]
+        self.assertEqual((cached.Church, cached.version), ("Грейс", 3))
+        self.assertEqual(self.repository.get_by_id(self.participant_id).version, 3)
+
+    def test_cache_without_ttl_is_not_reloaded(self):
+        self.service._get_cached_participants()
+        with patch.object(self.repository, "get_all") as get_all:
+            self.service._cache_timestamp = 0
+            self.service._get_cached_participants()
+            get_all.assert_not_called()
+
+    def test_existing_database_gets_version_column(self):
+        self.conn.execute("ALTER TABLE participants DROP COLUMN version")
+        self.conn.execute("PRAGMA user_version = 2")  # база до миграции 3
+        with patch("builtins.print"):
+            database.init_database()
+        self.assertEqual(database.get_participant_by_id(self.participant_id)["version"], 1)
+
+
+class FakeTable:
+    def __init__(self, records):
+        self.records = {r["id"]: r for r in records}
+        self.clock = 0
+
+    def get(self, record_id):
+        if record_id not in self.records:
+            raise Exception("404 NOT_FOUND")
+        return self.records[record_id]
+
+    def update(self, record_id, fields):
+        record = self.get(record_id)
+        self.clock += 1
+        record["fields"].update(fields, LastModified=f"2025-01-01T00:00:0{self.clock}.000Z")
+        return record
+
+
+class AirtableVersioningTestCase(unittest.TestCase):
+    def setUp(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            self.repo = AirtableParticipantRepository()
+        self.repo.table = FakeTable(
+            [{"id": "rec1", "fields": {**PARTICIPANT, "LastModified": "2025-01-01T00:00:00.000Z"}}]
+        )
+
+    def test_modified_time_is_compared_before_update(self):
+        first = self.repo.get_by_id("rec1")
+        second = self.repo.get_by_id("rec1")
+        self.assertEqual(first.version, "2025-01-01T00:00:00.000Z")
+
+        first.Size = "XL"
+        self.repo.update(first)
+        self.assertEqual(first.version, "2025-01-01T00:00:01.000Z")
+
+        second.Church = "Грейс"
+        with self.assertRaises(ConcurrentModificationError) as ctx:
+            self.repo.update(second)
+        self.assertEqual(ctx.exception.current.Size, "XL")
+        self.assertEqual(self.repo.table.records["rec1"]["fields"]["Church"], "Благодать")
+
+        with self.assertRaises(ConcurrentModificationError):
+            self.repo.update_fields("rec1", expected_version=second.version, Gender="F")
+
+
+class EditConflictPromptTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_save_conflict_shows_merge_prompt(self):
+        import main
+        from telegram.ext import ConversationHandler
+
+        user_id = 1
+        current = Participant(**PARTICIPANT, version=3, id=5)
+        current.Size = "XL"
+        context = SimpleNamespace(
+            user_data={
+                "participant_id": 5,
+                "parsed_participant": {**PARTICIPANT, "Church": "Грейс", "version": 2},
+            },
+            chat_data={},
+        )
+        query = MagicMock()
+        query.answer = AsyncMock()
+        query.message.reply_text = AsyncMock()
+        query.data = "confirm_save"
+        update = SimpleNamespace(
+            callback_query=query,
+            effective_user=SimpleNamespace(id=user_id),
+            effective_chat=SimpleNamespace(id=1),
+        )
+        service = MagicMock()
+        service.update_participant.side_effect = ConcurrentModificationError("conflict", current=current)
+
+        with acl.override("coordinator", [user_id]), \
+             patch.object(main, "participant_service", service), \
+             patch("main._cleanup_messages", new=AsyncMock()), \
+             patch("main.user_logger"):
+            state = await main.handle_save_confirmation(update, context)
+
+        self.assertEqual(state, main.CONFIRMING_DATA)
+        self.assertNotEqual(state, ConversationHandler.END)
+        text = query.message.reply_text.call_args.args[0]
+        self.assertIn("сохранено «XL», у вас «L»", text)
+        self.assertIn("сохранено «Благодать», у вас «Грейс»", text)
+        # следующее «Сохранить» перезапишет уже актуальную версию
+        self.assertEqual(context.user_data["parsed_participant"]["version"], 3)
+        self.assertEqual(context.user_data["parsed_participant"]["Church"], "Грейс")
+
+    async def _conflict(self, edit_base, mine, current):
+        import main
+
+        user_id = 1
+        context = SimpleNamespace(
+            user_data={"participant_id": 5, "parsed_participant": mine, "edit_base": edit_base},
+            chat_data={},
+        )
+        query = MagicMock()
+        query.answer = AsyncMock()
+        query.message.reply_text = AsyncMock()
+        update = SimpleNamespace(
+            callback_query=query,
+            effective_user=SimpleNamespace(id=user_id),
+            effective_chat=SimpleNamespace(id=1),
+        )
+        with patch("main.participant_service", MagicMock()):
+            await main.show_edit_conflict(update, context, mine, current)
+        return query.message.reply_text.call_args.args[0], context.user_data
+
+    async def test_conflict_rebases_edit_onto_saved_version(self):
+        base = {**PARTICIPANT, "version": 2}
+        current = Participant(**PARTICIPANT, version=3, id=5)
+        current.Size = "XL"
+        current.PaymentAmount, current.PaymentStatus = 200, "Paid"
+
+        text, user_data = await self._conflict(base, {**base, "Church": "Грейс"}, current)
+        merged = user_data["parsed_participant"]
+        self.assertIn("не пересекаются", text)
+        self.assertNotIn("XL", text)
+        self.assertEqual((merged["Church"], merged["Size"]), ("Грейс", "XL"))
+        self.assertEqual((merged["PaymentAmount"], merged["PaymentStatus"]), (200, "Paid"))
+        self.assertEqual(merged["version"], 3)
+        self.assertEqual(user_data["edit_base"]["Size"], "XL")
+
+    async def test_conflict_lists_fields_changed_by_both(self):
+        base = {**PARTICIPANT, "version": 2}
+        current = Participant(**{**PARTICIPANT, "Church": "Слово", "Size": "XL"}, version=3, id=5)
+
+        text, user_data = await self._conflict(base, {**base, "Church": "Грейс"}, current)
+        self.assertIn("сохранено «Слово», у вас «Грейс»", text)
+        self.assertNotIn("XL", text)
+        self.assertEqual(user_data["parsed_participant"]["Size"], "XL")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
+
+from utils.metrics import MetricsRegistry
+from utils.panel import PANEL_KEY, content_hash, forget_panel, show_panel
+from utils.acl import acl
+
+
+def _keyboard(label):
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data="x")]])
+
+
+class ShowPanelTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.bot = MagicMock()
+        self.bot.edit_message_text = AsyncMock()
+        self.bot.edit_message_reply_markup = AsyncMock()
+        self.context = SimpleNamespace(user_data={}, bot=self.bot)
+        self.message = MagicMock()
+        self.message.reply_text = AsyncMock(
+            side_effect=[SimpleNamespace(chat_id=5, message_id=10), SimpleNamespace(chat_id=5, message_id=11)]
+        )
+
+    async def _show(self, text, markup=None, flow="add", **kwargs):
+        return await show_panel(
+            self.context, self.message, text, flow, reply_markup=markup,
+            parse_mode="Markdown", registry=self.registry, **kwargs,
+        )
+
+    async def test_edits_in_place_and_skips_unchanged(self):
+        sent = await self._show("step 1", _keyboard("a"))
+        self.assertEqual(sent.message_id, 10)
+
+        self.assertIsNone(await self._show("step 2", _keyboard("a")))
+        self.bot.edit_message_text.assert_awaited_once_with(
+            "step 2", chat_id=5, message_id=10, parse_mode="Markdown", reply_markup=_keyboard("a")
+        )
+
+        # изменилась только клавиатура
+        await self._show("step 2", _keyboard("b"))
+        self.bot.edit_message_reply_markup.assert_awaited_once()
+
+        # ничего не изменилось — запроса нет
+        await self._show("step 2", _keyboard("b"))
+        self.assertEqual(self.bot.edit_message_text.await_count, 1)
+        self.assertEqual(self.bot.edit_message_reply_markup.await_count, 1)
+        self.message.reply_text.assert_awaited_once()
+        self.assertEqual(self.registry.get_counter("panel.sent"), 1)
+        self.assertEqual(self.registry.get_counter("panel.edited"), 2)
+        self.assertEqual(self.registry.get_counter("panel.skipped"), 1)
+
+    async def test_new_panel_for_other_flow_and_after_failed_edit(self):
+        await self._show("search prompt", flow="search")
+        self.bot.edit_message_text.side_effect = BadRequest("Message to edit not found")
+        sent = await self._show("results", flow="search")
+        self.assertEqual(sent.message_id, 11)
+        self.assertEqual(self.registry.get_counter("panel.fallback"), 1)
+        self.assertEqual(self.context.user_data[PANEL_KEY]["message_id"], 11)
+
+        forget_panel(self.context)
+        self.assertNotIn(PANEL_KEY, self.context.user_data)
+        self.assertNotEqual(content_hash("a", parse_mode="Markdown"), content_hash("a"))
+
+
+class SearchFlowPanelTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_search_results_replace_prompt(self):
+        import main
+        from models.participant import Participant
+        from scripts.load_test import FakeTelegram, OfflineRequest, make_message_update
+
+        user_id = 904
+        participant = Participant(id=5, FullNameRU="Иван Петров", Gender="M", Size="L")
+        service = MagicMock()
+        service.search_participants.return_value = [
+            SimpleNamespace(participant=participant, confidence=1.0, match_field="FullNameRU", match_type="exact")
+        ]
+        service.format_search_result.return_value = "Иван Петров (ID: 5)"
+        api = FakeTelegram()
+
+        with patch("main.participant_service", service), patch("main.user_logger"), patch(
+            "main.loop_monitor", None
+        ), acl.override("coordinator", [user_id]):
+            application = main.build_application(
+                "123456:TEST",
+                request=OfflineRequest(api),
+                get_updates_request=OfflineRequest(api),
+            )
+            await application.initialize()
+            try:
+                for update_id, text in enumerate(["/search", "Иван"], start=1):
+                    update = Update.de_json(
+                        make_message_update(update_id, user_id, text), application.bot
+                    )
+                    await application.process_update(update)
+            finally:
+                await application.shutdown()
+
+        # промпт отправлен один раз, результаты показаны на его месте
+        self.assertEqual(api.calls["sendMessage"], 1)
+        self.assertEqual(api.calls["editMessageText"], 1)
+        self.assertEqual(application.user_data[user_id][PANEL_KEY]["flow"], main.SEARCH_PANEL)
+
+
+if __name__ == "__main__":
+    unittest.main()
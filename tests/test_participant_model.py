@@ -0,0 +1,67 @@
+import copy
+import pickle
+import sqlite3
+import unittest
+from dataclasses import asdict, replace
+
+from models.participant import Participant
+
+
+class ParticipantModelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.participant = Participant(
+            FullNameRU="Иван Петров", Gender="M", Role="CANDIDATE", PaymentAmount=500, id=7
+        )
+
+    def test_slotted_instance(self):
+        self.assertFalse(hasattr(self.participant, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.participant.Unknown = "x"
+
+    def test_to_dict_matches_asdict(self):
+        data = self.participant.to_dict()
+        self.assertEqual(
+            data, {k: v for k, v in asdict(self.participant).items() if k in Participant.FIELD_SET}
+        )
+        self.assertEqual(tuple(data), Participant.FIELD_NAMES)
+        data["FullNameRU"] = "Другое"
+        self.assertEqual(self.participant.FullNameRU, "Иван Петров")
+
+    def test_from_row_skips_unknown_columns(self):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT 7 AS id, 'Иван Петров' AS FullNameRU, 'M' AS Gender, 'CANDIDATE' AS Role, "
+            "500 AS PaymentAmount, 'x' AS created_at"
+        ).fetchone()
+        conn.close()
+
+        for source in (row, dict(row)):
+            participant = Participant.from_row(source)
+            self.assertEqual(participant, self.participant)
+            self.assertEqual(participant.id, 7)
+
+    def test_from_airtable_defaults(self):
+        participant = Participant.from_airtable({"id": "rec1", "fields": {"Size": "M"}})
+        self.assertEqual(participant.id, "rec1")
+        self.assertEqual(participant.FullNameRU, "")
+        self.assertEqual((participant.Gender, participant.PaymentStatus), ("F", "Unpaid"))
+        self.assertEqual(participant.Size, "M")
+
+        round_trip = Participant.from_airtable({"id": "rec7", "fields": self.participant.to_dict()})
+        self.assertEqual(round_trip, self.participant)
+        self.assertEqual(round_trip.id, "rec7")
+
+    def test_copy_and_pickle(self):
+        for clone in (
+            copy.copy(self.participant),
+            copy.deepcopy(self.participant),
+            pickle.loads(pickle.dumps(self.participant)),
+            replace(self.participant),
+        ):
+            self.assertEqual(clone, self.participant)
+            self.assertEqual(clone.id, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import database
+from models.participant import Participant
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from repositories.participant_repository import SqliteParticipantRepository
+from services.participant_service import ParticipantService
+from utils.exceptions import ConcurrentModificationError, ParticipantNotFoundError
+from utils.payment_ledger import PaymentLedger, payment_status_for
+
+
+class PaymentStatusTestCase(unittest.TestCase):
+    def test_status_against_fee(self):
+        self.assertEqual(payment_status_for(0, 1000), "Unpaid")
+        self.assertEqual(payment_status_for(400, 1000), "Partial")
+        self.assertEqual(payment_status_for(1000, 1000), "Paid")
+        self.assertEqual(payment_status_for(1, 0), "Paid")
+
+    def test_in_memory_ledger(self):
+        ledger = PaymentLedger.from_entries(
+            [("a", 300, "2025-01-02"), ("b", 100, "2025-01-01"), ("a", 200, "2025-01-03")]
+        )
+        self.assertEqual(ledger.balance("a")["balance"], 500)
+        self.assertEqual(ledger.balance("a")["payments_count"], 2)
+        self.assertIsNone(ledger.balance("missing"))
+        self.assertEqual(
+            ledger.cash_flow("2025-01-02"),
+            [{"date": "2025-01-02", "total": 300, "count": 1}, {"date": "2025-01-03", "total": 200, "count": 1}],
+        )
+        self.assertEqual([day["date"] for day in ledger.cash_flow(end="2025-01-01")], ["2025-01-01"])
+
+
+class SqlitePaymentLedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+        self.repository = SqliteParticipantRepository()
+        self.service = ParticipantService(self.repository, event_fee=1000)
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def test_instalments_accumulate_and_update_status(self):
+        participant_id = self.repository.add(Participant(FullNameRU="Иван Петров", Role="CANDIDATE"))
+
+        first = self.service.process_payment(participant_id, 400, "2025-01-10", user_id=7, method="cash")
+        self.assertEqual((first["balance"], first["status"]), (400, "Partial"))
+        second = self.service.process_payment(participant_id, 600, "2025-01-12")
+        self.assertEqual((second["balance"], second["status"]), (1000, "Paid"))
+
+        participant = self.repository.get_by_id(participant_id)
+        self.assertEqual(participant.PaymentStatus, "Paid")
+        self.assertEqual(participant.PaymentAmount, 1000)
+        self.assertEqual(participant.PaymentDate, "2025-01-12")
+
+        history = database.get_payment_history(participant_id)
+        self.assertEqual([p["amount"] for p in history], [400, 600])
+        self.assertEqual((history[0]["method"], history[0]["recorded_by"]), ("cash", 7))
+        self.assertEqual(
+            self.service.get_participant_balance(participant_id),
+            {"participant_id": participant_id, "balance": 1000, "payments_count": 2, "last_payment_date": "2025-01-12"},
+        )
+        # сводка оплат (payment_summary) видит баланс, а не последний взнос
+        self.assertEqual(database.get_payment_summary()["total_amount"], 1000)
+        self.assertTrue(database.verify_payment_summary()["consistent"])
+
+    def test_cash_flow_by_day(self):
+        first = self.repository.add(Participant(FullNameRU="Иван", Role="CANDIDATE"))
+        second = self.repository.add(Participant(FullNameRU="Пётр", Role="CANDIDATE"))
+        self.service.process_payment(first, 300, "2025-01-10")
+        self.service.process_payment(second, 200, "2025-01-10")
+        self.service.process_payment(second, 500, "2025-01-11")
+
+        self.assertEqual(
+            self.service.get_cash_flow(),
+            [{"date": "2025-01-10", "total": 500, "count": 2}, {"date": "2025-01-11", "total": 500, "count": 1}],
+        )
+        self.assertEqual(self.service.get_cash_flow("2025-01-11", "2025-01-31")[0]["total"], 500)
+        plan = self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT total FROM payment_daily WHERE PaymentDate >= ? AND PaymentDate <= ?",
+            ("2025-01-11", "2025-01-31"),
+        ).fetchall()
+        self.assertTrue(any("USING" in row[3] for row in plan))
+
+    def test_ledger_is_append_only(self):
+        participant_id = self.repository.add(Participant(FullNameRU="Иван", Role="CANDIDATE"))
+        self.service.process_payment(participant_id, 300, "2025-01-10")
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("UPDATE payments SET amount = 1")
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("DELETE FROM payments")
+        with self.assertRaises(ParticipantNotFoundError):
+            self.service.process_payment(999, 100, "2025-01-10")
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0], 1)
+
+    def test_direct_payment_writes_go_through_ledger(self):
+        participant_id = database.add_participant(
+            {"FullNameRU": "Иван", "PaymentStatus": "Partial", "PaymentAmount": 300}
+        )
+        result = database.record_payment(participant_id, 200, "2025-01-20", event_fee=500)
+        self.assertEqual((result["balance"], result["status"]), (500, "Paid"))
+
+        database.update_participant_field(participant_id, {"PaymentAmount": 450})
+        participant = database.get_participant_by_id(participant_id)
+        database.update_participant(participant_id, participant)  # сумма не менялась
+        history = database.get_payment_history(participant_id)
+        self.assertEqual(
+            [(p["amount"], p["method"]) for p in history],
+            [(300, "adjustment"), (200, None), (-50, "adjustment")],
+        )
+        self.assertEqual(database.get_participant_balance(participant_id)["balance"], 450)
+        self.assertTrue(database.verify_payment_summary()["consistent"])
+
+    def test_edit_after_payment_keeps_balance(self):
+        participant_id = self.repository.add(
+            Participant(FullNameRU="Иван Петров", Gender="M", Size="L", Church="Слово", Role="CANDIDATE")
+        )
+        edit_copy = self.service.get_participant(participant_id).to_dict()
+        self.service.process_payment(participant_id, 200, "2025-01-10")
+
+        edit_copy["Church"] = "Благодать"
+        with self.assertRaises(ConcurrentModificationError):
+            self.service.update_participant(participant_id, edit_copy)
+        edit_copy["version"] = self.service.get_participant(participant_id).version
+        self.service.update_participant(participant_id, edit_copy)
+
+        # замена дубля: разобранный текст без полей оплаты
+        replacement = {k: v for k, v in edit_copy.items() if not k.startswith("Payment")}
+        self.service.update_participant(participant_id, {**replacement, "version": None, "Size": "XL"})
+
+        participant = self.repository.get_by_id(participant_id)
+        self.assertEqual((participant.Church, participant.Size), ("Благодать", "XL"))
+        self.assertEqual((participant.PaymentAmount, participant.PaymentStatus), (200, "Partial"))
+        self.assertEqual([p["amount"] for p in database.get_payment_history(participant_id)], [200])
+
+    def test_existing_payments_move_into_ledger(self):
+        participant_id = database.add_participant(
+            {"FullNameRU": "Иван", "PaymentStatus": "Paid", "PaymentAmount": 500, "PaymentDate": "2025-01-05"}
+        )
+        for table in ("payments", "payment_balances", "payment_daily"):
+            self.conn.execute(f"DROP TABLE {table}")
+        self.conn.execute("PRAGMA user_version = 4")  # база до миграции 5
+        with patch("builtins.print"):
+            database.init_database()
+
+        self.assertEqual(database.get_participant_balance(participant_id)["balance"], 500)
+        self.assertEqual(database.get_payment_history(participant_id)[0]["method"], "opening_balance")
+        result = self.service.process_payment(participant_id, 500, "2025-01-20")
+        self.assertEqual((result["balance"], result["status"]), (1000, "Paid"))
+
+
+class FakeTable:
+    def __init__(self, records=()):
+        self.records = {r["id"]: r for r in records}
+        self.all_calls = 0
+
+    def all(self, **kwargs):
+        self.all_calls += 1
+        return list(self.records.values())
+
+    def get(self, record_id):
+        if record_id not in self.records:
+            raise Exception("404 NOT_FOUND")
+        return self.records[record_id]
+
+    def create(self, fields):
+        record = {"id": f"rec{len(self.records) + 100}", "fields": dict(fields)}
+        self.records[record["id"]] = record
+        return record
+
+    def batch_create(self, records):
+        return [self.create(fields) for fields in records]
+
+    def batch_update(self, records):
+        return [self.update(record["id"], record["fields"]) for record in records]
+
+    def update(self, record_id, fields):
+        if record_id not in self.records:
+            raise Exception("404 NOT_FOUND")
+        self.records[record_id]["fields"].update(fields)
+        return self.records[record_id]
+
+
+class AirtablePaymentLedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            self.repo = AirtableParticipantRepository()
+        self.repo.table = FakeTable([{"id": "rec1", "fields": {"FullNameRU": "Иван"}}])
+        self.repo.payments_table = FakeTable(
+            [{"id": "pay1", "fields": {"ParticipantId": "rec1", "Amount": 300, "PaymentDate": "2025-01-10"}}]
+        )
+
+    def test_record_payment_appends_and_updates_participant(self):
+        result = self.repo.record_payment("rec1", 700, "12/01/2025", event_fee=1000, recorded_by=7)
+
+        self.assertEqual((result["balance"], result["status"]), (1000, "Paid"))
+        fields = self.repo.table.records["rec1"]["fields"]
+        self.assertEqual((fields["PaymentAmount"], fields["PaymentDate"]), (1000, "2025-01-12"))
+        self.assertEqual(len(self.repo.payments_table.records), 2)
+        self.assertEqual(self.repo.get_balance("rec1")["payments_count"], 2)
+        self.assertEqual(len(self.repo.get_cash_flow("2025-01-11")), 1)
+        self.assertEqual(self.repo.payments_table.all_calls, 1)
+
+    def test_existing_amount_becomes_opening_balance(self):
+        self.repo.table.records["rec2"] = {
+            "id": "rec2",
+            "fields": {"FullNameRU": "Пётр", "PaymentAmount": 300, "PaymentDate": "2025-01-05"},
+        }
+        result = self.repo.record_payment("rec2", 200, "2025-01-20", event_fee=500)
+        self.assertEqual((result["balance"], result["status"]), (500, "Paid"))
+        entries = [
+            r["fields"] for r in self.repo.payments_table.records.values()
+            if r["fields"]["ParticipantId"] == "rec2"
+        ]
+        self.assertEqual([(e["Amount"], e.get("Method")) for e in entries], [(300, "opening_balance"), (200, None)])
+
+        # повторно начальный остаток не вносится
+        self.repo.record_payment("rec2", 100, "2025-01-21", event_fee=500)
+        self.assertEqual(self.repo.get_balance("rec2")["balance"], 600)
+        self.assertEqual(self.repo.get_balance("rec2")["payments_count"], 3)
+
+    def test_batch_seeds_opening_balance(self):
+        self.repo.table.records["rec2"] = {"id": "rec2", "fields": {"PaymentAmount": 300}}
+        result = self.repo.record_payments(
+            [
+                {"participant_id": "rec2", "amount": 200, "date": "2025-01-20", "reference": "A"},
+                {"participant_id": "rec404", "amount": 100, "date": "2025-01-20", "reference": "B"},
+            ],
+            event_fee=500,
+        )
+        self.assertEqual([(r["participant_id"], r["balance"]) for r in result["recorded"]], [("rec2", 500)])
+        self.assertEqual(result["missing"], ["rec404"])
+        self.assertEqual(self.repo.table.records["rec2"]["fields"]["PaymentStatus"], "Paid")
+        self.assertEqual(self.repo.get_balance("rec2")["payments_count"], 2)
+
+    def test_unknown_participant_not_written_to_ledger(self):
+        with self.assertRaises(ParticipantNotFoundError):
+            self.repo.record_payment("rec404", 100, "2025-01-10")
+        self.assertEqual(len(self.repo.payments_table.records), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+import io
+import sqlite3
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import database
+from models.participant import Participant
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from repositories.participant_repository import SqliteParticipantRepository
+from services.participant_service import ParticipantService
+from utils.acl import VIEWER, acl
+from utils.payment_reconciliation import (
+    ParticipantMatcher,
+    Transfer,
+    name_key,
+    normalize_phone,
+    parse_amount,
+    parse_date,
+    read_transfers,
+    reconcile,
+)
+
+BIT_EXPORT = """תאריך;שם;טלפון;סכום
+10/01/2025;Иван Петров;054-123-4567;"1,250.00"
+11/01/2025;Петрова Анна;;300
+11/01/2025;Мария Сидорова;;-50
+12/01/2025;Неизвестный Плательщик;;200
+"""
+
+
+def _participants():
+    return [
+        Participant(FullNameRU="Иван Петров", ContactInformation="+972 54 123 4567", id=1),
+        Participant(FullNameRU="Анна Петрова", FullNameEN="Anna Petrova", id=2),
+        Participant(FullNameRU="Мария Сидорова", id=3),
+    ]
+
+
+class ParsingTestCase(unittest.TestCase):
+    def test_read_transfers_streams_rows(self):
+        rows = list(read_transfers(io.StringIO(BIT_EXPORT)))
+        transfers = [r for r in rows if r is not None]
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(len(transfers), 3)  # исходящий перевод пропущен
+        self.assertEqual(transfers[0].amount, 1250)
+        self.assertEqual(transfers[0].date, "2025-01-10")
+        self.assertEqual(transfers[0].phone, "541234567")
+        self.assertTrue(transfers[0].reference.startswith("sha1:"))
+
+    def test_reference_is_stable_and_distinguishes_repeats(self):
+        statement = "date,payer,amount\n2025-01-10,Иван,100\n2025-01-10,Иван,100\n"
+        first = [t.reference for t in read_transfers(io.StringIO(statement))]
+        again = [t.reference for t in read_transfers(io.StringIO(statement))]
+        self.assertEqual(first, again)
+        self.assertNotEqual(first[0], first[1])
+
+    def test_dates(self):
+        self.assertEqual(parse_date("15/03/2024 10:22"), "2024-03-15")
+        self.assertEqual(parse_date("2024-03-15T10:22:00"), "2024-03-15")
+        self.assertIsNone(parse_date("15 марта"))
+        self.assertIsNone(parse_date(""))
+
+        statement = "date,payer,amount\n15/03/2024 10:22,Иван,100\nвчера,Анна,100\n,Мария,100\n"
+        report = reconcile(io.StringIO(statement), ParticipantMatcher([]))
+        self.assertEqual([m.transfer.date for m in report.matches], ["2024-03-15"])
+        self.assertEqual(report.skipped, 2)
+
+        no_date = read_transfers(io.StringIO("payer,amount\nИван,100\n"), upload_date="2025-02-01")
+        self.assertEqual([t.date for t in no_date], ["2025-02-01"])
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            list(read_transfers(io.StringIO("date,comment\n2025-01-10,x\n")))
+
+    def test_normalizers(self):
+        self.assertEqual(normalize_phone("050-123-4567"), normalize_phone("+972 50 1234567"))
+        self.assertEqual(name_key("Петров  Иван"), name_key("иван петров"))
+        self.assertEqual(parse_amount("₪ 150,50"), 150)
+        self.assertEqual(parse_amount("2,000"), 2000)
+        self.assertIsNone(parse_amount("—"))
+
+
+class MatcherTestCase(unittest.TestCase):
+    def test_phone_then_name_then_search(self):
+        fuzzy = SimpleNamespace(participant=_participants()[2], confidence=0.8)
+        matcher = ParticipantMatcher(_participants(), search=lambda payer: [fuzzy] if "Мари" in payer else [])
+
+        by_phone = matcher.match(Transfer(1, "I. Petrov", 100, "2025-01-10", phone="541234567"))
+        self.assertEqual((by_phone.participant.id, by_phone.confidence), (1, 1.0))
+        by_name = matcher.match(Transfer(2, "Петрова Анна", 100, "2025-01-10"))
+        self.assertEqual((by_name.participant.id, by_name.confidence), (2, 0.95))
+        by_search = matcher.match(Transfer(3, "Мариа Сидорова", 100, "2025-01-10"))
+        self.assertEqual(by_search.participant.id, 3)
+        self.assertLess(by_search.confidence, 0.85)
+        self.assertIsNone(matcher.match(Transfer(4, "Кто-то", 100, "2025-01-10")).participant)
+
+    def test_ambiguous_name_needs_review(self):
+        participants = _participants() + [Participant(FullNameRU="Иван Петров", id=4)]
+        report = reconcile(
+            io.StringIO("payer,amount\nИван Петров,100\n"), ParticipantMatcher(participants)
+        )
+        self.assertEqual(len(report.to_review), 1)
+        self.assertEqual(report.confident, [])
+
+
+class SqliteReconciliationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+        self.service = ParticipantService(SqliteParticipantRepository(), event_fee=1000)
+        for participant in _participants():
+            participant.id = None
+            participant.Role = "CANDIDATE"
+            self.service.repository.add(participant)
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def test_apply_batch_and_skip_duplicates_on_reupload(self):
+        report = self.service.reconcile_payments(io.StringIO(BIT_EXPORT))
+        self.assertEqual(len(report.confident), 2)
+        self.assertEqual(len(report.unmatched), 1)
+        self.assertEqual(report.skipped, 1)
+
+        result = self.service.apply_reconciliation(report.confident, user_id=7)
+        self.assertEqual(len(result["recorded"]), 2)
+        ivan = self.service.get_participant(1)
+        self.assertEqual((ivan.PaymentStatus, ivan.PaymentAmount), ("Paid", 1250))
+        anna = self.service.get_participant(2)
+        self.assertEqual((anna.PaymentStatus, anna.PaymentAmount), ("Partial", 300))
+        self.assertEqual(database.get_payment_history(1)[0]["method"], "bank_import")
+
+        again = self.service.reconcile_payments(io.StringIO(BIT_EXPORT))
+        result = self.service.apply_reconciliation(again.confident, user_id=7)
+        self.assertEqual(result["recorded"], [])
+        self.assertEqual(len(result["duplicates"]), 2)
+        self.assertEqual(database.get_participant_balance(1)["balance"], 1250)
+        self.assertTrue(database.verify_payment_summary()["consistent"])
+
+    def test_deleted_participant_reported_as_missing(self):
+        report = self.service.reconcile_payments(io.StringIO(BIT_EXPORT))
+        database.delete_participant(2)
+        result = self.service.apply_reconciliation(report.confident)
+        self.assertEqual(result["missing"], [2])
+        self.assertEqual(len(result["recorded"]), 1)
+
+
+class FakeTable:
+    def __init__(self, records=()):
+        self.records = {r["id"]: r for r in records}
+        self.requests = 0
+
+    def all(self, **kwargs):
+        return list(self.records.values())
+
+    def batch_create(self, records):
+        self.requests += 1
+        created = []
+        for fields in records:
+            record = {"id": f"pay{len(self.records) + 1}", "fields": dict(fields)}
+            self.records[record["id"]] = record
+            created.append(record)
+        return created
+
+    def batch_update(self, records):
+        self.requests += 1
+        for record in records:
+            self.records[record["id"]]["fields"].update(record["fields"])
+        return [self.records[r["id"]] for r in records]
+
+
+class AirtableRecordPaymentsTestCase(unittest.TestCase):
+    def test_batch_requests_and_duplicates(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            repo = AirtableParticipantRepository()
+        repo.table = FakeTable([{"id": "rec1", "fields": {}}, {"id": "rec2", "fields": {}}])
+        repo.payments_table = FakeTable(
+            [{"id": "pay1", "fields": {"ParticipantId": "rec1", "Amount": 100, "PaymentDate": "2025-01-01", "Reference": "A"}}]
+        )
+        payments = [
+            {"participant_id": "rec1", "amount": 200, "date": "2025-01-10", "reference": "A"},
+            {"participant_id": "rec1", "amount": 700, "date": "2025-01-10", "reference": "B"},
+            {"participant_id": "rec2", "amount": 300, "date": "2025-01-11", "reference": "C"},
+            {"participant_id": "rec2", "amount": 300, "date": "2025-01-11", "reference": "C"},
+        ]
+        result = repo.record_payments(payments, event_fee=800)
+
+        self.assertEqual(result["duplicates"], ["A", "C"])
+        self.assertEqual([r["balance"] for r in result["recorded"]], [800, 300])
+        self.assertEqual(repo.table.records["rec1"]["fields"]["PaymentStatus"], "Paid")
+        self.assertEqual(repo.table.records["rec2"]["fields"]["PaymentStatus"], "Partial")
+        self.assertEqual((repo.table.requests, repo.payments_table.requests), (1, 1))
+
+
+class ReconcileFileHandlerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def _send_file(self, caption=None, user_data=None):
+        from main import handle_reconcile_file
+
+        message = MagicMock(caption=caption, document=MagicMock(file_size=10))
+        message.reply_text = AsyncMock()
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=5), message=message, callback_query=None)
+        context = SimpleNamespace(user_data=user_data or {}, chat_data={})
+        with acl.override(VIEWER, [5]):
+            await handle_reconcile_file(update, context)
+        return message.reply_text
+
+    async def test_unrelated_file_is_ignored_before_role_check(self):
+        (await self._send_file()).assert_not_awaited()
+
+    async def test_statement_still_requires_coordinator(self):
+        reply = await self._send_file(caption="/reconcile")
+        self.assertIn("Только координаторы", reply.await_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import database
+from models.participant import Participant
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from utils.payment_summary import PaymentAggregate, summary_from_breakdown
+
+
+def _full_scan(conn):
+    """Прежняя реализация get_payment_summary: полный проход по таблице."""
+    rows = conn.execute(
+        "SELECT PaymentStatus, COUNT(*), SUM(PaymentAmount) FROM participants GROUP BY PaymentStatus"
+    ).fetchall()
+    return summary_from_breakdown({row[0]: {"count": row[1], "total": row[2] or 0} for row in rows})
+
+
+class SqlitePaymentSummaryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def _add(self, name, status="Unpaid", amount=0):
+        return database.add_participant(
+            {"FullNameRU": name, "PaymentStatus": status, "PaymentAmount": amount}
+        )
+
+    def test_triggers_keep_summary_in_sync(self):
+        first = self._add("Иван", "Paid", 500)
+        second = self._add("Пётр")
+        self._add("Анна", "Partial", 200)
+        self.assertEqual(database.get_payment_summary(), _full_scan(self.conn))
+
+        database.update_payment_status(second, "Paid", 300, "2025-01-24")
+        database.update_participant(first, {"FullNameRU": "Иван", "PaymentStatus": "Refunded", "PaymentAmount": 0})
+        database.update_participant_field(second, {"Church": "Грейс"})
+        database.delete_participant(first)
+
+        summary = database.get_payment_summary()
+        self.assertEqual(summary, _full_scan(self.conn))
+        self.assertEqual(summary["paid_count"], 1)
+        self.assertEqual(summary["total_amount"], 500)
+        self.assertNotIn("Refunded", summary["status_breakdown"])
+        self.assertEqual(database.verify_payment_summary()["consistent"], True)
+
+    def test_failed_write_does_not_change_summary(self):
+        self._add("Иван", "Paid", 500)
+        before = database.get_payment_summary()
+        with self.assertRaises(Exception):
+            # TEAM без департамента отклоняется триггером до вставки
+            database.add_participant({"FullNameRU": "X", "Role": "TEAM", "PaymentStatus": "Paid", "PaymentAmount": 1})
+        self.assertEqual(database.get_payment_summary(), before)
+
+    def test_verify_rebuilds_inconsistent_summary(self):
+        self._add("Иван", "Paid", 500)
+        self.conn.execute("UPDATE payment_summary SET total = 1")
+        self.conn.execute("DELETE FROM payment_summary WHERE PaymentStatus = 'Unpaid'")
+        self._add("Пётр")
+
+        with self.assertLogs("database", level="WARNING"):
+            result = database.verify_payment_summary()
+        self.assertFalse(result["consistent"])
+        self.assertTrue(result["repaired"])
+        self.assertEqual(result["differences"]["Paid"]["expected"], {"count": 1, "total": 500})
+        self.assertEqual(database.get_payment_summary(), _full_scan(self.conn))
+
+    def test_existing_database_gets_summary_on_init(self):
+        self._add("Иван", "Paid", 500)
+        self.conn.execute("DROP TABLE payment_summary")
+        self.conn.execute("PRAGMA user_version = 3")  # база до миграции 4
+        with patch("builtins.print"):
+            database.init_database()
+        self.assertEqual(database.get_payment_summary()["total_amount"], 500)
+
+
+class FakeTable:
+    def __init__(self, records):
+        self.records = {r["id"]: r for r in records}
+        self.all_calls = 0
+
+    def all(self, **kwargs):
+        self.all_calls += 1
+        return list(self.records.values())
+
+    def create(self, fields):
+        record = {"id": f"rec{len(self.records) + 1}", "fields": dict(fields)}
+        self.records[record["id"]] = record
+        return record
+
+    def update(self, record_id, fields):
+        self.records[record_id]["fields"].update(fields)
+        return self.records[record_id]
+
+    def delete(self, record_id):
+        del self.records[record_id]
+
+
+class AirtablePaymentSummaryTestCase(unittest.TestCase):
+    def setUp(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            self.repo = AirtableParticipantRepository()
+        self.repo.table = FakeTable(
+            [
+                {"id": "rec1", "fields": {"FullNameRU": "Иван", "PaymentStatus": "Paid", "PaymentAmount": 500}},
+                {"id": "rec2", "fields": {"FullNameRU": "Пётр"}},
+            ]
+        )
+
+    def test_deltas_without_refetch(self):
+        self.assertEqual(self.repo.get_payment_summary()["total_amount"], 500)
+        self.assertEqual(self.repo.table.all_calls, 1)
+
+        new_id = self.repo.add(Participant(FullNameRU="Анна", PaymentStatus="Partial", PaymentAmount=200))
+        self.repo.update_payment("rec2", "Paid", 300, "2025-01-24")
+        self.repo.update_fields("rec1", PaymentAmount=600)
+        self.repo.delete(new_id)
+
+        summary = self.repo.get_payment_summary()
+        self.assertEqual(self.repo.table.all_calls, 1)
+        self.assertEqual(summary["paid_count"], 2)
+        self.assertEqual(summary["total_amount"], 900)
+        self.assertEqual(summary["unpaid_count"], 0)
+
+        result = self.repo.verify_payment_summary()
+        self.assertTrue(result["consistent"])
+
+    def test_verify_detects_external_changes(self):
+        self.repo.get_payment_summary()
+        self.repo.table.records["rec2"]["fields"]["PaymentStatus"] = "Paid"
+        with self.assertLogs("repositories.airtable_participant_repository", level="WARNING"):
+            result = self.repo.verify_payment_summary()
+        self.assertFalse(result["consistent"])
+        self.assertEqual(self.repo.get_payment_summary()["paid_count"], 2)
+
+
+class PaymentAggregateTestCase(unittest.TestCase):
+    def test_set_replaces_contribution(self):
+        aggregate = PaymentAggregate.from_records([("a", "Paid", 100), ("b", "Unpaid", None)])
+        aggregate.set("a", "Partial", 50)
+        aggregate.discard("missing")
+        self.assertEqual(aggregate.breakdown(), {"Partial": {"count": 1, "total": 50}, "Unpaid": {"count": 1, "total": 0}})
+        self.assertEqual(aggregate.as_summary()["paid_count"], 0)
+
+
+class StatsFormatTestCase(unittest.TestCase):
+    def test_format_payment_statistics(self):
+        from main import format_payment_statistics
+
+        text = format_payment_statistics(
+            summary_from_breakdown({"Paid": {"count": 2, "total": 900}, "Unpaid": {"count": 1, "total": 0}})
+        )
+        self.assertIn("👥 Участников: 3", text)
+        self.assertIn("💰 Собрано: 900 ₪", text)
+        self.assertIn("• ✅ Оплачено: 2 чел., 900 ₪", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from telegram import Update
+
+from models.participant import Participant
+from services.participant_service import SearchResult
+from utils.metrics import MetricsRegistry
+from utils.persistence import SQLitePersistence, TransientRef, dumps, loads
+from utils.acl import acl
+
+
+class SerializationTestCase(unittest.TestCase):
+    def test_round_trip_of_bot_objects(self):
+        participant = Participant(FullNameRU="Иван Петров", Gender="M", Size="L", id=7)
+        data = {
+            "parsed_participant": {"FullNameRU": "Иван Петров", "Gender": "M"},
+            "selected_participant": participant,
+            "search_results": [SearchResult(participant, 0.9, "FullNameRU", "fuzzy")],
+            "session_start": datetime(2025, 8, 13, 10, 0),
+            "messages_to_delete": [1, 2, 3],
+            "clear_edit_job": TransientRef(object()),
+        }
+        raw = dumps(data)
+        restored = loads(raw)
+
+        self.assertEqual(restored["selected_participant"], participant)
+        self.assertEqual(restored["selected_participant"].id, 7)
+        self.assertEqual(restored["search_results"][0].participant.FullNameRU, "Иван Петров")
+        self.assertEqual(restored["search_results"][0].confidence, 0.9)
+        self.assertEqual(restored["session_start"], data["session_start"])
+        self.assertEqual(restored["messages_to_delete"], [1, 2, 3])
+        # Job не сохраняется
+        self.assertNotIn("clear_edit_job", restored)
+        # значения по умолчанию Participant не пишутся
+        self.assertNotIn("PaymentStatus", raw)
+
+
+class SQLitePersistenceTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.db")
+        self.registry = MetricsRegistry()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _persistence(self):
+        return SQLitePersistence(self.path, flush_interval=0.05, registry=self.registry)
+
+    async def test_writes_are_coalesced_and_deduplicated(self):
+        persistence = self._persistence()
+        for step in range(5):
+            await persistence.update_user_data(1, {"step": step})
+        await persistence.update_user_data(2, {"step": 0})
+        self.assertEqual(self.registry.get_counter("persistence.flushes"), 0)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.registry.get_counter("persistence.flushes"), 1)
+        self.assertEqual(self.registry.get_counter("persistence.rows_written"), 2)
+
+        # неизменные данные повторно не пишутся
+        await persistence.update_user_data(1, {"step": 4})
+        await persistence.flush()
+        self.assertEqual(self.registry.get_counter("persistence.rows_written"), 2)
+
+    async def test_lazy_rehydrate_and_conversations(self):
+        persistence = self._persistence()
+        await persistence.update_user_data(1, {"add_flow_data": {"FullNameRU": "Анна"}})
+        await persistence.update_conversation("add_conv", (1, 1), 5)
+        await persistence.update_conversation("add_conv", (2, 2), 6)
+        await persistence.flush()
+        await persistence.update_conversation("add_conv", (2, 2), None)
+        await persistence.flush()
+
+        restarted = self._persistence()
+        self.assertEqual(await restarted.get_user_data(), {})
+        self.assertEqual(await restarted.get_conversations("add_conv"), {(1, 1): 5})
+
+        user_data = {}
+        await restarted.refresh_user_data(1, user_data)
+        self.assertEqual(user_data["add_flow_data"]["FullNameRU"], "Анна")
+        # повторный refresh базу не читает и данные не перетирает
+        user_data["add_flow_data"]["FullNameRU"] = "Мария"
+        await restarted.refresh_user_data(1, user_data)
+        self.assertEqual(user_data["add_flow_data"]["FullNameRU"], "Мария")
+        self.assertEqual(self.registry.get_counter("persistence.rehydrated"), 1)
+
+        await restarted.drop_user_data(1)
+        await restarted.flush()
+        other = {}
+        await self._persistence().refresh_user_data(1, other)
+        self.assertEqual(other, {})
+
+
+class RestartDuringAddTestCase(unittest.IsolatedAsyncioTestCase):
+    """Незавершённый /add продолжается после перезапуска бота."""
+
+    async def _run(self, path, user_id, update_id, text, service):
+        import main
+        from scripts.load_test import FakeTelegram, OfflineRequest, make_message_update
+
+        api = FakeTelegram()
+        with patch("main.participant_service", service), patch("main.user_logger"), patch(
+            "main.loop_monitor", None
+        ), acl.override("coordinator", [user_id]):
+            application = main.build_application(
+                "123456:TEST",
+                request=OfflineRequest(api),
+                get_updates_request=OfflineRequest(api),
+                persistence=SQLitePersistence(path, flush_interval=0.05),
+            )
+            await application.initialize()
+            try:
+                update = Update.de_json(
+                    make_message_update(update_id, user_id, text), application.bot
+                )
+                await application.process_update(update)
+                return dict(application.user_data[user_id])
+            finally:
+                # shutdown сохраняет всё несброшенное
+                await application.shutdown()
+
+    async def test_add_flow_survives_restart(self):
+        service = MagicMock()
+        service.check_duplicate.return_value = None
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.db")
+            first = await self._run(path, 903, 1, "/add", service)
+            self.assertIn("add_flow_data", first)
+
+            second = await self._run(path, 903, 2, "Иван Петров, M, L, Грейс", service)
+
+        self.assertEqual(second["add_flow_data"]["FullNameRU"], "Иван Петров")
+        service.check_duplicate.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import contextlib
+import inspect
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import database
+from scripts import query_plan
+
+# обёртки над функциями, которые уже есть в нагрузке
+WRAPPERS = {"get_participant_by_id_safe"}
+
+
+class QueryWorkloadTestCase(unittest.TestCase):
+    def setUp(self):
+        self._db_path = database.DB_PATH
+        self._tmp = tempfile.TemporaryDirectory()
+        self.state = query_plan.build_database(os.path.join(self._tmp.name, "participants.db"), 300)
+
+    def tearDown(self):
+        database.DB_PATH = self._db_path
+        self._tmp.cleanup()
+
+    def test_workload_covers_every_query_function(self):
+        functions = {
+            name
+            for name, obj in vars(database).items()
+            if inspect.isfunction(obj)
+            and obj.__module__ == "database"
+            and name.startswith(("add_", "get_", "find_", "search_", "update_", "delete_", "record_", "verify_"))
+        }
+        self.assertLessEqual(functions - WRAPPERS, {name for name, _ in query_plan.WORKLOAD})
+
+    def test_indexed_plans(self):
+        statements = query_plan.run_workload(self.state)
+        plans = {sql: " | ".join(stats["plan"]) for sql, stats in statements.items()}
+
+        self.assertIn(
+            "participants_created_index",
+            plans["SELECT * FROM participants ORDER BY created_at DESC"],
+        )
+        unpaid = plans["SELECT * FROM participants WHERE PaymentStatus = ? ORDER BY created_at DESC"]
+        self.assertIn("participants_payment_index", unpaid)
+        self.assertIn(
+            "COVERING INDEX participants_payment_index",
+            plans[
+                "SELECT PaymentStatus, COUNT(*), IFNULL(SUM(PaymentAmount), ?) "
+                "FROM participants GROUP BY PaymentStatus"
+            ],
+        )
+        self.assertIn(
+            "participants_role_department_index (Role=? AND Department=?)",
+            plans["SELECT * FROM participants WHERE Role = ? AND Department = ? ORDER BY FullNameRU"],
+        )
+        for sql, plan in plans.items():
+            # поиск по индексу сортирует по bm25 только найденные записи
+            if "FROM participants" in sql and "participants_fts" not in sql:
+                self.assertNotIn("TEMP B-TREE", plan, sql)
+
+    def test_migration_replaces_unused_index(self):
+        with database.DatabaseConnection() as conn:
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertNotIn("Candidates_index_0", names)
+        self.assertTrue(
+            {"participants_created_index", "participants_payment_index", "FullNameRU_index"} <= names
+        )
+
+    def test_summary_check_merges_null_status(self):
+        with database.DatabaseConnection() as conn:
+            conn.execute("UPDATE participants SET PaymentStatus = NULL WHERE id = 1")
+            conn.execute("UPDATE participants SET PaymentStatus = '' WHERE id = 2")
+        with patch("builtins.print"):
+            result = database.verify_payment_summary(repair=False)
+        self.assertTrue(result["consistent"], result["differences"])
+
+    def test_main_compares_older_schema(self):
+        argv = ["query_plan.py", "--participants", "50", "--rounds", "1"]
+        output = io.StringIO()
+        with patch("sys.argv", argv), contextlib.redirect_stdout(output):
+            query_plan.main()
+        report = output.getvalue()
+        self.assertIn(f"schema 5 -> {database.SCHEMA_VERSION}", report)
+        # колонки NameKey появляются только в миграции 8
+        skipped = report.splitlines()[1]
+        self.assertTrue(skipped.startswith("skipped before:"), skipped)
+        self.assertIn("find_participant_by_name", skipped)
+        self.assertIn("participants_namekey_index", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+
+from utils.message_cleanup import MessageCleaner
+from utils.metrics import MetricsRegistry
+from utils.rate_limiter import BACKGROUND, INTERACTIVE, TelegramRequestScheduler, TokenBucket
+
+
+class RequestSchedulerTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def _scheduler(self, global_rate=1000, capacity=None, **kwargs):
+        bucket = TokenBucket(global_rate, capacity, registry=self.registry)
+        return TelegramRequestScheduler(bucket, registry=self.registry, **kwargs)
+
+    async def _send(self, scheduler, endpoint, data, result="ok", rate_limit_args=None):
+        callback = AsyncMock(return_value=result)
+        return await scheduler.process_request(callback, (), {}, endpoint, data, rate_limit_args)
+
+    async def test_interactive_requests_overtake_background(self):
+        scheduler = self._scheduler(global_rate=50, capacity=1)
+        scheduler.global_bucket.try_acquire()
+        order = []
+
+        async def send(name, endpoint, chat_id):
+            await self._send(scheduler, endpoint, {"chat_id": chat_id})
+            order.append(name)
+
+        background = [
+            asyncio.create_task(send(f"delete{i}", "deleteMessages", 100 + i)) for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.queue_depth(BACKGROUND), 3)
+        self.assertEqual(self.registry.get_gauge("ratelimit.queue.background"), 3)
+
+        reply = asyncio.create_task(send("reply", "sendMessage", 1))
+        await asyncio.gather(reply, *background)
+        self.assertEqual(order[0], "reply")
+        self.assertEqual(scheduler.queue_depth(BACKGROUND), 0)
+        self.assertEqual(scheduler.queue_depth(INTERACTIVE), 0)
+
+    async def test_per_chat_limit_does_not_block_other_chats(self):
+        scheduler = self._scheduler(chat_rate=20, chat_burst=1)
+        start = time.monotonic()
+        await self._send(scheduler, "sendMessage", {"chat_id": 1})
+        await self._send(scheduler, "sendMessage", {"chat_id": 2})
+        self.assertLess(time.monotonic() - start, 0.03)
+
+        await self._send(scheduler, "sendMessage", {"chat_id": 1})
+        # второе сообщение в тот же чат ждёт токен чата (50 мс)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertIsNotNone(self.registry.snapshot()["summaries"].get("ratelimit.chat.wait_seconds"))
+
+    async def test_retry_after_pauses_and_retries(self):
+        scheduler = self._scheduler(max_retries=2)
+        callback = AsyncMock(side_effect=[RetryAfter(0), {"message_id": 1}])
+        result = await scheduler.process_request(
+            callback, ("sendMessage",), {}, "sendMessage", {"chat_id": 1}, None
+        )
+        self.assertEqual(result, {"message_id": 1})
+        self.assertEqual(callback.await_count, 2)
+        self.assertEqual(self.registry.get_counter("ratelimit.retry_after"), 1)
+
+        callback = AsyncMock(side_effect=RetryAfter(0))
+        with self.assertRaises(RetryAfter):
+            await scheduler.process_request(callback, (), {}, "sendMessage", {"chat_id": 1}, None)
+        self.assertEqual(callback.await_count, 3)
+
+    async def test_explicit_priority_and_ext_bot_integration(self):
+        from scripts.load_test import FakeTelegram, OfflineRequest
+
+        self.assertEqual(
+            TelegramRequestScheduler.priority_for("sendMessage", {"priority": BACKGROUND}),
+            BACKGROUND,
+        )
+        scheduler = self._scheduler()
+        api = FakeTelegram()
+        bot = ExtBot("123456:TEST", request=OfflineRequest(api), rate_limiter=scheduler)
+        async with bot:
+            await bot.send_message(chat_id=5, text="hi")
+            await bot.delete_messages(chat_id=5, message_ids=[1, 2])
+
+            # очистка не тратит токены дважды: лимит держит планировщик
+            cleaner = MessageCleaner(limiter=MagicMock(), registry=self.registry)
+            cleaner.schedule(bot, 5, [3])
+            for _ in range(20):
+                await asyncio.sleep(0)
+                if not cleaner.pending:
+                    break
+        cleaner.limiter.acquire.assert_not_called()
+        self.assertEqual(api.calls["sendMessage"], 1)
+        self.assertEqual(api.calls["deleteMessages"], 2)
+        summaries = self.registry.snapshot()["summaries"]
+        # getMe при инициализации тоже идёт через планировщик
+        self.assertEqual(summaries["ratelimit.interactive.wait_seconds"]["count"], 2)
+        self.assertEqual(summaries["ratelimit.background.wait_seconds"]["count"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
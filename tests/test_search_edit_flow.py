@@ -2,6 +2,7 @@ import re
 import unittest
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
+from utils.acl import acl
 
 
 class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
@@ -46,8 +47,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             state = await handle_action_selection(action_update, context)
 
@@ -94,8 +94,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             state = await handle_action_selection(action_update, context)
 
@@ -187,8 +186,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             state = await handle_action_selection(action_update, context)
 
@@ -243,8 +241,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             state = await handle_action_selection(action_update, context)
 
@@ -258,8 +255,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         text_update.message.text = "Новое Имя"
         text_update.message.reply_text = AsyncMock()
 
-        with patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+        with acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()) as mock_show:
             # Directly call participant_confirmation to ensure core logic works (authorized)
             next_state = await handle_participant_confirmation(text_update, context)
@@ -269,8 +265,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         # Also ensure handle_message delegates when field_to_edit is set
         context.user_data["field_to_edit"] = "FullNameRU"
         from main import ApplicationHandlerStop
-        with patch("main.VIEWER_IDS", [user_id]), \
-             patch("utils.decorators.VIEWER_IDS", [user_id]), \
+        with acl.override("viewer", [user_id]), \
              patch("main.handle_participant_confirmation", new=AsyncMock(return_value=CONFIRMING_DATA)) as mock_conf:
             with self.assertRaises(ApplicationHandlerStop):
                 await handle_message(text_update, context)
@@ -303,8 +298,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             await handle_action_selection(action_update, context)
 
@@ -330,8 +324,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         fake_service = MagicMock()
         fake_service.update_participant = MagicMock()
         fake_service.get_participant = MagicMock(return_value=None)
-        with patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+        with acl.override("coordinator", [user_id]), \
              patch.object(main_module, "participant_service", fake_service), \
              patch("main._cleanup_messages", new=AsyncMock()), \
              patch("main.user_logger"):
@@ -388,8 +381,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
         
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             state = await handle_action_selection(action_update, context)
         
@@ -452,8 +444,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             state = await handle_action_selection(action_update, context)
 
@@ -516,8 +507,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
         action_query.data = "action_edit"
 
         with patch("main.user_logger"), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.show_confirmation", new=AsyncMock()):
             _ = await handle_action_selection(action_update, context)
 
@@ -552,8 +542,7 @@ class TestSearchEditFlow(unittest.IsolatedAsyncioTestCase):
 
         with patch.object(main_module, "participant_service", fake_service), \
              patch("main._cleanup_messages", new=AsyncMock()), \
-             patch("main.COORDINATOR_IDS", [user_id]), \
-             patch("utils.decorators.COORDINATOR_IDS", [user_id]), \
+             acl.override("coordinator", [user_id]), \
              patch("main.get_department_selection_keyboard_required") as kb_mock:
             kb_mock.return_value = "DEPT_KB"
             next_state = await handle_save_confirmation(save_update, context)
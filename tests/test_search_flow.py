@@ -3,6 +3,7 @@ from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from main import handle_search_callback, cancel_callback, SEARCHING_PARTICIPANTS
+from utils.acl import acl
 
 
 class SearchFlowTestCase(unittest.IsolatedAsyncioTestCase):
@@ -24,11 +25,7 @@ class SearchFlowTestCase(unittest.IsolatedAsyncioTestCase):
             "main._show_main_menu", new=AsyncMock()
         ), patch(
             "main._log_session_end"
-        ), patch(
-            "utils.decorators.VIEWER_IDS", [1]
-        ), patch(
-            "utils.decorators.COORDINATOR_IDS", []
-        ):
+        ), acl.override("viewer", [1]), acl.override("coordinator", []):
             state = await handle_search_callback(update, context)
             self.assertEqual(state, SEARCHING_PARTICIPANTS)
             self.assertIn("current_state", context.user_data)
@@ -57,11 +54,7 @@ class SearchFlowTestCase(unittest.IsolatedAsyncioTestCase):
 
         with patch(
             "main._show_search_prompt", side_effect=mock_show_search_prompt
-        ), patch("main.user_logger"), patch(
-            "utils.decorators.VIEWER_IDS", [1]
-        ), patch(
-            "utils.decorators.COORDINATOR_IDS", []
-        ):
+        ), patch("main.user_logger"), acl.override("viewer", [1]), acl.override("coordinator", []):
             state = await handle_search_callback(update, context)
 
         self.assertEqual(state, SEARCHING_PARTICIPANTS)
@@ -98,11 +91,7 @@ class SearchFlowTestCase(unittest.IsolatedAsyncioTestCase):
 
         with patch(
             "main._show_search_prompt", side_effect=mock_show_search_prompt
-        ), patch("main.user_logger"), patch(
-            "utils.decorators.VIEWER_IDS", [1]
-        ), patch(
-            "utils.decorators.COORDINATOR_IDS", []
-        ):
+        ), patch("main.user_logger"), acl.override("viewer", [1]), acl.override("coordinator", []):
             state = await handle_search_callback(update, context)
 
         self.assertEqual(state, SEARCHING_PARTICIPANTS)
@@ -0,0 +1,101 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+import database
+from repositories.airtable_participant_repository import AirtableParticipantRepository
+from repositories.participant_repository import SqliteParticipantRepository
+from services.participant_service import ParticipantService
+from utils.migrations import run_migrations
+
+PARTICIPANTS = (
+    {"FullNameRU": "Ксения Кармаленко", "FullNameEN": "Kseniya Karmalenko", "Church": "Благодать"},
+    {"FullNameRU": "Иван Петров", "FullNameEN": "Ivan Petrov", "Church": "Новая жизнь"},
+    {"FullNameRU": "Мария Петрова", "FullNameEN": "Mariya Petrova", "CountryAndCity": "Хайфа"},
+)
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self._original_enter = database.DatabaseConnection.__enter__
+        self._original_exit = database.DatabaseConnection.__exit__
+
+        def _enter(_self):
+            _self.conn = self.conn
+            return self.conn
+
+        def _exit(_self, exc_type, exc_val, exc_tb):
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+
+        database.DatabaseConnection.__enter__ = _enter
+        database.DatabaseConnection.__exit__ = _exit
+        with patch("builtins.print"):
+            database.init_database()
+        self.ids = [
+            database.add_participant({**fields, "Gender": "F", "Role": "CANDIDATE"})
+            for fields in PARTICIPANTS
+        ]
+        self.repository = SqliteParticipantRepository()
+        self.service = ParticipantService(self.repository, cache_ttl=0)
+
+    def tearDown(self):
+        database.DatabaseConnection.__enter__ = self._original_enter
+        database.DatabaseConnection.__exit__ = self._original_exit
+        self.conn.close()
+
+    def _found(self, query):
+        return sorted(row["id"] for row in database.search_participants(query))
+
+    def test_triggers_keep_index_in_sync(self):
+        self.assertEqual(self._found("петров"), [self.ids[1], self.ids[2]])
+
+        database.update_participant_field(self.ids[1], {"FullNameRU": "Иван Сидоров"})
+        self.assertEqual(self._found("петров"), [self.ids[2]])
+        self.assertEqual(self._found("сидоров"), [self.ids[1]])
+
+        database.delete_participant(self.ids[2])
+        self.assertNotIn(self.ids[2], self._found("мария петрова"))
+        self.conn.execute("INSERT INTO participants_fts (participants_fts) VALUES ('integrity-check')")
+
+    def test_typo_is_found_without_loading_all_participants(self):
+        with patch.object(self.repository, "get_all") as get_all:
+            results = self.service.search_participants("Ксиния Кармаленко")
+            get_all.assert_not_called()
+        self.assertEqual(results[0].participant.id, self.ids[0])
+        self.assertEqual(results[0].match_field, "name_ru")
+
+    def test_church_and_city_matches(self):
+        results = self.service.search_participants("Новая жизнь")
+        self.assertEqual([(r.participant.id, r.match_field) for r in results], [(self.ids[1], "church")])
+        results = self.service.search_participants("хайфа")
+        self.assertEqual([(r.participant.id, r.match_field) for r in results], [(self.ids[2], "city")])
+
+    def test_short_query_falls_back_to_full_list(self):
+        self.assertIsNone(database.search_participants("Ив"))
+        with patch.object(self.repository, "get_all", wraps=self.repository.get_all) as get_all:
+            self.service.search_participants("Ив")
+            get_all.assert_called_once()
+
+    def test_database_without_index_falls_back(self):
+        conn = sqlite3.connect(":memory:")
+        run_migrations(conn, database.MIGRATIONS[:6])
+        self.conn, old = conn, self.conn
+        try:
+            self.assertIsNone(database.search_participants("петров"))
+        finally:
+            self.conn = old
+            conn.close()
+
+    def test_airtable_has_no_storage_search(self):
+        with patch.dict("os.environ", {"AIRTABLE_TOKEN": "test", "AIRTABLE_BASE_ID": "test"}):
+            repository = AirtableParticipantRepository()
+        self.assertIsNone(repository.search("петров"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils import sql_profiler
+from utils.sql_profiler import ProfilingConnection, SqlProfiler, normalize_sql
+
+
+class NormalizeSqlTestCase(unittest.TestCase):
+    def test_literals_and_whitespace(self):
+        self.assertEqual(
+            normalize_sql("SELECT *\n  FROM participants WHERE id = 42 AND Role = 'TEAM'"),
+            "SELECT * FROM participants WHERE id = ? AND Role = ?",
+        )
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (?, ?, ?)"),
+            "SELECT * FROM t WHERE id IN (?...)",
+        )
+        # цифры внутри идентификаторов не трогаем
+        self.assertIn("Candidates_index_0", normalize_sql("DROP INDEX Candidates_index_0"))
+
+
+class SqlProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.profiler = SqlProfiler(enabled=True, explain_threshold=10.0)
+        patcher = patch.object(sql_profiler, "profiler", self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.conn = sqlite3.connect(":memory:", factory=ProfilingConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+        self.conn.executemany("INSERT INTO t (name) VALUES (?)", [("a",), ("b",), ("c",)])
+        self.addCleanup(self.conn.close)
+
+    def test_aggregates_calls_time_and_rows(self):
+        for i in (1, 2):
+            self.conn.execute("SELECT * FROM t WHERE id = ?", (i,)).fetchone()
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM t")
+        self.assertEqual(len(list(cursor)), 3)
+
+        stats = self.profiler.snapshot()
+        by_id = stats["SELECT * FROM t WHERE id = ?"]
+        self.assertEqual(by_id["calls"], 2)
+        self.assertEqual(by_id["rows"], 2)
+        self.assertEqual(stats["SELECT * FROM t"]["rows"], 3)
+        self.assertEqual(stats["INSERT INTO t (name) VALUES (?)"]["rows"], 3)
+        self.assertGreater(by_id["total"], 0)
+
+    def test_plan_captured_over_threshold(self):
+        self.profiler.explain_threshold = 0.0
+        self.conn.execute("SELECT name FROM t WHERE id = ?", (1,)).fetchall()
+
+        stats = self.profiler.snapshot()
+        plan = stats["SELECT name FROM t WHERE id = ?"]["plan"]
+        self.assertTrue(any("t USING" in step for step in plan), plan)
+        # сам EXPLAIN в профиль не попадает
+        self.assertFalse(any(k.startswith("EXPLAIN") for k in stats))
+
+    def test_dump_and_report(self):
+        self.conn.execute("SELECT * FROM t").fetchall()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.profiler.dump(os.path.join(tmp, "profile.json"))
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        report = sql_profiler.format_report(data["statements"], sort="calls")
+        self.assertIn("SELECT * FROM t", report)
+
+    def test_disabled_uses_plain_connection(self):
+        self.profiler.enabled = False
+        conn = sql_profiler.connect(":memory:")
+        self.assertIs(type(conn), sqlite3.Connection)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
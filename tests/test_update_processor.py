@@ -0,0 +1,140 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from telegram import Update
+
+from utils.metrics import MetricsRegistry
+from utils.update_processor import PerUserUpdateProcessor, create_update_processor
+from utils.acl import acl
+
+
+def _update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+
+class PerUserUpdateProcessorTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_same_user_serialized_other_users_parallel(self):
+        registry = MetricsRegistry()
+        processor = PerUserUpdateProcessor(8, registry=registry)
+        events = []
+        running = set()
+        peak = 0
+
+        async def handle(name, user_id, delay):
+            nonlocal peak
+            events.append(("start", name))
+            running.add(name)
+            peak = max(peak, len(running))
+            # один и тот же пользователь не должен обрабатываться одновременно
+            self.assertEqual(sum(1 for n in running if n[0] == name[0]), 1)
+            await asyncio.sleep(delay)
+            running.discard(name)
+            events.append(("end", name))
+
+        jobs = [
+            ("a1", 1, 0.05),
+            ("b1", 2, 0.01),
+            ("a2", 1, 0.0),
+            ("b2", 2, 0.0),
+        ]
+        await asyncio.gather(
+            *(
+                processor.process_update(_update(user_id), handle(name, user_id, delay))
+                for name, user_id, delay in jobs
+            )
+        )
+
+        self.assertLess(events.index(("end", "a1")), events.index(("start", "a2")))
+        self.assertLess(events.index(("end", "b1")), events.index(("start", "b2")))
+        # b1/b2 завершились, пока a1 ещё выполнялся
+        self.assertLess(events.index(("end", "b2")), events.index(("end", "a1")))
+        self.assertGreaterEqual(peak, 2)
+        self.assertEqual(processor.active_keys, 0)
+        self.assertEqual(registry.get_counter("updates.serialized"), 2)
+
+    async def test_lock_released_on_error(self):
+        processor = PerUserUpdateProcessor(4)
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def ok():
+            return None
+
+        with self.assertRaises(RuntimeError):
+            await processor.process_update(_update(1), fail())
+        await asyncio.wait_for(processor.process_update(_update(1), ok()), timeout=1)
+        self.assertEqual(processor.active_keys, 0)
+
+    def test_sequential_when_concurrency_is_one(self):
+        self.assertIsNone(create_update_processor(1))
+        self.assertEqual(create_update_processor(16).max_concurrent_updates, 16)
+
+
+class InterleavedFlowsTestCase(unittest.IsolatedAsyncioTestCase):
+    """Апдейты двух координаторов приходят вперемешку: /add и /search."""
+
+    async def test_interleaved_add_and_search_flows(self):
+        import main
+        from models.participant import Participant
+        from scripts.load_test import FakeTelegram, OfflineRequest, TimingUpdateProcessor, make_message_update
+
+        adder, searcher = 901, 902
+        participant = Participant(id=5, FullNameRU="Иван Петров", Gender="M", Size="L", Church="Грейс")
+        result = SimpleNamespace(
+            participant=participant, confidence=1.0, match_field="FullNameRU", match_type="exact"
+        )
+        service = MagicMock()
+        service.check_duplicate.return_value = None
+        service.search_participants.return_value = [result]
+        service.format_search_result.return_value = "Иван Петров (ID: 5)"
+
+        api = FakeTelegram(latency=0.02)
+        processor = TimingUpdateProcessor(PerUserUpdateProcessor(8))
+
+        with patch("main.participant_service", service), patch("main.user_logger"), patch(
+            "main.loop_monitor", None
+        ), acl.override("coordinator", [adder, searcher]):
+            application = main.build_application(
+                "123456:TEST",
+                request=OfflineRequest(api),
+                get_updates_request=OfflineRequest(api),
+                update_processor=processor,
+            )
+            await application.initialize()
+            await application.start()
+            try:
+                steps = [
+                    (adder, "/add"),
+                    (searcher, "/search"),
+                    (adder, "Иван Петров, M, L, Грейс"),
+                    (searcher, "Иван"),
+                ]
+                waiters = []
+                for update_id, (user_id, text) in enumerate(steps, start=1):
+                    waiters.append(processor.expect(update_id))
+                    update = Update.de_json(
+                        make_message_update(update_id, user_id, text), application.bot
+                    )
+                    await application.update_queue.put(update)
+                await asyncio.wait_for(asyncio.gather(*waiters), timeout=10)
+            finally:
+                await application.stop()
+                await application.shutdown()
+
+        add_data = application.user_data[adder]
+        self.assertEqual(add_data["add_flow_data"]["FullNameRU"], "Иван Петров")
+        self.assertNotIn("search_results", add_data)
+
+        search_data = application.user_data[searcher]
+        self.assertEqual(len(search_data["search_results"]), 1)
+        self.assertNotIn("add_flow_data", search_data)
+        service.search_participants.assert_called_once()
+        # ответы двух пользователей отправлялись одновременно
+        self.assertGreaterEqual(api.peak_in_flight, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import logging
+import queue
+import unittest
+from datetime import datetime
+
+from utils import user_logger as module
+from utils.metrics import metrics
+from utils.user_logger import UserActionLogger, UserEvent
+
+
+class _CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class UserActionLoggerTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.capture = _CaptureHandler()
+        logging.getLogger("user_action").addHandler(self.capture)
+
+    def tearDown(self):
+        logging.getLogger("user_action").removeHandler(self.capture)
+
+    def test_event_is_serialised_lazily(self):
+        user_logger = UserActionLogger(sample_rates={})
+        user_logger.log_state_transition(1, "A", "B", {"input": "текст"})
+        record = self.capture.records[-1]
+        self.assertIsInstance(record.msg, UserEvent)
+
+        # обработчик очереди передаёт событие потоку записи без форматирования
+        log_queue = queue.Queue()
+        record = logging.makeLogRecord({"msg": record.msg, "created": record.created})
+        module._LazyQueueHandler(log_queue).handle(record)
+        queued = log_queue.get_nowait()
+        self.assertIsInstance(queued.msg, UserEvent)
+        self.assertFalse(hasattr(queued, "message"))
+
+        line = module._UserEventFormatter("%(message)s").format(queued)
+        data = json.loads(line)
+        self.assertEqual(data["event"], "state_transition")
+        self.assertEqual(data["context"], {"input": "текст"})
+        datetime.fromisoformat(data["timestamp"])
+
+    def test_sampling_counts_skipped_events(self):
+        user_logger = UserActionLogger(sample_rates={"state_transition": 0.0})
+        for _ in range(5):
+            user_logger.log_state_transition(1, "A", "B", {})
+        user_logger.log_user_action(1, "command", {"command": "/add"})
+
+        self.assertEqual(
+            [r.msg.data["event"] for r in self.capture.records], ["user_action"]
+        )
+        stats = UserActionLogger.stats()
+        self.assertEqual(stats["user_log.sampled_out.state_transition"], 5)
+        self.assertEqual(stats["user_log.emitted"], 1)
+
+    def test_full_queue_drops_and_counts(self):
+        handler = module._LazyQueueHandler(queue.Queue(maxsize=1))
+        record = logging.makeLogRecord({"msg": UserEvent({"event": "x"})})
+        handler.enqueue(record)
+        handler.enqueue(record)
+        self.assertEqual(metrics.get_counter("user_log.dropped"), 1)
+
+    def test_dumps_handles_non_json_values(self):
+        data = json.loads(module.dumps({1: datetime(2025, 1, 1), "name": "Иван"}))
+        self.assertEqual(data["name"], "Иван")
+        self.assertTrue(data["1"].startswith("2025-01-01"))
+
+
+class SafeSerializeUserDataTestCase(unittest.TestCase):
+    def test_type_based_check(self):
+        from main import _safe_serialize_user_data
+        from models.participant import Participant
+
+        safe = _safe_serialize_user_data(
+            {
+                "current_state": 8,
+                "add_flow_data": {"FullNameRU": "Иван", "tags": [1, 2.5, None]},
+                "participant": Participant(FullNameRU="Иван"),
+                "started": datetime(2025, 1, 1),
+            }
+        )
+        self.assertEqual(safe["current_state"], 8)
+        self.assertEqual(safe["add_flow_data"]["tags"], [1, 2.5, None])
+        self.assertEqual(safe["participant"], "<Participant object>")
+        self.assertEqual(safe["started"], "2025-01-01 00:00:00")
+        json.dumps(safe, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
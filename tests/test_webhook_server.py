@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from telegram import Bot, Update
+from telegram.ext import Application, CommandHandler
+
+from utils.metrics import MetricsRegistry
+from utils.webhook_server import AIOHTTP_AVAILABLE, SECRET_HEADER
+
+if AIOHTTP_AVAILABLE:
+    import aiohttp
+
+    from utils.webhook_server import BotHTTPServer, serve_webhook
+
+UPDATE = {
+    "update_id": 10,
+    "message": {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "/start",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    },
+}
+
+
+@unittest.skipUnless(AIOHTTP_AVAILABLE, "aiohttp не установлен")
+class BotHTTPServerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.registry = MetricsRegistry()
+        self.application = SimpleNamespace(
+            bot=Bot("123456:TEST"), update_queue=asyncio.Queue(), running=True
+        )
+        self.server = BotHTTPServer(
+            self.application,
+            port=0,
+            webhook_path="/telegram",
+            secret_token="s3cret",
+            registry=self.registry,
+        )
+        await self.server.start()
+        self.base = f"http://127.0.0.1:{self.server.port}"
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.stop()
+
+    async def test_valid_secret_queues_update(self):
+        async with self.session.post(
+            self.base + "/telegram", json=UPDATE, headers={SECRET_HEADER: "s3cret"}
+        ) as response:
+            self.assertEqual(response.status, 200)
+        update = self.application.update_queue.get_nowait()
+        self.assertIsInstance(update, Update)
+        self.assertEqual(update.effective_user.id, 42)
+        self.assertEqual(self.registry.get_counter("webhook.updates"), 1)
+
+    async def test_wrong_secret_and_bad_payload_rejected(self):
+        async with self.session.post(
+            self.base + "/telegram", json=UPDATE, headers={SECRET_HEADER: "wrong"}
+        ) as response:
+            self.assertEqual(response.status, 403)
+        async with self.session.post(
+            self.base + "/telegram", data=b"{not json", headers={SECRET_HEADER: "s3cret"}
+        ) as response:
+            self.assertEqual(response.status, 400)
+        self.assertTrue(self.application.update_queue.empty())
+        self.assertEqual(self.registry.get_counter("webhook.rejected"), 1)
+
+    async def test_metrics_and_health(self):
+        self.registry.inc("handlers.calls", 3)
+        async with self.session.get(self.base + "/metrics") as response:
+            data = await response.json()
+        self.assertEqual(data["counters"]["handlers.calls"], 3)
+        async with self.session.get(self.base + "/healthz") as response:
+            self.assertEqual((await response.json())["status"], "ok")
+
+
+@unittest.skipUnless(AIOHTTP_AVAILABLE, "aiohttp не установлен")
+class ServeWebhookTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_update_processed_through_application(self):
+        from scripts.load_test import FakeTelegram, OfflineRequest
+
+        api = FakeTelegram()
+        application = (
+            Application.builder()
+            .token("123456:TEST")
+            .request(OfflineRequest(api))
+            .get_updates_request(OfflineRequest(api))
+            .build()
+        )
+        handled = asyncio.Event()
+
+        async def start(update, context):
+            await update.message.reply_text("pong")
+            handled.set()
+
+        application.add_handler(CommandHandler("start", start))
+        server = BotHTTPServer(application, port=0, webhook_path="/telegram", secret_token="s3cret")
+        stop = asyncio.Event()
+        serving = asyncio.create_task(serve_webhook(application, server, stop_event=stop))
+        while not application.running:
+            await asyncio.sleep(0.01)
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                f"http://127.0.0.1:{server.port}/telegram",
+                json=UPDATE,
+                headers={SECRET_HEADER: "s3cret"},
+            ) as response:
+                self.assertEqual(response.status, 200)
+        await asyncio.wait_for(handled.wait(), timeout=5)
+
+        stop.set()
+        await serving
+        self.assertFalse(application.running)
+        self.assertEqual(api.calls["sendMessage"], 1)
+        # webhook не регистрировался: URL не передан
+        self.assertEqual(api.calls["setWebhook"], 0)
+
+
+class AllowedUpdatesTestCase(unittest.TestCase):
+    def test_default_allowed_updates_narrowed(self):
+        import config
+
+        self.assertEqual(config.ALLOWED_UPDATES, ["message", "callback_query"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+"""Список доступа (ACL): роли пользователей и права на команды.
+
+Раньше роли проверялись ``user_id in COORDINATOR_IDS`` по спискам из
+config.py, а ``require_role("viewer")`` на каждый вызов склеивал два списка.
+Чтобы добавить координатора, нужно было править код и перезапускать бота.
+
+``AccessControl`` хранит роли в словаре ``user_id -> роль`` и права ролей во
+``frozenset``, так что любая проверка — один поиск в словаре:
+
+* роли из config.py (``COORDINATOR_IDS``/``VIEWER_IDS``) — статические, их
+  нельзя отозвать командой;
+* роли, выданные через ``/admin``, хранятся в JSON-файле (``ACL_PATH``);
+* файл перечитывается на лету: не чаще раза в ``check_interval`` секунд
+  сравниваются его mtime и размер, поэтому правка файла вручную или другим
+  процессом применяется без перезапуска.
+
+Формат файла::
+
+    {"users": {"123": "coordinator", "456": "viewer"},
+     "permissions": {"viewer": ["search", "list"]}}
+
+``permissions`` необязателен и заменяет права указанных ролей по умолчанию.
+Обработчики проверяют их через ``require_role(role, command)``: роль задаёт
+минимальный уровень, а список прав может отнять у роли команду (например,
+``/stats`` у наблюдателей или ``/reconcile`` у координаторов).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterable, Iterator, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COORDINATOR = "coordinator"
+VIEWER = "viewer"
+UNAUTHORIZED = "unauthorized"
+
+# Старшая роль включает права младшей
+ROLE_RANK = {VIEWER: 1, COORDINATOR: 2}
+
+_VIEWER_COMMANDS = frozenset({"start", "help", "search", "list", "stats", "export", "cancel"})
+DEFAULT_PERMISSIONS: Mapping[str, FrozenSet[str]] = {
+    VIEWER: _VIEWER_COMMANDS,
+    COORDINATOR: _VIEWER_COMMANDS
+    | frozenset({"add", "edit", "edit_field", "delete", "payment", "reconcile", "admin"}),
+}
+
+
+class AccessControl:
+    """Роли пользователей с горячей перезагрузкой из файла."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        coordinators: Iterable[int] = (),
+        viewers: Iterable[int] = (),
+        check_interval: float = 1.0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self.configure(path, coordinators, viewers, check_interval)
+
+    def configure(
+        self,
+        path: Optional[str] = None,
+        coordinators: Iterable[int] = (),
+        viewers: Iterable[int] = (),
+        check_interval: float = 1.0,
+    ) -> None:
+        """Задаёт статические роли и файл ACL; файл читается при первой проверке."""
+        with self._lock:
+            self.path = path
+            self.check_interval = check_interval
+            self._static: Dict[int, str] = {}
+            for user_id in viewers:
+                self._static[int(user_id)] = VIEWER
+            for user_id in coordinators:
+                self._static[int(user_id)] = COORDINATOR
+            self._granted: Dict[int, str] = {}
+            self._file_permissions: Dict[str, FrozenSet[str]] = {}
+            self._file_stamp: Optional[Tuple[int, int]] = None
+            self._next_check = 0.0
+            self._overridden = 0
+            self._rebuild()
+
+    # --- Проверки --------------------------------------------------------------
+
+    def role_of(self, user_id: Optional[int]) -> str:
+        """Роль пользователя: ``coordinator``, ``viewer`` или ``unauthorized``."""
+        self._maybe_reload()
+        return self._roles.get(user_id, UNAUTHORIZED)
+
+    def has_role(self, user_id: Optional[int], role: str) -> bool:
+        """Есть ли у пользователя роль ``role`` или старше."""
+        self._maybe_reload()
+        return ROLE_RANK.get(self._roles.get(user_id), 0) >= ROLE_RANK[role]
+
+    def can(self, user_id: Optional[int], command: str) -> bool:
+        """Разрешена ли пользователю команда ``command`` (без слеша)."""
+        self._maybe_reload()
+        role = self._roles.get(user_id)
+        return role is not None and command in self._permissions.get(role, ())
+
+    def users(self) -> Dict[int, str]:
+        """Копия таблицы ролей (статические и выданные)."""
+        self._maybe_reload()
+        return dict(self._roles)
+
+    def is_static(self, user_id: int) -> bool:
+        return user_id in self._static
+
+    # --- Изменение ------------------------------------------------------------
+
+    def grant(self, user_id: int, role: str, persist: bool = True) -> None:
+        """Выдаёт роль; при ``persist=False`` только до перезапуска."""
+        if role not in ROLE_RANK:
+            raise ValueError(f"Unknown role: {role}")
+        self._maybe_reload()
+        with self._lock:
+            if persist:
+                self._granted[int(user_id)] = role
+                self._save()
+            else:
+                self._static[int(user_id)] = role
+            self._rebuild()
+
+    def revoke(self, user_id: int) -> bool:
+        """Отзывает выданную роль. Статические роли из config.py не отзываются."""
+        self._maybe_reload()
+        with self._lock:
+            if self._granted.pop(int(user_id), None) is None:
+                return False
+            self._save()
+            self._rebuild()
+        return True
+
+    @contextmanager
+    def override(self, role: str, user_ids: Iterable[int]) -> Iterator[None]:
+        """Временно заменяет состав роли (для тестов); файл на это время не читается."""
+        with self._lock:
+            saved = (self._static, self._granted, self._roles)
+            members = {int(user_id) for user_id in user_ids}
+            self._static = {
+                user_id: r for user_id, r in self._static.items() if r != role and user_id not in members
+            }
+            self._static.update(dict.fromkeys(members, role))
+            self._granted = {
+                user_id: r for user_id, r in self._granted.items() if r != role and user_id not in members
+            }
+            self._overridden += 1
+            self._rebuild()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._static, self._granted, self._roles = saved
+                self._overridden -= 1
+
+    # --- Файл ------------------------------------------------------------------
+
+    def _rebuild(self) -> None:
+        # новая таблица собирается целиком и подменяется одной ссылкой
+        roles = dict(self._granted)
+        roles.update(self._static)
+        permissions = dict(DEFAULT_PERMISSIONS)
+        permissions.update(self._file_permissions)
+        self._roles = roles
+        self._permissions = permissions
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _maybe_reload(self) -> None:
+        if not self.path or self._overridden:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            self._next_check = now + self.check_interval
+            stamp = self._stamp()
+            if stamp == self._file_stamp:
+                return
+            self._load(stamp)
+
+    def reload(self) -> None:
+        """Перечитывает файл немедленно."""
+        with self._lock:
+            self._load(self._stamp())
+
+    def _load(self, stamp: Optional[Tuple[int, int]]) -> None:
+        granted: Dict[int, str] = {}
+        permissions: Dict[str, FrozenSet[str]] = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for user_id, role in data.get("users", {}).items():
+                    if role in ROLE_RANK:
+                        granted[int(user_id)] = role
+                for role, commands in data.get("permissions", {}).items():
+                    permissions[role] = frozenset(commands)
+            except (OSError, ValueError, AttributeError) as e:
+                # битый файл не должен отбирать доступ: оставляем прежние роли
+                logger.error("Failed to load ACL from %s: %s", self.path, e)
+                return
+        self._granted = granted
+        self._file_permissions = permissions
+        self._file_stamp = stamp
+        self._rebuild()
+        logger.info("ACL loaded: %d granted roles", len(granted))
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = {"users": {str(user_id): role for user_id, role in sorted(self._granted.items())}}
+        if self._file_permissions:
+            data["permissions"] = {
+                role: sorted(commands) for role, commands in self._file_permissions.items()
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._file_stamp = self._stamp()
+
+
+acl = AccessControl()
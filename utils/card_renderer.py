@@ -0,0 +1,331 @@
+"""Рендеринг карточек участников по заранее скомпилированным шаблонам.
+
+Раньше карточки (блок подтверждения, полная информация, результат поиска,
+строка /list) собирались f-строками и ``+=`` при каждом показе, со
+справочниками отображаемых значений внутри цикла. ``CardRenderer``:
+
+* для каждого вида карточки шаблоны строк компилируются один раз
+  (``str.format_map``), текст собирается ``join`` по списку строк;
+* значения полей экранируются для Markdown один раз на уникальное значение
+  (``escape_value`` кеширован), поэтому имена с ``_`` или ``*`` больше не
+  ломают разметку сообщения;
+* готовая карточка кешируется по (вид, версия записи). Версия — кортеж
+  значений полей участника, так что любое изменение записи даёт новый ключ
+  и карточка перерисовывается только после изменения.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+
+from telegram.helpers import escape_markdown
+
+from constants import (
+    DEPARTMENT_DISPLAY,
+    GENDER_DISPLAY,
+    PAYMENT_STATUS_DISPLAY,
+    ROLE_DISPLAY,
+    SIZE_DISPLAY,
+)
+from utils.metrics import MetricsRegistry, metrics
+
+NOT_SET = "Не указано"
+
+# Поля, от которых зависит любая карточка; их значения и есть версия записи
+CARD_FIELDS = (
+    "id",
+    "FullNameRU",
+    "FullNameEN",
+    "Gender",
+    "Size",
+    "Church",
+    "Role",
+    "Department",
+    "CountryAndCity",
+    "SubmittedBy",
+    "ContactInformation",
+    "PaymentStatus",
+    "PaymentAmount",
+    "PaymentDate",
+)
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=8192)
+def _escape_str(value: str) -> str:
+    return escape_markdown(value, version=1)
+
+
+def escape_value(value: Any) -> str:
+    """Значение поля для Markdown; строки экранируются один раз на значение."""
+    if isinstance(value, str):
+        return _escape_str(value)
+    return str(value)
+
+
+def record_version(data: Any) -> Tuple[Any, ...]:
+    """Версия записи: значения полей карточки (dict или объект участника)."""
+    if isinstance(data, Mapping):
+        return tuple(data.get(name, _MISSING) for name in CARD_FIELDS)
+    return tuple(getattr(data, name, _MISSING) for name in CARD_FIELDS)
+
+
+def _fields(version: Tuple[Any, ...]) -> Dict[str, Any]:
+    # отсутствующие ключи не попадают в словарь: .get(name, default) работает
+    # так же, как на исходных данных
+    return {name: value for name, value in zip(CARD_FIELDS, version) if value is not _MISSING}
+
+
+# --- Шаблоны -----------------------------------------------------------------
+
+_BLOCK_HEAD = (
+    "Имя (рус): {name}\n"
+    "Имя (англ): {name_en}\n"
+    "Пол: {gender}\n"
+    "Размер: {size}\n"
+    "Церковь: {church}\n"
+    "Роль: {role}"
+).format_map
+_BLOCK_DEPARTMENT = "Департамент: {department}".format_map
+_BLOCK_TAIL = (
+    "Город: {city}\n"
+    "Кто подал: {submitted_by}\n"
+    "Контакты: {contacts}\n"
+    "💰 Статус оплаты: {payment_status}"
+).format_map
+_BLOCK_AMOUNT = "💳 Сумма оплаты: {amount} ₪".format_map
+_BLOCK_DATE = "📅 Дата оплаты: {date}".format_map
+
+_FULL_HEAD = "👤 **{name}** (ID: {id})".format_map
+_FULL_NAME_EN = "🌍 English: {name_en}".format_map
+_FULL_BODY = (
+    "⚥ Пол: {gender}\n"
+    "👕 Размер: {size}\n"
+    "⛪ Церковь: {church}\n"
+    "👥 Роль: {role}"
+).format_map
+_FULL_DEPARTMENT = "🏢 Департамент: {department}".format_map
+_FULL_CITY = "🏙️ Город: {city}".format_map
+_FULL_SUBMITTED_BY = "👨‍💼 Кто подал: {submitted_by}".format_map
+_FULL_CONTACTS = "📞 Контакты: {contacts}".format_map
+
+_SEARCH_CARD = (
+    "{confidence_emoji} {role_emoji} **{name}** (ID: {id})\n"
+    "   • Церковь: {church}\n"
+    "   • Роль: {role}{department}\n"
+    "   • {payment}"
+).format_map
+_SEARCH_NAME_EN = "\n   • English: {name_en}".format_map
+_SEARCH_CONFIDENCE = "\n   • Совпадение: {percent}%".format_map
+
+_LIST_ITEM = (
+    "{role_emoji} **{name}**\n"
+    "   • Роль: {role}{department}\n"
+    "   • Оплата: {payment}\n"
+    "   • ID: {id}\n\n"
+).format_map
+_LIST_HEADER = "📋 **Список участников ({count} чел.):**\n\n".format_map
+
+# Статус оплаты в коротких карточках: (шаблон с суммой, текст без суммы)
+_SEARCH_PAYMENT = {
+    "Paid": ("💰 Оплачено: {} ₪", None),
+    "Partial": ("🔄 Частично: {} ₪", None),
+    "Refunded": (None, "🔙 Возврат оплаты"),
+}
+_LIST_PAYMENT = {
+    "Paid": ("💰 {} ₪", None),
+    "Partial": ("🔄 {} ₪", None),
+    "Refunded": (None, "🔙 Возврат"),
+}
+
+
+def _short_payment(fields: Mapping[str, Any], variants: Mapping[str, Tuple], unpaid: str) -> str:
+    status = fields.get("PaymentStatus")
+    amount = fields.get("PaymentAmount")
+    with_amount, fixed = variants.get(status, (None, None))
+    if with_amount and amount:
+        return with_amount.format(amount)
+    return fixed or unpaid
+
+
+def _role_extras(fields: Mapping[str, Any]) -> Tuple[str, str]:
+    role = fields.get("Role")
+    role_emoji = "👤" if role == "CANDIDATE" else "👨‍💼"
+    department = fields.get("Department")
+    suffix = f" ({escape_value(department)})" if role == "TEAM" and department else ""
+    return role_emoji, suffix
+
+
+# --- Виды карточек ---------------------------------------------------------------
+
+
+def _render_block(fields: Mapping[str, Any]) -> str:
+    role_key = fields.get("Role") or ""
+    dept_key = fields.get("Department") or ""
+    payment_status = fields.get("PaymentStatus") or "Unpaid"
+    context = {
+        "name": escape_value(fields.get("FullNameRU") or NOT_SET),
+        "name_en": escape_value(fields.get("FullNameEN") or NOT_SET),
+        "gender": GENDER_DISPLAY.get(fields.get("Gender") or "", NOT_SET),
+        "size": SIZE_DISPLAY.get(fields.get("Size") or "", NOT_SET),
+        "church": escape_value(fields.get("Church") or NOT_SET),
+        "role": escape_value(ROLE_DISPLAY.get(role_key, role_key)),
+        "department": escape_value(DEPARTMENT_DISPLAY.get(dept_key, dept_key or NOT_SET)),
+        "city": escape_value(fields.get("CountryAndCity") or NOT_SET),
+        "submitted_by": escape_value(fields.get("SubmittedBy") or NOT_SET),
+        "contacts": escape_value(fields.get("ContactInformation") or NOT_SET),
+        "payment_status": escape_value(PAYMENT_STATUS_DISPLAY.get(payment_status, payment_status)),
+    }
+    lines = [_BLOCK_HEAD(context)]
+    if role_key == "TEAM":
+        lines.append(_BLOCK_DEPARTMENT(context))
+    lines.append(_BLOCK_TAIL(context))
+    amount = fields.get("PaymentAmount", 0)
+    if amount and amount > 0:
+        lines.append(_BLOCK_AMOUNT({"amount": amount}))
+    date = fields.get("PaymentDate", "")
+    if date:
+        lines.append(_BLOCK_DATE({"date": escape_value(date)}))
+    return "\n".join(lines)
+
+
+def _render_full_info(fields: Mapping[str, Any]) -> str:
+    participant_id = fields.get("id")
+    department = fields.get("Department")
+    context = {
+        "name": escape_value(fields.get("FullNameRU", NOT_SET)),
+        "id": escape_value(participant_id) if participant_id else "N/A",
+        "name_en": escape_value(fields.get("FullNameEN") or ""),
+        "gender": GENDER_DISPLAY.get(fields.get("Gender", ""), NOT_SET),
+        "size": SIZE_DISPLAY.get(fields.get("Size", ""), NOT_SET),
+        "church": escape_value(fields.get("Church", NOT_SET)),
+        "role": ROLE_DISPLAY.get(fields.get("Role", ""), NOT_SET),
+        "department": escape_value(DEPARTMENT_DISPLAY.get(department, department)),
+        "city": escape_value(fields.get("CountryAndCity") or ""),
+        "submitted_by": escape_value(fields.get("SubmittedBy") or ""),
+        "contacts": escape_value(fields.get("ContactInformation") or ""),
+    }
+    lines = [_FULL_HEAD(context)]
+    if fields.get("FullNameEN"):
+        lines.append(_FULL_NAME_EN(context))
+    lines.append(_FULL_BODY(context))
+    if fields.get("Role") == "TEAM" and department:
+        lines.append(_FULL_DEPARTMENT(context))
+    if fields.get("CountryAndCity"):
+        lines.append(_FULL_CITY(context))
+    if fields.get("SubmittedBy"):
+        lines.append(_FULL_SUBMITTED_BY(context))
+    if fields.get("ContactInformation"):
+        lines.append(_FULL_CONTACTS(context))
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _render_list_item(fields: Mapping[str, Any]) -> str:
+    role_emoji, department = _role_extras(fields)
+    return _LIST_ITEM(
+        {
+            "role_emoji": role_emoji,
+            "name": escape_value(fields.get("FullNameRU")),
+            "role": escape_value(fields.get("Role")),
+            "department": department,
+            "payment": _short_payment(fields, _LIST_PAYMENT, "❌ Не оплачено"),
+            "id": escape_value(fields.get("id")),
+        }
+    )
+
+
+def _search_renderer(exact: bool, show_name_en: bool) -> Callable[[Mapping[str, Any]], str]:
+    def render(fields: Mapping[str, Any]) -> str:
+        role_emoji, department = _role_extras(fields)
+        text = _SEARCH_CARD(
+            {
+                "confidence_emoji": "🎯" if exact else "🔍",
+                "role_emoji": role_emoji,
+                "name": escape_value(fields.get("FullNameRU")),
+                "id": escape_value(fields.get("id")),
+                "church": escape_value(fields.get("Church")),
+                "role": escape_value(fields.get("Role")),
+                "department": department,
+                "payment": _short_payment(fields, _SEARCH_PAYMENT, "❌ Не оплачено"),
+            }
+        )
+        if show_name_en and fields.get("FullNameEN"):
+            text += _SEARCH_NAME_EN({"name_en": escape_value(fields["FullNameEN"])})
+        return text
+
+    return render
+
+
+_SEARCH_VIEWS = {
+    (exact, name_en): _search_renderer(exact, name_en)
+    for exact in (True, False)
+    for name_en in (True, False)
+}
+
+
+class CardRenderer:
+    """Рендерит карточки участников с кешем по версии записи."""
+
+    def __init__(self, max_entries: int = 4096, registry: Optional[MetricsRegistry] = None) -> None:
+        self.max_entries = max_entries
+        self.registry = registry or metrics
+        self._cache: "OrderedDict[Tuple[Hashable, ...], str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _render(self, view: Hashable, render: Callable[[Mapping[str, Any]], str], data: Any) -> str:
+        version = record_version(data)
+        key = (view, version)
+        try:
+            text = self._cache.get(key)
+        except TypeError:
+            # нехешируемое значение поля — рендерим без кеша
+            return render(_fields(version))
+        if text is not None:
+            self._cache.move_to_end(key)
+            self.registry.inc("cards.cache_hits")
+            return text
+        text = render(_fields(version))
+        self._cache[key] = text
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        self.registry.inc("cards.rendered")
+        return text
+
+    def block(self, data: Any) -> str:
+        """Блок полей для подтверждения/дубликата (dict или Participant)."""
+        return self._render("block", _render_block, data)
+
+    def full_info(self, data: Any) -> str:
+        """Полная карточка после сохранения."""
+        return self._render("full", _render_full_info, data)
+
+    def search_result(self, result: Any) -> str:
+        """Карточка результата поиска; процент совпадения добавляется отдельно."""
+        exact = result.confidence == 1.0
+        show_name_en = result.match_field == "name_en"
+        text = self._render(
+            ("search", exact, show_name_en),
+            _SEARCH_VIEWS[(exact, show_name_en)],
+            result.participant,
+        )
+        if result.confidence < 1.0:
+            text += _SEARCH_CONFIDENCE({"percent": int(result.confidence * 100)})
+        return text
+
+    def list_item(self, participant: Any) -> str:
+        return self._render("list", _render_list_item, participant)
+
+    def participant_list(self, participants: Iterable[Any]) -> str:
+        """Сообщение /list: заголовок и карточки, собранные одним join."""
+        items = [self.list_item(p) for p in participants]
+        return _LIST_HEADER({"count": len(items)}) + "".join(items)
+
+
+renderer = CardRenderer()
@@ -1,10 +1,37 @@
 from functools import wraps
-from config import COORDINATOR_IDS, VIEWER_IDS
-
-
-def require_role(required_role):
+from utils.acl import acl
+
+UNAUTHORIZED_MESSAGES = {
+    "coordinator": "❌ Только координаторы могут выполнять эту команду.",
+    "viewer": "❌ У вас нет доступа к этому боту.",
+}
+COMMAND_DENIED_MESSAGE = "❌ Недостаточно прав для этой команды."
+
+
+async def reply_unauthorized(update, text):
+    """Replies with an access error via the callback message or the message."""
+    # Prefer replying via callback when present
+    callback_query = getattr(update, "callback_query", None)
+    if callback_query is not None:
+        try:
+            # Acknowledge the callback to avoid Telegram client spinners
+            await callback_query.answer()
+        except Exception:
+            # Ignore acknowledgment errors
+            pass
+        if getattr(callback_query, "message", None) is not None:
+            await callback_query.message.reply_text(text)
+    elif getattr(update, "message", None) is not None:
+        await update.message.reply_text(text)
+
+
+def require_role(required_role, command=None):
     """Decorator to check user role for a command or callback.
 
+    With ``command`` (name without the slash) the user also needs that
+    command in their role's permissions, so the "permissions" section of the
+    ACL file can take commands away from a role.
+
     For callback-only handlers where update.message is None, the decorator will
     respond via update.callback_query.message and call answer() to acknowledge
     the callback.
@@ -16,27 +43,14 @@ def require_role(required_role):
             user_id = getattr(getattr(update, "effective_user", None), "id", None)
 
             unauthorized_message = None
-            if required_role == "coordinator":
-                if user_id not in COORDINATOR_IDS:
-                    unauthorized_message = "❌ Только координаторы могут выполнять эту команду."
-            elif required_role == "viewer":
-                if user_id not in (COORDINATOR_IDS + VIEWER_IDS):
-                    unauthorized_message = "❌ У вас нет доступа к этому боту."
+            # роли — словарь в utils/acl.py, проверка за O(1)
+            if required_role in UNAUTHORIZED_MESSAGES and not acl.has_role(user_id, required_role):
+                unauthorized_message = UNAUTHORIZED_MESSAGES[required_role]
+            elif command is not None and not acl.can(user_id, command):
+                unauthorized_message = COMMAND_DENIED_MESSAGE
 
             if unauthorized_message:
-                # Prefer replying via callback when present
-                callback_query = getattr(update, "callback_query", None)
-                if callback_query is not None:
-                    try:
-                        # Acknowledge the callback to avoid Telegram client spinners
-                        await callback_query.answer()
-                    except Exception:
-                        # Ignore acknowledgment errors
-                        pass
-                    if getattr(callback_query, "message", None) is not None:
-                        await callback_query.message.reply_text(unauthorized_message)
-                elif getattr(update, "message", None) is not None:
-                    await update.message.reply_text(unauthorized_message)
+                await reply_unauthorized(update, unauthorized_message)
                 return
 
             return await func(update, context)
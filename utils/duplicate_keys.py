@@ -0,0 +1,57 @@
+"""Ключи для поиска дублей участников.
+
+Проверка дубля сравнивала имя как есть, поэтому «анна козлова» и
+«Анна Козлова», «Алёна» и «Алена», «Козлова Анна» и «Анна Козлова»
+считались разными людьми. Здесь строятся нормализованные ключи:
+
+* ``name_key`` — слова имени без регистра и знаков препинания, с «е»
+  вместо «ё», по алфавиту («Козлова-Анна» == «анна козлова»);
+* ``normalize_phone`` — последние 9 цифр номера: «+972 50…» и «050…»
+  совпадают; ``phone_keys`` — все номера из текста;
+* ``contact_keys`` — первый телефон и email в нижнем регистре из поля
+  контактов.
+
+В SQLite ключи хранятся в индексированных колонках participants
+(NameKey, PhoneKey, EmailKey), для Airtable сервис строит их по кешу.
+Те же функции использует сверка выписки (utils/payment_reconciliation.py),
+чтобы имя и телефон сравнивались везде одинаково.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+_WORDS = re.compile(r"\w+")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{5,}\d")
+_NON_DIGITS = re.compile(r"\D")
+# 9 цифр — израильский номер без кода страны и без ведущего 0
+_PHONE_DIGITS = 9
+
+
+def name_key(full_name: Optional[str]) -> Optional[str]:
+    """Ключ имени или None для пустого имени."""
+    if not full_name:
+        return None
+    words = _WORDS.findall(full_name.casefold().replace("ё", "е"))
+    return " ".join(sorted(words)) or None
+
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    """Последние 9 цифр номера или None, если цифр меньше (скорее дата)."""
+    digits = _NON_DIGITS.sub("", value or "")
+    return digits[-_PHONE_DIGITS:] if len(digits) >= _PHONE_DIGITS else None
+
+
+def phone_keys(text: Optional[str]) -> List[str]:
+    """Ключи всех номеров в тексте; цифры внутри email номером не считаются."""
+    phones = (normalize_phone(m.group()) for m in _PHONE.finditer(_EMAIL.sub(" ", text or "")))
+    return [phone for phone in phones if phone]
+
+
+def contact_keys(contact: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(телефон, email) из поля контактов; отсутствующий ключ — None."""
+    if not contact:
+        return None, None
+    email = _EMAIL.search(contact)
+    phones = phone_keys(contact)
+    return phones[0] if phones else None, email.group().lower() if email else None
@@ -21,3 +21,12 @@ class ValidationError(BotException):
 class DatabaseError(BotException):
     """Related to database errors."""
     pass
+
+
+class ConcurrentModificationError(BotException):
+    """Raised when a participant was saved by someone else after it was read"""
+
+    def __init__(self, message: str = "", current=None):
+        super().__init__(message)
+        # Актуальная версия участника, если её удалось прочитать
+        self.current = current
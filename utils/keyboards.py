@@ -0,0 +1,75 @@
+"""Реестр неизменяемых inline-клавиатур.
+
+Клавиатуры бота почти все статические, но раньше каждая ``get_*_keyboard()``
+заново создавала кнопки и ``InlineKeyboardMarkup``, а PTB при каждой отправке
+заново обходил их в ``to_dict()``.
+
+* ``button()`` кеширует кнопки: одинаковые кнопки (``↩️ Назад``,
+  ``❌ Отмена``) — один объект;
+* ``keyboard()`` собирает ``FrozenInlineKeyboardMarkup`` один раз при импорте
+  модуля; сериализованные ``to_dict()``/``to_json()`` вычисляются сразу и
+  потом только возвращаются;
+* динамические клавиатуры собираются из готовых строк (``row()``), варианты
+  с небольшим числом комбинаций кешируются целиком.
+
+Объекты PTB заморожены после создания, поэтому одну клавиатуру безопасно
+отдавать в любое число сообщений. Словарь из ``to_dict()`` общий — его нельзя
+изменять.
+"""
+
+import json
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """``InlineKeyboardMarkup`` с заранее посчитанным представлением для Bot API."""
+
+    __slots__ = ("_cached_dict", "_cached_json")
+
+    def __init__(
+        self,
+        inline_keyboard: Sequence[Sequence[InlineKeyboardButton]],
+        *,
+        api_kwargs: Optional[dict] = None,
+    ) -> None:
+        super().__init__(inline_keyboard, api_kwargs=api_kwargs)
+        with self._unfrozen():
+            self._cached_dict = super().to_dict()
+            self._cached_json = json.dumps(self._cached_dict)
+
+    def to_dict(self, recursive: bool = True) -> dict:
+        if recursive:
+            return self._cached_dict
+        return super().to_dict(recursive=False)
+
+    def to_json(self) -> str:
+        return self._cached_json
+
+
+Row = Tuple[InlineKeyboardButton, ...]
+
+
+@lru_cache(maxsize=None)
+def button(text: str, callback_data: str) -> InlineKeyboardButton:
+    """Кнопка с callback_data; одинаковые кнопки создаются один раз."""
+    return InlineKeyboardButton(text, callback_data=callback_data)
+
+
+def row(*buttons: Tuple[str, str]) -> Row:
+    """Строка клавиатуры из пар (текст, callback_data)."""
+    return tuple(button(text, data) for text, data in buttons)
+
+
+def keyboard(*rows: Iterable[InlineKeyboardButton]) -> FrozenInlineKeyboardMarkup:
+    """Собирает неизменяемую клавиатуру из строк."""
+    return FrozenInlineKeyboardMarkup([tuple(r) for r in rows])
+
+
+# Общие строки и клавиатуры, которые встречаются в нескольких сценариях
+CANCEL_ROW = row(("❌ Отмена", "main_cancel"))
+BACK_ROW = row(("↩️ Назад", "field_edit_cancel"))
+CANCEL_KEYBOARD = keyboard(CANCEL_ROW)
+BACK_KEYBOARD = keyboard(BACK_ROW)
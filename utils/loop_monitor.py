@@ -0,0 +1,266 @@
+"""Мониторинг здоровья event loop.
+
+Обработчики бота выполняют синхронный I/O (SQLite, Airtable) прямо в event
+loop, из-за чего остальные апдейты ждут. ``LoopMonitor`` измеряет это:
+
+* heartbeat-задача раз в ``interval`` секунд замеряет задержку планирования;
+* в debug-режиме asyncio перехватываются предупреждения о медленных
+  callback'ах и привязываются к обработчику PTB, который их вызвал;
+* размер очереди ``application.update_queue`` публикуется как gauge.
+
+Все значения попадают в ``utils.metrics.metrics``, превышения порогов пишутся
+в лог ``performance`` в JSON.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from telegram.ext import ApplicationHandlerStop, ConversationHandler
+
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+_TASK_NAME_RE = re.compile(r"name='([^']+)'")
+_CORO_NAME_RE = re.compile(r"coro=<([\w.<>]+)\(")
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Перехватывает сообщения asyncio вида ``Executing <handle> took N seconds``."""
+
+    def __init__(self, monitor: "LoopMonitor") -> None:
+        super().__init__(level=logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not isinstance(record.msg, str) or not record.msg.startswith("Executing"):
+            return
+        args = record.args or ()
+        if len(args) != 2:
+            return
+        try:
+            self.monitor.record_slow_callback(str(args[0]), float(args[1]))
+        except Exception:  # pragma: no cover - мониторинг не должен ронять бота
+            self.handleError(record)
+
+
+class LoopMonitor:
+    """Heartbeat-монитор event loop с атрибуцией медленных обработчиков."""
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        lag_threshold: float = 0.25,
+        slow_callback_threshold: float = 0.1,
+        pending_threshold: int = 20,
+        debug: bool = False,
+        report_every: int = 60,
+        registry: Optional[MetricsRegistry] = None,
+        timing_logger: Any = None,
+        timing_exclude: Iterable[str] = (),
+    ) -> None:
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.slow_callback_threshold = slow_callback_threshold
+        self.pending_threshold = pending_threshold
+        self.debug = debug
+        self.report_every = report_every
+        self.registry = registry or metrics
+        self.performance_logger = logging.getLogger("performance")
+        # UserActionLogger для событий handler_timing (источник для dashboard.py)
+        self.timing_logger = timing_logger
+        self.timing_exclude = frozenset(timing_exclude)
+
+        # имя asyncio-задачи -> последний запущенный в ней обработчик
+        self._active: Dict[str, str] = {}
+        self._last_handler: Optional[str] = None
+        self._in_flight = 0
+        self._task: Optional[asyncio.Task] = None
+        self._update_queue: Optional[asyncio.Queue] = None
+        self._log_handler: Optional[_SlowCallbackHandler] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._previous_debug: Optional[bool] = None
+
+    # ------------------------------------------------------------------
+    # Инструментирование обработчиков
+    # ------------------------------------------------------------------
+
+    def wrap_callback(self, callback: Callable) -> Callable:
+        """Оборачивает callback обработчика для атрибуции и замера длительности."""
+        if getattr(callback, "__loop_monitored__", False):
+            return callback
+        name = getattr(callback, "__name__", repr(callback))
+        log_timing = self.timing_logger is not None and name not in self.timing_exclude
+
+        @wraps(callback)
+        async def wrapper(update: Any, context: Any) -> Any:
+            self._enter(name)
+            start = time.perf_counter()
+            error = None
+            try:
+                return await callback(update, context)
+            except ApplicationHandlerStop:
+                raise
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                self._in_flight -= 1
+                self.registry.set_gauge("handlers.in_flight", self._in_flight)
+                self.registry.observe(f"handler.{name}.seconds", duration)
+                if log_timing:
+                    user = getattr(update, "effective_user", None)
+                    self.timing_logger.log_handler_timing(
+                        getattr(user, "id", None), name, duration, error
+                    )
+
+        wrapper.__loop_monitored__ = True
+        return wrapper
+
+    def instrument(self, application: Any) -> int:
+        """Оборачивает callback'и всех зарегистрированных обработчиков.
+
+        Вложенные обработчики ``ConversationHandler`` тоже обрабатываются.
+        Возвращает количество обёрнутых callback'ов.
+        """
+        count = 0
+        for handlers in application.handlers.values():
+            for handler in self._iter_handlers(handlers):
+                handler.callback = self.wrap_callback(handler.callback)
+                count += 1
+        return count
+
+    def _iter_handlers(self, handlers: Iterable[Any]) -> Iterable[Any]:
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                yield from self._iter_handlers(handler.entry_points)
+                for state_handlers in handler.states.values():
+                    yield from self._iter_handlers(state_handlers)
+                yield from self._iter_handlers(handler.fallbacks)
+            elif getattr(handler, "callback", None) is not None:
+                yield handler
+
+    def _enter(self, name: str) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            task_name = task.get_name()
+            if task_name not in self._active:
+                # Запись удаляется только после завершения задачи: предупреждение
+                # asyncio о медленном шаге приходит уже после выхода из обработчика.
+                task.add_done_callback(
+                    lambda _t, key=task_name: self._active.pop(key, None)
+                )
+            self._active[task_name] = name
+        self._last_handler = name
+        self._in_flight += 1
+        self.registry.set_gauge("handlers.in_flight", self._in_flight)
+
+    # ------------------------------------------------------------------
+    # Запуск и остановка
+    # ------------------------------------------------------------------
+
+    def start(self, application: Any = None) -> None:
+        """Запускает heartbeat в текущем event loop (вызывать из post_init)."""
+        if self._task is not None and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        if application is not None:
+            self._update_queue = getattr(application, "update_queue", None)
+
+        if self.debug:
+            self._previous_debug = loop.get_debug()
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_callback_threshold
+            self._log_handler = _SlowCallbackHandler(self)
+            logging.getLogger("asyncio").addHandler(self._log_handler)
+
+        self._task = loop.create_task(self._heartbeat(), name="loop_monitor")
+        logger.info(
+            "Loop monitor started (interval=%.2fs, lag_threshold=%.2fs, debug=%s)",
+            self.interval,
+            self.lag_threshold,
+            self.debug,
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._log_handler is not None:
+            logging.getLogger("asyncio").removeHandler(self._log_handler)
+            self._log_handler = None
+        if self._loop is not None and self._previous_debug is not None:
+            self._loop.set_debug(self._previous_debug)
+            self._previous_debug = None
+        self._loop = None
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        ticks = 0
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record_lag(max(0.0, loop.time() - expected))
+            self.sample_pending_updates()
+            ticks += 1
+            if self.report_every and ticks % self.report_every == 0:
+                self._log("loop_health", **self.registry.snapshot())
+
+    # ------------------------------------------------------------------
+    # Регистрация измерений
+    # ------------------------------------------------------------------
+
+    def record_lag(self, lag: float) -> None:
+        self.registry.set_gauge("loop.lag.seconds", lag)
+        self.registry.observe("loop.lag.seconds", lag)
+        if lag >= self.lag_threshold:
+            self.registry.inc("loop.lag.exceeded")
+            self._log("event_loop_lag", duration=lag, handler=self._last_handler)
+
+    def record_slow_callback(self, handle: str, duration: float) -> None:
+        task_match = _TASK_NAME_RE.search(handle)
+        coro_match = _CORO_NAME_RE.search(handle)
+        handler = None
+        if task_match:
+            handler = self._active.get(task_match.group(1))
+        if handler is None:
+            handler = self._last_handler
+
+        self.registry.inc("loop.slow_callbacks")
+        if handler:
+            self.registry.inc(f"loop.slow_callbacks.{handler}")
+        self.registry.observe("loop.slow_callback.seconds", duration)
+        self._log(
+            "slow_callback",
+            duration=duration,
+            handler=handler,
+            task=task_match.group(1) if task_match else None,
+            coroutine=coro_match.group(1) if coro_match else None,
+        )
+
+    def sample_pending_updates(self) -> int:
+        if self._update_queue is None:
+            return 0
+        pending = self._update_queue.qsize()
+        self.registry.set_gauge("updates.pending", pending)
+        self.registry.observe("updates.pending", pending)
+        if pending >= self.pending_threshold:
+            self.registry.inc("updates.pending.exceeded")
+            self._log("pending_updates", pending=pending)
+        return pending
+
+    def _log(self, operation: str, **fields: Any) -> None:
+        self.performance_logger.info(
+            json.dumps({"operation": operation, **fields}, ensure_ascii=False, default=str)
+        )
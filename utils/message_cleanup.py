@@ -0,0 +1,167 @@
+"""Фоновая пакетная очистка служебных сообщений бота.
+
+Раньше ``_cleanup_messages`` последовательно вызывал ``delete_message`` для
+каждого ID прямо в обработчике: длинная сессия редактирования означала N
+HTTP-запросов до следующего ответа пользователю.
+
+Теперь обработчик только передаёт список ``MessageCleaner``:
+
+* ID копятся по чату и удаляются вызовом ``deleteMessages`` — до 100 ID
+  за запрос; несколько очисток одного чата объединяются;
+* удаление выполняется в фоне через JobQueue, а без неё — задачей
+  ``application.create_task``;
+* каждый запрос забирает токен из общего ``rate_limiter.global_limiter``,
+  ``RetryAfter`` обрабатывается повтором после паузы. Если у бота есть
+  ``TelegramRequestScheduler``, лимиты и повторы берёт на себя он, а
+  удаление идёт с фоновым приоритетом.
+
+Список сообщений для очистки хранится в ``chat_data`` (ID сообщений
+уникальны в пределах чата) и ограничен ``CLEANUP_MAX_TRACKED``: самые старые
+ID вытесняются.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, MutableMapping, Optional, Sequence
+
+from telegram.error import RetryAfter, TelegramError
+
+import config
+from utils.metrics import MetricsRegistry, metrics
+from utils.rate_limiter import (
+    TelegramRequestScheduler,
+    TokenBucket,
+    global_limiter,
+    retry_after_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_KEY = "messages_to_delete"
+# Ограничение Bot API для deleteMessages
+MAX_BATCH = 100
+
+
+def track_message(
+    store: MutableMapping[str, Any],
+    message_id: int,
+    max_tracked: Optional[int] = None,
+    registry: Optional[MetricsRegistry] = None,
+) -> None:
+    """Добавляет ID в список очистки, удерживая его размер в пределах."""
+    max_tracked = max_tracked or config.CLEANUP_MAX_TRACKED
+    ids: List[int] = store.setdefault(CLEANUP_KEY, [])
+    ids.append(message_id)
+    overflow = len(ids) - max_tracked
+    if overflow > 0:
+        del ids[:overflow]
+        (registry or metrics).inc("cleanup.dropped", overflow)
+
+
+def take_tracked(store: Optional[MutableMapping[str, Any]]) -> List[int]:
+    """Забирает накопленные ID и очищает список."""
+    if not store:
+        return []
+    ids = store.get(CLEANUP_KEY) or []
+    taken = list(ids)
+    ids.clear()
+    return taken
+
+
+class MessageCleaner:
+    """Планирует и выполняет пакетное удаление сообщений по чатам."""
+
+    def __init__(
+        self,
+        limiter: Optional[TokenBucket] = None,
+        batch_size: int = MAX_BATCH,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        self.limiter = limiter or global_limiter
+        self.batch_size = min(batch_size, MAX_BATCH)
+        self.registry = registry or metrics
+        self._pending: Dict[int, List[int]] = {}
+
+    @property
+    def pending(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    def schedule(
+        self,
+        bot: Any,
+        chat_id: int,
+        message_ids: Sequence[int],
+        job_queue: Any = None,
+        application: Any = None,
+    ) -> bool:
+        """Ставит удаление в очередь. True, если запущен новый фоновый проход."""
+        if not message_ids:
+            return False
+        pending = self._pending.get(chat_id)
+        if pending is not None:
+            # проход для этого чата уже запланирован — он заберёт и эти ID
+            pending.extend(message_ids)
+            self.registry.set_gauge("cleanup.pending", self.pending)
+            return False
+
+        self._pending[chat_id] = list(message_ids)
+        self.registry.set_gauge("cleanup.pending", self.pending)
+        if job_queue is not None:
+            job_queue.run_once(self._job_callback, 0, data=chat_id, name=f"cleanup:{chat_id}")
+        elif application is not None:
+            application.create_task(self.run(bot, chat_id), name=f"cleanup:{chat_id}")
+        else:
+            asyncio.get_running_loop().create_task(self.run(bot, chat_id))
+        return True
+
+    async def _job_callback(self, context: Any) -> None:
+        await self.run(context.bot, context.job.data)
+
+    async def run(self, bot: Any, chat_id: int) -> int:
+        """Удаляет все накопленные для чата сообщения. Возвращает число удалённых ID."""
+        deleted = 0
+        try:
+            while True:
+                ids = self._pending.get(chat_id)
+                if not ids:
+                    return deleted
+                batch = ids[: self.batch_size]
+                del ids[: self.batch_size]
+                self.registry.set_gauge("cleanup.pending", self.pending)
+                if await self._delete_batch(bot, chat_id, batch):
+                    deleted += len(batch)
+        finally:
+            # ожидания между проверкой и удалением записи нет, поэтому ID,
+            # добавленные во время прохода, не теряются
+            if not self._pending.get(chat_id):
+                self._pending.pop(chat_id, None)
+            self.registry.set_gauge("cleanup.pending", self.pending)
+
+    async def _delete_batch(self, bot: Any, chat_id: int, batch: List[int]) -> bool:
+        scheduled = isinstance(getattr(bot, "rate_limiter", None), TelegramRequestScheduler)
+        for attempt in range(2):
+            if not scheduled:
+                await self.limiter.acquire()
+            try:
+                await bot.delete_messages(chat_id=chat_id, message_ids=batch)
+            except RetryAfter as e:
+                self.registry.inc("cleanup.retry_after")
+                if attempt == 0:
+                    await asyncio.sleep(retry_after_seconds(e))
+                    continue
+                logger.warning(
+                    "Cleanup for chat %s throttled, giving up on %d messages", chat_id, len(batch)
+                )
+            except TelegramError as e:
+                # Сообщения старше 48 часов или уже удалённые — не критично
+                logger.warning("Could not delete %d messages in chat %s: %s", len(batch), chat_id, e)
+            else:
+                self.registry.inc("cleanup.batches")
+                self.registry.inc("cleanup.deleted", len(batch))
+                return True
+            break
+        self.registry.inc("cleanup.errors")
+        return False
+
+
+cleaner = MessageCleaner()
@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Any, Dict
+
+
+class _Summary:
+    """Агрегат наблюдений: количество, сумма, минимум и максимум."""
+
+    __slots__ = ("count", "total", "min", "max", "last")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe in-process registry for counters, gauges and summaries."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, _Summary] = {}
+        self._started_at = time.time()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = _Summary()
+            summary.observe(value)
+
+    def get_counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def get_gauge(self, name: str, default: float = 0) -> float:
+        with self._lock:
+            return self._gauges.get(name, default)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Возвращает копию всех метрик для логирования или HTTP-эндпоинта."""
+        with self._lock:
+            return {
+                "uptime": round(time.time() - self._started_at, 3),
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {k: v.to_dict() for k, v in self._summaries.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+            self._started_at = time.time()
+
+
+metrics = MetricsRegistry()
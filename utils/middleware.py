@@ -0,0 +1,110 @@
+"""Конвейер middleware: хуки, которые выполняются один раз до диспетчеризации.
+
+Раньше логирование апдейтов и отладка callback'ов были обработчиками
+``MessageHandler(filters.ALL, ...)`` в группах -2 и -1: на каждый апдейт PTB
+делал две лишние проверки фильтров, собирал ``CallbackContext`` и запускал
+две корутины, а ``log_all_updates`` сериализовал апдейт целиком.
+
+``MiddlewarePipeline`` — упорядоченный список хуков ``hook(update,
+application)``, синхронных или асинхронных. ``PipelineApplication`` вызывает
+его в ``process_update`` до обхода групп обработчиков:
+
+* хук, вернувший ``False``, останавливает обработку апдейта (например,
+  отсекает неавторизованных пользователей до сопоставления с
+  ConversationHandler);
+* время каждого хука пишется в ``middleware.<имя>.seconds``;
+* исключение в хуке логируется (``middleware.errors``) и не мешает
+  обработке апдейта;
+* каждый хук можно выключить (``enabled``) без перестройки приложения.
+"""
+
+import inspect
+import logging
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+from telegram.ext import Application
+
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Middleware:
+    """Один хук конвейера."""
+
+    __slots__ = ("name", "hook", "enabled", "is_async")
+
+    def __init__(self, name: str, hook: Callable[[Any, Any], Any], enabled: bool = True) -> None:
+        self.name = name
+        self.hook = hook
+        self.enabled = enabled
+        # определяется один раз, а не на каждый апдейт
+        self.is_async = inspect.iscoroutinefunction(hook)
+
+
+class MiddlewarePipeline:
+    """Упорядоченный список хуков, выполняемых до диспетчеризации апдейта."""
+
+    def __init__(
+        self, disabled: Iterable[str] = (), registry: Optional[MetricsRegistry] = None
+    ) -> None:
+        self.registry = registry or metrics
+        self.disabled = frozenset(disabled)
+        self._hooks: List[Middleware] = []
+
+    def add(self, name: str, hook: Callable[[Any, Any], Any], enabled: bool = True) -> "MiddlewarePipeline":
+        """Добавляет хук в конец; хуки из ``disabled`` добавляются выключенными."""
+        if any(m.name == name for m in self._hooks):
+            raise ValueError(f"Middleware {name!r} is already registered")
+        self._hooks.append(Middleware(name, hook, enabled and name not in self.disabled))
+        return self
+
+    def set_enabled(self, name: str, enabled: bool) -> None:
+        for middleware in self._hooks:
+            if middleware.name == name:
+                middleware.enabled = enabled
+                return
+        raise KeyError(name)
+
+    @property
+    def names(self) -> List[str]:
+        return [m.name for m in self._hooks if m.enabled]
+
+    async def run(self, update: object, application: Any) -> bool:
+        """Выполняет хуки по порядку; False — апдейт обрабатывать не нужно."""
+        for middleware in self._hooks:
+            if not middleware.enabled:
+                continue
+            start = time.perf_counter()
+            try:
+                result = middleware.hook(update, application)
+                if middleware.is_async:
+                    result = await result
+            except Exception:
+                logger.exception("Middleware %s failed", middleware.name)
+                self.registry.inc("middleware.errors")
+                result = None
+            finally:
+                self.registry.observe(
+                    f"middleware.{middleware.name}.seconds", time.perf_counter() - start
+                )
+            if result is False:
+                self.registry.inc(f"middleware.{middleware.name}.stopped")
+                return False
+        return True
+
+
+class PipelineApplication(Application):
+    """``Application``, который прогоняет апдейт через middleware перед обработчиками."""
+
+    __slots__ = ("middleware",)
+
+    def __init__(self, *, middleware: Optional[MiddlewarePipeline] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.middleware = middleware
+
+    async def process_update(self, update: object) -> None:
+        if self.middleware is not None and not await self.middleware.run(update, self):
+            return
+        await super().process_update(update)
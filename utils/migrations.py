@@ -0,0 +1,151 @@
+"""Нумерованные миграции схемы SQLite по ``PRAGMA user_version``.
+
+Раньше ``init_database`` на каждом старте выполнял все CREATE ... IF NOT
+EXISTS и проверял колонки через ``PRAGMA table_info``. Теперь номер
+применённой миграции хранится в заголовке файла БД (``user_version``):
+
+* если схема актуальна, старт — одно чтение ``user_version`` без DDL;
+* каждая миграция выполняется в своей транзакции ``BEGIN IMMEDIATE`` вместе
+  с записью нового номера: при ошибке БД остаётся на предыдущей версии, а
+  второй процесс, стартующий одновременно, ждёт и не применяет её повторно;
+* ``dry_run`` только возвращает список ожидающих миграций;
+* ``rebuild_table`` пересоздаёт таблицу для изменений, которые ALTER TABLE
+  не умеет (CHECK-ограничения, типы колонок), сохраняя индексы и триггеры.
+
+Сами миграции описаны в database.py.
+"""
+
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+def get_user_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def check_sequence(migrations: Sequence[Migration]) -> None:
+    """Номера миграций должны идти подряд с 1: пропуск — ошибка в коде."""
+    versions = [m.version for m in migrations]
+    if versions != list(range(1, len(versions) + 1)):
+        raise ValueError(f"Migration versions must be 1..N without gaps: {versions}")
+
+
+def run_migrations(
+    conn: sqlite3.Connection, migrations: Sequence[Migration], dry_run: bool = False
+) -> List[Migration]:
+    """
+    Применяет миграции новее ``user_version`` и возвращает их список.
+
+    Соединение не должно держать открытую транзакцию: каждая миграция
+    фиксируется отдельно. База новее кода (``user_version`` больше последней
+    миграции) не трогается, это логируется.
+    """
+    check_sequence(migrations)
+    current = get_user_version(conn)
+    latest = migrations[-1].version if migrations else 0
+    if current > latest:
+        logger.warning(
+            "Database schema version %d is newer than the code (%d)", current, latest
+        )
+    pending = [m for m in migrations if m.version > current]
+    if dry_run or not pending:
+        return pending
+
+    applied = []
+    for migration in pending:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # другой процесс мог применить миграцию, пока мы ждали блокировку
+            if get_user_version(conn) >= migration.version:
+                conn.rollback()
+                continue
+            started = time.perf_counter()
+            migration.apply(conn.cursor())
+            # PRAGMA не принимает параметры; version — int из кода
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            logger.error(
+                "Migration %d (%s) failed, schema stays at version %d",
+                migration.version,
+                migration.description,
+                migration.version - 1,
+            )
+            raise
+        logger.info(
+            "Applied migration %d: %s (%.1f ms)",
+            migration.version,
+            migration.description,
+            (time.perf_counter() - started) * 1000,
+        )
+        applied.append(migration)
+    return applied
+
+
+def rebuild_table(
+    cursor: sqlite3.Cursor,
+    table: str,
+    create_sql: str,
+    columns: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    Пересоздаёт таблицу по новому ``CREATE TABLE`` (порядок из документации
+    SQLite «Making Other Kinds Of Table Schema Changes»).
+
+    ``create_sql`` должен создавать таблицу с именем ``table``. Копируются
+    ``columns`` или все колонки, общие для старой и новой схем; индексы и
+    триггеры старой таблицы создаются заново. Вызывать внутри миграции —
+    шаги выполняются в её транзакции.
+    """
+    cursor.execute(
+        "SELECT sql FROM sqlite_master "
+        "WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,),
+    )
+    dependents = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"PRAGMA table_info({table})")
+    old_columns = [row[1] for row in cursor.fetchall()]
+
+    # без legacy_alter_table SQLite переписал бы ссылки в триггерах и
+    # представлениях на временное имя, и после DROP они бы сломались
+    cursor.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        cursor.execute(f"ALTER TABLE {table} RENAME TO _{table}_old")
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table = OFF")
+    cursor.execute(create_sql)
+    cursor.execute(f"PRAGMA table_info({table})")
+    new_columns = {row[1] for row in cursor.fetchall()}
+    if columns is None:
+        columns = [name for name in old_columns if name in new_columns]
+    column_list = ", ".join(columns)
+    cursor.execute(
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM _{table}_old"
+    )
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'"
+    )
+    if cursor.fetchone():
+        # AUTOINCREMENT не должен выдать заново id удалённых записей
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, IFNULL("
+            "(SELECT seq FROM sqlite_sequence WHERE name = ?), 0)) WHERE name = ?",
+            (f"_{table}_old", table),
+        )
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (f"_{table}_old",))
+    cursor.execute(f"DROP TABLE _{table}_old")
+    for statement in dependents:
+        cursor.execute(statement)
@@ -0,0 +1,117 @@
+"""Панель многошагового диалога: одно сообщение, которое редактируется на месте.
+
+Раньше каждый шаг добавления, поиска и оплаты отправлял новое сообщение, а
+старые потом удалялись через ``messages_to_delete`` — по два запроса к Bot API
+на шаг. ``show_panel`` держит для активного сценария одно сообщение-панель
+(в ``user_data``) и:
+
+* первый шаг сценария (или ``new=True``) отправляет новое сообщение;
+* следующие шаги того же сценария редактируют его: ``editMessageText``, а
+  если изменилась только клавиатура — ``editMessageReplyMarkup``;
+* если текст и клавиатура не изменились (сравниваются хеши), запрос не
+  отправляется вовсе;
+* если панель отредактировать нельзя (удалена, старше 48 часов), отправляется
+  новое сообщение и становится панелью.
+"""
+
+import hashlib
+import logging
+from typing import Any, Optional, Tuple
+
+from telegram import TelegramObject
+from telegram.error import BadRequest
+
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+PANEL_KEY = "panel"
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def content_hash(
+    text: str, reply_markup: Any = None, parse_mode: Optional[str] = None
+) -> Tuple[str, str]:
+    """Хеши текста (с учётом parse_mode) и клавиатуры."""
+    if reply_markup is None:
+        markup = ""
+    elif isinstance(reply_markup, TelegramObject):
+        # у клавиатур из utils/keyboards.py JSON уже посчитан
+        markup = reply_markup.to_json()
+    else:
+        markup = repr(reply_markup)
+    return _digest(f"{parse_mode}\x00{text}"), _digest(markup)
+
+
+def forget_panel(context: Any) -> None:
+    """Забывает панель: следующий шаг отправит новое сообщение."""
+    user_data = getattr(context, "user_data", None)
+    if user_data is not None:
+        user_data.pop(PANEL_KEY, None)
+
+
+async def show_panel(
+    context: Any,
+    message: Any,
+    text: str,
+    flow: str,
+    reply_markup: Any = None,
+    parse_mode: Optional[str] = None,
+    new: bool = False,
+    registry: Optional[MetricsRegistry] = None,
+) -> Optional[Any]:
+    """Показывает ``text`` в панели сценария ``flow``.
+
+    ``message`` — сообщение, на которое отвечать, если панель создаётся
+    заново. Возвращает новое сообщение, если оно было отправлено, иначе None
+    (панель отредактирована или не изменилась).
+    """
+    registry = registry or metrics
+    user_data = context.user_data
+    text_hash, markup_hash = content_hash(text, reply_markup, parse_mode)
+    panel = user_data.get(PANEL_KEY)
+
+    if panel and not new and panel.get("flow") == flow:
+        if panel["text_hash"] == text_hash and panel["markup_hash"] == markup_hash:
+            registry.inc("panel.skipped")
+            return None
+        try:
+            if panel["text_hash"] == text_hash:
+                await context.bot.edit_message_reply_markup(
+                    chat_id=panel["chat_id"],
+                    message_id=panel["message_id"],
+                    reply_markup=reply_markup,
+                )
+            else:
+                await context.bot.edit_message_text(
+                    text,
+                    chat_id=panel["chat_id"],
+                    message_id=panel["message_id"],
+                    parse_mode=parse_mode,
+                    reply_markup=reply_markup,
+                )
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                panel.update(text_hash=text_hash, markup_hash=markup_hash)
+                registry.inc("panel.skipped")
+                return None
+            logger.info("Panel %s can't be edited, sending a new one: %s", panel["message_id"], e)
+            registry.inc("panel.fallback")
+        else:
+            panel.update(text_hash=text_hash, markup_hash=markup_hash)
+            registry.inc("panel.edited")
+            return None
+
+    sent = await message.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    user_data[PANEL_KEY] = {
+        "flow": flow,
+        "chat_id": getattr(sent, "chat_id", None),
+        "message_id": sent.message_id,
+        "text_hash": text_hash,
+        "markup_hash": markup_hash,
+    }
+    registry.inc("panel.sent")
+    return sent
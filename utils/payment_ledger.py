@@ -0,0 +1,87 @@
+"""Журнал платежей: история взносов, балансы участников и поступления по дням.
+
+Раньше оплата перезаписывала ``PaymentStatus/PaymentAmount/PaymentDate`` у
+участника и всегда ставила «Paid», так что второй взнос стирал первый.
+Теперь каждый взнос — отдельная неизменяемая запись журнала (в SQLite таблица
+``payments``, в Airtable таблица ``Payments``), а на участнике хранится
+только итог:
+
+* баланс участника — материализованная сумма его взносов (в SQLite таблица
+  ``payment_balances`` с ключом ``participant_id``);
+* поступления по дням — материализованные итоги по дате (``payment_daily``);
+* статус считается от баланса и взноса за мероприятие ``EVENT_FEE``:
+  ``payment_status_for``.
+
+Обе сводки обновляются при добавлении записи, поэтому баланс участника — один
+поиск по ключу, а поступления за период — поиск начала диапазона и проход по
+дням периода. ``PaymentLedger`` — то же самое в памяти (для Airtable).
+"""
+
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+UNPAID = "Unpaid"
+PARTIAL = "Partial"
+PAID = "Paid"
+
+
+def payment_status_for(balance: int, event_fee: int = 0) -> str:
+    """Статус оплаты по балансу; при ``event_fee <= 0`` любой взнос — «Paid»."""
+    if balance <= 0:
+        return UNPAID
+    if event_fee <= 0 or balance >= event_fee:
+        return PAID
+    return PARTIAL
+
+
+class PaymentLedger:
+    """Балансы участников и итоги по дням, собранные из записей журнала."""
+
+    def __init__(self) -> None:
+        self._balances: Dict[Any, Dict] = {}
+        self._daily: Dict[str, Dict[str, int]] = {}
+        self._days: List[str] = []  # отсортированные даты для выборки диапазона
+        self._references: Set[str] = set()
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[Any, int, str]]) -> "PaymentLedger":
+        """Строит журнал из (participant_id, сумма, дата)."""
+        ledger = cls()
+        for participant_id, amount, payment_date in entries:
+            ledger.add(participant_id, amount, payment_date)
+        return ledger
+
+    def add(
+        self, participant_id: Any, amount: int, payment_date: str, reference: Optional[str] = None
+    ) -> Dict:
+        """Учитывает взнос и возвращает новый баланс участника."""
+        if reference:
+            self._references.add(reference)
+        balance = self._balances.setdefault(
+            participant_id,
+            {"participant_id": participant_id, "balance": 0, "payments_count": 0, "last_payment_date": ""},
+        )
+        balance["balance"] += amount
+        balance["payments_count"] += 1
+        balance["last_payment_date"] = max(balance["last_payment_date"], payment_date)
+
+        day = self._daily.get(payment_date)
+        if day is None:
+            day = self._daily[payment_date] = {"total": 0, "count": 0}
+            bisect.insort(self._days, payment_date)
+        day["total"] += amount
+        day["count"] += 1
+        return dict(balance)
+
+    def has_reference(self, reference: str) -> bool:
+        return reference in self._references
+
+    def balance(self, participant_id: Any) -> Optional[Dict]:
+        balance = self._balances.get(participant_id)
+        return dict(balance) if balance is not None else None
+
+    def cash_flow(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Поступления по дням в диапазоне ``[start, end]`` (даты ISO)."""
+        lo = bisect.bisect_left(self._days, start) if start else 0
+        hi = bisect.bisect_right(self._days, end) if end else len(self._days)
+        return [{"date": day, **self._daily[day]} for day in self._days[lo:hi]]
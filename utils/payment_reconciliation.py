@@ -0,0 +1,260 @@
+"""Сверка выписки банка/Bit с участниками.
+
+После мероприятия приходит CSV с сотнями переводов, а оплату вносили по
+одному участнику через /payment (поиск, подтверждение, запись). Здесь:
+
+* ``read_transfers`` читает файл построчно (``csv`` поверх текстового
+  потока) и сама находит колонки плательщика, суммы, даты, телефона и
+  номера операции по заголовкам на английском, иврите и русском;
+  исходящие переводы, строки без суммы и с нераспознанной датой
+  пропускаются, время после даты отбрасывается; если колонки даты нет,
+  датой платежа считается день загрузки;
+* ``ParticipantMatcher`` один раз строит индексы участников по телефону из
+  ``ContactInformation`` и по имени (слова в любом порядке), а для
+  остальных строк вызывает обычный поиск сервиса;
+* ``reconcile`` сопоставляет строки потоком и собирает ``ReconciliationReport``
+  с оценкой уверенности у каждого совпадения.
+
+У каждого перевода есть ``reference`` — номер операции из файла или хеш
+строки. Журнал платежей не принимает повторную ссылку, поэтому повторная
+загрузка той же выписки не удваивает платежи.
+"""
+
+import csv
+import hashlib
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from models.participant import Participant
+from utils.duplicate_keys import name_key, normalize_phone, phone_keys
+
+# Заголовки колонок в выписках (сравниваются в нижнем регистре)
+COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "payer": ("payer", "name", "payer name", "from", "sender", "שם", "שם המשלם", "שולח", "плательщик", "имя", "отправитель"),
+    "amount": ("amount", "credit", "sum", "סכום", "זכות", "סכום העסקה", "сумма", "приход"),
+    "date": ("date", "value date", "תאריך", "תאריך ערך", "дата"),
+    "phone": ("phone", "mobile", "טלפון", "נייד", "телефон"),
+    "reference": ("reference", "id", "transaction id", "אסמכתא", "מספר אסמכתא", "номер", "номер операции"),
+}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y", "%d/%m/%y", "%d.%m.%y")
+
+# Уверенность совпадений по способу поиска
+PHONE_CONFIDENCE = 1.0
+NAME_CONFIDENCE = 0.95
+AMBIGUOUS_PENALTY = 0.5
+
+_AMOUNT_RE = re.compile(r"[^\d.,\-]")
+
+
+@dataclass
+class Transfer:
+    """Входящий перевод из строки выписки."""
+
+    line: int
+    payer: str
+    amount: int
+    date: str
+    phone: str = ""
+    reference: str = ""
+
+
+@dataclass
+class ReconciliationMatch:
+    transfer: Transfer
+    participant: Optional[Participant] = None
+    confidence: float = 0.0
+    reason: str = ""
+
+
+@dataclass
+class ReconciliationReport:
+    """Результат сверки: совпадения по убыванию уверенности и отбракованные строки."""
+
+    matches: List[ReconciliationMatch] = field(default_factory=list)
+    skipped: int = 0
+    min_confidence: float = 0.85
+
+    @property
+    def confident(self) -> List[ReconciliationMatch]:
+        return [m for m in self.matches if m.participant and m.confidence >= self.min_confidence]
+
+    @property
+    def to_review(self) -> List[ReconciliationMatch]:
+        return [m for m in self.matches if m.participant and m.confidence < self.min_confidence]
+
+    @property
+    def unmatched(self) -> List[ReconciliationMatch]:
+        return [m for m in self.matches if m.participant is None]
+
+    @property
+    def total_amount(self) -> int:
+        return sum(m.transfer.amount for m in self.matches)
+
+
+def parse_amount(value: str) -> Optional[int]:
+    """Сумма в целых шекелях; «1,250.00 ₪» -> 1250."""
+    cleaned = _AMOUNT_RE.sub("", value or "")
+    if not cleaned:
+        return None
+    if "," in cleaned and "." not in cleaned and len(cleaned.rsplit(",", 1)[1]) != 3:
+        cleaned = cleaned.replace(",", ".")  # 150,50 — десятичная запятая
+    try:
+        return int(round(float(cleaned.replace(",", ""))))
+    except ValueError:
+        return None
+
+
+def parse_date(value: str) -> Optional[str]:
+    """Дата ISO; «15/03/2024 10:22» -> «2024-03-15», нераспознанная — None."""
+    value = (value or "").strip()
+    # время после даты: «15/03/2024 10:22», «2024-03-15T10:22:00»
+    value = re.split(r"[\sT]", value, maxsplit=1)[0]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _find_columns(header: Sequence[str]) -> Dict[str, int]:
+    normalized = [h.strip().lstrip("\ufeff").lower() for h in header]
+    columns = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        for index, title in enumerate(normalized):
+            if title in aliases:
+                columns[name] = index
+                break
+    missing = {"payer", "amount"} - set(columns)
+    if missing:
+        raise ValueError(f"Не найдены колонки: {', '.join(sorted(missing))}")
+    return columns
+
+
+def _row_reference(date: str, amount: int, payer: str, phone: str, occurrence: int) -> str:
+    # Без номера операции: хеш содержимого и номера повтора такой же строки,
+    # чтобы вставка строк в начало выписки не меняла ссылки
+    raw = f"{date}|{amount}|{payer}|{phone}|{occurrence}"
+    return "sha1:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def read_transfers(
+    lines: Iterable[str], upload_date: Optional[str] = None
+) -> Iterator[Optional[Transfer]]:
+    """
+    Читает выписку построчно; для непригодной строки отдаёт None.
+
+    ``upload_date`` (ISO, по умолчанию сегодня) — дата платежей выписки без
+    колонки даты.
+    """
+    iterator = iter(lines)
+    first = next(iterator, "")
+    try:
+        delimiter = csv.Sniffer().sniff(first, delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    reader = csv.reader(_chain(first, iterator), delimiter=delimiter)
+    columns = _find_columns(next(reader, []))
+    default_date = None if "date" in columns else upload_date or date.today().isoformat()
+
+    def cell(row: List[str], name: str) -> str:
+        index = columns.get(name)
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    seen: Dict[Tuple, int] = {}
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        amount = parse_amount(cell(row, "amount"))
+        payer = cell(row, "payer")
+        payment_date = default_date or parse_date(cell(row, "date"))
+        if not amount or amount <= 0 or not payer or payment_date is None:
+            yield None
+            continue
+        phone = normalize_phone(cell(row, "phone")) or ""
+        reference = cell(row, "reference")
+        if not reference:
+            key = (payment_date, amount, payer, phone)
+            seen[key] = seen.get(key, 0) + 1
+            reference = _row_reference(*key, seen[key])
+        yield Transfer(
+            line=reader.line_num,
+            payer=payer,
+            amount=amount,
+            date=payment_date,
+            phone=phone,
+            reference=reference,
+        )
+
+
+def _chain(first: str, rest: Iterator[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+
+class ParticipantMatcher:
+    """Индексы участников для сверки: телефон и имя, затем обычный поиск."""
+
+    def __init__(
+        self,
+        participants: Iterable[Participant],
+        search: Optional[Callable[[str], Sequence]] = None,
+    ) -> None:
+        self._search = search
+        self._by_phone: Dict[str, List[Participant]] = {}
+        self._by_name: Dict[str, List[Participant]] = {}
+        for participant in participants:
+            for phone in set(phone_keys(participant.ContactInformation)):
+                self._by_phone.setdefault(phone, []).append(participant)
+            keys = {name_key(participant.FullNameRU), name_key(participant.FullNameEN)}
+            for key in keys - {None}:
+                self._by_name.setdefault(key, []).append(participant)
+
+    @staticmethod
+    def _pick(candidates: List[Participant], confidence: float, reason: str) -> Tuple[Participant, float, str]:
+        if len(candidates) > 1:
+            return candidates[0], confidence * AMBIGUOUS_PENALTY, f"{reason} (несколько совпадений)"
+        return candidates[0], confidence, reason
+
+    def match(self, transfer: Transfer) -> ReconciliationMatch:
+        candidates = self._by_phone.get(transfer.phone) if transfer.phone else None
+        if candidates:
+            participant, confidence, reason = self._pick(candidates, PHONE_CONFIDENCE, "телефон")
+            return ReconciliationMatch(transfer, participant, confidence, reason)
+
+        candidates = self._by_name.get(name_key(transfer.payer))
+        if candidates:
+            participant, confidence, reason = self._pick(candidates, NAME_CONFIDENCE, "имя")
+            return ReconciliationMatch(transfer, participant, confidence, reason)
+
+        if self._search is not None:
+            results = list(self._search(transfer.payer))
+            if results:
+                best = results[0]
+                confidence = best.confidence * NAME_CONFIDENCE
+                reason = "похожее имя"
+                if len(results) > 1 and results[1].confidence == best.confidence:
+                    confidence *= AMBIGUOUS_PENALTY
+                    reason += " (несколько совпадений)"
+                return ReconciliationMatch(transfer, best.participant, round(confidence, 2), reason)
+
+        return ReconciliationMatch(transfer, None, 0.0, "не найден")
+
+
+def reconcile(
+    lines: Iterable[str],
+    matcher: ParticipantMatcher,
+    min_confidence: float = 0.85,
+    upload_date: Optional[str] = None,
+) -> ReconciliationReport:
+    """Сопоставляет строки выписки с участниками по мере чтения файла."""
+    report = ReconciliationReport(min_confidence=min_confidence)
+    for transfer in read_transfers(lines, upload_date):
+        if transfer is None:
+            report.skipped += 1
+            continue
+        report.matches.append(matcher.match(transfer))
+    report.matches.sort(key=lambda m: m.confidence, reverse=True)
+    return report
@@ -0,0 +1,92 @@
+"""Сводка оплат, которая поддерживается инкрементально.
+
+Статистика оплат раньше считалась на каждый запрос: в SQLite двумя полными
+проходами по таблице (GROUP BY и общий агрегат), в Airtable — скачиванием всех
+записей. Теперь:
+
+* в SQLite таблицу ``payment_summary`` (статус -> количество, сумма)
+  обновляют триггеры на INSERT/UPDATE/DELETE в той же транзакции, что и
+  изменение участника (database.py);
+* для Airtable ``PaymentAggregate`` хранит вклад каждой записи в памяти и
+  обновляется дельтами при add/update/delete репозитория.
+
+Чтение сводки — проход по нескольким статусам, а не по участникам.
+``summary_from_breakdown`` собирает из разбивки по статусам словарь в прежнем
+формате ``get_payment_summary``.
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+PAID = "Paid"
+
+
+def summary_from_breakdown(breakdown: Mapping[Any, Mapping[str, int]]) -> Dict:
+    """Словарь статистики из ``{статус: {"count": n, "total": сумма}}``."""
+    total_participants = sum(item["count"] for item in breakdown.values())
+    paid_count = breakdown.get(PAID, {}).get("count", 0)
+    return {
+        "status_breakdown": {status: dict(item) for status, item in breakdown.items()},
+        "total_participants": total_participants,
+        "total_amount": sum(item["total"] for item in breakdown.values()),
+        "paid_count": paid_count,
+        "unpaid_count": total_participants - paid_count,
+    }
+
+
+def diff_breakdowns(
+    expected: Mapping[Any, Mapping[str, int]], actual: Mapping[Any, Mapping[str, int]]
+) -> Dict[Any, Dict[str, Optional[Mapping[str, int]]]]:
+    """Статусы, по которым сводка расходится с пересчётом с нуля."""
+    return {
+        status: {"expected": expected.get(status), "actual": actual.get(status)}
+        for status in set(expected) | set(actual)
+        if expected.get(status) != actual.get(status)
+    }
+
+
+class PaymentAggregate:
+    """Сводка оплат в памяти: вклад каждой записи и итоги по статусам."""
+
+    def __init__(self) -> None:
+        self._records: Dict[Any, Tuple[Any, int]] = {}
+        self._by_status: Dict[Any, Dict[str, int]] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[Any, Any, Optional[int]]]) -> "PaymentAggregate":
+        """Строит сводку из (id, статус, сумма)."""
+        aggregate = cls()
+        for record_id, status, amount in records:
+            aggregate.set(record_id, status, amount)
+        return aggregate
+
+    def __contains__(self, record_id: Any) -> bool:
+        return record_id in self._records
+
+    def get(self, record_id: Any) -> Optional[Tuple[Any, int]]:
+        return self._records.get(record_id)
+
+    def set(self, record_id: Any, status: Any, amount: Optional[int]) -> None:
+        """Добавляет запись или заменяет её прежний вклад."""
+        self.discard(record_id)
+        amount = amount or 0
+        self._records[record_id] = (status, amount)
+        item = self._by_status.setdefault(status, {"count": 0, "total": 0})
+        item["count"] += 1
+        item["total"] += amount
+
+    def discard(self, record_id: Any) -> None:
+        previous = self._records.pop(record_id, None)
+        if previous is None:
+            return
+        status, amount = previous
+        item = self._by_status[status]
+        item["count"] -= 1
+        item["total"] -= amount
+        if item["count"] <= 0:
+            del self._by_status[status]
+
+    def breakdown(self) -> Dict[Any, Dict[str, int]]:
+        return {status: dict(item) for status, item in self._by_status.items()}
+
+    def as_summary(self) -> Dict:
+        return summary_from_breakdown(self._by_status)
@@ -0,0 +1,420 @@
+"""Постоянное хранение состояния диалогов и user_data в SQLite.
+
+Без persistence рестарт бота теряет все незавершённые /add: состояние
+ConversationHandler, ``context.user_data`` (``parsed_participant``,
+``add_flow_data``, ``search_results``, таймауты редактирования) и
+``chat_data`` (``messages_to_delete``) живут только в памяти.
+
+``SQLitePersistence`` — реализация ``BasePersistence`` для PTB:
+
+* отдельная база (``PERSISTENCE_PATH``) в режиме WAL;
+* запись объединяется: изменённые пользователи копятся в памяти и
+  сбрасываются одной транзакцией раз в ``flush_interval`` секунд, неизменные
+  данные повторно не пишутся;
+* компактная сериализация: JSON с тегами (``{"__p": ...}`` и т. п.) для
+  ``Participant`` (только отличающиеся от значений по умолчанию поля),
+  ``SearchResult``, ``datetime``, кортежей и множеств; объекты, которые нельзя
+  восстановить (Job, Message), пропускаются. Ключи словарей сохраняются
+  строками;
+* user_data и chat_data поднимаются лениво — при первом апдейте пользователя
+  (``refresh_user_data``), а не все сразу при старте.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from models.participant import Participant
+from services.participant_service import SearchResult
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+_SKIP = object()
+_PARTICIPANT_DEFAULTS = Participant.DEFAULTS
+
+
+class TransientRef:
+    """Ссылка на объект, который не переживает рестарт (например, Job).
+
+    ``deepcopy`` (его делает PTB перед сохранением) возвращает саму ссылку,
+    а сериализатор такие значения пропускает. Атрибуты проксируются.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any) -> None:
+        self.obj = obj
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.obj, name)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "TransientRef":
+        return self
+
+    def __bool__(self) -> bool:
+        return self.obj is not None
+
+
+# ----------------------------------------------------------------------
+# Сериализация
+# ----------------------------------------------------------------------
+
+
+def _encode_participant(participant: Participant) -> Dict[str, Any]:
+    return {
+        name: value
+        for name, value in participant.to_dict().items()
+        if name not in _PARTICIPANT_DEFAULTS or value != _PARTICIPANT_DEFAULTS[name]
+    }
+
+
+def encode_value(value: Any) -> Any:
+    """Приводит значение к JSON-совместимому виду с тегами для особых типов."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        encoded = {}
+        for key, item in value.items():
+            item = encode_value(item)
+            if item is not _SKIP:
+                encoded[str(key)] = item
+        return encoded
+    if isinstance(value, list):
+        return [item for item in map(encode_value, value) if item is not _SKIP]
+    if isinstance(value, Participant):
+        return {"__p": _encode_participant(value)}
+    if isinstance(value, SearchResult):
+        return {
+            "__sr": [
+                _encode_participant(value.participant),
+                value.confidence,
+                value.match_field,
+                value.match_type,
+            ]
+        }
+    if isinstance(value, datetime):
+        return {"__dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tu": [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"__set": [encode_value(item) for item in value]}
+    logger.debug("Skipping non-persistable value of type %s", type(value).__name__)
+    return _SKIP
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) != 1:
+        return obj
+    tag, value = next(iter(obj.items()))
+    if tag == "__p":
+        return Participant(**value)
+    if tag == "__sr":
+        participant, confidence, match_field, match_type = value
+        return SearchResult(Participant(**participant), confidence, match_field, match_type)
+    if tag == "__dt":
+        return datetime.fromisoformat(value)
+    if tag == "__date":
+        return date.fromisoformat(value)
+    if tag == "__tu":
+        return tuple(value)
+    if tag == "__set":
+        return set(value)
+    return obj
+
+
+def dumps(value: Any) -> str:
+    encoded = encode_value(value)
+    if encoded is _SKIP:
+        encoded = None
+    return json.dumps(encoded, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(raw: str) -> Any:
+    return json.loads(raw, object_hook=_decode_object)
+
+
+# ----------------------------------------------------------------------
+# Persistence
+# ----------------------------------------------------------------------
+
+
+class SQLitePersistence(BasePersistence):
+    """``BasePersistence`` на SQLite (WAL) с объединением записи и ленивой загрузкой."""
+
+    def __init__(
+        self,
+        path: str = "bot_state.db",
+        flush_interval: float = 0.5,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        # callback_data бот не использует (arbitrary_callback_data выключен)
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=flush_interval,
+        )
+        self.path = path
+        self.flush_interval = flush_interval
+        self.registry = registry or metrics
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self._loaded: Set[Tuple[str, int]] = set()
+        # последнее записанное значение — неизменные данные не пишем повторно
+        self._last: Dict[Tuple[str, Any], str] = {}
+        # ("user"|"chat", id) -> JSON или None (удалить)
+        self._dirty: Dict[Tuple[str, int], Optional[str]] = {}
+        self._dirty_bot: Optional[str] = None
+        self._dirty_conversations: Dict[Tuple[str, str], Optional[str]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    # ------------------------------------------------------------------
+    # Соединение
+    # ------------------------------------------------------------------
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS user_data (
+                    user_id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chat_data (
+                    chat_id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS bot_data (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS conversations (
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (name, key)
+                );
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Загрузка
+    # ------------------------------------------------------------------
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        # данные пользователей поднимаются лениво в refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        row = self.conn.execute("SELECT data FROM bot_data WHERE id = 0").fetchone()
+        if row is None:
+            return {}
+        self._last[("bot", 0)] = row[0]
+        return loads(row[0])
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[Any, ...], Any]:
+        rows = self.conn.execute(
+            "SELECT key, state FROM conversations WHERE name = ?", (name,)
+        ).fetchall()
+        conversations = {}
+        for key, state in rows:
+            conversations[tuple(json.loads(key))] = loads(state)
+            self._last[("conv", name, key)] = state
+        return conversations
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        self._rehydrate("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        self._rehydrate("chat", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    def _rehydrate(self, kind: str, key: int, target: Dict[Any, Any]) -> None:
+        marker = (kind, key)
+        if marker in self._loaded:
+            return
+        self._loaded.add(marker)
+        if marker in self._dirty:
+            # ещё не сброшенные данные новее, чем в базе
+            return
+        row = self.conn.execute(
+            f"SELECT data FROM {kind}_data WHERE {kind}_id = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return
+        self._last[marker] = row[0]
+        for name, value in loads(row[0]).items():
+            target.setdefault(name, value)
+        self.registry.inc("persistence.rehydrated")
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._mark("user", user_id, dumps(data))
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        self._mark("chat", chat_id, dumps(data))
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        raw = dumps(data)
+        if self._last.get(("bot", 0)) != raw:
+            self._dirty_bot = raw
+            self._schedule_flush()
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def update_conversation(
+        self, name: str, key: Tuple[Any, ...], new_state: Optional[object]
+    ) -> None:
+        raw_key = json.dumps(list(key))
+        state = None if new_state is None else dumps(new_state)
+        if self._last.get(("conv", name, raw_key)) == state:
+            self._dirty_conversations.pop((name, raw_key), None)
+            return
+        self._dirty_conversations[(name, raw_key)] = state
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._mark("user", user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._mark("chat", chat_id, None)
+
+    def _mark(self, kind: str, key: int, raw: Optional[str]) -> None:
+        marker = (kind, key)
+        self._loaded.add(marker)
+        if raw is not None and self._last.get(marker) == raw:
+            self._dirty.pop(marker, None)
+            return
+        self._dirty[marker] = raw
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_dirty()
+            return
+        self._flush_handle = loop.call_later(self.flush_interval, self._write_dirty)
+
+    async def flush(self) -> None:
+        self._write_dirty()
+        self.close()
+
+    def _write_dirty(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty and self._dirty_bot is None and not self._dirty_conversations:
+            return
+
+        dirty, self._dirty = self._dirty, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        bot, self._dirty_bot = self._dirty_bot, None
+
+        now = time.time()
+        upserts: Dict[str, list] = {"user": [], "chat": []}
+        deletes: Dict[str, list] = {"user": [], "chat": []}
+        for (kind, key), raw in dirty.items():
+            if raw is None:
+                deletes[kind].append((key,))
+            else:
+                upserts[kind].append((key, raw, now))
+        conv_upserts = [(n, k, s) for (n, k), s in conversations.items() if s is not None]
+        conv_deletes = [(n, k) for (n, k), s in conversations.items() if s is None]
+
+        start = time.perf_counter()
+        try:
+            with self.conn:
+                for kind in ("user", "chat"):
+                    if upserts[kind]:
+                        self.conn.executemany(
+                            f"INSERT OR REPLACE INTO {kind}_data ({kind}_id, data, updated_at) "
+                            "VALUES (?, ?, ?)",
+                            upserts[kind],
+                        )
+                    if deletes[kind]:
+                        self.conn.executemany(
+                            f"DELETE FROM {kind}_data WHERE {kind}_id = ?", deletes[kind]
+                        )
+                if conv_upserts:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                        conv_upserts,
+                    )
+                if conv_deletes:
+                    self.conn.executemany(
+                        "DELETE FROM conversations WHERE name = ? AND key = ?", conv_deletes
+                    )
+                if bot is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO bot_data (id, data) VALUES (0, ?)", (bot,)
+                    )
+        except sqlite3.Error:
+            logger.exception("Failed to flush persistence, will retry")
+            # возвращаем несохранённое, не перетирая более свежие изменения
+            for marker, raw in dirty.items():
+                self._dirty.setdefault(marker, raw)
+            for key, state in conversations.items():
+                self._dirty_conversations.setdefault(key, state)
+            if self._dirty_bot is None:
+                self._dirty_bot = bot
+            self.registry.inc("persistence.flush_errors")
+            return
+
+        for marker, raw in dirty.items():
+            if raw is None:
+                self._last.pop(marker, None)
+            else:
+                self._last[marker] = raw
+        for (name, key), state in conversations.items():
+            if state is None:
+                self._last.pop(("conv", name, key), None)
+            else:
+                self._last[("conv", name, key)] = state
+        if bot is not None:
+            self._last[("bot", 0)] = bot
+
+        rows = len(dirty) + len(conversations) + (bot is not None)
+        self.registry.inc("persistence.flushes")
+        self.registry.inc("persistence.rows_written", rows)
+        self.registry.observe("persistence.flush.seconds", time.perf_counter() - start)
+
+
+def create_persistence(enabled: bool, path: str, flush_interval_ms: int) -> Optional[SQLitePersistence]:
+    if not enabled:
+        return None
+    return SQLitePersistence(path, flush_interval=max(flush_interval_ms, 1) / 1000)
@@ -0,0 +1,263 @@
+"""Ограничение частоты исходящих запросов к Bot API.
+
+Telegram допускает около 30 сообщений в секунду на бота; при превышении
+приходит ``RetryAfter``. ``TokenBucket`` — асинхронное ведро токенов:
+``acquire()`` ждёт, пока накопится нужное число токенов. Общий экземпляр
+``global_limiter`` разделяют все фоновые отправители (очистка сообщений).
+
+``TelegramRequestScheduler`` — планировщик всех исходящих запросов бота
+(подключается через ``ApplicationBuilder.rate_limiter``):
+
+* общее ведро ``global_limiter`` плюс ведро на каждый чат: 1 сообщение/с
+  с небольшим запасом в личке, 20 в минуту в группах;
+* интерактивные ответы обходят в очереди фоновые запросы (удаление
+  сообщений или ``rate_limit_args={"priority": "background"}``);
+* при ``RetryAfter`` все запросы ставятся на паузу на указанное время,
+  запрос повторяется до ``max_retries`` раз;
+* глубина очередей — в gauge ``ratelimit.queue.interactive/background``.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import warnings
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import config
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_PRIORITIES = (INTERACTIVE, BACKGROUND)
+# Запросы, которые пользователь не ждёт: по умолчанию уходят с низким приоритетом
+BACKGROUND_ENDPOINTS = frozenset({"deleteMessage", "deleteMessages"})
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Пауза из ``RetryAfter`` в секундах (PTB отдаёт int или timedelta)."""
+    with warnings.catch_warnings():
+        # PTB 22 предупреждает о будущей смене типа на timedelta
+        warnings.simplefilter("ignore")
+        retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TokenBucket:
+    """Ведро токенов: ``rate`` токенов в секунду, не больше ``capacity`` про запас."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        name: str = "global",
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.name = name
+        self.registry = registry or metrics
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Забирает токены без ожидания; False, если их не хватает."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def time_until(self, tokens: float = 1.0) -> float:
+        """Сколько секунд ждать, пока накопится ``tokens`` токенов."""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """Возвращает невостребованные токены."""
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Ждёт и забирает токены. Возвращает время ожидания в секундах."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        waited = 0.0
+        # lock сохраняет порядок ожидающих (FIFO)
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                delay = (tokens - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+        if waited:
+            self.registry.observe(f"ratelimit.{self.name}.wait_seconds", waited)
+        return waited
+
+
+# Общий лимит исходящих запросов бота
+global_limiter = TokenBucket(config.TELEGRAM_GLOBAL_RATE, name="global")
+
+
+class TelegramRequestScheduler(BaseRateLimiter[Dict[str, Any]]):
+    """Ограничитель исходящих запросов с приоритетами и паузой по ``RetryAfter``."""
+
+    def __init__(
+        self,
+        global_bucket: Optional[TokenBucket] = None,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        max_retries: int = 2,
+        max_chats: int = 10000,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        self.global_bucket = global_bucket or global_limiter
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.registry = registry or metrics
+        self._chats: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+        # (приоритет, порядковый номер, future) — меньший приоритет первым
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._queued: Dict[str, int] = {name: 0 for name in _PRIORITIES}
+        self._pump: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._pump is not None and not self._pump.done():
+            self._pump.cancel()
+        self._pump = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    @staticmethod
+    def priority_for(endpoint: str, rate_limit_args: Optional[Dict[str, Any]]) -> str:
+        if rate_limit_args and rate_limit_args.get("priority") in _PRIORITIES:
+            return rate_limit_args["priority"]
+        return BACKGROUND if endpoint in BACKGROUND_ENDPOINTS else INTERACTIVE
+
+    def queue_depth(self, priority: str) -> int:
+        return self._queued[priority]
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is not None:
+            self._chats.move_to_end(chat_id)
+            return bucket
+        # отрицательный ID — группа или канал (@username тоже не личка)
+        private = isinstance(chat_id, int) and chat_id > 0
+        if private:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, name="chat", registry=self.registry)
+        else:
+            bucket = TokenBucket(self.group_rate, 1, name="group", registry=self.registry)
+        self._chats[chat_id] = bucket
+        if len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        return bucket
+
+    def _pause_remaining(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def _set_queue_gauge(self, priority: str, delta: int) -> None:
+        self._queued[priority] += delta
+        self.registry.set_gauge(f"ratelimit.queue.{priority}", self._queued[priority])
+
+    async def _acquire_global(self, priority: str) -> None:
+        # быстрый путь: очереди нет, паузы нет, токен есть
+        if not self._waiters and not self._pause_remaining() and self.global_bucket.try_acquire():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_PRIORITIES.index(priority), next(self._seq), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run_pump())
+        self._set_queue_gauge(priority, 1)
+        try:
+            await future
+        finally:
+            self._set_queue_gauge(priority, -1)
+
+    async def _run_pump(self) -> None:
+        """Выдаёт глобальные токены ожидающим в порядке приоритета."""
+        while self._waiters:
+            pause = self._pause_remaining()
+            if pause:
+                await asyncio.sleep(pause)
+                continue
+            if not self.global_bucket.try_acquire():
+                await asyncio.sleep(self.global_bucket.time_until())
+                continue
+            # отменённые ожидания пропускаем, токен достаётся следующему
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
+            else:
+                self.global_bucket.refund()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Any:
+        priority = self.priority_for(endpoint, rate_limit_args)
+        chat_id = data.get("chat_id")
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            if chat_id is not None:
+                await self._chat_bucket(chat_id).acquire()
+            await self._acquire_global(priority)
+            self.registry.observe(f"ratelimit.{priority}.wait_seconds", time.monotonic() - start)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                delay = retry_after_seconds(e)
+                self.registry.inc("ratelimit.retry_after")
+                # flood control действует на весь бот — тормозим все запросы
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                if attempt >= self.max_retries:
+                    logger.warning("%s still throttled after %d retries", endpoint, attempt)
+                    raise
+                attempt += 1
+                logger.info("%s hit flood control, retrying in %.1fs", endpoint, delay)
+
+
+def create_request_scheduler(enabled: bool) -> Optional[TelegramRequestScheduler]:
+    """Планировщик с настройками из config; None, если отключён."""
+    if not enabled:
+        return None
+    return TelegramRequestScheduler(
+        chat_rate=config.TELEGRAM_CHAT_RATE,
+        chat_burst=config.TELEGRAM_CHAT_BURST,
+        group_rate=config.TELEGRAM_GROUP_RATE_PER_MIN / 60,
+        max_retries=config.TELEGRAM_MAX_RETRIES,
+    )
@@ -0,0 +1,294 @@
+"""Opt-in SQL statement profiler for the SQLite backend.
+
+When ``config.SQL_PROFILE`` is enabled, ``DatabaseConnection`` opens
+connections with ``ProfilingConnection``: every statement is timed
+(execute and fetch), rows are counted and the numbers are aggregated per
+normalised statement (literals replaced by ``?``). The first time a
+statement exceeds ``SQL_PROFILE_EXPLAIN_THRESHOLD`` its ``EXPLAIN QUERY
+PLAN`` is captured. When disabled, plain ``sqlite3`` connections are used
+and nothing here runs.
+
+Stats are dumped to ``SQL_PROFILE_DUMP`` periodically and on exit; view them
+with::
+
+    python -m utils.sql_profiler report --sort total --limit 20
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+SORT_KEYS = ("total", "mean", "max", "calls", "rows")
+
+
+@lru_cache(maxsize=512)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals so equal statements share a key."""
+    normalized = _WS_RE.sub(" ", sql.strip())
+    normalized = _STRING_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    return _IN_LIST_RE.sub("(?...)", normalized)
+
+
+class StatementStats:
+    __slots__ = ("calls", "total", "max", "rows", "plan")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.plan: Optional[List[str]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.calls, 6) if self.calls else 0.0,
+            "max": round(self.max, 6),
+            "rows": self.rows,
+            "plan": self.plan,
+        }
+
+
+class SqlProfiler:
+    """Aggregates timings per normalised SQL statement."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        explain_threshold: float = 0.05,
+        dump_path: Optional[str] = None,
+        dump_interval: float = 60.0,
+    ) -> None:
+        self.enabled = enabled
+        self.explain_threshold = explain_threshold
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self._stats: Dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    def record(
+        self,
+        key: str,
+        duration: float,
+        rows: int = 0,
+        call_elapsed: Optional[float] = None,
+        new_call: bool = False,
+    ) -> bool:
+        """Add a measurement. Returns True when the plan should be captured."""
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            if new_call:
+                stats.calls += 1
+            stats.total += duration
+            stats.rows += rows
+            elapsed = duration if call_elapsed is None else call_elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+            need_plan = stats.plan is None and elapsed >= self.explain_threshold
+            if need_plan:
+                stats.plan = []  # захватываем план только один раз
+        if self.dump_path and time.monotonic() - self._last_dump >= self.dump_interval:
+            self.dump()
+        return need_plan
+
+    def set_plan(self, key: str, plan: List[str]) -> None:
+        with self._lock:
+            if key in self._stats:
+                self._stats[key].plan = plan
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {key: stats.to_dict() for key, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def dump(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.dump_path
+        self._last_dump = time.monotonic()
+        if not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"generated_at": time.time(), "statements": self.snapshot()},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        os.replace(tmp, path)
+        return path
+
+
+def _capture_plan(conn: sqlite3.Connection, sql: str, parameters: Any) -> List[str]:
+    try:
+        # базовый курсор: сам EXPLAIN не должен попадать в профиль
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    return [str(row[3]) for row in rows]
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch time to the profiler."""
+
+    _key: Optional[str] = None
+    _sql: str = ""
+    _parameters: Any = ()
+    _elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._begin(sql, (), time.perf_counter() - start, plan=False)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(time.perf_counter() - start, 0)
+            raise
+        self._add(time.perf_counter() - start, 1)
+        return row
+
+    def _begin(self, sql: str, parameters: Any, duration: float, plan: bool = True) -> None:
+        self._key = normalize_sql(sql)
+        self._sql = sql
+        self._parameters = parameters if plan else None
+        self._elapsed = duration
+        rows = self.rowcount if self.rowcount > 0 else 0
+        self._report(duration, rows, new_call=True)
+
+    def _add(self, duration: float, rows: int) -> None:
+        if self._key is None:
+            return
+        self._elapsed += duration
+        self._report(duration, rows)
+
+    def _report(self, duration: float, rows: int, new_call: bool = False) -> None:
+        if profiler.record(self._key, duration, rows, self._elapsed, new_call):
+            if self._parameters is None:
+                profiler.set_plan(self._key, ["(executemany: plan not captured)"])
+            else:
+                profiler.set_plan(
+                    self._key, _capture_plan(self.connection, self._sql, self._parameters)
+                )
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose cursors (including ``conn.execute``) are profiled."""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    # sqlite3 создаёт курсор для этих shortcut-методов в обход cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database: str) -> sqlite3.Connection:
+    """Open a connection, profiled only when the profiler is enabled."""
+    if profiler.enabled:
+        return sqlite3.connect(database, factory=ProfilingConnection)
+    return sqlite3.connect(database)
+
+
+def format_report(
+    statements: Dict[str, Dict[str, Any]], sort: str = "total", limit: int = 20
+) -> str:
+    ordered = sorted(statements.items(), key=lambda kv: kv[1][sort], reverse=True)
+    lines = [
+        f"{'calls':>7} {'total,s':>9} {'mean,ms':>9} {'max,ms':>9} {'rows':>8}  statement"
+    ]
+    for sql, stats in ordered[:limit]:
+        lines.append(
+            f"{stats['calls']:>7} {stats['total']:>9.3f} {stats['mean'] * 1000:>9.2f} "
+            f"{stats['max'] * 1000:>9.2f} {stats['rows']:>8}  {sql[:120]}"
+        )
+        for step in stats.get("plan") or []:
+            lines.append(f"{'':>46}  plan: {step}")
+    return "\n".join(lines)
+
+
+profiler = SqlProfiler(
+    enabled=config.SQL_PROFILE,
+    explain_threshold=config.SQL_PROFILE_EXPLAIN_THRESHOLD,
+    dump_path=config.SQL_PROFILE_DUMP,
+)
+
+if profiler.enabled:
+    atexit.register(profiler.dump)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SQL profiler report")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--file", default=config.SQL_PROFILE_DUMP)
+    parser.add_argument("--sort", choices=SORT_KEYS, default="total")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"❌ {args.file} не найден. Включите SQL_PROFILE=true и запустите бота.")
+    else:
+        with open(args.file, encoding="utf-8") as f:
+            data = json.load(f)
+        print(format_report(data["statements"], args.sort, args.limit))
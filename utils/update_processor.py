@@ -0,0 +1,101 @@
+"""Параллельная обработка апдейтов с сохранением порядка для каждого пользователя.
+
+По умолчанию PTB обрабатывает апдейты строго по одному, и медленное
+сохранение у одного координатора задерживает всех остальных. Простое
+``concurrent_updates(N)`` ломает ConversationHandler: два сообщения одного
+пользователя могут обрабатываться одновременно, и второе увидит старое
+состояние диалога.
+
+``PerUserUpdateProcessor`` пропускает параллельно апдейты разных
+пользователей, а апдейты одного пользователя выполняет по очереди через
+отдельный ``asyncio.Lock`` на каждого. Блокировка берётся *до* общего
+семафора, поэтому поток сообщений от одного пользователя не занимает все
+слоты конкурентности. Замки создаются по требованию и удаляются, когда
+у пользователя не остаётся апдейтов в обработке.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram.ext import BaseUpdateProcessor
+
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyedLock:
+    __slots__ = ("lock", "holders")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # апдейты этого ключа, которые ждут или выполняются
+        self.holders = 0
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Конкурентная обработка апдейтов с последовательностью внутри пользователя."""
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        super().__init__(max_concurrent_updates)
+        self.registry = registry or metrics
+        self._locks: Dict[Hashable, _KeyedLock] = {}
+
+    @staticmethod
+    def key_for(update: object) -> Optional[Hashable]:
+        """Ключ сериализации: пользователь, а при его отсутствии — чат."""
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return ("user", user.id)
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return ("chat", chat.id)
+        return None
+
+    @property
+    def active_keys(self) -> int:
+        """Сколько пользователей сейчас имеют апдейты в обработке."""
+        return len(self._locks)
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.key_for(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyedLock()
+        entry.holders += 1
+        if entry.holders > 1:
+            self.registry.inc("updates.serialized")
+        self.registry.set_gauge("updates.active_users", len(self._locks))
+        try:
+            async with entry.lock:
+                await super().process_update(update, coroutine)
+        finally:
+            entry.holders -= 1
+            if entry.holders == 0:
+                del self._locks[key]
+            self.registry.set_gauge("updates.active_users", len(self._locks))
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+def create_update_processor(max_concurrent_updates: int) -> Optional[PerUserUpdateProcessor]:
+    """Процессор для ``ApplicationBuilder.concurrent_updates``; None — последовательная обработка."""
+    if max_concurrent_updates <= 1:
+        return None
+    return PerUserUpdateProcessor(max_concurrent_updates)
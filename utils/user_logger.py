@@ -1,11 +1,96 @@
-import logging
+import atexit
 import json
-from logging.handlers import RotatingFileHandler
+import logging
+import queue
+import random
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Any, Dict, Optional
 
+import config
+from utils.metrics import metrics
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def dumps(data: Any) -> str:
+    """Serialise to JSON, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(
+                data, option=orjson.OPT_NON_STR_KEYS, default=str
+            ).decode("utf-8")
+        except TypeError:
+            # например, целые числа больше 64 бит — отдаём стандартному json
+            pass
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class UserEvent:
+    """Событие журнала действий; сериализуется только в потоке записи.
+
+    Словарь ``data`` не копируется, поэтому вызывающий код не должен
+    изменять его после передачи в логгер.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data = data
+
+    def to_json(self, created: Optional[float] = None) -> str:
+        if created is None:
+            return dumps(self.data)
+        payload = {"timestamp": datetime.utcfromtimestamp(created).isoformat()}
+        payload.update(self.data)
+        return dumps(payload)
+
+    def __str__(self) -> str:
+        return self.to_json()
+
+
+class _UserEventFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, UserEvent):
+            return record.msg.to_json(record.created)
+        return super().format(record)
+
+
+class _LazyQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в вызывающем потоке."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("user_log.dropped")
+
+
+_listener: Optional[QueueListener] = None
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 class UserActionLogger:
-    """Structured logger for user-related actions."""
+    """Structured logger for user-related actions.
+
+    События ставятся в ограниченную очередь и пишутся в
+    ``logs/user_actions.log`` отдельным потоком. Частые события можно
+    сэмплировать через ``config.USER_LOG_SAMPLE_RATES``.
+    """
 
     USER_ACTION_LEVEL = logging.INFO + 5
     BUSINESS_LOGIC_LEVEL = logging.INFO + 7
@@ -13,23 +98,56 @@ class UserActionLogger:
     logging.addLevelName(USER_ACTION_LEVEL, "USER_ACTION")
     logging.addLevelName(BUSINESS_LOGIC_LEVEL, "BUSINESS_LOGIC")
 
-    def __init__(self) -> None:
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None) -> None:
         import os
 
         log_dir = "logs"
         os.makedirs(log_dir, exist_ok=True)
 
+        self.sample_rates = (
+            config.USER_LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        )
         self.logger = logging.getLogger("user_action")
         if not self.logger.handlers:
-            handler = RotatingFileHandler(
+            global _listener
+
+            file_handler = RotatingFileHandler(
                 f"{log_dir}/user_actions.log", maxBytes=5 * 1024 * 1024, backupCount=5
             )
-            handler.setFormatter(logging.Formatter("%(message)s"))
-            self.logger.addHandler(handler)
+            file_handler.setFormatter(_UserEventFormatter("%(message)s"))
+            log_queue: queue.Queue = queue.Queue(maxsize=config.USER_LOG_QUEUE_SIZE)
+            self.logger.addHandler(_LazyQueueHandler(log_queue))
+            _listener = QueueListener(log_queue, file_handler)
+            _listener.start()
+            atexit.register(_stop_listener)
         self.logger.setLevel(logging.INFO)
+        # Не дублируем события в bot.log: корневой обработчик форматировал бы
+        # их синхронно в потоке обработчика.
+        self.logger.propagate = False
+
+    def _sampled(self, event: str) -> bool:
+        """True, если событие нужно записать с учётом частоты сэмплирования."""
+        rate = self.sample_rates.get(event, 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        metrics.inc(f"user_log.sampled_out.{event}")
+        return False
 
     def _log(self, level: int, data: Dict[str, Any]) -> None:
-        self.logger.log(level, json.dumps(data, ensure_ascii=False))
+        if not self.logger.isEnabledFor(level):
+            return
+        metrics.inc("user_log.emitted")
+        # makeRecord вместо logger.log: не нужен дорогой поиск вызывающего кадра
+        record = self.logger.makeRecord(
+            self.logger.name, level, "(user_logger)", 0, UserEvent(data), None, None
+        )
+        self.logger.handle(record)
+
+    @staticmethod
+    def stats() -> Dict[str, float]:
+        """Счётчики записанных, отброшенных и отсэмплированных событий."""
+        counters = metrics.snapshot()["counters"]
+        return {k: v for k, v in counters.items() if k.startswith("user_log.")}
 
     def log_user_action(
         self,
@@ -38,6 +156,8 @@ class UserActionLogger:
         details: Dict[str, Any],
         result: str = "success",
     ) -> None:
+        if not self._sampled("user_action"):
+            return
         data = {
             "event": "user_action",
             "user_id": user_id,
@@ -54,6 +174,8 @@ class UserActionLogger:
         participant_data: Dict[str, Any],
         participant_id: Optional[int] = None,
     ) -> None:
+        if not self._sampled("participant_operation"):
+            return
         data = {
             "event": "participant_operation",
             "user_id": user_id,
@@ -74,6 +196,8 @@ class UserActionLogger:
     ) -> None:
         """Логирует операцию поиска участников."""
 
+        if not self._sampled("search_operation"):
+            return
         data: Dict[str, Any] = {
             "event": "search_operation",
             "user_id": user_id,
@@ -93,6 +217,8 @@ class UserActionLogger:
     ) -> None:
         """Логирует действия с участниками."""
 
+        if not self._sampled("participant_action"):
+            return
         data: Dict[str, Any] = {
             "event": "participant_action",
             "user_id": user_id,
@@ -109,6 +235,8 @@ class UserActionLogger:
         to_state: str,
         context: Dict[str, Any],
     ) -> None:
+        if not self._sampled("state_transition"):
+            return
         data = {
             "event": "state_transition",
             "user_id": user_id,
@@ -118,9 +246,30 @@ class UserActionLogger:
         }
         self._log(self.BUSINESS_LOGIC_LEVEL, data)
 
+    def log_handler_timing(
+        self,
+        user_id: Optional[int],
+        handler: str,
+        duration: float,
+        error: Optional[str] = None,
+    ) -> None:
+        """Логирует длительность обработчика (для SLO-дашборда)."""
+
+        if not self._sampled("handler_timing"):
+            return
+        data: Dict[str, Any] = {
+            "event": "handler_timing",
+            "user_id": user_id,
+            "handler": handler,
+            "duration": duration,
+            "error": error,
+        }
+        self._log(self.BUSINESS_LOGIC_LEVEL, data)
+
     def log_error_with_context(
         self, user_id: int, error: Exception, context: Dict[str, Any], action: str
     ) -> None:
+        # Ошибки не сэмплируются и пишутся синхронно
         data = {
             "event": "error",
             "user_id": user_id,
@@ -128,4 +277,4 @@ class UserActionLogger:
             "context": context,
             "action": action,
         }
-        logging.getLogger("errors").error(json.dumps(data, ensure_ascii=False))
+        logging.getLogger("errors").error(dumps(data))
@@ -0,0 +1,214 @@
+"""HTTP-сервер бота на aiohttp: webhook Telegram и эндпоинты мониторинга.
+
+В режиме ``BOT_MODE=webhook`` Telegram сам присылает апдейты POST-запросом,
+сервер проверяет заголовок ``X-Telegram-Bot-Api-Secret-Token`` и кладёт
+апдейт в ``application.update_queue`` — дальше он обрабатывается так же, как
+при polling. На том же сервере и в том же event loop работают ``/metrics``
+(снимок ``utils.metrics.metrics``) и ``/healthz``.
+
+В режиме polling сервер можно поднять только ради ``/metrics``
+(``METRICS_PORT``), без webhook-маршрута.
+
+aiohttp — необязательная зависимость: без неё доступен только polling.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+import signal
+from typing import Any, Optional, Sequence
+
+from telegram import Update
+
+from utils.metrics import MetricsRegistry, metrics
+
+try:
+    from aiohttp import web
+
+    AIOHTTP_AVAILABLE = True
+except ImportError:  # pragma: no cover - зависит от окружения
+    web = None
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def generate_secret_token() -> str:
+    """Случайный секрет для ``setWebhook`` (допустимы символы A-Z, a-z, 0-9, _ и -)."""
+    return secrets.token_urlsafe(32)
+
+
+class BotHTTPServer:
+    """aiohttp-сервер с webhook-маршрутом и эндпоинтами мониторинга."""
+
+    def __init__(
+        self,
+        application: Any,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        webhook_path: Optional[str] = None,
+        secret_token: Optional[str] = None,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp не установлен: pip install aiohttp")
+        self.application = application
+        self.host = host
+        self.port = port
+        self.webhook_path = webhook_path
+        self.secret_token = secret_token
+        self.registry = registry or metrics
+        self._runner: Optional["web.AppRunner"] = None
+
+    def make_app(self) -> "web.Application":
+        app = web.Application()
+        if self.webhook_path:
+            app.router.add_post(self.webhook_path, self._handle_update)
+        app.router.add_get("/metrics", self._handle_metrics)
+        app.router.add_get("/healthz", self._handle_health)
+        return app
+
+    async def start(self) -> None:
+        if self._runner is not None:
+            return
+        runner = web.AppRunner(self.make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self._runner = runner
+        # при port=0 ОС выбирает свободный порт — запоминаем фактический
+        if runner.addresses:
+            self.port = runner.addresses[0][1]
+        logger.info(
+            "HTTP server listening on %s:%s (webhook=%s)",
+            self.host,
+            self.port,
+            self.webhook_path or "off",
+        )
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ------------------------------------------------------------------
+    # Обработчики запросов
+    # ------------------------------------------------------------------
+
+    async def _handle_update(self, request: "web.Request") -> "web.Response":
+        if self.secret_token is not None:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+                self.registry.inc("webhook.rejected")
+                logger.warning("Webhook request with invalid secret token from %s", request.remote)
+                return web.Response(status=403)
+
+        try:
+            data = json.loads(await request.read())
+            update = Update.de_json(data, self.application.bot)
+        except Exception:
+            self.registry.inc("webhook.bad_request")
+            logger.warning("Malformed webhook payload", exc_info=True)
+            return web.Response(status=400)
+
+        # Отвечаем Telegram сразу: обработка идёт в общем цикле приложения,
+        # долгий ответ привёл бы к повторной доставке апдейта.
+        await self.application.update_queue.put(update)
+        self.registry.inc("webhook.updates")
+        return web.Response()
+
+    async def _handle_metrics(self, request: "web.Request") -> "web.Response":
+        return web.json_response(self.registry.snapshot())
+
+    async def _handle_health(self, request: "web.Request") -> "web.Response":
+        return web.json_response(
+            {"status": "ok", "running": bool(getattr(self.application, "running", False))}
+        )
+
+
+async def serve_webhook(
+    application: Any,
+    server: BotHTTPServer,
+    webhook_url: Optional[str] = None,
+    allowed_updates: Optional[Sequence[str]] = None,
+    drop_pending_updates: bool = False,
+    stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """Жизненный цикл приложения в режиме webhook (аналог ``run_polling``).
+
+    Вызывает ``post_init``/``post_shutdown`` приложения, поднимает сервер,
+    регистрирует webhook (если передан ``webhook_url``) и ждёт ``stop_event``
+    или SIGINT/SIGTERM.
+    """
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    installed = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            installed.append(sig)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Windows или не главный поток — останавливаемся только по stop_event
+            pass
+
+    try:
+        await application.initialize()
+        try:
+            if application.post_init:
+                await application.post_init(application)
+            await server.start()
+            try:
+                if webhook_url:
+                    await application.bot.set_webhook(
+                        url=webhook_url,
+                        secret_token=server.secret_token,
+                        allowed_updates=list(allowed_updates) if allowed_updates else None,
+                        drop_pending_updates=drop_pending_updates,
+                    )
+                await application.start()
+                try:
+                    await stop_event.wait()
+                finally:
+                    await application.stop()
+            finally:
+                await server.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        finally:
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+    finally:
+        for sig in installed:
+            loop.remove_signal_handler(sig)
+
+
+def run_webhook(
+    application: Any,
+    host: str,
+    port: int,
+    url_path: str,
+    webhook_url: str,
+    secret_token: Optional[str] = None,
+    allowed_updates: Optional[Sequence[str]] = None,
+) -> None:
+    """Блокирующий запуск бота в режиме webhook."""
+    server = BotHTTPServer(
+        application,
+        host=host,
+        port=port,
+        webhook_path=url_path,
+        secret_token=secret_token or generate_secret_token(),
+    )
+    asyncio.run(
+        serve_webhook(
+            application,
+            server,
+            webhook_url=webhook_url,
+            allowed_updates=allowed_updates,
+        )
+    )